@@ -0,0 +1,96 @@
+"""
+Micro-benchmark of per-candidate place filtering.
+
+Compares the previous per-call list building and linear scans with the
+precompiled category registry. Run from the backend directory:
+    python -m benchmarks.bench_place_filtering
+"""
+import argparse
+import random
+import timeit
+from config.place_categories import RESTAURANT_PRIMARY_TYPES, place_categories
+
+SAMPLE_PRIMARY_TYPES = sorted(RESTAURANT_PRIMARY_TYPES) + [
+    "cafe", "coffee_shop", "bakery", "bar", "museum", "meal_takeaway", "hotel", None
+]
+PLACE_TYPES = ("cafe", "restaurant", "tourist_attraction")
+
+
+def legacy_is_valid(primary_type, place_type):
+    """Filtering as it was done before the registry, lists rebuilt on every call."""
+    if place_type == "cafe":
+        cafe_specific_types = ["cafe", "coffee_shop", "bakery"]
+        return bool(primary_type) and primary_type in cafe_specific_types
+    elif place_type == "restaurant":
+        restaurant_types = [
+            "restaurant", "american_restaurant", "asian_restaurant", "barbecue_restaurant",
+            "brazilian_restaurant", "chinese_restaurant", "dessert_restaurant",
+            "fast_food_restaurant", "fine_dining_restaurant", "french_restaurant",
+            "greek_restaurant", "hamburger_restaurant", "indian_restaurant",
+            "indonesian_restaurant", "italian_restaurant", "japanese_restaurant",
+            "korean_restaurant", "lebanese_restaurant", "mediterranean_restaurant",
+            "mexican_restaurant", "middle_eastern_restaurant", "pizza_restaurant",
+            "ramen_restaurant", "seafood_restaurant", "spanish_restaurant",
+            "steak_house", "sushi_restaurant", "thai_restaurant", "turkish_restaurant",
+            "vegan_restaurant", "vegetarian_restaurant", "vietnamese_restaurant"
+        ]
+        if primary_type:
+            if primary_type in restaurant_types or primary_type.endswith("restaurant"):
+                cafe_specific_types = ["cafe", "coffee_shop", "bakery"]
+                return primary_type not in cafe_specific_types
+        return False
+    return place_type == "tourist_attraction"
+
+
+def legacy_excluded_types(place_type):
+    common_excluded_types = [
+        "hotel", "lodging", "motel", "resort_hotel", "bed_and_breakfast",
+        "inn", "guest_house", "department_store", "shopping_mall"
+    ]
+    if place_type == "cafe":
+        return common_excluded_types + [
+            "art_gallery", "art_studio", "auditorium", "cultural_landmark",
+            "historical_place", "monument", "museum", "performing_arts_theater",
+            "sculpture", "restaurant"
+        ]
+    elif place_type == "restaurant":
+        return common_excluded_types + ["cafe", "coffee_shop", "bakery"]
+    return [] if place_type == "tourist_attraction" else common_excluded_types
+
+
+def registry_is_valid(primary_type, place_type):
+    category = place_categories.categories.get(place_type)
+    return category is not None and category.accepts(primary_type)
+
+
+def registry_excluded_types(place_type):
+    return place_categories.get(place_type).excluded_types
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--candidates", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    candidates = [(rng.choice(SAMPLE_PRIMARY_TYPES), rng.choice(PLACE_TYPES)) for _ in range(args.candidates)]
+
+    # Both implementations must agree before timing them
+    mismatches = [c for c in candidates if legacy_is_valid(*c) != registry_is_valid(*c)]
+    assert not mismatches, f"Registry disagrees with legacy filtering for {mismatches[:3]}"
+
+    cases = {
+        "is_valid (legacy)": lambda: [legacy_is_valid(*c) for c in candidates],
+        "is_valid (registry)": lambda: [registry_is_valid(*c) for c in candidates],
+        "excluded_types (legacy)": lambda: [legacy_excluded_types(p) for _, p in candidates],
+        "excluded_types (registry)": lambda: [registry_excluded_types(p) for _, p in candidates],
+    }
+    print(f"{args.candidates} candidates, best of {args.repeat}")
+    for name, case in cases.items():
+        best = min(timeit.repeat(case, number=1, repeat=args.repeat))
+        print(f"  {name:<28} {best * 1e9 / args.candidates:8.1f} ns/candidate")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark of parsing and serializing a Places searchNearby response.
+
+Compares the previous path (json, dict.get chains into the pydantic Place,
+PlaceWithPhotoUrl copies and FastAPI's jsonable_encoder) with orjson and the
+slotted PlaceRecord. Payloads are read from benchmarks/fixtures. Run from the
+backend directory:
+    python -m benchmarks.bench_place_parsing
+"""
+import argparse
+import json
+import timeit
+from pathlib import Path
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from models.googleplaces import Place, PlaceRecord, PlaceWithPhotoUrl
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def photo_url(photo_name):
+    return f"https://lh3.googleusercontent.com/places/{photo_name.rsplit('/', 1)[-1]}=s400"
+
+
+def legacy_parse(body):
+    """Parsing as it was done in nearby_search before PlaceRecord."""
+    data = json.loads(body)
+    places = []
+    for result in data.get("places", []):
+        formatted_hours = None
+        if "regularOpeningHours" in result:
+            weekday_texts = result.get("regularOpeningHours", {}).get("weekdayDescriptions", [])
+            formatted_hours = "\n".join(weekday_texts) if weekday_texts else None
+        photo_name = None
+        if result.get("photos") and len(result.get("photos")) > 0:
+            photo_name = result.get("photos")[0].get("name")
+        places.append(Place(
+            place_id=result.get("id"),
+            name=result.get("displayName", {}).get("text", ""),
+            formatted_address=result.get("formattedAddress"),
+            types=result.get("types", []),
+            primary_type=result.get("primaryType"),
+            rating=result.get("rating"),
+            user_ratings_total=result.get("userRatingCount"),
+            photo_name=photo_name,
+            location={
+                "latitude": result.get("location", {}).get("latitude"),
+                "longitude": result.get("location", {}).get("longitude")
+            },
+            website=result.get("websiteUri"),
+            phone=result.get("nationalPhoneNumber"),
+            description=result.get("editorialSummary", {}).get("text") if "editorialSummary" in result else None,
+            opening_hours=formatted_hours,
+            price_level=result.get("priceLevel"),
+            business_status=result.get("businessStatus"),
+            cuisine=result.get("cuisine"),
+            opening_periods=result.get("regularOpeningHours", {}).get("periods")
+        ))
+    return places
+
+
+def legacy_respond(places):
+    """What the routes returned: PlaceWithPhotoUrl copies through FastAPI's default JSON response."""
+    body = [
+        PlaceWithPhotoUrl.from_place(place, photo_url(place.photo_name) if place.photo_name else None)
+        for place in places
+    ]
+    return json.dumps(jsonable_encoder(body), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def record_parse(body):
+    return [PlaceRecord.from_api(result) for result in orjson.loads(body).get("places", [])]
+
+
+def record_respond(places):
+    return orjson.dumps([
+        place.with_photo_url(photo_url(place.photo_name) if place.photo_name else None) for place in places
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fixture", default="places_search_nearby.json")
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    body = (FIXTURES / args.fixture).read_bytes()
+    count = len(orjson.loads(body)["places"])
+
+    # Both paths must send the same JSON before timing them
+    legacy = json.loads(legacy_respond(legacy_parse(body)))
+    record = orjson.loads(record_respond(record_parse(body)))
+    assert len(legacy) == len(record) == count
+    for old, new in zip(legacy, record):
+        mismatched = [key for key in old if old[key] != new.get(key)]
+        assert not mismatched, f"PlaceRecord disagrees with Place on {mismatched} for {old['place_id']}"
+
+    cases = {
+        "parse (legacy)": lambda: legacy_parse(body),
+        "parse (record)": lambda: record_parse(body),
+        "parse + respond (legacy)": lambda: legacy_respond(legacy_parse(body)),
+        "parse + respond (record)": lambda: record_respond(record_parse(body)),
+    }
+    print(f"{args.fixture}: {len(body)} bytes, {count} places, best of {args.repeat}")
+    for name, case in cases.items():
+        best = min(timeit.repeat(case, number=args.number, repeat=args.repeat))
+        print(f"  {name:<28} {best * 1e6 / args.number:8.1f} us/response")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Micro-benchmark of response building and encoding for the heaviest list endpoints.
+
+Compares the previous path (validated pydantic models, FastAPI's jsonable_encoder
+and json.dumps) with trusted-document construction and the orjson response class,
+for a batch of points of interest and a list of saved trips. Run from the backend
+directory:
+    python -m benchmarks.bench_responses
+"""
+import argparse
+import json
+import random
+import timeit
+from datetime import datetime, timedelta, timezone
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from firebase_admin.firestore import GeoPoint
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+from models.pointofinterest import Coordinates, PointOfInterestResponse
+from models.trip import UserTrip
+from routes.responses import FastJSONResponse
+from services.pointofinterest_service import point_from_document
+
+
+def poi_documents(count, rng):
+    created = DatetimeWithNanoseconds(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    return [(f"poi{i}", {
+        "place_id": f"ChIJ{i:06d}",
+        "name": f"Place {i}",
+        "coordinates": GeoPoint(53.48 + rng.uniform(-0.05, 0.05), -2.24 + rng.uniform(-0.05, 0.05)),
+        "address": f"{i} Deansgate, Manchester",
+        "city": "manchester",
+        "country": "united kingdom",
+        "type": rng.choice(["restaurant", "cafe", "attraction"]),
+        "categories": ["museum", "tourist_attraction"],
+        "description": "A well reviewed place in the city centre. " * 3,
+        "website": f"https://example.com/{i}",
+        "rating": round(rng.uniform(3, 5), 1),
+        "user_ratings_total": rng.randint(10, 5000),
+        "created_at": created,
+        "updated_at": created
+    }) for i in range(count)]
+
+
+def trip_documents(count):
+    start = datetime(2024, 6, 1)
+    return [(f"trip{i}", {
+        "city": "manchester",
+        "country": "united kingdom",
+        "fromDT": start + timedelta(days=i),
+        "toDT": start + timedelta(days=i + 3),
+        "monthlyDays": 3,
+        "status": True
+    }) for i in range(count)]
+
+
+def legacy_point(doc_id, poi_data):
+    """PointOfInterestResponse as it was built before, validating every stored field."""
+    poi_data = dict(poi_data)
+    coordinates = poi_data.get("coordinates")
+    if isinstance(coordinates, GeoPoint):
+        poi_data["coordinates"] = Coordinates(lat=coordinates.latitude, lng=coordinates.longitude)
+    return PointOfInterestResponse(id=doc_id, **poi_data)
+
+
+def legacy_render(content):
+    # What FastAPI does for a route without a response class: encode, then json.dumps
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, default=200)
+    parser.add_argument("--trips", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    points = poi_documents(args.points, random.Random(42))
+    trips = trip_documents(args.trips)
+
+    cases = {
+        "points": (
+            lambda: legacy_render([legacy_point(doc_id, data) for doc_id, data in points]),
+            lambda: FastJSONResponse([point_from_document(doc_id, data) for doc_id, data in points]).body
+        ),
+        "saved trips": (
+            lambda: legacy_render([UserTrip(**data, trip_doc_id=doc_id) for doc_id, data in trips]),
+            lambda: FastJSONResponse([UserTrip.model_construct(**data, trip_doc_id=doc_id) for doc_id, data in trips]).body
+        )
+    }
+
+    # Both paths must produce the same document before timing them
+    for name, (legacy, fast) in cases.items():
+        assert json.loads(legacy()) == orjson.loads(fast()), f"{name}: responses differ"
+
+    print(f"{args.points} points, {args.trips} trips, best of {args.repeat} x {args.number}")
+    for name, (legacy, fast) in cases.items():
+        timings = [min(timeit.repeat(case, number=args.number, repeat=args.repeat)) / args.number for case in (legacy, fast)]
+        print(f"  {name:<12} legacy {timings[0] * 1e3:7.2f} ms  orjson {timings[1] * 1e3:7.2f} ms  "
+              f"({timings[0] / timings[1]:.1f}x, {1 / timings[1]:,.0f} responses/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Offline benchmark of the main request paths, failing on regressions against a baseline.
+
+Drives the real services (TripGenerationService.generate_trip, TripService.update_trip,
+PointOfInterestService.get_points) and the Google Places routes with Firestore held in
+memory and every provider answered from recorded fixtures after a sampled latency
+(see benchmarks/fakes.py). Each case reports p50/p95/p99 latency, throughput and
+upstream calls per operation, each the median over a few rounds to damp scheduling
+noise. Run from the backend directory:
+    python -m benchmarks.bench_services                   # report
+    python -m benchmarks.bench_services --check           # exit 1 on a regression
+    python -m benchmarks.bench_services --update-baseline
+
+--latency-scale 0 removes the upstream delays, leaving only our own CPU time, which
+is what to use when chasing a regression in local work. Baselines depend on the
+machine and the settings; --check refuses to compare runs with different settings.
+The Places rate limiter is opened up unless PLACES_QPS/PLACES_BURST are set, so the
+quota does not throttle the benchmark.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+BASELINE = Path(__file__).parent / "baseline.json"
+
+
+@dataclass
+class CaseResult:
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    throughput: float
+    calls_per_op: Dict[str, float]
+
+
+def median_result(rounds: List[CaseResult]) -> CaseResult:
+    providers = sorted({provider for result in rounds for provider in result.calls_per_op})
+    return CaseResult(
+        p50_ms=statistics.median(result.p50_ms for result in rounds),
+        p95_ms=statistics.median(result.p95_ms for result in rounds),
+        p99_ms=statistics.median(result.p99_ms for result in rounds),
+        throughput=statistics.median(result.throughput for result in rounds),
+        calls_per_op={
+            provider: statistics.median(result.calls_per_op.get(provider, 0) for result in rounds)
+            for provider in providers
+        }
+    )
+
+
+def summarize(latencies: List[float], wall_seconds: float, calls: Dict[str, int]) -> CaseResult:
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return CaseResult(
+        p50_ms=round(quantiles[49] * 1000, 2),
+        p95_ms=round(quantiles[94] * 1000, 2),
+        p99_ms=round(quantiles[98] * 1000, 2),
+        throughput=round(len(latencies) / wall_seconds, 2),
+        calls_per_op={provider: round(count / len(latencies), 2) for provider, count in sorted(calls.items())}
+    )
+
+
+async def measure(operation: Callable[[int], Awaitable], iterations: int, concurrency: int) -> tuple:
+    """Run the operation `iterations` times from `concurrency` workers; (latencies, wall seconds)."""
+    latencies = []
+    numbers = itertools.count()
+
+    async def worker():
+        while (number := next(numbers)) < iterations:
+            started = time.perf_counter()
+            await operation(number)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started
+
+
+def build_cases(env) -> Dict[str, Callable[[int], Awaitable]]:
+    """Operations per case, on services created inside offline()."""
+    import httpx
+    from fastapi import FastAPI
+    from benchmarks import workload
+    from routes.googleplaces_route import router as googleplaces_router
+    from routes.responses import FastJSONResponse
+    from services.pointofinterest_service import PointCache, PointOfInterestService
+    from services.trip_service import TripService
+    from services.tripgeneration_service import TripGenerationService
+
+    point_ids = workload.seed_points(env.firestore)
+    workload.seed_trip(env.firestore, "bench-trip", "bench-user", point_ids)
+    place_ids = [place["id"] for place in env.upstreams.places]
+
+    trip_generation = TripGenerationService()
+    generation_request = workload.trip_generation_request()
+    trip_service = TripService()
+    poi_service = PointOfInterestService()
+
+    app = FastAPI(default_response_class=FastJSONResponse)
+    app.include_router(googleplaces_router)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+    near = {"latitude": workload.CITY["lat"], "longitude": workload.CITY["lng"]}
+
+    async def generate_trip(number: int) -> None:
+        await trip_generation.generate_trip(generation_request)
+
+    async def update_trip(number: int) -> None:
+        # Called on the event loop, as the route does
+        trip_service.update_trip("bench-trip", workload.trip_update_request(point_ids, number))
+
+    async def get_points(number: int) -> None:
+        # A cold cache each time, so every call reads Firestore
+        poi_service.cache = PointCache()
+        await poi_service.get_points(point_ids[:40])
+
+    async def get(path: str, params: Dict) -> None:
+        response = await client.get(path, params=params)
+        response.raise_for_status()
+
+    async def places_nearby(number: int) -> None:
+        await get("/api/googleplaces/nearby", {**near, "type": "cafe", "max_results": 10})
+
+    async def places_details(number: int) -> None:
+        await get(f"/api/googleplaces/details/{place_ids[number % len(place_ids)]}", {"profile": "card"})
+
+    async def places_textsearch(number: int) -> None:
+        await get("/api/googleplaces/textsearch", {**near, "query": "italian restaurant", "max_results": 10})
+
+    return {
+        "generate_trip": generate_trip,
+        "update_trip": update_trip,
+        "get_points": get_points,
+        "places_nearby": places_nearby,
+        "places_details": places_details,
+        "places_textsearch": places_textsearch
+    }
+
+
+async def run(args) -> Dict[str, CaseResult]:
+    from benchmarks.fakes import latency_profile, offline
+
+    results = {}
+    with offline(latency_profile(args.latency_scale), seed=args.seed) as env:
+        cases = build_cases(env)
+        for name in args.cases or cases:
+            operation = cases[name]
+            for number in range(args.warmup):
+                await operation(number)
+            rounds = []
+            for _ in range(args.rounds):
+                calls_before = env.calls()
+                latencies, wall_seconds = await measure(operation, args.iterations, args.concurrency)
+                calls = {provider: count - calls_before.get(provider, 0) for provider, count in env.calls().items()}
+                rounds.append(summarize(latencies, wall_seconds, {p: c for p, c in calls.items() if c}))
+            result = results[name] = median_result(rounds)
+            print(f"  {name:<18} p50 {result.p50_ms:8.1f} ms  p95 {result.p95_ms:8.1f} ms  p99 {result.p99_ms:8.1f} ms  "
+                  f"{result.throughput:8.1f} ops/s  calls/op {result.calls_per_op}")
+    return results
+
+
+def regressions(results: Dict[str, CaseResult], baseline: Dict, tolerance: float, slack_ms: float) -> List[str]:
+    """
+    What got worse than the baseline by more than the tolerance (a fraction). Latencies
+    also get slack_ms, since a few ms of thread scheduling noise is a large fraction of
+    the fast cases.
+    """
+    found = []
+    for name, result in results.items():
+        expected = baseline["cases"].get(name)
+        if expected is None:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if getattr(result, metric) > expected[metric] * (1 + tolerance) + slack_ms:
+                found.append(f"{name}: {metric} {getattr(result, metric)} > baseline {expected[metric]}")
+        if result.throughput < expected["throughput"] * (1 - tolerance):
+            found.append(f"{name}: throughput {result.throughput} < baseline {expected['throughput']}")
+        for provider, calls in result.calls_per_op.items():
+            # Call counts barely vary between runs: any real increase is a regression
+            if calls > expected["calls_per_op"].get(provider, 0) * (1 + tolerance) + 0.05:
+                found.append(f"{name}: {provider} calls/op {calls} > baseline {expected['calls_per_op'].get(provider, 0)}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cases", nargs="*", help="cases to run (default: all)")
+    parser.add_argument("--iterations", type=int, default=30, help="operations per round")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier for the upstream latencies")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before --check fails")
+    parser.add_argument("--slack-ms", type=float, default=15.0, help="latency increase always allowed")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--check", action="store_true", help="exit 1 if a case regressed against the baseline")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    os.environ.setdefault("PLACES_QPS", "10000")
+    os.environ.setdefault("PLACES_BURST", "10000")
+    logging.basicConfig(level=logging.ERROR)
+    settings = {key: getattr(args, key) for key in ("iterations", "rounds", "concurrency", "warmup", "latency_scale", "seed")}
+
+    print(f"{args.rounds} rounds of {args.iterations} operations from {args.concurrency} workers, "
+          f"latency scale {args.latency_scale}")
+    results = asyncio.run(run(args))
+
+    if args.update_baseline:
+        previous = json.loads(args.baseline.read_text()) if args.baseline.exists() else {"cases": {}}
+        cases = previous["cases"] if previous.get("settings") == settings else {}
+        cases.update({name: asdict(result) for name, result in results.items()})
+        args.baseline.write_text(json.dumps({"settings": settings, "cases": cases}, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+
+    if args.check:
+        if not args.baseline.exists():
+            sys.exit(f"No baseline at {args.baseline}; run with --update-baseline first")
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get("settings") != settings:
+            sys.exit(f"Baseline was recorded with {baseline.get('settings')}, not {settings}")
+        found = regressions(results, baseline, args.tolerance, args.slack_ms)
+        if found:
+            print("Regressions against the baseline:")
+            for regression in found:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,598 @@
+"""
+Offline stand-ins for the backend's upstreams, shared by the benchmarks and load tests.
+
+FakeFirestore keeps documents in memory and implements the part of the Firestore
+client API the services use (documents and subcollections, filtered/ordered/paged
+queries, projections, get_all, write batches and transactions). ReplayUpstreams
+answers Google Places, Wikidata, Geoapify and Groq HTTP calls from the recorded
+responses in benchmarks/fixtures. Both wait a sampled latency per call, so the
+services behave as they do against the real providers, only repeatably.
+
+offline() patches them in for the duration of a with block; create services inside it.
+"""
+import asyncio
+import copy
+import itertools
+import json
+import random
+import re
+import secrets
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from unittest.mock import patch
+from urllib.parse import urlparse
+
+import httpx
+import requests
+from google.api_core.exceptions import NotFound
+from google.cloud.firestore_v1.transforms import Sentinel
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+@dataclass
+class Latency:
+    """Per-call delay: normally distributed around mean_ms, never negative."""
+    mean_ms: float = 0.0
+    jitter_ms: float = 0.0
+
+    def sample(self, rng: random.Random) -> float:
+        if self.mean_ms <= 0 and self.jitter_ms <= 0:
+            return 0.0
+        return max(0.0, rng.gauss(self.mean_ms, self.jitter_ms)) / 1000
+
+    def scaled(self, factor: float) -> "Latency":
+        return Latency(self.mean_ms * factor, self.jitter_ms * factor)
+
+
+# Roughly what the providers take from a European region
+DEFAULT_LATENCY = {
+    "firestore": Latency(8, 3),
+    "google_places": Latency(90, 25),
+    "wikidata": Latency(70, 20),
+    "geoapify": Latency(120, 35),
+    "groq": Latency(900, 250)
+}
+
+
+def latency_profile(scale: float = 1.0, **overrides: Latency) -> Dict[str, Latency]:
+    """DEFAULT_LATENCY multiplied by scale (0 for no delays), with per-provider overrides."""
+    profile = {provider: latency.scaled(scale) for provider, latency in DEFAULT_LATENCY.items()}
+    profile.update(overrides)
+    return profile
+
+
+class _Delays:
+    """Seeded latency sampling shared by threads, with per-provider call counts."""
+
+    def __init__(self, latency: Dict[str, Latency], seed: int):
+        self.latency = latency
+        self.calls = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next(self, provider: str) -> float:
+        with self._lock:
+            self.calls[provider] += 1
+            return self.latency.get(provider, Latency()).sample(self._rng)
+
+    def wait(self, provider: str) -> None:
+        delay = self.next(provider)
+        if delay:
+            time.sleep(delay)
+
+    async def wait_async(self, provider: str) -> None:
+        delay = self.next(provider)
+        if delay:
+            await asyncio.sleep(delay)
+
+
+# --- Firestore -------------------------------------------------------------------
+
+def _resolve(value: Any, now: datetime) -> Any:
+    """Stored form of a written value: server timestamps become the commit time."""
+    if isinstance(value, Sentinel):
+        return now
+    if isinstance(value, dict):
+        return {key: _resolve(item, now) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_resolve(item, now) for item in value]
+    return value
+
+
+def _field(data: Dict, path: str) -> Tuple[bool, Any]:
+    value = data
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return False, None
+        value = value[part]
+    return True, value
+
+
+def _sort_key(value: Any) -> Any:
+    """Comparable form of a field value; GeoPoints compare by latitude, then longitude."""
+    if hasattr(value, "latitude") and hasattr(value, "longitude"):
+        return (value.latitude, value.longitude)
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+_OPERATORS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: _sort_key(a) < _sort_key(b),
+    "<=": lambda a, b: _sort_key(a) <= _sort_key(b),
+    ">": lambda a, b: _sort_key(a) > _sort_key(b),
+    ">=": lambda a, b: _sort_key(a) >= _sort_key(b),
+    "in": lambda a, b: a in b,
+    "not-in": lambda a, b: a not in b,
+    "array_contains": lambda a, b: isinstance(a, list) and b in a,
+    "array_contains_any": lambda a, b: isinstance(a, list) and any(item in a for item in b)
+}
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, reference: "FakeDocumentReference", data: Optional[Dict], fields: Optional[List[str]] = None):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        if data is not None and fields is not None:
+            data = {name: value for name, value in data.items() if name in fields}
+        self._data = copy.deepcopy(data)
+
+    def to_dict(self) -> Optional[Dict]:
+        return copy.deepcopy(self._data)
+
+    def get(self, field_path: str) -> Any:
+        found, value = _field(self._data or {}, field_path)
+        if not found:
+            raise KeyError(field_path)
+        return copy.deepcopy(value)
+
+
+class FakeDocumentReference:
+    def __init__(self, db: "FakeFirestore", collection_path: str, doc_id: str):
+        self._db = db
+        self._collection_path = collection_path
+        self.id = doc_id
+        self.path = f"{collection_path}/{doc_id}"
+
+    def collection(self, name: str) -> "FakeCollectionReference":
+        return FakeCollectionReference(self._db, f"{self.path}/{name}")
+
+    def get(self, field_paths: Optional[List[str]] = None, transaction: Any = None) -> FakeDocumentSnapshot:
+        self._db.delays.wait("firestore")
+        return self._db._snapshot(self, field_paths)
+
+    def set(self, data: Dict, merge: Any = False) -> None:
+        self._db.delays.wait("firestore")
+        self._db._apply([("set", self, data, merge)])
+
+    def update(self, data: Dict) -> None:
+        self._db.delays.wait("firestore")
+        self._db._apply([("update", self, data, None)])
+
+    def delete(self) -> None:
+        self._db.delays.wait("firestore")
+        self._db._apply([("delete", self, None, None)])
+
+
+class FakeQuery:
+    def __init__(self, db: "FakeFirestore", collection_path: str, filters=(), orders=(), limit_to=None,
+                 start_after_values=None, fields=None):
+        self._db = db
+        self._collection_path = collection_path
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit_to
+        self._start_after = start_after_values
+        self._fields = fields
+
+    def _copy(self, **changes) -> "FakeQuery":
+        state = {
+            "filters": self._filters, "orders": self._orders, "limit_to": self._limit,
+            "start_after_values": self._start_after, "fields": self._fields
+        }
+        state.update(changes)
+        return FakeQuery(self._db, self._collection_path, **state)
+
+    def where(self, field_path: str = None, op_string: str = None, value: Any = None, filter: Any = None) -> "FakeQuery":
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, _OPERATORS[op_string], value),))
+
+    def order_by(self, field_path: Any, direction: str = "ASCENDING") -> "FakeQuery":
+        return self._copy(orders=self._orders + ((str(field_path), direction == "DESCENDING"),))
+
+    def limit(self, count: int) -> "FakeQuery":
+        return self._copy(limit_to=count)
+
+    def start_after(self, values: Dict) -> "FakeQuery":
+        return self._copy(start_after_values=values)
+
+    def select(self, field_paths: List[str]) -> "FakeQuery":
+        return self._copy(fields=list(field_paths))
+
+    def _order_values(self, doc_id: str, data: Dict) -> Optional[List]:
+        values = []
+        for field_path, _ in self._orders:
+            if field_path == "__name__":
+                values.append(doc_id)
+                continue
+            found, value = _field(data, field_path)
+            if not found:
+                # Firestore leaves out documents without the ordered field
+                return None
+            values.append(_sort_key(value))
+        return values
+
+    def _run(self) -> List[FakeDocumentSnapshot]:
+        documents = self._db._documents(self._collection_path)
+        matched = []
+        for doc_id, data in documents:
+            if all(found and test(value, expected)
+                   for (field_path, test, expected) in self._filters
+                   for found, value in [_field(data, field_path)]):
+                order_values = self._order_values(doc_id, data)
+                if order_values is not None:
+                    matched.append((order_values, doc_id, data))
+
+        # Stable sorts from the last order to the first give the combined order
+        for index in reversed(range(len(self._orders))):
+            matched.sort(key=lambda item: item[0][index], reverse=self._orders[index][1])
+        if self._start_after is not None:
+            cursor = [
+                self._start_after["__name__"] if field_path == "__name__" else _sort_key(self._start_after[field_path])
+                for field_path, _ in self._orders
+            ]
+            position = next((i for i, item in enumerate(matched) if self._after(item[0], cursor)), len(matched))
+            matched = matched[position:]
+        if self._limit is not None:
+            matched = matched[:self._limit]
+
+        fields = self._fields
+        return [
+            FakeDocumentSnapshot(FakeDocumentReference(self._db, self._collection_path, doc_id), data, fields)
+            for _, doc_id, data in matched
+        ]
+
+    def _after(self, values: List, cursor: List) -> bool:
+        for (field_path, descending), value, bound in zip(self._orders, values, cursor):
+            if value != bound:
+                return value < bound if descending else value > bound
+        return False
+
+    def get(self, transaction: Any = None) -> List[FakeDocumentSnapshot]:
+        self._db.delays.wait("firestore")
+        return self._run()
+
+    def stream(self, transaction: Any = None) -> Iterator[FakeDocumentSnapshot]:
+        self._db.delays.wait("firestore")
+        return iter(self._run())
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, db: "FakeFirestore", path: str, **state):
+        super().__init__(db, path, **state)
+        self.id = path.rsplit("/", 1)[-1]
+
+    def document(self, document_id: Optional[str] = None) -> FakeDocumentReference:
+        return FakeDocumentReference(self._db, self._collection_path, document_id or secrets.token_hex(10))
+
+
+class FakeWriteBatch:
+    """Writes buffered until commit(), then applied together."""
+
+    def __init__(self, db: "FakeFirestore"):
+        self._db = db
+        self._writes = []
+
+    def set(self, reference: FakeDocumentReference, data: Dict, merge: Any = False) -> None:
+        self._writes.append(("set", reference, data, merge))
+
+    def update(self, reference: FakeDocumentReference, data: Dict) -> None:
+        self._writes.append(("update", reference, data, None))
+
+    def delete(self, reference: FakeDocumentReference) -> None:
+        self._writes.append(("delete", reference, None, None))
+
+    def commit(self) -> List:
+        self._db.delays.wait("firestore")
+        self._db._apply(self._writes)
+        writes, self._writes = self._writes, []
+        return writes
+
+
+class FakeTransaction(FakeWriteBatch):
+    """
+    A write batch with the hooks firestore.transactional drives (begin, commit,
+    rollback). Transactions are serialized by one lock, standing in for Firestore's
+    pessimistic locking of the documents read.
+    """
+    _read_only = False
+    _max_attempts = 5
+
+    def __init__(self, db: "FakeFirestore"):
+        super().__init__(db)
+        self._id = None
+
+    def _clean_up(self) -> None:
+        self._writes = []
+        self._id = None
+
+    def _begin(self, retry_id: Any = None) -> None:
+        self._db._transaction_lock.acquire()
+        self._db.delays.wait("firestore")
+        self._id = secrets.token_bytes(8)
+
+    def _commit(self) -> List:
+        try:
+            return self.commit()
+        finally:
+            self._release()
+
+    def _rollback(self) -> None:
+        self._writes = []
+        self._release()
+
+    def _release(self) -> None:
+        if self._id is not None:
+            self._id = None
+            self._db._transaction_lock.release()
+
+
+class FakeFirestore:
+    """In-memory Firestore client; see the module docstring."""
+
+    def __init__(self, latency: Optional[Dict[str, Latency]] = None, seed: int = 0):
+        self.delays = _Delays(latency or {}, seed)
+        self._collections: Dict[str, Dict[str, Dict]] = {}
+        self._lock = threading.Lock()
+        self._transaction_lock = threading.Lock()
+
+    def collection(self, name: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self, name)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    def transaction(self, **kwargs) -> FakeTransaction:
+        return FakeTransaction(self)
+
+    def get_all(self, references: List[FakeDocumentReference], field_paths: Optional[List[str]] = None,
+                transaction: Any = None) -> Iterator[FakeDocumentSnapshot]:
+        self.delays.wait("firestore")
+        return iter([self._snapshot(reference, field_paths) for reference in references])
+
+    def seed(self, path: str, data: Dict) -> None:
+        """Store a document at "collection/id[/subcollection/id...]" without any delay."""
+        collection_path, doc_id = path.rsplit("/", 1)
+        with self._lock:
+            self._collections.setdefault(collection_path, {})[doc_id] = _resolve(data, datetime.now(timezone.utc))
+
+    def _documents(self, collection_path: str) -> List[Tuple[str, Dict]]:
+        with self._lock:
+            return list(self._collections.get(collection_path, {}).items())
+
+    def _snapshot(self, reference: FakeDocumentReference, field_paths: Optional[List[str]]) -> FakeDocumentSnapshot:
+        with self._lock:
+            data = self._collections.get(reference._collection_path, {}).get(reference.id)
+            return FakeDocumentSnapshot(reference, data, field_paths)
+
+    def _apply(self, writes: List) -> None:
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            # Writes go to copies of the collections touched, so a failing batch writes nothing
+            staged = {}
+            for kind, reference, data, merge in writes:
+                path = reference._collection_path
+                if path not in staged:
+                    staged[path] = dict(self._collections.get(path, {}))
+                documents = staged[path]
+                if kind == "delete":
+                    documents.pop(reference.id, None)
+                elif kind == "update":
+                    if reference.id not in documents:
+                        raise NotFound(f"No document to update: {reference.path}")
+                    updated = copy.deepcopy(documents[reference.id])
+                    for field_path, value in data.items():
+                        *parents, name = field_path.split(".")
+                        target = updated
+                        for parent in parents:
+                            target = target.setdefault(parent, {})
+                        target[name] = _resolve(value, now)
+                    documents[reference.id] = updated
+                elif merge:
+                    merged = copy.deepcopy(documents.get(reference.id, {}))
+                    fields = data.keys() if merge is True else merge
+                    merged.update({name: _resolve(data[name], now) for name in fields if name in data})
+                    documents[reference.id] = merged
+                else:
+                    documents[reference.id] = _resolve(copy.deepcopy(data), now)
+            self._collections.update(staged)
+
+
+# --- HTTP providers -------------------------------------------------------------
+
+def load_fixture(name: str) -> Any:
+    with open(FIXTURES / name, encoding="utf-8") as fixture:
+        return json.load(fixture)
+
+
+class ReplayUpstreams:
+    """
+    Recorded provider responses: Places searches are answered from the recorded pool
+    of places (filtered by type and nearest first, like the API), details and photos
+    by place ID, Wikidata and Geoapify from their recorded payloads, and every Groq
+    completion with the recorded itinerary.
+    """
+
+    def __init__(self, latency: Optional[Dict[str, Latency]] = None, seed: int = 0):
+        self.delays = _Delays(latency or {}, seed)
+        self.places = load_fixture("places_pool.json")["places"]
+        self.places_by_id = {place["id"]: place for place in self.places}
+        self.wikidata = load_fixture("wikidata_entities.json")
+        self.geoapify = load_fixture("geoapify_places.json")
+        self.completion = load_fixture("groq_itinerary_completion.json")
+        self._completion_ids = itertools.count()
+
+    def _nearest(self, places: List[Dict], circle: Dict, count: int) -> List[Dict]:
+        center = circle.get("center", {})
+        lat, lng = center.get("latitude", 0.0), center.get("longitude", 0.0)
+        return sorted(
+            places,
+            key=lambda place: (place["location"]["latitude"] - lat) ** 2 + (place["location"]["longitude"] - lng) ** 2
+        )[:count]
+
+    def search_nearby(self, body: Dict) -> Dict:
+        included = set(body.get("includedTypes") or [])
+        excluded = set(body.get("excludedTypes") or [])
+        places = [
+            place for place in self.places
+            if (not included or included & set(place["types"])) and not excluded & set(place["types"])
+        ]
+        circle = body.get("locationRestriction", {}).get("circle", {})
+        return {"places": self._nearest(places, circle, body.get("maxResultCount", 20))}
+
+    def search_text(self, body: Dict) -> Dict:
+        words = set(re.findall(r"\w+", body.get("textQuery", "").lower()))
+        included = body.get("includedType")
+        places = [
+            place for place in self.places
+            if (included is None or included in place["types"])
+            and (words & set(place["types"]) or words & set(place["displayName"]["text"].lower().split()))
+        ]
+        circle = body.get("locationBias", {}).get("circle", {})
+        return {"places": self._nearest(places, circle, body.get("pageSize", 20))}
+
+    def chat_completion(self, body: Dict) -> Dict:
+        return {**self.completion, "id": f"chatcmpl-replay-{next(self._completion_ids)}", "model": body.get("model")}
+
+    def respond(self, method: str, url: str, params: Dict, body: Optional[Dict]) -> Tuple[str, int, Dict, Any]:
+        """(provider, status, headers, JSON body or None) for a request."""
+        parsed = urlparse(url)
+        host, path = parsed.netloc, parsed.path
+        if host == "places.googleapis.com":
+            if path.endswith(":searchNearby"):
+                return "google_places", 200, {}, self.search_nearby(body or {})
+            if path.endswith(":searchText"):
+                return "google_places", 200, {}, self.search_text(body or {})
+            if path.endswith("/media"):
+                photo = path.removeprefix("/v1/").removesuffix("/media")
+                return "google_places", 302, {"Location": f"https://lh3.googleusercontent.com/{photo}=s400"}, None
+            place = self.places_by_id.get(path.rsplit("/", 1)[-1])
+            if place is None:
+                return "google_places", 404, {}, {"error": {"code": 404, "status": "NOT_FOUND"}}
+            return "google_places", 200, {}, place
+        if host == "www.wikidata.org":
+            entity = next(iter(self.wikidata["entities"].values()))
+            ids = str(params.get("ids", "")).split("|")
+            return "wikidata", 200, {}, {**self.wikidata, "entities": {entity_id: {**entity, "id": entity_id} for entity_id in ids}}
+        if host == "api.geoapify.com":
+            limit = int(params.get("limit", 20))
+            return "geoapify", 200, {}, {**self.geoapify, "features": self.geoapify["features"][:limit]}
+        if host == "api.groq.com" and path.endswith("/chat/completions"):
+            return "groq", 200, {}, self.chat_completion(body or {})
+        return "unknown", 404, {}, {"error": f"No recording for {method} {url}"}
+
+    # requests.get / requests.post replacements
+
+    def _requests_call(self, method: str, url: str, params: Optional[Dict] = None, json: Optional[Dict] = None,
+                       **kwargs) -> requests.Response:
+        provider, status, headers, payload = self.respond(method, url, params or {}, json)
+        self.delays.wait(provider)
+        response = requests.Response()
+        response.status_code = status
+        response.url = url
+        response.headers.update(headers)
+        response._content = b"" if payload is None else _dumps(payload)
+        return response
+
+    def get(self, url: str, params: Optional[Dict] = None, **kwargs) -> requests.Response:
+        return self._requests_call("GET", url, params=params, **kwargs)
+
+    def post(self, url: str, json: Optional[Dict] = None, **kwargs) -> requests.Response:
+        return self._requests_call("POST", url, json=json, **kwargs)
+
+    # httpx transports (Groq SDK clients, Geoapify)
+
+    def _httpx_response(self, request: httpx.Request) -> Tuple[str, httpx.Response]:
+        body = _loads(request.content) if request.content else None
+        provider, status, headers, payload = self.respond(request.method, str(request.url), dict(request.url.params), body)
+        content = b"" if payload is None else _dumps(payload)
+        return provider, httpx.Response(status, headers={**headers, "content-type": "application/json"}, content=content)
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        provider, response = self._httpx_response(request)
+        self.delays.wait(provider)
+        return response
+
+    async def handle_async(self, request: httpx.Request) -> httpx.Response:
+        provider, response = self._httpx_response(request)
+        await self.delays.wait_async(provider)
+        return response
+
+
+def _dumps(payload: Any) -> bytes:
+    return json.dumps(payload).encode()
+
+
+def _loads(content: bytes) -> Any:
+    try:
+        return json.loads(content)
+    except ValueError:
+        return None
+
+
+@dataclass
+class Offline:
+    firestore: FakeFirestore
+    upstreams: ReplayUpstreams
+
+    def calls(self) -> Dict[str, int]:
+        """Upstream calls made so far, by provider."""
+        return dict(self.firestore.delays.calls + self.upstreams.delays.calls)
+
+
+@contextmanager
+def offline(latency: Optional[Dict[str, Latency]] = None, seed: int = 0) -> Iterator[Offline]:
+    """
+    Route Firestore and provider HTTP calls to the fakes. Services (and route modules,
+    which create services on import) must be created inside the block.
+    """
+    latency = latency_profile() if latency is None else latency
+    db = FakeFirestore(latency, seed)
+    upstreams = ReplayUpstreams(latency, seed + 1)
+
+    from groq import AsyncGroq, Groq
+    real_async_client = httpx.AsyncClient
+
+    class ReplayAsyncClient(real_async_client):
+        # Clients the app creates without a transport (Geoapify) go to the recordings
+        def __init__(self, *args, **kwargs):
+            kwargs.setdefault("transport", httpx.MockTransport(upstreams.handle_async))
+            super().__init__(*args, **kwargs)
+
+    def groq_client(api_key=None, **kwargs):
+        http_client = httpx.Client(transport=httpx.MockTransport(upstreams.handle))
+        return Groq(api_key=api_key or "offline", http_client=http_client, **kwargs)
+
+    def async_groq_client(api_key=None, **kwargs):
+        http_client = ReplayAsyncClient()
+        return AsyncGroq(api_key=api_key or "offline", http_client=http_client, **kwargs)
+
+    with patch("services.firebase_service.initialize_firebase"), \
+         patch("firebase_admin.firestore.client", return_value=db), \
+         patch("requests.get", upstreams.get), \
+         patch("requests.post", upstreams.post), \
+         patch("httpx.AsyncClient", ReplayAsyncClient), \
+         patch("services.groq_service.Groq", groq_client), \
+         patch("services.groq_service.AsyncGroq", async_groq_client):
+        yield Offline(db, upstreams)
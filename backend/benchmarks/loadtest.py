@@ -0,0 +1,325 @@
+"""
+Load test of one API worker: simulated users running whole sessions against the app.
+
+Each user repeats a session of what the frontend does: explore the city, save a few
+of the places, generate a trip, create it and autosave edits, then reopen it from the
+history, pausing for a think time between actions. Authentication is replaced by a
+dependency accepting any "Bearer loadtest-<n>" token as user loadtest-<n>, and
+Firestore and the providers are the offline fakes (see benchmarks/fakes.py).
+Reports latency percentiles and throughput per step, completed sessions and the
+event loop lag, where blocking calls on the loop show up. Run from the backend
+directory:
+    python -m benchmarks.loadtest                              # in-process
+    python -m benchmarks.loadtest --serve --port 8001          # uvicorn, one worker
+    python -m benchmarks.loadtest --url http://127.0.0.1:8001  # load that server
+
+In-process, the users share the event loop with the app, so their own work counts in
+the lag; against a server the lag comes from its event_loop_lag_seconds metric,
+which only resolves to histogram buckets.
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import random
+import re
+import statistics
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from unittest.mock import patch
+
+import httpx
+from fastapi import HTTPException, Security
+from fastapi.security import HTTPAuthorizationCredentials
+
+from benchmarks import workload
+from routes.auth import security, verify_firebase_token
+
+TOKEN_PREFIX = "loadtest-"
+
+
+async def fake_verify_firebase_token(credentials: HTTPAuthorizationCredentials = Security(security)) -> str:
+    """Stands in for verify_firebase_token: the token is the user ID."""
+    if not credentials.credentials.startswith(TOKEN_PREFIX):
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid authentication credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return credentials.credentials
+
+
+def create_app(env) -> Any:
+    """The API on the fakes of an offline() block, with the recorded city seeded."""
+    with patch("config.firebase_init.initialize_firebase"):
+        from main import app
+    workload.seed_points(env.firestore)
+    app.dependency_overrides[verify_firebase_token] = fake_verify_firebase_token
+    return app
+
+
+class SessionFailed(Exception):
+    pass
+
+
+@dataclass
+class Stats:
+    latencies: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: Counter = field(default_factory=Counter)
+    last_error: Dict[str, str] = field(default_factory=dict)
+    sessions: Counter = field(default_factory=Counter)
+
+
+class User:
+    """One simulated user; steps are timed under their names in Stats."""
+
+    def __init__(self, client: httpx.AsyncClient, number: int, stats: Stats, think_time: float, autosaves: int, seed: int):
+        self.client = client
+        self.user_id = f"{TOKEN_PREFIX}{number}"
+        self.headers = {"Authorization": f"Bearer {self.user_id}"}
+        self.stats = stats
+        self.think_time = think_time
+        self.autosaves = autosaves
+        self.rng = random.Random(seed * 100003 + number)
+
+    async def think(self) -> None:
+        if self.think_time > 0:
+            await asyncio.sleep(self.rng.expovariate(1 / self.think_time))
+
+    async def step(self, name: str, method: str, path: str, **kwargs) -> Any:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, headers=self.headers, **kwargs)
+        except httpx.HTTPError as e:
+            self.fail(name, f"{type(e).__name__}: {e}")
+        self.stats.latencies[name].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.fail(name, f"{response.status_code} {response.text[:200]}")
+        if response.headers.get("content-type", "").startswith("application/json"):
+            return response.json()
+        return response.text
+
+    def fail(self, name: str, message: str) -> None:
+        self.stats.errors[name] += 1
+        self.stats.last_error[name] = message
+        raise SessionFailed(name)
+
+    async def session(self) -> None:
+        """Explore, save POIs, generate a trip, edit it with autosaves, reopen it."""
+        near = {"latitude": workload.CITY["lat"], "longitude": workload.CITY["lng"]}
+        city = workload.CITY["city"].lower()
+        point_ids = workload.seeded_point_ids()
+
+        attractions = await self.step("explore nearby", "GET", "/api/googleplaces/nearby",
+                                      params={**near, "type": "tourist_attraction"})
+        await self.think()
+        restaurants = await self.step("explore restaurants", "GET", "/api/googleplaces/explore",
+                                      params={**near, "type": "restaurant"})
+        await self.think()
+        picks = self.rng.sample(attractions, min(2, len(attractions))) + restaurants[:1]
+        for place in picks:
+            await self.step("place details", "GET", f"/api/googleplaces/details/{place['place_id']}",
+                            params={"profile": "card"})
+            await self.think()
+
+        for place in picks:
+            point_id = await self.step("create poi", "POST", "/api/points/CreateGetPOI",
+                                       json={"poi_data": poi_data(place, city)})
+            await self.step("save poi", "POST", "/api/user/history/saved-pois",
+                            json={"pointId": point_id, "city": city})
+        await self.think()
+
+        await self.step("generate trip", "POST", "/api/tripgeneration/generate",
+                        json=workload.trip_generation_request().model_dump(mode="json"))
+        trip_id = await self.step("create trip", "POST", "/api/trip/create",
+                                  json=workload.trip_save_request(self.user_id, point_ids).model_dump(mode="json"))
+        await self.step("save trip", "POST", f"/api/user/history/saved-trips/{trip_id}",
+                        json={"city": city, "country": workload.CITY["country"]})
+
+        for revision in range(self.autosaves):
+            await self.think()
+            update = workload.trip_update_request(point_ids, revision)
+            await self.step("autosave trip", "PUT", f"/api/trip/update/{trip_id}", json=update.model_dump(mode="json"))
+        await self.think()
+
+        await self.step("history summary", "GET", "/api/user/history/summary")
+        await self.step("saved trips", "GET", "/api/user/history/saved-trips")
+        await self.step("trip details", "GET", f"/api/trip/details/{trip_id}")
+        await self.step("trip points", "POST", "/api/points/saved/details", json={"point_ids": point_ids})
+        await self.step("saved poi details", "GET", "/api/user/history/saved-pois/details", params={"city": city})
+
+    async def run(self, start_delay: float) -> None:
+        await asyncio.sleep(start_delay)
+        while True:
+            try:
+                await self.session()
+                self.stats.sessions["completed"] += 1
+            except SessionFailed:
+                self.stats.sessions["failed"] += 1
+                await self.think()
+
+
+def poi_data(place: Dict, city: str) -> Dict:
+    """The POI the frontend creates for a Places search result."""
+    return {
+        "id": "",
+        "place_id": place["place_id"],
+        "name": place["name"],
+        "coordinates": {"lat": place["location"]["latitude"], "lng": place["location"]["longitude"]},
+        "address": place.get("formatted_address") or "",
+        "city": city,
+        "country": workload.CITY["country"].lower(),
+        "categories": place.get("types") or [],
+        "website": place.get("website"),
+        "phone": place.get("phone"),
+        "rating": place.get("rating"),
+        "user_ratings_total": place.get("user_ratings_total")
+    }
+
+
+def percentile(values: List[float], percent: int) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+_LAG_BUCKET = re.compile(r'^event_loop_lag_seconds_bucket\{le="([^"]+)"\} (\S+)$', re.MULTILINE)
+_LAG_SUM = re.compile(r"^event_loop_lag_seconds_sum (\S+)$", re.MULTILINE)
+
+
+def lag_histogram(metrics_text: str) -> Dict[str, Any]:
+    """Cumulative event_loop_lag_seconds buckets and sum from a /metrics scrape."""
+    buckets = {float(bound): float(count) for bound, count in _LAG_BUCKET.findall(metrics_text)}
+    total = _LAG_SUM.search(metrics_text)
+    return {"buckets": buckets, "sum": float(total.group(1)) if total else 0.0}
+
+
+def lag_from_metrics(before: Dict[str, Any], after: Dict[str, Any]) -> Optional[str]:
+    """Lag over the run from two scrapes: bucket bounds of the percentiles, and the mean."""
+    buckets = {bound: count - before["buckets"].get(bound, 0) for bound, count in after["buckets"].items()}
+    samples = buckets.get(float("inf"), 0)
+    if not samples:
+        return None
+
+    def bound(fraction: float) -> str:
+        limit = next(bound for bound, count in sorted(buckets.items()) if count >= fraction * samples)
+        return "> 2.5 s" if limit == float("inf") else f"<= {limit * 1000:g} ms"
+
+    mean = (after["sum"] - before["sum"]) / samples
+    return f"p50 {bound(0.5)}  p95 {bound(0.95)}  p99 {bound(0.99)}  mean {mean * 1000:.1f} ms ({samples:.0f} samples)"
+
+
+def report(stats: Stats, wall_seconds: float) -> None:
+    print(f"  {'step':<22}{'requests':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}")
+    everything = []
+    for name, latencies in stats.latencies.items():
+        everything += latencies
+        print(f"  {name:<22}{len(latencies):>9}{stats.errors[name]:>8}"
+              f"{percentile(latencies, 50) * 1000:>10.1f}{percentile(latencies, 95) * 1000:>10.1f}"
+              f"{percentile(latencies, 99) * 1000:>10.1f}{len(latencies) / wall_seconds:>9.1f}")
+    if everything:
+        print(f"  {'all':<22}{len(everything):>9}{sum(stats.errors.values()):>8}"
+              f"{percentile(everything, 50) * 1000:>10.1f}{percentile(everything, 95) * 1000:>10.1f}"
+              f"{percentile(everything, 99) * 1000:>10.1f}{len(everything) / wall_seconds:>9.1f}")
+    print(f"Sessions: {stats.sessions['completed']} completed, {stats.sessions['failed']} failed, "
+          f"{stats.sessions['completed'] / wall_seconds * 60:.1f} per minute")
+    for name, message in stats.last_error.items():
+        print(f"  last error in {name}: {message}")
+
+
+async def drive(client: httpx.AsyncClient, args, stats: Stats) -> float:
+    """Run the users for the duration (sessions in progress are cut off); the wall time."""
+    users = [User(client, number, stats, args.think_time, args.autosaves, args.seed) for number in range(args.users)]
+    delays = (args.ramp_up * number / args.users for number in itertools.count())
+    tasks = [asyncio.create_task(user.run(delay)) for user, delay in zip(users, delays)]
+    started = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return time.perf_counter() - started
+
+
+async def run_in_process(args) -> None:
+    from benchmarks.fakes import latency_profile, offline
+    from services.metrics import monitor_event_loop
+
+    stats = Stats()
+    lags = []
+    with offline(latency_profile(args.latency_scale), seed=args.seed) as env:
+        app = create_app(env)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest",
+                                     timeout=args.timeout) as client:
+            monitor = asyncio.create_task(monitor_event_loop(0.05, lags.append))
+            wall_seconds = await drive(client, args, stats)
+            monitor.cancel()
+        # Calls of cut-off requests still running on worker threads must end on the fakes
+        await asyncio.get_running_loop().shutdown_default_executor()
+        calls = env.calls()
+
+    report(stats, wall_seconds)
+    if lags:
+        print(f"Event loop lag: p50 {percentile(lags, 50) * 1000:.1f} ms  p95 {percentile(lags, 95) * 1000:.1f} ms  "
+              f"p99 {percentile(lags, 99) * 1000:.1f} ms  max {max(lags) * 1000:.1f} ms")
+    completed = stats.sessions["completed"] or 1
+    print(f"Upstream calls per completed session: "
+          f"{ {provider: round(count / completed, 1) for provider, count in sorted(calls.items())} }")
+
+
+async def run_against_server(args) -> None:
+    stats = Stats()
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        before = lag_histogram((await client.get("/metrics")).text)
+        wall_seconds = await drive(client, args, stats)
+        after = lag_histogram((await client.get("/metrics")).text)
+
+    report(stats, wall_seconds)
+    lag = lag_from_metrics(before, after)
+    print(f"Event loop lag (server): {lag or 'no samples; is EVENT_LOOP_LAG_INTERVAL set to 0?'}")
+
+
+def serve(args) -> None:
+    """The API on uvicorn (one worker) with the fakes and fake auth, for --url runs."""
+    import uvicorn
+    from benchmarks.fakes import latency_profile, offline
+
+    with offline(latency_profile(args.latency_scale), seed=args.seed) as env:
+        app = create_app(env)
+        print(f"Serving the offline API on http://{args.host}:{args.port}; tokens are 'Bearer {TOKEN_PREFIX}<n>'")
+        uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=20, help="simulated users")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of load")
+    parser.add_argument("--ramp-up", type=float, default=10.0, help="seconds over which users start")
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean pause between a user's actions")
+    parser.add_argument("--autosaves", type=int, default=3, help="trip autosaves per session")
+    parser.add_argument("--timeout", type=float, default=60.0, help="request timeout in seconds")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier for the upstream latencies")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--url", help="load a server started with --serve instead of the app in-process")
+    parser.add_argument("--serve", action="store_true", help="serve the offline API instead of loading it")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+
+    os.environ.setdefault("PLACES_QPS", "10000")
+    os.environ.setdefault("PLACES_BURST", "10000")
+    logging.basicConfig(level=logging.ERROR)
+
+    if args.serve:
+        serve(args)
+        return
+    print(f"{args.users} users for {args.duration:g} s (ramp-up {args.ramp_up:g} s), think time {args.think_time:g} s, "
+          f"{'against ' + args.url if args.url else 'in-process'}")
+    asyncio.run(run_against_server(args) if args.url else run_in_process(args))
+
+
+if __name__ == "__main__":
+    main()
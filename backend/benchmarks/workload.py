@@ -0,0 +1,173 @@
+"""
+The recorded city used by the benchmarks and load tests: Firestore documents for the
+places in fixtures/places_pool.json, a user's saved trip and POIs, and the requests
+the frontend sends for them.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from firebase_admin.firestore import GeoPoint
+
+from benchmarks.fakes import FakeFirestore, load_fixture
+from models.trip import SaveTripRequest, TripUpdateRequest
+from models.tripgeneration import TripGenerationRequest
+
+CITY = {"city": "Manchester", "country": "United Kingdom", "lat": 53.4808, "lng": -2.2426}
+TRIP_DAYS = 3
+TRIP_START = datetime(2025, 5, 2)
+
+
+def poi_type(place: Dict) -> str:
+    if "cafe" in place["types"]:
+        return "cafe"
+    if "restaurant" in place["types"]:
+        return "restaurant"
+    return "attraction"
+
+
+def seed_points(db: FakeFirestore) -> List[str]:
+    """A PointofInterest document per recorded place; returns their document IDs."""
+    created = datetime(2025, 4, 1, 9, 0, tzinfo=timezone.utc)
+    places = load_fixture("places_pool.json")["places"]
+    for point_id, place in zip(seeded_point_ids(), places):
+        db.seed(f"PointofInterest/{point_id}", {
+            "place_id": place["id"],
+            "name": place["displayName"]["text"],
+            "coordinates": GeoPoint(place["location"]["latitude"], place["location"]["longitude"]),
+            "address": place["formattedAddress"],
+            "city": CITY["city"].lower(),
+            "country": CITY["country"].lower(),
+            "type": poi_type(place),
+            "categories": place["types"],
+            "description": place["editorialSummary"]["text"],
+            "website": place["websiteUri"],
+            "phone": place["internationalPhoneNumber"],
+            "opening_hours": "\n".join(place["regularOpeningHours"]["weekdayDescriptions"]),
+            "rating": place["rating"],
+            "user_ratings_total": place["userRatingCount"],
+            "created_at": created,
+            "updated_at": created
+        })
+    return seeded_point_ids()
+
+
+def seeded_point_ids() -> List[str]:
+    """The document IDs seed_points gives the recorded places, in fixture order."""
+    return [f"poi{index:04d}" for index in range(len(load_fixture("places_pool.json")["places"]))]
+
+
+def seed_trip(db: FakeFirestore, trip_id: str, user_id: str, point_ids: List[str]) -> None:
+    """A saved trip scheduling the first points (two per slot) with the rest unused."""
+    db.seed(f"Trip/{trip_id}", {
+        "city": CITY["city"].lower(),
+        "country": CITY["country"],
+        "coordinates": [CITY["lat"], CITY["lng"]],
+        "fromDT": TRIP_START,
+        "toDT": TRIP_START + timedelta(days=TRIP_DAYS),
+        "monthlyDays": TRIP_DAYS,
+        "interests": ["Museum", "Park"],
+        "customInterests": [],
+        "foodPreferences": ["Italian"],
+        "customFoodPreferences": [],
+        "createdDT": TRIP_START - timedelta(days=7),
+        "lastModifiedDT": TRIP_START - timedelta(days=7),
+        "userId": user_id,
+        "version": 1
+    })
+    for point_id, slot in itinerary_slots(point_ids).items():
+        db.seed(f"Trip/{trip_id}/itineraryPOIs/{point_id}", slot)
+    for point_id in point_ids[TRIP_DAYS * 6:]:
+        db.seed(f"Trip/{trip_id}/unusedPOIs/{point_id}", {})
+
+
+def itinerary_slots(point_ids: List[str]) -> Dict[str, Dict]:
+    """The schedule of a trip on these points: the first six of them each day."""
+    slots = {}
+    for index, point_id in enumerate(point_ids[:TRIP_DAYS * 6]):
+        day, slot = divmod(index, 6)
+        slots[point_id] = {
+            "StartTime": 800 + slot * 200,
+            "EndTime": 930 + slot * 200,
+            "timeSlot": ("Morning", "Afternoon", "Evening")[slot // 2],
+            "day": day + 1,
+            "duration": 90
+        }
+    return slots
+
+
+def trip_save_request(user_id: str, point_ids: List[str]) -> SaveTripRequest:
+    """The request creating the trip seed_trip stores, so trip_update_request applies to it."""
+    return SaveTripRequest(
+        tripData={
+            "city": CITY["city"],
+            "country": CITY["country"],
+            "coordinates": {"lat": CITY["lat"], "lng": CITY["lng"]},
+            "fromDT": TRIP_START,
+            "toDT": TRIP_START + timedelta(days=TRIP_DAYS),
+            "monthlyDays": TRIP_DAYS,
+            "interests": ["Museum", "Park"],
+            "customInterests": [],
+            "foodPreferences": ["Italian"],
+            "customFoodPreferences": [],
+            "createdDT": TRIP_START - timedelta(days=7),
+            "userId": user_id
+        },
+        itineraryPOIs=[{"PointID": point_id, **slot} for point_id, slot in itinerary_slots(point_ids).items()],
+        unusedPOIs=[{"PointID": point_id} for point_id in point_ids[TRIP_DAYS * 6:]]
+    )
+
+
+def trip_generation_request() -> TripGenerationRequest:
+    """
+    A three-day trip with one cafe and two attractions picked by the user, so the rest
+    are searched for. use_cache is off: every call runs the whole pipeline.
+    """
+    places = load_fixture("places_pool.json")["places"]
+
+    def picked(kind: str, count: int) -> List[Dict]:
+        return [{
+            "place_id": place["id"],
+            "name": place["displayName"]["text"],
+            "type": kind,
+            "coordinates": {"lat": place["location"]["latitude"], "lng": place["location"]["longitude"]},
+            "opening_hours": place["regularOpeningHours"]["periods"]
+        } for place in places if poi_type(place) == kind][:count]
+
+    return TripGenerationRequest(
+        trip_data={
+            "city": CITY["city"],
+            "country": CITY["country"],
+            "coordinates": {"lat": CITY["lat"], "lng": CITY["lng"]},
+            "fromDT": TRIP_START,
+            "toDT": TRIP_START + timedelta(days=TRIP_DAYS),
+            "monthly_days": TRIP_DAYS,
+            "interests": ["Museum", "Park"],
+            "food_preferences": ["Italian"]
+        },
+        cafepois=picked("cafe", 1),
+        attractionpois=picked("attraction", 2),
+        use_cache=False
+    )
+
+
+def trip_update_request(point_ids: List[str], revision: int = 0) -> TripUpdateRequest:
+    """
+    An autosave of a trip seeded by seed_trip: reschedules two POIs and swaps one
+    between the itinerary and the unused list. Safe to send any number of times.
+    """
+    scheduled = point_ids[:TRIP_DAYS * 6]
+    unused = point_ids[TRIP_DAYS * 6:]
+    minute = revision % 30
+
+    def slot(point_id: str, day: int, start: int) -> Dict:
+        return {"PointID": point_id, "StartTime": start + minute, "EndTime": start + 90 + minute,
+                "timeSlot": "Morning", "day": day, "duration": 90}
+
+    return TripUpdateRequest(
+        tripDataChanged=None,
+        movedToItinerary=[slot(unused[0], 1, 1300)],
+        movedToUnused=[{"PointID": scheduled[-1]}],
+        schedulingUpdates=[slot(scheduled[0], 1, 800), slot(scheduled[1], 1, 1000)],
+        unusedPOIsState=[{"PointID": point_id} for point_id in [scheduled[-1], *unused[1:]]],
+        newlyAddedPOIs=[]
+    )
@@ -0,0 +1,215 @@
+"""
+Registry of place categories used to search and filter Google Places results.
+
+Everything here is built once at import and is immutable afterwards. Extra
+categories, preference mappings or type lists can be supplied without code
+changes through a JSON file named by PLACE_CATEGORIES_FILE, e.g.
+
+    {
+        "categories": {"bar": {"accepted_primary_types": ["bar", "pub", "wine_bar"], "require_primary_type": true}},
+        "attraction_preferences": {"Aquarium": ["aquarium"]},
+        "food_preferences": {"Tapas": ["spanish_restaurant"]}
+    }
+
+Entries in the file are merged over the defaults; a category given in the file
+replaces the default category of the same name.
+"""
+import json
+import logging
+import os
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CAFE_PRIMARY_TYPES = frozenset({"cafe", "coffee_shop", "bakery"})
+RESTAURANT_PRIMARY_TYPES = frozenset({
+    "restaurant", "american_restaurant", "asian_restaurant", "barbecue_restaurant",
+    "brazilian_restaurant", "chinese_restaurant", "dessert_restaurant",
+    "fast_food_restaurant", "fine_dining_restaurant", "french_restaurant",
+    "greek_restaurant", "hamburger_restaurant", "indian_restaurant",
+    "indonesian_restaurant", "italian_restaurant", "japanese_restaurant",
+    "korean_restaurant", "lebanese_restaurant", "mediterranean_restaurant",
+    "mexican_restaurant", "middle_eastern_restaurant", "pizza_restaurant",
+    "ramen_restaurant", "seafood_restaurant", "spanish_restaurant",
+    "steak_house", "sushi_restaurant", "thai_restaurant", "turkish_restaurant",
+    "vegan_restaurant", "vegetarian_restaurant", "vietnamese_restaurant"
+})
+# Excluded from every food search
+LODGING_AND_RETAIL_TYPES = (
+    "hotel", "lodging", "motel", "resort_hotel", "bed_and_breakfast",
+    "inn", "guest_house", "department_store", "shopping_mall"
+)
+
+
+@dataclass(frozen=True)
+class PlaceCategory:
+    """How one searched place type is queried upstream and which results are kept."""
+
+    name: str
+    # Primary types kept; empty means every primary type is kept
+    accepted_primary_types: FrozenSet[str] = frozenset()
+    # Primary types ending with one of these suffixes are kept as well
+    accepted_suffixes: Tuple[str, ...] = ()
+    rejected_primary_types: FrozenSet[str] = frozenset()
+    # Reject places with no primary type instead of keeping them
+    require_primary_type: bool = False
+    # Sent as excludedTypes with every search for this category
+    excluded_types: Tuple[str, ...] = ()
+    # Searched when the category itself does not return enough places
+    backup_types: Tuple[str, ...] = ()
+    # Extra primary types the explore endpoint shows for this category
+    explore_extra_types: FrozenSet[str] = frozenset()
+
+    def accepts(self, primary_type: Optional[str]) -> bool:
+        """Strict check used when picking itinerary candidates."""
+        if primary_type in self.rejected_primary_types:
+            return False
+        if primary_type in self.accepted_primary_types:
+            return True
+        if not primary_type:
+            return not (self.require_primary_type or self.accepted_primary_types or self.accepted_suffixes)
+        if self.accepted_suffixes:
+            return primary_type.endswith(self.accepted_suffixes)
+        return not self.accepted_primary_types
+
+    def explore_accepts(self, primary_type: Optional[str]) -> bool:
+        """Looser check for the explore endpoint: unknown primary types are shown."""
+        if not primary_type or primary_type in self.explore_extra_types:
+            return True
+        return self.accepts(primary_type)
+
+    @classmethod
+    def from_config(cls, name: str, config: Dict) -> "PlaceCategory":
+        return cls(
+            name=name,
+            accepted_primary_types=frozenset(config.get("accepted_primary_types", ())),
+            accepted_suffixes=tuple(config.get("accepted_suffixes", ())),
+            rejected_primary_types=frozenset(config.get("rejected_primary_types", ())),
+            require_primary_type=bool(config.get("require_primary_type", False)),
+            excluded_types=tuple(config.get("excluded_types", ())),
+            backup_types=tuple(config.get("backup_types", ())),
+            explore_extra_types=frozenset(config.get("explore_extra_types", ()))
+        )
+
+
+DEFAULT_CATEGORIES = {
+    "cafe": PlaceCategory(
+        name="cafe",
+        accepted_primary_types=CAFE_PRIMARY_TYPES,
+        require_primary_type=True,
+        excluded_types=LODGING_AND_RETAIL_TYPES + (
+            "art_gallery", "art_studio", "auditorium", "cultural_landmark",
+            "historical_place", "monument", "museum", "performing_arts_theater",
+            "sculpture", "restaurant"
+        ),
+        backup_types=("bakery", "coffee_shop", "tea_house", "breakfast_restaurant", "juice_shop")
+    ),
+    "restaurant": PlaceCategory(
+        name="restaurant",
+        accepted_primary_types=RESTAURANT_PRIMARY_TYPES,
+        accepted_suffixes=("restaurant",),
+        rejected_primary_types=CAFE_PRIMARY_TYPES,
+        require_primary_type=True,
+        excluded_types=LODGING_AND_RETAIL_TYPES + ("cafe", "coffee_shop", "bakery"),
+        backup_types=(
+            "meal_takeaway", "meal_delivery", "food",
+            "fast_food_restaurant", "fine_dining_restaurant",
+            "breakfast_restaurant", "brunch_restaurant"
+        ),
+        explore_extra_types=frozenset({"meal_takeaway", "meal_delivery"})
+    ),
+    "tourist_attraction": PlaceCategory(name="tourist_attraction")
+}
+
+DEFAULT_ATTRACTION_PREFERENCES = {
+    'Museum': ('museum',),
+    'Shopping Malls': ('shopping_mall',),
+    'Art Gallery': ('art_gallery',),
+    'Theatre': ('performing_arts_theater',),
+    'Cultural': ('cultural_landmark',),
+    'Historical': ('historical_place',),
+    'National Park': ('national_park',),
+    'Gardens': ('garden',),
+    'Zoo': ('zoo',)
+}
+DEFAULT_FOOD_PREFERENCES = {
+    'Italian': ('italian_restaurant',),
+    'Chinese': ('chinese_restaurant',),
+    'Japanese': ('japanese_restaurant',),
+    'Thai': ('thai_restaurant',),
+    'Indian': ('indian_restaurant',),
+    'Mediterranean': ('mediterranean_restaurant',),
+    'French': ('french_restaurant',),
+    'Greek': ('greek_restaurant',),
+    'Mexican': ('mexican_restaurant',),
+    'Korean': ('korean_restaurant',),
+    'Vietnamese': ('vietnamese_restaurant',),
+    'Burger': ('hamburger_restaurant',),
+    'Asian': ('asian_restaurant',),
+    'American': ('american_restaurant',),
+    'Seafood': ('seafood_restaurant',),
+    'Steakhouse': ('steak_house',),
+    'Vegetarian': ('vegetarian_restaurant',),
+    'Breakfast': ('breakfast_restaurant',),
+    'Brunch': ('brunch_restaurant',),
+    'Bakery': ('bakery',),
+    'Cafe': ('cafe',),
+    'Coffee': ('coffee_shop',),
+    'Dessert': ('dessert_shop',),
+    'Ice Cream': ('ice_cream_shop',),
+    'Bar': ('bar',),
+    'pub': ('pub',),
+    'wine': ('wine_bar',)
+}
+
+
+class PlaceCategoryRegistry:
+    """Read-only view over categories and preference -> place type mappings."""
+
+    def __init__(
+        self,
+        categories: Mapping[str, PlaceCategory],
+        attraction_preferences: Mapping[str, Tuple[str, ...]],
+        food_preferences: Mapping[str, Tuple[str, ...]]
+    ):
+        self.categories = MappingProxyType(dict(categories))
+        self.attraction_preferences = MappingProxyType(dict(attraction_preferences))
+        self.food_preferences = MappingProxyType(dict(food_preferences))
+        # Unknown categories fall back to this: no filtering, lodging/retail excluded
+        self.default_category = PlaceCategory(name="default", excluded_types=LODGING_AND_RETAIL_TYPES)
+
+    def get(self, place_type: Optional[str]) -> PlaceCategory:
+        return self.categories.get(place_type, self.default_category)
+
+    def preference_mapping(self, place_type: str) -> Mapping[str, Tuple[str, ...]]:
+        """Preference name -> place types searched for it, for the given searched category."""
+        if place_type == "tourist_attraction":
+            return self.attraction_preferences
+        if place_type in ("restaurant", "cafe"):
+            return self.food_preferences
+        return MappingProxyType({})
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "PlaceCategoryRegistry":
+        categories = dict(DEFAULT_CATEGORIES)
+        attraction_preferences = dict(DEFAULT_ATTRACTION_PREFERENCES)
+        food_preferences = dict(DEFAULT_FOOD_PREFERENCES)
+        path = path if path is not None else os.environ.get("PLACE_CATEGORIES_FILE")
+        if path:
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    overrides = json.load(file)
+                for name, config in overrides.get("categories", {}).items():
+                    categories[name] = PlaceCategory.from_config(name, config)
+                for key, types in overrides.get("attraction_preferences", {}).items():
+                    attraction_preferences[key] = tuple(types)
+                for key, types in overrides.get("food_preferences", {}).items():
+                    food_preferences[key] = tuple(types)
+            except (OSError, ValueError, AttributeError) as e:
+                logger.error(f"Ignoring place category overrides in {path}: {str(e)}")
+        return cls(categories, attraction_preferences, food_preferences)
+
+
+place_categories = PlaceCategoryRegistry.load()
@@ -1,4 +1,7 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+import os
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from routes.pointofinterest_route import router as poi_router
@@ -10,10 +13,21 @@ from routes.wikidata_route import router as wikidata_router
 from routes.tripgeneration_route import router as tripgeneration_router
 from routes.googleplaces_route import router as googleplaces_router
 from routes.trip_route import router as trip_router
+from routes.responses import CompressionMiddleware, FastJSONResponse
+from routes.metrics_route import MetricsMiddleware, TracingMiddleware, router as metrics_router
+from services.pointofinterest_service import PointOfInterestService
+from services.poi_corpus import poi_corpus
+from services.citypack_service import DEFAULT_PACK_DIR, CityPackService, city_pack_store, parse_city_list
+from services.googleplaces_service import GooglePlacesService
+from services.geoapify_service import GeoapifyService
+from services.wikidata_service import WikidataService
+from services.trip_service import TripService
+from services.circuit_breaker import stale_providers
+from services.metrics import monitor_event_loop
 # Initialize Firebase Admin
 initialize_firebase()
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # CORS configuration
 origins = [
@@ -26,7 +40,70 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Served-Stale", "X-Next-Cursor", "Server-Timing", "X-Trace-Id"],
 )
+# Compresses JSON bodies above RESPONSE_COMPRESSION_MIN_BYTES (brotli if installed, else gzip)
+app.add_middleware(CompressionMiddleware)
+
+@app.middleware("http")
+async def flag_stale_responses(request: Request, call_next):
+    """Name the providers answered from stale cache (open circuit) in X-Served-Stale."""
+    served = set()
+    token = stale_providers.set(served)
+    try:
+        response = await call_next(request)
+    finally:
+        stale_providers.reset(token)
+    if served:
+        response.headers["X-Served-Stale"] = ",".join(sorted(served))
+        # Stale data must not be reused by browsers or a CDN without revalidating
+        response.headers["Cache-Control"] = "no-cache"
+    return response
+
+# Spans for X-Debug-Timing / TRACING_EXPORTER; the root span covers the other middleware
+app.add_middleware(TracingMiddleware)
+# Added last so it is outermost: request latency includes the other middleware
+app.add_middleware(MetricsMiddleware)
+
+async def refresh_poi_corpus():
+    """Load stored POIs into the local corpus, then refresh periodically if configured."""
+    interval = float(os.environ.get("POI_CORPUS_REFRESH_SECONDS", 0))
+    service = PointOfInterestService()
+    while True:
+        await asyncio.to_thread(service.load_corpus, poi_corpus)
+        if interval <= 0:
+            return
+        await asyncio.sleep(interval)
+
+async def refresh_city_packs():
+    """Refresh city packs for the configured (or most planned) cities every CITY_PACK_REFRESH_SECONDS."""
+    interval = float(os.environ.get("CITY_PACK_REFRESH_SECONDS", 0))
+    if interval <= 0:
+        return
+    service = CityPackService(GooglePlacesService(), WikidataService(), GeoapifyService)
+    while True:
+        try:
+            cities = parse_city_list(os.environ.get("CITY_PACK_CITIES"))
+            if not cities:
+                cities = await asyncio.to_thread(TripService().top_cities, int(os.environ.get("CITY_PACK_TOP_N", 10)))
+            await service.refresh(cities)
+        except Exception as e:
+            logging.error(f"City pack refresh failed: {str(e)}")
+        await asyncio.sleep(interval)
+
+@app.on_event("startup")
+async def start_background_tasks():
+    # Packs are loaded first so their places are in the corpus before any request
+    await asyncio.to_thread(city_pack_store.load_dir, os.environ.get("CITY_PACK_DIR", DEFAULT_PACK_DIR))
+    if os.environ.get("POI_CORPUS_WARM_ON_STARTUP", "true").lower() == "true":
+        app.state.poi_corpus_task = asyncio.create_task(refresh_poi_corpus())
+    else:
+        logging.info("POI corpus warm-up disabled")
+    app.state.city_pack_task = asyncio.create_task(refresh_city_packs())
+    # event_loop_lag_seconds in /metrics; EVENT_LOOP_LAG_INTERVAL=0 turns it off
+    lag_interval = float(os.environ.get("EVENT_LOOP_LAG_INTERVAL", 0.1))
+    if lag_interval > 0:
+        app.state.loop_lag_task = asyncio.create_task(monitor_event_loop(lag_interval))
 
 @app.get("/")
 async def root():
@@ -40,6 +117,7 @@ app.include_router(wikidata_router)
 app.include_router(tripgeneration_router)
 app.include_router(googleplaces_router)
 app.include_router(trip_router)
+app.include_router(metrics_router)
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -1,5 +1,6 @@
+from dataclasses import dataclass, replace
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 class Location(BaseModel):
     latitude: float
@@ -21,6 +22,132 @@ class Place(BaseModel):
     opening_hours: Optional[str]
     price_level: Optional[str]
     cuisine: Optional[List[str]]
+    opening_periods: Optional[List[Dict]] = None
+
+@dataclass(slots=True)
+class PlaceLocation:
+    latitude: float
+    longitude: float
+
+
+def _optional_float(value: Any) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+def _optional_int(value: Any) -> Optional[int]:
+    return int(value) if value is not None else None
+
+
+def _optional_str(value: Any, field: str) -> Optional[str]:
+    if value is not None and not isinstance(value, str):
+        raise TypeError(f"{field} must be a string, got {type(value).__name__}")
+    return value
+
+
+def _required_str(value: Any, field: str) -> str:
+    if not isinstance(value, str) or not value:
+        raise TypeError(f"{field} must be a non-empty string")
+    return value
+
+
+def _string_list(value: Any, field: str) -> Optional[List[str]]:
+    if value is None:
+        return None
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise TypeError(f"{field} must be a list of strings")
+    return value
+
+
+@dataclass(slots=True)
+class PlaceRecord:
+    """
+    Compact place parsed straight from Places API payloads, with the same attributes
+    as Place. Fields are checked once when the record is built (from_api / from_dict)
+    and the record is serialized as is (orjson handles dataclasses natively), so
+    search results skip pydantic validation on the way in and on the way out.
+    """
+    place_id: str
+    name: str
+    formatted_address: Optional[str]
+    types: List[str]
+    primary_type: Optional[str]
+    rating: Optional[float]
+    user_ratings_total: Optional[int]
+    photo_name: Optional[str]
+    location: PlaceLocation
+    website: Optional[str]
+    phone: Optional[str]
+    description: Optional[str]
+    opening_hours: Optional[str]
+    price_level: Optional[str]
+    cuisine: Optional[List[str]]
+    opening_periods: Optional[List[Dict]] = None
+    photo_url: Optional[str] = None
+
+    @classmethod
+    def from_api(cls, result: Dict) -> "PlaceRecord":
+        """
+        Build a record from one place of a Places API (New) search response.
+        Raises KeyError, TypeError or ValueError if the id or location is missing or
+        any field has the wrong type.
+        """
+        location = result["location"]
+        display_name = result.get("displayName")
+        photos = result.get("photos")
+        summary = result.get("editorialSummary")
+        hours = result.get("regularOpeningHours") or result.get("currentOpeningHours")
+        weekday_texts = hours.get("weekdayDescriptions") if hours else None
+        return cls(
+            place_id=_required_str(result["id"], "id"),
+            name=_optional_str(display_name.get("text", ""), "displayName.text") if display_name else "",
+            formatted_address=_optional_str(result.get("formattedAddress"), "formattedAddress"),
+            types=_string_list(result.get("types"), "types") or [],
+            primary_type=_optional_str(result.get("primaryType"), "primaryType"),
+            rating=_optional_float(result.get("rating")),
+            user_ratings_total=_optional_int(result.get("userRatingCount")),
+            photo_name=_optional_str(photos[0].get("name"), "photos.name") if photos else None,
+            location=PlaceLocation(float(location["latitude"]), float(location["longitude"])),
+            website=_optional_str(result.get("websiteUri"), "websiteUri"),
+            phone=_optional_str(result.get("nationalPhoneNumber"), "nationalPhoneNumber"),
+            description=_optional_str(summary.get("text"), "editorialSummary.text") if summary else None,
+            opening_hours="\n".join(_string_list(weekday_texts, "weekdayDescriptions")) if weekday_texts else None,
+            price_level=_optional_str(result.get("priceLevel"), "priceLevel"),
+            cuisine=_string_list(result.get("cuisine"), "cuisine"),
+            opening_periods=hours.get("periods") if hours else None
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "PlaceRecord":
+        """Inverse of to_dict(), for records read back from storage (e.g. city packs)."""
+        location = data["location"]
+        return cls(
+            place_id=_required_str(data["place_id"], "place_id"),
+            name=_optional_str(data.get("name"), "name") or "",
+            formatted_address=_optional_str(data.get("formatted_address"), "formatted_address"),
+            types=list(_string_list(data.get("types"), "types") or []),
+            primary_type=_optional_str(data.get("primary_type"), "primary_type"),
+            rating=_optional_float(data.get("rating")),
+            user_ratings_total=_optional_int(data.get("user_ratings_total")),
+            photo_name=_optional_str(data.get("photo_name"), "photo_name"),
+            location=PlaceLocation(float(location["latitude"]), float(location["longitude"])),
+            website=_optional_str(data.get("website"), "website"),
+            phone=_optional_str(data.get("phone"), "phone"),
+            description=_optional_str(data.get("description"), "description"),
+            opening_hours=_optional_str(data.get("opening_hours"), "opening_hours"),
+            price_level=_optional_str(data.get("price_level"), "price_level"),
+            cuisine=_string_list(data.get("cuisine"), "cuisine"),
+            opening_periods=data.get("opening_periods"),
+            photo_url=_optional_str(data.get("photo_url"), "photo_url")
+        )
+
+    def to_dict(self) -> Dict:
+        data = {name: getattr(self, name) for name in self.__slots__}
+        data["location"] = {"latitude": self.location.latitude, "longitude": self.location.longitude}
+        return data
+
+    def with_photo_url(self, photo_url: Optional[str]) -> "PlaceRecord":
+        """Copy with photo_url set; records can be shared (corpus, coalesced searches), so never mutate."""
+        return replace(self, photo_url=photo_url)
 
 class PlaceWithPhotoUrl(Place):
     photo_url: Optional[str]
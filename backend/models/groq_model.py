@@ -23,4 +23,6 @@ class ChatResponse(BaseModel):
     content: str
     role: MessageRole = MessageRole.ASSISTANT
     model: Optional[str] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
 
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, ConfigDict
-from typing import List
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Any, Dict, List, Literal, Optional, Union
 from datetime import datetime
 
 class Coordinates(BaseModel):
@@ -11,6 +11,8 @@ class POI(BaseModel):
     name: str
     type: str
     coordinates: Coordinates
+    # Google periods, Google weekday text or an OSM opening_hours string
+    opening_hours: Optional[Union[str, List[Dict[str, Any]]]] = None
 
 class TripData(BaseModel):
     city: str
@@ -29,5 +31,15 @@ class TripGenerationRequest(BaseModel):
     attractionpois: List[POI] = []
     foodpois: List[POI] = []
     cafepois: List[POI] = []
+    use_cache: bool = True
 
-    model_config = ConfigDict(populate_by_name=True, arbitrary_types_allowed=True)
\ No newline at end of file
+    model_config = ConfigDict(populate_by_name=True, arbitrary_types_allowed=True)
+
+class TripRegenerationRequest(BaseModel):
+    trip_data: TripData
+    itinerary: Dict[str, Any]
+    day: int = Field(..., ge=1)
+    time_slot: Optional[Literal["Morning", "Afternoon", "Evening"]] = None
+    candidate_pois: List[POI] = []
+
+    model_config = ConfigDict(populate_by_name=True)
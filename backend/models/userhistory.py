@@ -1,5 +1,5 @@
 from pydantic import BaseModel, field_serializer, ConfigDict
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 class SavedPOI(BaseModel):
@@ -41,4 +41,11 @@ class UserHistory(BaseModel):
     def serialize_datetime_fields(self, v, _info):
         if isinstance(v, datetime):
             return v.isoformat()
-        return v
\ No newline at end of file
+        return v
+
+class HistorySummary(BaseModel):
+    """Per-city counts and the latest saved items of a user's history."""
+    poiCounts: Dict[str, int] = {}
+    tripCounts: Dict[str, int] = {}
+    recentPOIs: List[Dict[str, Any]] = []
+    recentTrips: List[Dict[str, Any]] = []
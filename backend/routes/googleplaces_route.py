@@ -1,85 +1,118 @@
-from typing import List, Optional
-from fastapi import APIRouter, HTTPException
+import asyncio
+from typing import Any, Dict, List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
 from services.googleplaces_service import GooglePlacesService
-from models.googleplaces import PlaceWithPhotoUrl
+from services.circuit_breaker import circuit_breaker_stats
+from services.rate_limiter import places_rate_limiter
+from services.single_flight import single_flight_stats
+from models.googleplaces import PlaceRecord
+from .auth import verify_firebase_token
+from .responses import (
+    NO_STORE_CACHE_CONTROL, PLACE_DETAILS_CACHE_CONTROL, PLACES_CACHE_CONTROL, FastJSONResponse, cached_response
+)
 
 router = APIRouter(prefix="/api/googleplaces", tags=["Google Places"])
 google_places_service = GooglePlacesService()
 
+def _photo_urls(places: List[PlaceRecord]) -> List[Optional[str]]:
+    return [google_places_service.get_place_photo(place.photo_name) if place.photo_name else None for place in places]
+
+async def with_photo_urls(places: List[PlaceRecord]) -> FastJSONResponse:
+    """Places with their photo URLs, serialized straight from the parsed records."""
+    # The Places service is blocking (HTTP calls, rate limiter waits): keep it off the event loop
+    photo_urls = await asyncio.to_thread(_photo_urls, places)
+    return FastJSONResponse([place.with_photo_url(url) for place, url in zip(places, photo_urls)])
+
 @router.get("/nearby")
-async def get_nearby_places(latitude: float, longitude: float, radius: int = 1000, type: Optional[str] = None, max_results: int = 10):
+async def get_nearby_places(request: Request, latitude: float, longitude: float, radius: int = 1000, type: Optional[str] = None, max_results: int = 10):
     """
     Endpoint to find places near a given location and include photo URLs.
     """
     try:
-        places = google_places_service.nearby_search(latitude, longitude, radius, type, max_results)
+        places = await asyncio.to_thread(
+            google_places_service.tiered_nearby_search,
+            latitude=latitude,
+            longitude=longitude,
+            radius=radius,
+            type=type,
+            max_results=max_results,
+            require_photo=True
+        )
         
-        # Transform places to include photo URLs
-        places_with_photos = []
-        for place in places:
-            photo_url = None
-            if place.photo_name:
-                photo_url = google_places_service.get_place_photo(place.photo_name)
-            places_with_photos.append(PlaceWithPhotoUrl.from_place(place, photo_url))
-            
-        return places_with_photos
+        return cached_response(request, await with_photo_urls(places), PLACES_CACHE_CONTROL)
+    except HTTPException:
+        # Rate limited or quota exhausted upstream (429)
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
 @router.get("/details/{place_id}")
-async def get_place_details(place_id: str):
+async def get_place_details(request: Request, place_id: str, profile: Literal["minimal", "card", "full"] = "full"):
     """
     Endpoint to retrieve detailed information for a specific place.
+    `profile` selects the field mask: minimal, card or full (default).
+    Only found places are cacheable: a failed lookup is a 404 (not a Google place ID)
+    or 502 (request failed, circuit open) with no-store.
     """
     try:
-        place_details = google_places_service.get_place_details(place_id)
-        return place_details
+        place_details = await asyncio.to_thread(google_places_service.get_place_details, place_id, profile=profile)
+        if place_details is None:
+            if not place_id.startswith("ChI"):
+                raise HTTPException(status_code=404, detail="Not a Google place ID",
+                                    headers={"Cache-Control": NO_STORE_CACHE_CONTROL})
+            raise HTTPException(status_code=502, detail="Place details are unavailable",
+                                headers={"Cache-Control": NO_STORE_CACHE_CONTROL})
+        return cached_response(request, FastJSONResponse(place_details), PLACE_DETAILS_CACHE_CONTROL)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/batch_details")
-async def batch_get_place_details(place_ids: List[str]):
+async def batch_get_place_details(place_ids: List[str], profile: Literal["minimal", "card", "full"] = "full"):
     """
-    Endpoint to retrieve detailed information for multiple places in one call.
+    Endpoint to retrieve detailed information for multiple places in one call,
+    e.g. to upgrade the places of a generated itinerary to full details.
     """
     try:
         # Get place details for all valid place IDs
-        place_details_dict = google_places_service.batch_get_place_details(place_ids)
+        place_details_dict = await asyncio.to_thread(
+            google_places_service.batch_get_place_details, place_ids, profile=profile
+        )
         
         # Add photo URLs to the details
-        enriched_details = google_places_service.batch_get_photos(place_details_dict)
+        enriched_details = await asyncio.to_thread(google_places_service.batch_get_photos, place_details_dict)
         
         return enriched_details
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
 #Used by trip poi suggestion hook
 @router.get("/explore")
-async def get_explore_places(latitude: float, longitude: float, radius: int = 2000, type: Optional[str] = None, max_results: int = 20):
+async def get_explore_places(request: Request, latitude: float, longitude: float, radius: int = 2000, type: Optional[str] = None, max_results: int = 20):
     """
     Endpoint to retrieve explore places for a given location and type.
     """
     try:
-        places = google_places_service.getExplorePOIs(latitude, longitude, radius, type, max_results)
-         # Transform places to include photo URLs
-        places_with_photos = []
-        for place in places:
-            photo_url = None
-            if place.photo_name:
-                photo_url = google_places_service.get_place_photo(place.photo_name)
-            places_with_photos.append(PlaceWithPhotoUrl.from_place(place, photo_url))
-            
-        return places_with_photos
+        places = await asyncio.to_thread(
+            google_places_service.getExplorePOIs, latitude, longitude, radius, type, max_results
+        )
+        return cached_response(request, await with_photo_urls(places), PLACES_CACHE_CONTROL)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail= f"Error fetching explore places from Google Places API: {str(e)}")
 
 @router.get("/textsearch")
-async def text_search(query: str, latitude: float, longitude: float, radius: int = 2000, type: Optional[str] = None, max_results: int = 20, open_now: bool = False):
+async def text_search(request: Request, query: str, latitude: float, longitude: float, radius: int = 2000, type: Optional[str] = None, max_results: int = 20, open_now: bool = False):
     """
     Endpoint to search for places based on a text query with location bias.
     """
     try:
-        places = google_places_service.text_search(
+        places = await asyncio.to_thread(
+            google_places_service.text_search,
             query=query,
             latitude=latitude,
             longitude=longitude,
@@ -89,14 +122,29 @@ async def text_search(query: str, latitude: float, longitude: float, radius: int
             open_now=open_now
         )
         
-        # Transform places to include photo URLs
-        places_with_photos = []
-        for place in places:
-            photo_url = None
-            if place.photo_name:
-                photo_url = google_places_service.get_place_photo(place.photo_name)
-            places_with_photos.append(PlaceWithPhotoUrl.from_place(place, photo_url))
-            
-        return places_with_photos
+        return cached_response(request, await with_photo_urls(places), PLACES_CACHE_CONTROL)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error searching places: {str(e)}")
+
+@router.get("/coalescing/stats")
+async def get_coalescing_stats(
+    user_id: str = Depends(verify_firebase_token)
+) -> Dict[str, Dict[str, Any]]:
+    """Per-provider counts of upstream calls made and identical calls collapsed into them."""
+    return single_flight_stats()
+
+@router.get("/quota/stats")
+async def get_quota_stats(
+    user_id: str = Depends(verify_firebase_token)
+) -> Dict[str, Dict[str, Any]]:
+    """Token bucket level, daily usage, and acquired/shed/queue-time figures per endpoint and priority."""
+    return places_rate_limiter.stats()
+
+@router.get("/circuits/stats")
+async def get_circuit_stats(
+    user_id: str = Depends(verify_firebase_token)
+) -> Dict[str, Dict[str, Any]]:
+    """Circuit state, recent failure/slow counts and stale responses served, per provider."""
+    return circuit_breaker_stats()
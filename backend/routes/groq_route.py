@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict
 from fastapi.responses import StreamingResponse
 from services.groq_service import GroqService
 from models.groq_model import ChatRequest, ChatResponse, MessageRole
@@ -41,4 +42,11 @@ async def create_chat_completion(
         raise HTTPException(
             status_code=500,
             detail=str(e)
-        )
\ No newline at end of file
+        )
+
+@router.get("/models/stats")
+async def get_model_stats(
+    user_id: str = Depends(verify_firebase_token)
+) -> Dict[str, Dict]:
+    """Per-model latency percentiles and hedging win rates"""
+    return groq_service.latency_stats()
@@ -0,0 +1,97 @@
+import os
+import time
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from services import metrics, tracing
+
+DEBUG_TIMING_HEADER = "x-debug-timing"
+
+router = APIRouter(tags=["metrics"])
+
+
+class MetricsMiddleware:
+    """
+    Request latency per route template (not per URL, which would make a series per
+    ID) and the number of requests in flight. Streamed responses are timed to the
+    end of the stream.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = metrics.http_requests_in_flight.labels()
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            route = scope.get("route")
+            metrics.http_request_duration.labels(
+                scope["method"], getattr(route, "path", "unmatched"), status
+            ).observe(time.perf_counter() - started)
+
+
+class TracingMiddleware:
+    """
+    Runs each request in a trace when spans are exported (TRACING_EXPORTER) or the
+    client asks for the timing breakdown with X-Debug-Timing. The latter gets the span
+    timings back inline in a Server-Timing header, with the trace ID in X-Trace-Id.
+    The breakdown exposes internals (models, candidate counts, token usage), so the
+    header is ignored unless TRACING_DEBUG_HEADER=1; if METRICS_TOKEN is set, its
+    value must be that token rather than "1".
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.debug_header_enabled = os.environ.get("TRACING_DEBUG_HEADER", "0") == "1"
+        token = os.environ.get("METRICS_TOKEN")
+        self.debug_header_values = (token,) if token else ("1", "true")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        debug = self.debug_header_enabled and Headers(scope=scope).get(DEBUG_TIMING_HEADER) in self.debug_header_values
+        if not debug and not tracing.exporting():
+            await self.app(scope, receive, send)
+            return
+
+        with tracing.start_trace(f"{scope['method']} unmatched") as root:
+            async def send_with_timing(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    route = scope.get("route")
+                    root.name = f"{scope['method']} {getattr(route, 'path', 'unmatched')}"
+                    root.set_attribute("status", message["status"])
+                    if debug:
+                        headers = MutableHeaders(scope=message)
+                        headers.append("Server-Timing", tracing.server_timing(root))
+                        headers["X-Trace-Id"] = root.trace.trace_id
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request) -> PlainTextResponse:
+    """Prometheus scrape endpoint. Set METRICS_TOKEN to require it as a bearer token."""
+    token = os.environ.get("METRICS_TOKEN")
+    if token and request.headers.get("authorization") != f"Bearer {token}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -3,6 +3,7 @@ from typing import Dict, List
 from services.pointofinterest_service import PointOfInterestService
 from models.pointofinterest import PointOfInterestResponse
 from .auth import verify_firebase_token
+from .responses import FastJSONResponse
 import logging 
 
 router = APIRouter(prefix="/api/points", tags=["points"])
@@ -13,11 +14,10 @@ async def get_points_details(
     request_body: Dict[str, List[str]],
     _: str = Depends(verify_firebase_token)
 ) -> List[PointOfInterestResponse]:
-    logging.info(f"Received POST request with body: {request_body}")
     point_ids = request_body.get("point_ids", [])
     if not point_ids:
         raise HTTPException(status_code=400, detail="point_ids is required")
-    return await poi_service.get_points(point_ids)
+    return FastJSONResponse(await poi_service.get_points(point_ids))
 
 @router.post("/CreateGetPOI", response_model=str)
 async def create_or_get_point(
@@ -27,7 +27,7 @@ async def create_or_get_point(
     """Create a new point of interest"""
     try:
         point_data = PointOfInterestResponse(**request['poi_data'])
-        logging.info(f"Creating POI with data: {point_data}")
+        logging.info(f"Creating POI for place {point_data.place_id}")
         point_id = await poi_service.create_or_get_point(point_data)
         logging.info(f"Created/Found POI with ID: {point_id}")
         return point_id
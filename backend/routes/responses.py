@@ -0,0 +1,189 @@
+import gzip
+import hashlib
+import os
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Optional
+import orjson
+from fastapi import Request, Response
+from fastapi.responses import ORJSONResponse
+from firebase_admin.firestore import GeoPoint
+from pydantic import BaseModel
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    # Optional: without it responses are gzipped only
+    brotli = None
+
+# Cache-Control per kind of response. Places and Wikidata content changes slowly and
+# is the same for every user; per-user documents may only be cached by the browser,
+# which must revalidate (cheap with the ETag).
+PLACES_CACHE_CONTROL = "public, max-age=300, stale-while-revalidate=60"
+PLACE_DETAILS_CACHE_CONTROL = "public, max-age=3600, stale-while-revalidate=300"
+WIKIDATA_IMAGE_CACHE_CONTROL = "public, max-age=86400"
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+# Failures must never be reused by a browser or CDN
+NO_STORE_CACHE_CONTROL = "no-store"
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def encode_default(value: Any) -> Any:
+    """orjson fallback for the values our responses carry that it does not encode itself."""
+    if isinstance(value, BaseModel):
+        # Already validated (or built from our own documents): dump without re-validating
+        return value.model_dump()
+    if isinstance(value, datetime):
+        # Firestore timestamps are a datetime subclass, which orjson rejects
+        return value.isoformat()
+    if isinstance(value, GeoPoint):
+        return {"lat": value.latitude, "lng": value.longitude}
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dump_json(content: Any) -> bytes:
+    return orjson.dumps(
+        content,
+        default=encode_default,
+        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    )
+
+
+class FastJSONResponse(ORJSONResponse):
+    """
+    Default response class of the app. Encodes with orjson, including dataclasses
+    (PlaceRecord), numpy values, pydantic models, Firestore timestamps and GeoPoints.
+
+    Routes returning data we trust (our own Firestore documents, records parsed from
+    upstream) return it wrapped in this class, which skips FastAPI's response-model
+    validation and jsonable_encoder pass; the return annotation still documents it.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dump_json(content)
+
+
+async def ndjson_lines(items: AsyncIterator[Any]) -> AsyncIterator[bytes]:
+    """Body of an application/x-ndjson StreamingResponse: one JSON document per line."""
+    async for item in items:
+        yield dump_json(item) + b"\n"
+
+
+def content_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison (RFC 9110 13.1.2): a compressed copy of the body still matches."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def cached_response(request: Request, response: Response, cache_control: str) -> Response:
+    """
+    Tag a rendered response with a content-hash ETag and the route's Cache-Control,
+    answering 304 Not Modified when the client already holds the same body.
+    """
+    headers = {"ETag": content_etag(response.body), "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return response
+
+
+def accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    """Content codings from an Accept-Encoding header with their q-values."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        quality = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip().lower() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        if coding.strip():
+            accepted[coding.strip().lower()] = quality
+    return accepted
+
+
+class CompressionMiddleware:
+    """
+    Compresses complete responses of at least minimum_size bytes: brotli when the
+    brotli module is installed and the client accepts it, gzip otherwise.
+
+    Streamed responses (chat SSE) are passed through untouched, so events are not
+    held back in a compressor buffer, as are bodies that are already encoded or of a
+    type that does not compress. A compressed response's ETag is made weak.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: Optional[int] = None, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size if minimum_size is not None \
+            else int(os.environ.get("RESPONSE_COMPRESSION_MIN_BYTES", 1024))
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def choose_encoding(self, accept_encoding: str) -> Optional[str]:
+        accepted = accepted_encodings(accept_encoding)
+        if brotli is not None and accepted.get("br", 0) > 0:
+            return "br"
+        if accepted.get("gzip", 0) > 0:
+            return "gzip"
+        return None
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self.choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # Held back until the first body message shows whether to compress
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            compress = (
+                not message.get("more_body", False)
+                and len(body) >= self.minimum_size
+                and "content-encoding" not in headers
+                and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            )
+            if compress:
+                body = self.compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = "W/" + etag
+                message = {**message, "body": body}
+            await send(start)
+            start = None
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from models.trip import SaveTripRequest, TripDetails, TripUpdateRequest
 from services.trip_service import TripService
 from typing import Dict
 from .auth import verify_firebase_token
+from .responses import PRIVATE_CACHE_CONTROL, FastJSONResponse, cached_response
 import logging
 from typing import Dict, Optional
 from firebase_admin import firestore
 from services.userhistory_service import UserHistoryService
+from services.history_summary import record_trip_removed
 
 router = APIRouter(prefix="/api/trip", tags=["trip"])
 def get_trip_service():
@@ -24,11 +26,13 @@ async def create_trip(
 
 @router.get("/details/{trip_doc_id}")
 async def get_trip_details(
+    request: Request,
     trip_doc_id: str,
     user_id: str = Depends(verify_firebase_token)
 ) -> TripDetails:
     trip_service = TripService()
-    return await trip_service.get_trip_details(trip_doc_id)
+    details = FastJSONResponse(await trip_service.get_trip_details(trip_doc_id))
+    return cached_response(request, details, PRIVATE_CACHE_CONTROL)
 
 @router.put("/update/{trip_doc_id}")
 async def update_trip(
@@ -60,7 +64,6 @@ async def delete_trip_with_history(
         
         user_history_ref = db.collection(collection_name).document(user_id)
         saved_itinerary_ref = user_history_ref.collection('savedItineraries').document(trip_doc_id)
-        saved_itinerary_doc = saved_itinerary_ref.get()
         
         if not trip_doc.exists:
             raise HTTPException(status_code=404, detail="Trip not found")
@@ -70,10 +73,18 @@ async def delete_trip_with_history(
         
         @firestore.transactional
         def delete_in_transaction(transaction):
+            # Everything the summary update depends on is read in the transaction, before the writes,
+            # so a concurrent change or a second delete retries instead of decrementing twice
+            saved_itinerary_doc = saved_itinerary_ref.get(transaction=transaction)
+            summary = userhistory_service.read_summary(transaction, user_history_ref)
+
             # if one fails, the whole transaction will be rolled back
             # Delete from savedItineraries subcollection if it exists
             if saved_itinerary_doc.exists:
                 transaction.delete(saved_itinerary_ref)
+                if summary is not None and saved_itinerary_doc.get('status'):
+                    record_trip_removed(summary, trip_doc_id, saved_itinerary_doc.get('city'))
+                    userhistory_service.write_summary(transaction, user_history_ref, summary)
             
             # Delete the trip document
             transaction.delete(trip_ref)
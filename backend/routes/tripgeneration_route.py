@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
-from typing import Dict
+from typing import Any, Dict
 import logging
 from services.tripgeneration_service import TripGenerationService
-from models.tripgeneration import TripGenerationRequest
+from models.tripgeneration import TripGenerationRequest, TripRegenerationRequest
 from .auth import verify_firebase_token
 import json
 
@@ -17,10 +17,14 @@ async def generate_trip(
 ) -> Dict[str, str]:
     try:
         raw_data = await request.json()
-        logger.info(f"Received raw data: {raw_data}")
 
         try:
             trip_request = TripGenerationRequest.model_validate(raw_data)
+            logger.info(
+                f"Generating trip for {trip_request.trip_data.city} with "
+                f"{len(trip_request.attractionpois)}/{len(trip_request.foodpois)}/{len(trip_request.cafepois)} "
+                "attraction/food/cafe suggestions"
+            )
             itinerary = await trip_service.generate_trip(trip_request)
 
             try:
@@ -44,4 +48,20 @@ async def generate_trip(
         raise HTTPException(
             status_code=500,
             detail=f"Failed to generate trip: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.post("/regenerate")
+async def regenerate_itinerary_slice(
+    request: TripRegenerationRequest,
+    user_id: str = Depends(verify_firebase_token)
+) -> Dict[str, str]:
+    """Regenerate one day, or one time slot of a day, keeping the rest of the itinerary fixed."""
+    itinerary = await trip_service.regenerate_slice(request)
+    return {"itinerary": itinerary}
+
+@router.get("/cache/stats")
+async def get_itinerary_cache_stats(
+    user_id: str = Depends(verify_firebase_token)
+) -> Dict[str, Any]:
+    """Hit/miss counters for the generated itinerary cache."""
+    return trip_service.itinerary_cache.stats()
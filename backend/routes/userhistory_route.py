@@ -1,15 +1,63 @@
-from models.trip import UserTrip
-from fastapi import APIRouter, Depends, Body
+from fastapi import APIRouter, Depends, Body, Query
+from fastapi.responses import StreamingResponse
 from typing import Dict, List, Optional
 from services.userhistory_service import UserHistoryService
+from models.userhistory import HistorySummary
+from services.pagination import MAX_PAGE_SIZE, Page, select_fields
 from .auth import verify_firebase_token
+from .responses import FastJSONResponse, ndjson_lines
 
 router = APIRouter(prefix="/api/user/history", tags=["user_history"])
 user_history_service = UserHistoryService()
 
+SAVED_POI_FIELDS = ("pointID", "status", "createdDT", "city")
+SAVED_TRIP_FIELDS = ("city", "country", "fromDT", "toDT", "monthlyDays", "status")
+
+def page_response(page: Page) -> FastJSONResponse:
+    """The page's items as the body, with the cursor of the next page (if any) in X-Next-Cursor."""
+    response = FastJSONResponse(page.items)
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return response
+
 @router.get("/saved-pois")
-async def get_saved_pois(user_id: str = Depends(verify_firebase_token), city: str = None) -> List[Dict]:
-    return await user_history_service.get_saved_pois(user_id, city)
+async def get_saved_pois(
+    user_id: str = Depends(verify_firebase_token),
+    city: str = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+) -> List[Dict]:
+    """
+    Saved POIs of the user, optionally for one city. With `limit` (or a `cursor`)
+    they are returned newest first, a page at a time: pass the X-Next-Cursor header
+    of a response as `cursor` for the next page. `fields` (comma-separated) limits
+    each entry to those fields.
+    """
+    page = await user_history_service.get_saved_pois_page(
+        user_id, city, limit, cursor, select_fields(fields, SAVED_POI_FIELDS)
+    )
+    return page_response(page)
+
+@router.get("/summary")
+async def get_history_summary(
+    user_id: str = Depends(verify_firebase_token)
+) -> HistorySummary:
+    """Saved POIs and trips per city, and the latest of each, from a single document."""
+    return FastJSONResponse(await user_history_service.get_summary(user_id))
+
+@router.get("/saved-pois/details")
+async def stream_saved_poi_details(
+    user_id: str = Depends(verify_firebase_token),
+    city: str = None
+) -> StreamingResponse:
+    """
+    Saved POIs of the user (optionally for one city) with their full details, in one
+    round-trip: newline-delimited JSON, one point per line, streamed as they are read.
+    If reading fails part way, the last line is {"error": "..."}: the list is incomplete.
+    """
+    points = await user_history_service.stream_detailed_saved_pois(user_id, city)
+    return StreamingResponse(ndjson_lines(points), media_type="application/x-ndjson")
 
 @router.post("/saved-pois")
 async def save_poi(
@@ -47,7 +95,16 @@ async def save_trip_to_history(
 
 @router.get("/saved-trips")
 async def get_user_trips(
-    user_id: str = Depends(verify_firebase_token)
-) -> List[UserTrip]:
-    """Get all saved trips for a user"""
-    return await user_history_service.get_user_saved_trips(user_id)
\ No newline at end of file
+    user_id: str = Depends(verify_firebase_token),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+) -> List[Dict]:
+    """
+    Get all saved trips for a user. With `limit` (or a `cursor`) they are returned
+    latest start date first, a page at a time, like /saved-pois.
+    """
+    page = await user_history_service.get_user_saved_trips_page(
+        user_id, limit, cursor, select_fields(fields, SAVED_TRIP_FIELDS)
+    )
+    return page_response(page)
\ No newline at end of file
@@ -1,16 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from services.wikidata_service import WikidataService
 from models.wikidata import WikidataImageResponse
+from .responses import WIKIDATA_IMAGE_CACHE_CONTROL, FastJSONResponse, cached_response
 
 router = APIRouter(prefix="/api/wikidata", tags=["wikidata"])
 wikidata_service = WikidataService()
 
 @router.get("/image/{wikidata_id}", response_model=WikidataImageResponse)
-async def get_wikidata_image(wikidata_id: str):
+async def get_wikidata_image(request: Request, wikidata_id: str):
     """
     Fetch the image URL associated with a Wikidata ID.
     """
     image_url = await wikidata_service.fetch_wikidata_image(wikidata_id)
     if not image_url:
         raise HTTPException(status_code=404, detail="No image found for this Wikidata ID")
-    return WikidataImageResponse(wikidata_id=wikidata_id, image_url=image_url)
\ No newline at end of file
+    return cached_response(
+        request,
+        FastJSONResponse(WikidataImageResponse(wikidata_id=wikidata_id, image_url=image_url)),
+        WIKIDATA_IMAGE_CACHE_CONTROL
+    )
\ No newline at end of file
@@ -0,0 +1,43 @@
+"""
+Build or refresh city packs.
+
+Run from the backend directory:
+    python -m scripts.build_city_packs --city "Manchester,United Kingdom,53.4808,-2.2426"
+    python -m scripts.build_city_packs --top 10 --force
+"""
+import argparse
+import asyncio
+import logging
+from dotenv import load_dotenv
+from services.citypack_service import CityPackService, parse_city_list
+from services.geoapify_service import GeoapifyService
+from services.googleplaces_service import GooglePlacesService
+from services.wikidata_service import WikidataService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build precomputed candidate packs for popular cities")
+    parser.add_argument("--city", action="append", default=[], help='"City,Country,lat,lng" (repeatable)')
+    parser.add_argument("--top", type=int, default=0, help="Also build the N most planned cities from Trip documents")
+    parser.add_argument("--force", action="store_true", help="Rebuild every pool, not only stale ones")
+    parser.add_argument("--pack-dir", default=None, help="Output directory (default: CITY_PACK_DIR or data/citypacks)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    cities = parse_city_list(";".join(args.city))
+    if args.top:
+        from services.trip_service import TripService
+        cities.extend(TripService().top_cities(args.top))
+    if not cities:
+        parser.error("No cities given; use --city and/or --top")
+
+    service = CityPackService(GooglePlacesService(), WikidataService(), GeoapifyService, pack_dir=args.pack_dir)
+    paths = asyncio.run(service.refresh(cities, force=args.force))
+    for path in paths:
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import logging
+from typing import Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import linear_kernel
+from services.geometry import haversine_matrix
+
+logger = logging.getLogger(__name__)
+
+# Feature weights, in FEATURES order; scores are a single dot product per candidate
+FEATURES = ("rating", "reviews", "proximity", "type_match", "text_match", "affordability")
+RANKING_WEIGHTS = np.array([0.30, 0.20, 0.15, 0.15, 0.15, 0.05], dtype=np.float32)
+
+# Rating assumed for unrated places, and the review count at which a rating is fully trusted
+PRIOR_RATING = 3.5
+TRUSTED_REVIEW_COUNT = 50
+# Distance (km) at which the proximity feature has halved
+PROXIMITY_HALF_KM = 1.5
+
+PRICE_LEVELS = {
+    "PRICE_LEVEL_FREE": 0,
+    "PRICE_LEVEL_INEXPENSIVE": 1,
+    "PRICE_LEVEL_MODERATE": 2,
+    "PRICE_LEVEL_EXPENSIVE": 3,
+    "PRICE_LEVEL_VERY_EXPENSIVE": 4
+}
+
+
+class CandidateRanker:
+    """
+    Scores Places API candidates against a trip's preferences.
+
+    A feature matrix is built for the whole candidate batch (rating shrunk towards a
+    prior by review count, log review count, proximity to the city centre, preferred
+    type match, TF-IDF similarity of custom preferences to the place text, and price)
+    and scored with one matrix-vector product.
+    """
+
+    def __init__(self, weights: Optional[Sequence[float]] = None):
+        self.weights = np.asarray(weights if weights is not None else RANKING_WEIGHTS, dtype=np.float32)
+
+    @staticmethod
+    def _place_text(place) -> str:
+        types = " ".join((place.types or []))
+        return " ".join(filter(None, [place.name, place.description, types.replace("_", " ")]))
+
+    def text_match(self, places: Sequence, custom_preferences: Iterable[str]) -> np.ndarray:
+        """Max TF-IDF cosine similarity of each place's text to any custom preference."""
+        queries = [query.strip() for query in custom_preferences or [] if query and query.strip()]
+        if not queries or not places:
+            return np.zeros(len(places), dtype=np.float32)
+        documents = [self._place_text(place) for place in places]
+        try:
+            matrix = TfidfVectorizer(stop_words="english", sublinear_tf=True).fit_transform(documents + queries)
+        except ValueError:
+            # Only stop words / empty vocabulary
+            return np.zeros(len(places), dtype=np.float32)
+        similarity = linear_kernel(matrix[:len(documents)], matrix[len(documents):])
+        return similarity.max(axis=1).astype(np.float32)
+
+    def features(
+        self,
+        places: Sequence,
+        center: Tuple[float, float],
+        preferred_types: Optional[Iterable[str]] = None,
+        custom_preferences: Optional[Iterable[str]] = None
+    ) -> np.ndarray:
+        """(N, len(FEATURES)) float32 matrix with every feature scaled to [0, 1]."""
+        count = len(places)
+        ratings = np.array(
+            [place.rating if place.rating is not None else np.nan for place in places], dtype=np.float32
+        )
+        reviews = np.array([place.user_ratings_total or 0 for place in places], dtype=np.float32)
+        # Shrink ratings with few reviews towards the prior
+        trust = np.minimum(reviews / TRUSTED_REVIEW_COUNT, 1.0)
+        ratings = np.where(np.isnan(ratings), PRIOR_RATING, ratings)
+        rating_feature = (trust * ratings + (1 - trust) * PRIOR_RATING) / 5.0
+
+        log_reviews = np.log1p(reviews)
+        review_feature = log_reviews / log_reviews.max() if count and log_reviews.max() > 0 else np.zeros(count, dtype=np.float32)
+
+        points = [(place.location.latitude, place.location.longitude) for place in places]
+        distances = haversine_matrix(points, [center])[:, 0] if count else np.zeros(0, dtype=np.float32)
+        proximity_feature = np.exp2(-distances / PROXIMITY_HALF_KM)
+
+        wanted = set(preferred_types or [])
+        type_feature = np.array(
+            [1.0 if wanted and (place.primary_type in wanted or wanted.intersection(place.types or [])) else 0.0
+             for place in places],
+            dtype=np.float32
+        )
+
+        price_levels = np.array(
+            [PRICE_LEVELS.get(place.price_level, 2) for place in places], dtype=np.float32
+        )
+        affordability_feature = 1.0 - price_levels / 4.0
+
+        return np.column_stack((
+            rating_feature,
+            review_feature,
+            proximity_feature,
+            type_feature,
+            self.text_match(places, custom_preferences),
+            affordability_feature
+        )).astype(np.float32)
+
+    def scores(self, places: Sequence, center: Tuple[float, float], **kwargs) -> np.ndarray:
+        if not places:
+            return np.zeros(0, dtype=np.float32)
+        return self.features(places, center, **kwargs) @ self.weights
+
+    def top_k(self, places: Sequence, k: int, center: Tuple[float, float], **kwargs) -> List:
+        """The k best places, best first; ties keep upstream order."""
+        if k <= 0 or not places:
+            return []
+        order = np.argsort(-self.scores(places, center, **kwargs), kind="stable")
+        return [places[index] for index in order[:k]]
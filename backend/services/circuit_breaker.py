@@ -0,0 +1,243 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple, Type
+import httpx
+import requests
+from cachetools import LRUCache
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Every breaker created, by provider name, so their state can be reported together
+CIRCUIT_BREAKERS: Dict[str, "CircuitBreaker"] = {}
+
+# Providers that answered the current request from stale data. The middleware in
+# main.py installs a fresh set per request; worker threads share it by reference.
+stale_providers: contextvars.ContextVar[Optional[Set[str]]] = contextvars.ContextVar("stale_providers", default=None)
+
+
+# Errors that say the provider is unreachable or too slow, whatever the client library
+TRANSIENT_ERRORS: Tuple[Type[BaseException], ...] = (
+    TimeoutError,
+    ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ConnectionError,
+    httpx.TimeoutException,
+    httpx.NetworkError
+)
+
+
+def is_provider_failure(error: BaseException) -> bool:
+    """
+    Whether an error counts against the provider: 5xx responses, timeouts and
+    connection errors. 4xx responses are about our request (bad place id, missing
+    key, upstream quota) and other exceptions are bugs on our side.
+    """
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None) if response is not None else getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status >= 500
+    return isinstance(error, TRANSIENT_ERRORS)
+
+
+def mark_stale(provider: str) -> None:
+    served = stale_providers.get()
+    if served is not None:
+        served.add(provider)
+
+
+class CircuitOpenError(HTTPException):
+    """Raised instead of calling a provider whose circuit is open and that has nothing cached."""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(
+            status_code=503,
+            detail=f"{provider} is unavailable, retry in {retry_after:.0f}s",
+            headers={"Retry-After": str(max(1, round(retry_after)))}
+        )
+        self.provider = provider
+
+
+class CircuitBreaker:
+    """
+    Tracks the outcome and latency of the last `window` calls to one provider.
+
+    The circuit opens when at least `min_calls` were recorded and the share of
+    failed calls, or of calls slower than `slow_call_seconds`, reaches
+    `failure_rate`. While open, calls are refused without waiting. After
+    `open_seconds` one probe call at a time is let through (half-open): a success
+    closes the circuit, a failure opens it again.
+
+    Only errors accepted by `is_failure` (by default 5xx responses, timeouts and
+    connection errors) count as failures. Other errors, including 4xx responses and
+    anything listed in `ignored` (by default HTTPExceptions raised by our own code,
+    such as rate limiting), pass through without a verdict. The last good response
+    per key is kept so callers can be answered stale while the circuit is open;
+    errors while it is closed are raised as before.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        window: Optional[int] = None,
+        min_calls: Optional[int] = None,
+        failure_rate: Optional[float] = None,
+        slow_call_seconds: Optional[float] = None,
+        open_seconds: Optional[float] = None,
+        stale_entries: Optional[int] = None,
+        ignored: Tuple[Type[BaseException], ...] = (HTTPException,),
+        is_failure: Callable[[BaseException], bool] = is_provider_failure,
+        timer: Callable[[], float] = time.monotonic
+    ):
+        self.provider = provider
+        self.min_calls = min_calls or int(os.environ.get("CIRCUIT_MIN_CALLS", 5))
+        self.failure_rate = failure_rate or float(os.environ.get("CIRCUIT_FAILURE_RATE", 0.5))
+        self.slow_call_seconds = slow_call_seconds or float(os.environ.get("CIRCUIT_SLOW_CALL_SECONDS", 10))
+        self.open_seconds = open_seconds or float(os.environ.get("CIRCUIT_OPEN_SECONDS", 30))
+        self.ignored = ignored
+        self.is_failure = is_failure
+        self._timer = timer
+        self._lock = threading.Lock()
+        # (failed, slow) per recorded call
+        self._outcomes = deque(maxlen=window or int(os.environ.get("CIRCUIT_WINDOW", 20)))
+        self._stale = LRUCache(maxsize=stale_entries or int(os.environ.get("STALE_CACHE_MAX_ENTRIES", 2000)))
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._counters = {"calls": 0, "failures": 0, "rejected": 0, "stale_served": 0, "opened": 0}
+        CIRCUIT_BREAKERS[provider] = self
+
+    def _open(self) -> None:
+        if self.state != OPEN:
+            logger.warning(f"Circuit for {self.provider} opened")
+            self._counters["opened"] += 1
+        self.state = OPEN
+        self._opened_at = self._timer()
+        self._probing = False
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now; claims the probe slot when half-open."""
+        with self._lock:
+            if self.state == OPEN and self._timer() - self._opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self._counters["rejected"] += 1
+            return False
+
+    def record(self, failed: bool, latency: float) -> None:
+        with self._lock:
+            self._counters["calls"] += 1
+            self._counters["failures"] += int(failed)
+            slow = latency >= self.slow_call_seconds
+            if self.state == HALF_OPEN:
+                if failed or slow:
+                    self._open()
+                else:
+                    logger.info(f"Circuit for {self.provider} closed")
+                    self.state = CLOSED
+                    self._probing = False
+                    self._outcomes.clear()
+                return
+            self._outcomes.append((failed, slow))
+            if self.state == CLOSED and len(self._outcomes) >= self.min_calls:
+                failures = sum(1 for failed_call, _ in self._outcomes if failed_call)
+                slow_calls = sum(1 for _, slow_call in self._outcomes if slow_call)
+                if max(failures, slow_calls) >= self.failure_rate * len(self._outcomes):
+                    self._open()
+
+    def record_error(self, error: BaseException, latency: float) -> bool:
+        """Record a call that raised; returns whether the error counted as a failure."""
+        if isinstance(error, self.ignored) or not self.is_failure(error):
+            self.release_probe()
+            return False
+        self.record(True, latency)
+        return True
+
+    def release_probe(self) -> None:
+        """Give back the half-open probe slot without a verdict, e.g. when the call was cancelled."""
+        with self._lock:
+            self._probing = False
+
+    def retry_after(self) -> float:
+        with self._lock:
+            return max(0.0, self.open_seconds - (self._timer() - self._opened_at))
+
+    def _fallback(self, key: str, error: Optional[BaseException]) -> Tuple[Any, bool]:
+        with self._lock:
+            cached = self._stale.get(key)
+            if cached is not None:
+                self._counters["stale_served"] += 1
+        if cached is not None:
+            return cached, True
+        if error is not None:
+            raise error
+        raise CircuitOpenError(self.provider, self.retry_after())
+
+    def call(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run fn through the breaker; returns (response, served_stale)."""
+        if not self.allow():
+            return self._fallback(key, None)
+        started = self._timer()
+        try:
+            result = fn()
+        except Exception as e:
+            if not self.record_error(e, self._timer() - started) or self.state == CLOSED:
+                raise
+            return self._fallback(key, e)
+        except BaseException:
+            # Cancelled: no verdict on the provider
+            self.release_probe()
+            raise
+        self.record(False, self._timer() - started)
+        if result is not None:
+            with self._lock:
+                self._stale[key] = result
+        return result, False
+
+    async def call_async(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Coroutine version of call()."""
+        if not self.allow():
+            return self._fallback(key, None)
+        started = self._timer()
+        try:
+            result = await fn()
+        except Exception as e:
+            if not self.record_error(e, self._timer() - started) or self.state == CLOSED:
+                raise
+            return self._fallback(key, e)
+        except BaseException:
+            # Cancelled: no verdict on the provider
+            self.release_probe()
+            raise
+        self.record(False, self._timer() - started)
+        if result is not None:
+            with self._lock:
+                self._stale[key] = result
+        return result, False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._counters,
+                "state": self.state,
+                "window_failures": sum(1 for failed, _ in self._outcomes if failed),
+                "window_slow": sum(1 for _, slow in self._outcomes if slow),
+                "window_size": len(self._outcomes),
+                "stale_entries": len(self._stale)
+            }
+
+
+def circuit_breaker_stats() -> Dict[str, Dict[str, Any]]:
+    return {provider: breaker.stats() for provider, breaker in CIRCUIT_BREAKERS.items()}
@@ -0,0 +1,268 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+import msgpack
+from config.place_categories import place_categories
+from models.googleplaces import PlaceRecord
+from services.poi_corpus import PoiCorpus, poi_corpus
+from services.rate_limiter import BACKGROUND, priority
+
+logger = logging.getLogger(__name__)
+
+CITY_PACK_VERSION = 1
+DEFAULT_PACK_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "citypacks")
+# Same radius the trip generator searches with
+PACK_SEARCH_RADIUS = 3000
+BASE_PLACE_TYPES = ("tourist_attraction", "restaurant", "cafe")
+# Moved into the corpus and the URL maps on load rather than kept with the pack
+INDEXED_PACK_FIELDS = ("places", "photos", "wikidata_images")
+
+CityConfig = Tuple[str, str, float, float]
+
+
+def city_slug(city: str, country: str) -> str:
+    """File-system safe key for a city, e.g. ('São Paulo', 'Brazil') -> 'sao-paulo--brazil'."""
+    def slug(value: str) -> str:
+        folded = unicodedata.normalize("NFKD", value or "")
+        folded = "".join(char for char in folded if not unicodedata.combining(char)).lower()
+        return re.sub(r"[^a-z0-9]+", "-", folded).strip("-")
+    return f"{slug(city)}--{slug(country)}"
+
+
+def parse_city_list(value: Optional[str]) -> List[CityConfig]:
+    """Parse "Manchester,United Kingdom,53.4808,-2.2426;Paris,France,48.8566,2.3522"."""
+    cities = []
+    for entry in (value or "").split(";"):
+        parts = [part.strip() for part in entry.split(",")]
+        if len(parts) != 4 or not all(parts):
+            continue
+        cities.append((parts[0], parts[1], float(parts[2]), float(parts[3])))
+    return cities
+
+
+def pack_search_types() -> Dict[str, List[str]]:
+    """Pool name -> Google place types, one pool per base type and per preference mapping key."""
+    pools = {f"type:{place_type}": [place_type] for place_type in BASE_PLACE_TYPES}
+    pools.update({f"attraction:{key}": list(types) for key, types in place_categories.attraction_preferences.items()})
+    pools.update({f"food:{key}": list(types) for key, types in place_categories.food_preferences.items()})
+    return pools
+
+
+class CityPackStore:
+    """
+    City packs loaded in memory. Loading a pack reads the msgpack file, feeds its
+    places to the POI corpus and indexes photo and Wikidata image URLs; only the
+    pack's metadata and pools are kept, so places live once, in the corpus.
+    """
+
+    def __init__(self, corpus: PoiCorpus = poi_corpus):
+        self.corpus = corpus
+        self._lock = threading.Lock()
+        self.packs: Dict[str, Dict] = {}
+        self.photo_urls: Dict[str, str] = {}
+        self.wikidata_images: Dict[str, str] = {}
+
+    @staticmethod
+    def read(path: str) -> Dict:
+        # Read plainly: the pack is decoded into Python objects at once, so a memory map would not be kept
+        with open(path, "rb") as file:
+            return msgpack.unpackb(file.read(), raw=False)
+
+    def load(self, path: str) -> Optional[Dict]:
+        try:
+            pack = self.read(path)
+        except (OSError, ValueError, msgpack.UnpackException) as e:
+            logger.warning(f"Skipping unreadable city pack {path}: {str(e)}")
+            return None
+        if pack.get("version") != CITY_PACK_VERSION:
+            logger.warning(f"Skipping city pack {path} with version {pack.get('version')}")
+            return None
+
+        places = []
+        for place_data in pack.get("places", {}).values():
+            try:
+                places.append(PlaceRecord.from_dict(place_data))
+            except (KeyError, TypeError, ValueError):
+                continue
+        self.corpus.ingest(places)
+        with self._lock:
+            self.packs[city_slug(pack["city"], pack["country"])] = {
+                key: value for key, value in pack.items() if key not in INDEXED_PACK_FIELDS
+            }
+            self.photo_urls.update(pack.get("photos", {}))
+            self.wikidata_images.update(pack.get("wikidata_images", {}))
+        return pack
+
+    def load_dir(self, pack_dir: str = DEFAULT_PACK_DIR) -> int:
+        if not os.path.isdir(pack_dir):
+            return 0
+        loaded = sum(
+            1 for name in sorted(os.listdir(pack_dir))
+            if name.endswith(".msgpack") and self.load(os.path.join(pack_dir, name)) is not None
+        )
+        logger.info(f"Loaded {loaded} city packs from {pack_dir}")
+        return loaded
+
+    def get(self, city: str, country: str) -> Optional[Dict]:
+        """The loaded pack's metadata and pools; its places are in the corpus."""
+        return self.packs.get(city_slug(city, country))
+
+    def photo_url(self, photo_name: str) -> Optional[str]:
+        return self.photo_urls.get(photo_name)
+
+    def wikidata_image(self, wikidata_id: str) -> Optional[str]:
+        return self.wikidata_images.get(wikidata_id)
+
+
+# Shared so the Places and Wikidata services can answer from loaded packs
+city_pack_store = CityPackStore()
+
+
+class CityPackService:
+    """Builds and incrementally refreshes precomputed candidate pools for popular cities."""
+
+    def __init__(
+        self,
+        places_service,
+        wikidata_service=None,
+        geoapify_service=None,
+        pack_dir: Optional[str] = None,
+        max_age_seconds: Optional[float] = None,
+        max_photos_per_pool: int = 10,
+        store: CityPackStore = city_pack_store,
+        timer=time.time
+    ):
+        self.places_service = places_service
+        self.wikidata_service = wikidata_service
+        self.geoapify_service = geoapify_service
+        self.pack_dir = pack_dir or os.environ.get("CITY_PACK_DIR", DEFAULT_PACK_DIR)
+        self.max_age_seconds = max_age_seconds or float(os.environ.get("CITY_PACK_MAX_AGE_SECONDS", 7 * 24 * 3600))
+        self.max_photos_per_pool = max_photos_per_pool
+        self.store = store
+        self._timer = timer
+
+    def pack_path(self, city: str, country: str) -> str:
+        return os.path.join(self.pack_dir, f"{city_slug(city, country)}.msgpack")
+
+    def read_pack(self, city: str, country: str) -> Optional[Dict]:
+        path = self.pack_path(city, country)
+        if not os.path.exists(path):
+            return None
+        try:
+            pack = CityPackStore.read(path)
+        except (OSError, ValueError, msgpack.UnpackException):
+            return None
+        return pack if pack.get("version") == CITY_PACK_VERSION else None
+
+    def write_pack(self, pack: Dict) -> str:
+        os.makedirs(self.pack_dir, exist_ok=True)
+        path = self.pack_path(pack["city"], pack["country"])
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(msgpack.packb(pack, use_bin_type=True))
+        os.replace(temporary, path)
+        return path
+
+    async def build_pack(self, city: str, country: str, lat: float, lng: float, force: bool = False) -> Dict:
+        """
+        Build or refresh the pack for one city. Only pools older than max_age_seconds
+        (or all of them with force) are searched again; photo and Wikidata image URLs
+        already resolved are reused.
+        """
+        now = self._timer()
+        previous = None if force else self.read_pack(city, country)
+        pack = previous or {
+            "version": CITY_PACK_VERSION,
+            "city": city,
+            "country": country,
+            "coordinates": [lat, lng],
+            "pools": {},
+            "places": {},
+            "photos": {},
+            "wikidata_images": {}
+        }
+
+        refreshed = 0
+        # Several pools can share a place type; search each type once per build
+        searched: Dict[str, List[PlaceRecord]] = {}
+        for pool_name, place_types in pack_search_types().items():
+            pool = pack["pools"].get(pool_name)
+            if pool and now - pool["built_at"] < self.max_age_seconds:
+                continue
+            place_ids = []
+            for place_type in place_types:
+                if place_type not in searched:
+                    try:
+                        searched[place_type] = await asyncio.to_thread(
+                            self.places_service.nearby_search,
+                            latitude=lat,
+                            longitude=lng,
+                            radius=PACK_SEARCH_RADIUS,
+                            type=place_type,
+                            max_results=20
+                        )
+                    except Exception as e:
+                        logger.warning(f"City pack search for {place_type} in {city} failed: {str(e)}")
+                        continue
+                places = searched[place_type]
+                for place in places:
+                    pack["places"][place.place_id] = place.to_dict()
+                    place_ids.append(place.place_id)
+                await self._resolve_photos(pack, places[:self.max_photos_per_pool])
+            pack["pools"][pool_name] = {"place_ids": place_ids, "built_at": now}
+            refreshed += 1
+
+        await self._resolve_wikidata_images(pack, city, lat, lng)
+        pack["built_at"] = now
+        logger.info(f"City pack for {city}, {country}: {refreshed} pools refreshed, {len(pack['places'])} places")
+        return pack
+
+    async def _resolve_photos(self, pack: Dict, places: List[PlaceRecord]) -> None:
+        for place in places:
+            if not place.photo_name or place.photo_name in pack["photos"]:
+                continue
+            photo_url = await asyncio.to_thread(self.places_service.get_place_photo, place.photo_name)
+            if photo_url:
+                pack["photos"][place.photo_name] = photo_url
+
+    async def _resolve_wikidata_images(self, pack: Dict, city: str, lat: float, lng: float) -> None:
+        """Wikidata images for the city's attractions, discovered through Geoapify."""
+        if not self.geoapify_service or not self.wikidata_service:
+            return
+        try:
+            points = await self.geoapify_service.get_points(
+                city, lat, lng, category="tourism", type="attraction", radius=PACK_SEARCH_RADIUS
+            )
+        except Exception as e:
+            logger.warning(f"City pack Geoapify lookup for {city} failed: {str(e)}")
+            return
+        for point in points:
+            wikidata_id = point.wikidata_id
+            if not wikidata_id or wikidata_id in pack["wikidata_images"]:
+                continue
+            try:
+                image_url = await self.wikidata_service.fetch_wikidata_image(wikidata_id)
+            except Exception:
+                continue
+            if image_url:
+                pack["wikidata_images"][wikidata_id] = image_url
+
+    async def refresh(self, cities: List[CityConfig], force: bool = False) -> List[str]:
+        """Build, write and load the packs for the given cities; returns the written paths."""
+        paths = []
+        # Warm-up work: yields to user-facing calls and is shed first when quota runs low
+        with priority(BACKGROUND):
+            for city, country, lat, lng in cities:
+                try:
+                    pack = await self.build_pack(city, country, lat, lng, force=force)
+                    path = self.write_pack(pack)
+                    self.store.load(path)
+                    paths.append(path)
+                except Exception as e:
+                    logger.error(f"Error refreshing city pack for {city}, {country}: {str(e)}")
+        return paths
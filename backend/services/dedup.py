@@ -0,0 +1,165 @@
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from scipy.spatial import cKDTree
+from services.geometry import EARTH_RADIUS_KM
+
+# Places closer than this are the same place whatever their names
+DUPLICATE_RADIUS_KM = 0.03
+# Places within this radius with similar names ("Café X" / "Cafe X - Old Town") are the same place
+FUZZY_NAME_RADIUS_KM = 0.3
+FUZZY_NAME_THRESHOLD = 0.85
+
+# Branch or area suffixes: "Cafe X - Old Town", "Cafe X | Old Town", "Cafe X (Old Town)"
+NAME_SUFFIX = re.compile(r"\s+[-–—|:]\s+.*$|\s*\(.*\)\s*$")
+NAME_PUNCTUATION = re.compile(r"[^\w\s]")
+LEADING_ARTICLE = re.compile(r"^the\s+")
+
+Candidate = Tuple[str, float, float]
+
+
+def normalize_name(name: Optional[str]) -> str:
+    """
+    Name key used for dedup: accents folded, branch suffixes and punctuation
+    removed, lowercased, whitespace collapsed and a leading "the" dropped.
+    """
+    if not name:
+        return ""
+    folded = unicodedata.normalize("NFKD", name)
+    folded = "".join(char for char in folded if not unicodedata.combining(char))
+    folded = NAME_SUFFIX.sub("", folded.strip()) or folded
+    folded = NAME_PUNCTUATION.sub(" ", folded.casefold())
+    folded = " ".join(folded.split())
+    return LEADING_ARTICLE.sub("", folded)
+
+
+def names_similar(first: str, second: str, threshold: float = FUZZY_NAME_THRESHOLD) -> bool:
+    """Fuzzy comparison of two normalized name keys."""
+    if not first or not second:
+        return False
+    if first == second:
+        return True
+    shorter, longer = sorted((first, second), key=len)
+    if longer.startswith(shorter + " "):
+        return True
+    return SequenceMatcher(None, first, second).ratio() >= threshold
+
+
+def to_unit_vectors(latitudes: Sequence[float], longitudes: Sequence[float]) -> np.ndarray:
+    """Points on the unit sphere, so euclidean KD-tree queries follow great-circle distance."""
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lng = np.radians(np.asarray(longitudes, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)))
+
+
+def chord_length(radius_km: float) -> float:
+    """Euclidean distance on the unit sphere matching a great-circle distance."""
+    return 2 * np.sin(radius_km / (2 * EARTH_RADIUS_KM))
+
+
+class DedupIndex:
+    """
+    Tracks accepted places and rejects new candidates that duplicate them.
+
+    A candidate is a duplicate if it has the same name key as any accepted place,
+    lies within radius_km of one, or lies within fuzzy_radius_km of one with a
+    similar name. Candidates are checked in batches: the KD-tree is built once per
+    batch and all radius queries run in one vectorized call.
+    """
+
+    def __init__(
+        self,
+        radius_km: float = DUPLICATE_RADIUS_KM,
+        fuzzy_radius_km: float = FUZZY_NAME_RADIUS_KM,
+        fuzzy_threshold: float = FUZZY_NAME_THRESHOLD
+    ):
+        self.radius = chord_length(radius_km)
+        self.fuzzy_radius = chord_length(max(fuzzy_radius_km, radius_km))
+        self.fuzzy_threshold = fuzzy_threshold
+        self._names: List[str] = []
+        self._name_keys = set()
+        self._points = np.empty((0, 3))
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def add(self, name: str, lat: Optional[float] = None, lng: Optional[float] = None) -> None:
+        """Record an accepted place without checking it."""
+        self.add_many([(name, lat, lng)])
+
+    def add_many(self, candidates: Sequence[Candidate]) -> None:
+        for name, lat, lng in candidates:
+            key = normalize_name(name)
+            if key:
+                self._name_keys.add(key)
+            if lat is not None and lng is not None:
+                self._names.append(key)
+                self._points = np.vstack((self._points, to_unit_vectors([lat], [lng])))
+
+    def is_duplicate(self, name: str, lat: Optional[float] = None, lng: Optional[float] = None) -> bool:
+        return not self.filter_batch([(name, lat, lng)], record=False)
+
+    def filter_batch(self, candidates: Sequence[Candidate], limit: Optional[int] = None, record: bool = True) -> List[int]:
+        """
+        Indices of the candidates to keep, in order. Candidates are also checked
+        against earlier candidates of the same batch. Kept candidates are recorded
+        unless record is False; at most `limit` are kept.
+        """
+        if not candidates:
+            return []
+        keys = [normalize_name(name) for name, _, _ in candidates]
+        located = [index for index, (_, lat, lng) in enumerate(candidates) if lat is not None and lng is not None]
+        batch_points = to_unit_vectors(
+            [candidates[index][1] for index in located],
+            [candidates[index][2] for index in located]
+        ) if located else np.empty((0, 3))
+        batch_row = {index: row for row, index in enumerate(located)}
+
+        # One tree over accepted places and the whole batch; batch rows follow the accepted ones
+        offset = len(self._names)
+        all_points = np.vstack((self._points, batch_points))
+        neighbours = []
+        if len(batch_points):
+            tree = cKDTree(all_points)
+            neighbours = tree.query_ball_point(batch_points, r=self.fuzzy_radius)
+            distances = [
+                np.linalg.norm(all_points[near] - point, axis=1) if near else np.empty(0)
+                for near, point in zip(neighbours, batch_points)
+            ]
+        all_names = self._names + [keys[index] for index in located]
+
+        kept: List[int] = []
+        kept_rows = set(range(offset))
+        kept_keys = set(self._name_keys)
+        for index, key in enumerate(keys):
+            if limit is not None and len(kept) >= limit:
+                break
+            if key and key in kept_keys:
+                continue
+            row = batch_row.get(index)
+            if row is not None and self._near_duplicate(
+                neighbours[row], distances[row], kept_rows, all_names, key
+            ):
+                continue
+            kept.append(index)
+            if key:
+                kept_keys.add(key)
+            if row is not None:
+                kept_rows.add(offset + row)
+
+        if record:
+            self.add_many([candidates[index] for index in kept])
+        return kept
+
+    def _near_duplicate(self, near: list, distances: np.ndarray, kept_rows: set, all_names: list, key: str) -> bool:
+        for neighbour, distance in zip(near, distances):
+            if neighbour not in kept_rows:
+                continue
+            if distance <= self.radius:
+                return True
+            if names_similar(key, all_names[neighbour], self.fuzzy_threshold):
+                return True
+        return False
@@ -2,6 +2,10 @@ from fastapi import HTTPException
 import httpx
 from typing import List,Optional
 from models.pointofinterest import PointOfInterestResponse, Coordinates
+from services.dedup import DedupIndex
+from services.circuit_breaker import CircuitBreaker, mark_stale
+from services.single_flight import SingleFlight, canonical_key
+from services.metrics import observe_upstream
 import os
 from dotenv import load_dotenv
 import traceback
@@ -9,6 +13,10 @@ import traceback
 # Load environment variables from .env file
 load_dotenv()
 
+# Identical place lookups in flight at the same time share one upstream request
+geoapify_flight = SingleFlight("geoapify", timeout=float(os.getenv("SINGLE_FLIGHT_TIMEOUT_SECONDS", 30)))
+geoapify_breaker = CircuitBreaker("geoapify")
+
 class GeoapifyService:
     BASE_URL = "https://api.geoapify.com/v2/places"
     API_KEY = os.getenv("GEOAPIFY_API_KEY")
@@ -37,6 +45,13 @@ class GeoapifyService:
         
         return opening_hours if isinstance(opening_hours, str) else None
 
+    @staticmethod
+    def dedup_candidate(feature: dict) -> tuple:
+        # (name, lat, lng) of a GeoJSON feature; coordinates are [lng, lat]
+        coordinates = feature.get('geometry', {}).get('coordinates') or []
+        lng, lat = coordinates[:2] if len(coordinates) >= 2 else (None, None)
+        return feature.get('properties', {}).get('name', ''), lat, lng
+
     @staticmethod
     async def get_points(city: str, lat: float, lng: float, category: str, type: str, radius: int = 5000, limit: int = 30) -> List[PointOfInterestResponse]:
         filter_string = f"circle:{lng},{lat},{radius}"
@@ -47,77 +62,91 @@ class GeoapifyService:
             "apiKey": GeoapifyService.API_KEY,
             "limit": limit
         }
-        try:
+
+        async def fetch() -> dict:
             async with httpx.AsyncClient() as client:
-                response = await client.get(GeoapifyService.BASE_URL, params=params)
-                try:
+                with observe_upstream("geoapify", "places"):
+                    response = await client.get(GeoapifyService.BASE_URL, params=params)
                     response.raise_for_status()
-                    data = response.json()
-                except httpx.HTTPStatusError as e:
-                    print(f"""
-                        Geoapify API Error:
-                        Status Code: {e.response.status_code}
-                        URL: {e.request.url}
-                        Response Text: {e.response.text}
-                        Headers: {e.response.headers}
-                    """)
-                    raise HTTPException(
-                        status_code=500, 
-                        detail=f"API Error: {e.response.status_code} - {e.response.text}"
-                    )
+                try:
+                    return response.json()
                 except ValueError as e:
                     print(f"JSON Parsing Error: {str(e)}\nResponse Content: {response.text}")
-                    raise HTTPException(
-                        status_code=500, 
-                        detail="Failed to parse API response"
-                    )
+                    raise
+
+        try:
+            try:
+                key = canonical_key(url=GeoapifyService.BASE_URL, categories=categories, filter=filter_string, limit=limit)
+                data, stale = await geoapify_flight.do_async(key, lambda: geoapify_breaker.call_async(key, fetch))
+                if stale:
+                    mark_stale(geoapify_breaker.provider)
+            except httpx.HTTPStatusError as e:
+                print(f"""
+                    Geoapify API Error:
+                    Status Code: {e.response.status_code}
+                    URL: {e.request.url}
+                    Response Text: {e.response.text}
+                    Headers: {e.response.headers}
+                """)
+                raise HTTPException(
+                    status_code=500, 
+                    detail=f"API Error: {e.response.status_code} - {e.response.text}"
+                )
+            except ValueError:
+                raise HTTPException(
+                    status_code=500, 
+                    detail="Failed to parse API response"
+                )
+
+            if not isinstance(data, dict) or 'features' not in data:
+                print(f"Unexpected response format: {data}")
+                raise ValueError("Invalid response format from API")
+
+            # Drop duplicates by name and proximity in one pass over the batch
+            features = data['features']
+            kept = DedupIndex().filter_batch(
+                [GeoapifyService.dedup_candidate(feature) for feature in features],
+                limit=limit
+            )
+            places = []
+
+            for feature in (features[index] for index in kept):
+                properties = feature.get('properties', {})
+                name = properties.get('name', '')
+                geometry = feature.get('geometry', {})
+                coordinates = geometry.get('coordinates', [])
+
+                # Parse properties
+                opening_hours = GeoapifyService.parse_opening_hours(properties)
+                cuisine = GeoapifyService.parse_cuisine(properties)
 
-                if not isinstance(data, dict) or 'features' not in data:
-                    print(f"Unexpected response format: {data}")
-                    raise ValueError("Invalid response format from API")
-
-                seen_names = set()
-                places = []
-
-                for feature in data['features']:
-                    properties = feature.get('properties', {})
-                    name = properties.get('name', '')
-                    
-                    if name.lower() in seen_names:
-                        continue
-                        
-                    seen_names.add(name.lower())
-                    geometry = feature.get('geometry', {})
-                    coordinates = geometry.get('coordinates', [])
-
-                    # Parse properties
-                    opening_hours = GeoapifyService.parse_opening_hours(properties)
-                    cuisine = GeoapifyService.parse_cuisine(properties)
-
-                    place = PointOfInterestResponse(
-                        id=properties.get('place_id', ''),
-                        place_id=properties.get('place_id', ''),
-                        name=name,
-                        phone=properties.get('contact', {}).get('phone', ''),
-                        website=properties.get('website', ''),
-                        wikidata_id=properties.get('wiki_and_media', {}).get('wikidata', ''),
-                        description=properties.get('description', ''),
-                        opening_hours=opening_hours,
-                        cuisine=cuisine,
-                        type = type,
-                        categories=properties.get('categories', []),
-                        address=properties.get('address_line2', ''), 
-                        city=properties.get('city', city),
-                        country=properties.get('country', ''),
-                        coordinates=Coordinates(
-                            lat=coordinates[1],
-                            lng=coordinates[0]
-                        )
+                place = PointOfInterestResponse(
+                    id=properties.get('place_id', ''),
+                    place_id=properties.get('place_id', ''),
+                    name=name,
+                    phone=properties.get('contact', {}).get('phone', ''),
+                    website=properties.get('website', ''),
+                    wikidata_id=properties.get('wiki_and_media', {}).get('wikidata', ''),
+                    description=properties.get('description', ''),
+                    opening_hours=opening_hours,
+                    cuisine=cuisine,
+                    type = type,
+                    categories=properties.get('categories', []),
+                    address=properties.get('address_line2', ''), 
+                    city=properties.get('city', city),
+                    country=properties.get('country', ''),
+                    coordinates=Coordinates(
+                        lat=coordinates[1],
+                        lng=coordinates[0]
                     )
-                    places.append(place)
+                )
+                places.append(place)
 
-                return places[:limit]
+            return places[:limit]
 
+        except HTTPException:
+            # Circuit open with nothing cached (503), or the API errors handled above
+            raise
         except httpx.RequestError as e:
             print(f"""
                 Request Failed:
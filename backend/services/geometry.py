@@ -0,0 +1,145 @@
+import hashlib
+import threading
+from typing import Dict, Optional, Sequence, Tuple, Union
+import numpy as np
+from cachetools import LRUCache
+from services.metrics import register_cache
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Minutes per kilometre for each travel profile; "walking" is the 15 min/km rule used in the prompts
+SPEED_PROFILES = {
+    "walking": 15.0,
+    "cycling": 4.0,
+    "transit": 3.0,
+    "driving": 2.0
+}
+DEFAULT_PROFILE = "walking"
+
+Coordinates = Union[Sequence[Tuple[float, float]], np.ndarray]
+
+
+def coordinate_of(poi) -> Optional[Tuple[float, float]]:
+    """(lat, lng) of a POI model, Place, POI dict or coordinates dict; None if unknown."""
+    if poi is None:
+        return None
+    if isinstance(poi, dict):
+        coordinates = poi.get("coordinates", poi)
+        if isinstance(coordinates, dict) and coordinates.get("lat") is not None and coordinates.get("lng") is not None:
+            return float(coordinates["lat"]), float(coordinates["lng"])
+        return None
+    if hasattr(poi, "location"):
+        return float(poi.location.latitude), float(poi.location.longitude)
+    if getattr(poi, "coordinates", None) is not None:
+        return float(poi.coordinates.lat), float(poi.coordinates.lng)
+    return None
+
+
+def to_radians(points: Coordinates) -> np.ndarray:
+    """(N, 2) float32 array of [lat, lng] in radians."""
+    array = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+    return np.radians(array, dtype=np.float32)
+
+
+def haversine_matrix(origins: Coordinates, destinations: Optional[Coordinates] = None) -> np.ndarray:
+    """
+    Pairwise great-circle distances in km as an (N, M) float32 matrix.
+    With no destinations the matrix is origins x origins.
+    """
+    a = to_radians(origins)
+    b = a if destinations is None else to_radians(destinations)
+    lat_a, lng_a = a[:, 0:1], a[:, 1:2]
+    lat_b, lng_b = b[:, 0], b[:, 1]
+    h = (
+        np.sin((lat_b - lat_a) / 2) ** 2
+        + np.cos(lat_a) * np.cos(lat_b) * np.sin((lng_b - lng_a) / 2) ** 2
+    )
+    return (2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0, 1)))).astype(np.float32)
+
+
+def haversine_pairs(origins: Coordinates, destinations: Coordinates) -> np.ndarray:
+    """Element-wise distances in km between origins[i] and destinations[i]."""
+    a = to_radians(origins)
+    b = to_radians(destinations)
+    h = (
+        np.sin((b[:, 0] - a[:, 0]) / 2) ** 2
+        + np.cos(a[:, 0]) * np.cos(b[:, 0]) * np.sin((b[:, 1] - a[:, 1]) / 2) ** 2
+    )
+    return (2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0, 1)))).astype(np.float32)
+
+
+def travel_minutes(distance_km: Union[float, np.ndarray], profile: str = DEFAULT_PROFILE) -> Union[float, np.ndarray]:
+    """Estimated travel time for a distance under a speed profile."""
+    if profile not in SPEED_PROFILES:
+        raise ValueError(f"Unknown travel profile '{profile}'")
+    return np.asarray(distance_km, dtype=np.float32) * np.float32(SPEED_PROFILES[profile])
+
+
+def k_nearest(distances: np.ndarray, k: int, exclude_self: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Indices and distances of the k nearest destinations for every origin row,
+    nearest first. exclude_self ignores the diagonal of a square matrix.
+    """
+    distances = np.array(distances, dtype=np.float32, copy=exclude_self)
+    if exclude_self:
+        np.fill_diagonal(distances, np.inf)
+    k = max(0, min(k, distances.shape[1] - (1 if exclude_self else 0)))
+    if k == 0:
+        return np.empty((distances.shape[0], 0), dtype=np.int64), np.empty((distances.shape[0], 0), dtype=np.float32)
+    partitioned = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    partitioned_distances = np.take_along_axis(distances, partitioned, axis=1)
+    order = np.argsort(partitioned_distances, axis=1, kind="stable")
+    return np.take_along_axis(partitioned, order, axis=1), np.take_along_axis(partitioned_distances, order, axis=1)
+
+
+def nearest_distance_km(point: Tuple[float, float], points: Coordinates) -> float:
+    """Distance in km from point to the closest of points (inf if there are none)."""
+    if len(points) == 0:
+        return float("inf")
+    return float(haversine_matrix([point], points).min())
+
+
+class DistanceMatrixCache:
+    """
+    LRU cache of distance matrices keyed on the exact candidate coordinates, so the
+    planner, validator and dedup can share one matrix per candidate set.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self._cache = LRUCache(maxsize=max_entries)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(origins: np.ndarray, destinations: Optional[np.ndarray]) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(origins.tobytes())
+        if destinations is not None:
+            digest.update(b"|")
+            digest.update(destinations.tobytes())
+        return digest.hexdigest()
+
+    def matrix(self, origins: Coordinates, destinations: Optional[Coordinates] = None) -> np.ndarray:
+        origins = np.asarray(origins, dtype=np.float32).reshape(-1, 2)
+        destinations = None if destinations is None else np.asarray(destinations, dtype=np.float32).reshape(-1, 2)
+        key = self._key(origins, destinations)
+        with self._lock:
+            if key in self._cache:
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+        distances = haversine_matrix(origins, destinations)
+        distances.setflags(write=False)
+        with self._lock:
+            self._cache[key] = distances
+        return distances
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._cache)}
+
+
+# Shared so matrices computed while planning are reused when validating
+distance_matrix_cache = DistanceMatrixCache()
+register_cache("distance_matrix", distance_matrix_cache.stats)
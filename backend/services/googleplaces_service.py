@@ -1,13 +1,89 @@
+import contextvars
 import os
+import orjson
 import re
 import requests
-from typing import List, Optional, Dict
-from models.googleplaces import Place
+from typing import Dict, List, Optional, Sequence
+from config.place_categories import place_categories
+from models.googleplaces import PlaceRecord
+from services.poi_corpus import poi_corpus
+from services.citypack_service import city_pack_store
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError, mark_stale
+from services.metrics import observe_upstream
+from services.rate_limiter import places_rate_limiter
+from services.single_flight import SingleFlight, canonical_key
+from services.tracing import current_span, traced
+
+# Identical searches in flight at the same time share one upstream request
+places_flight = SingleFlight("google_places", timeout=float(os.environ.get("SINGLE_FLIGHT_TIMEOUT_SECONDS", 30)))
+places_breaker = CircuitBreaker("google_places")
+
+# Places API fields requested per response profile; each profile extends the previous one.
+# minimal covers what trip planning reads (ranking signals and weekly hours included),
+# card adds what a place card shows, full adds contact details and the editorial summary.
+# The summary is left out of minimal to keep candidate searches off the top SKU tier: the
+# ranker matches custom interests against names and types there, and the final itinerary
+# places get their descriptions when the client upgrades them through batch_details.
+MINIMAL_FIELDS = (
+    "id", "displayName", "location", "primaryType", "types",
+    "rating", "userRatingCount", "priceLevel", "regularOpeningHours"
+)
+CARD_FIELDS = MINIMAL_FIELDS + ("formattedAddress", "photos", "businessStatus")
+FULL_FIELDS = CARD_FIELDS + ("websiteUri", "nationalPhoneNumber", "internationalPhoneNumber", "editorialSummary")
+FIELD_MASK_PROFILES = {
+    "minimal": MINIMAL_FIELDS,
+    "card": CARD_FIELDS,
+    "full": FULL_FIELDS
+}
+
+
+def field_mask(profile: str, prefix: str = "") -> str:
+    """X-Goog-FieldMask value for a profile; search responses nest fields under 'places.'."""
+    if profile not in FIELD_MASK_PROFILES:
+        raise ValueError(f"Unknown field mask profile: {profile}")
+    return ",".join(f"{prefix}{field}" for field in FIELD_MASK_PROFILES[profile])
 
 class GooglePlacesService:
     def __init__(self):
         self.api_key = os.environ.get("GOOGLE_PLACES_API_KEY")
         self.base_url = "https://places.googleapis.com/v1/places"
+        self.corpus = poi_corpus
+        # Local results needed before a nearby search skips the Places API
+        self.corpus_min_results = int(os.environ.get("POI_CORPUS_MIN_RESULTS", 10))
+        self.flight = places_flight
+        self.rate_limiter = places_rate_limiter
+        self.breaker = places_breaker
+
+    def _post_search(self, url: str, request_body: Dict, headers: Dict) -> Dict:
+        """
+        POST a search request, sharing the response with identical requests already in
+        flight. While the Places circuit is open the last response for the request is
+        returned instead, if there is one.
+        """
+        def post() -> Dict:
+            # Only the call that actually goes upstream spends a token
+            endpoint = url.rsplit(":", 1)[-1]
+            self.rate_limiter.acquire(endpoint)
+            with observe_upstream("google_places", endpoint):
+                response = requests.post(url, json=request_body, headers=headers)
+                response.raise_for_status()
+            return orjson.loads(response.content)
+        key = canonical_key(url=url, body=request_body, field_mask=headers.get("X-Goog-FieldMask"))
+        data, stale = self.flight.do(key, lambda: self.breaker.call(key, post))
+        if stale:
+            mark_stale(self.breaker.provider)
+        return data
+
+    @staticmethod
+    def _parse_places(data: Dict) -> List[PlaceRecord]:
+        """Records for the places of a search response, skipping malformed results."""
+        places = []
+        for result in data.get("places", []):
+            try:
+                places.append(PlaceRecord.from_api(result))
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                print(f"Error processing place result: {str(e)}")
+        return places
 
     def getExplorePOIs(
         self,
@@ -16,7 +92,7 @@ class GooglePlacesService:
         radius: float = 2000,
         type: Optional[str] = None,
         max_results: int = 20
-    ) -> List[Place]:
+    ) -> List[PlaceRecord]:
         """
         Perform an Explore Search for the Search Query using the Places API.
         """
@@ -40,14 +116,13 @@ class GooglePlacesService:
                     max_results=max_results
                 )
 
+                category = place_categories.get(current_type.strip())
                 for place in suggested_places:
                     if place.place_id in existing_place_ids:
                         continue
                     
                     # Check primary type matches - be less strict here since we want results
-                    if current_type == "cafe" and place.primary_type and place.primary_type not in ["cafe", "coffee_shop", "bakery"]:
-                        continue
-                    elif current_type == "restaurant" and place.primary_type and not (place.primary_type.endswith("restaurant") or place.primary_type in ["meal_takeaway", "meal_delivery"]):
+                    if not category.explore_accepts(place.primary_type):
                         continue
                     
                     places.append(place)
@@ -61,17 +136,20 @@ class GooglePlacesService:
         
         return places
 
+    @traced("places.nearby_search")
     def nearby_search(
         self,
         latitude: float,
         longitude: float,
         radius: float = 1000,
         type: Optional[str] = "tourist_attraction",
-        excluded_types: Optional[List[str]] = None,
-        max_results: int = 10
-    ) -> List[Place]:
+        excluded_types: Optional[Sequence[str]] = None,
+        max_results: int = 10,
+        profile: str = "full"
+    ) -> List[PlaceRecord]:
         """
-        Perform a Nearby Search using the latest Places API.
+        Perform a Nearby Search using the latest Places API, requesting the fields of
+        the given field mask profile.
         """
         url = f"{self.base_url}:searchNearby"
         
@@ -97,77 +175,74 @@ class GooglePlacesService:
         headers = {
             "Content-Type": "application/json",
             "X-Goog-Api-Key": f"{self.api_key}",
-            "X-Goog-FieldMask": (
-                "places.id,"
-                "places.displayName,"
-                "places.formattedAddress,"
-                "places.location,"
-                "places.rating,"
-                "places.userRatingCount,"
-                "places.types,"
-                "places.photos,"
-                "places.primaryType,"
-                "places.businessStatus,"
-                "places.websiteUri,"
-                "places.editorialSummary,"
-                "places.regularOpeningHours,"
-                "places.priceLevel"
-            )
+            "X-Goog-FieldMask": field_mask(profile, prefix="places.")
         }
         try:
-            response = requests.post(url, json=request_body, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            places = []
-            for result in data.get("places", []):
-                try:
-                    # Format opening hours if available
-                    formatted_hours = None
-                    if "regularOpeningHours" in result:
-                        weekday_texts = result.get("regularOpeningHours", {}).get("weekdayDescriptions", [])
-                        formatted_hours = "\n".join(weekday_texts) if weekday_texts else None
-                    
-                    # Extract first photo if available
-                    photo_name = None
-                    if result.get("photos") and len(result.get("photos")) > 0:
-                        photo_name = result.get("photos")[0].get("name")
-                    
-                    place = Place(
-                        place_id=result.get("id"),
-                        name=result.get("displayName", {}).get("text", ""),
-                        formatted_address=result.get("formattedAddress"),
-                        types=result.get("types", []),
-                        primary_type=result.get("primaryType"),
-                        rating=result.get("rating"),
-                        user_ratings_total=result.get("userRatingCount"),
-                        photo_name=photo_name,
-                        location={
-                            "latitude": result.get("location", {}).get("latitude"),
-                            "longitude": result.get("location", {}).get("longitude")
-                        },
-                        website=result.get("websiteUri"),
-                        phone=result.get("nationalPhoneNumber"),
-                        description=result.get("editorialSummary", {}).get("text") if "editorialSummary" in result else None,
-                        opening_hours=formatted_hours,
-                        price_level=result.get("priceLevel"),
-                        business_status=result.get("businessStatus"),
-                        cuisine=result.get("cuisine")
-                    )
-                    places.append(place)
-                except Exception as e:
-                    print(f"Error processing place result: {str(e)}")
-                    # Continue processing other results even if one fails
-                    continue
+            data = self._post_search(url, request_body, headers)
+            places = self._parse_places(data)
+            current_span().set_attributes({"type": type, "results": len(places)})
 
+            # Minimal records lack photos and addresses the corpus serves to /nearby
+            if profile != "minimal":
+                self.corpus.ingest(places)
             return places
 
         except requests.exceptions.RequestException as e:
             print(f"Error making Places API request: {str(e)}")
             raise
 
-    def get_place_details(self, place_id: str) -> Optional[Dict]:
+    @traced("places.tiered_nearby_search")
+    def tiered_nearby_search(
+        self,
+        latitude: float,
+        longitude: float,
+        radius: float = 1000,
+        type: Optional[str] = "tourist_attraction",
+        excluded_types: Optional[Sequence[str]] = None,
+        max_results: int = 10,
+        profile: str = "full",
+        require_photo: bool = False
+    ) -> List[PlaceRecord]:
         """
-        Get detailed information for a specific place using Place Details API
+        Nearby search answered from the local POI corpus when it has enough matching
+        places, falling back to the Places API (which also refreshes the corpus).
+        With require_photo, corpus places without a photo (e.g. loaded from
+        PointofInterest documents) are not used.
+        """
+        local = self.corpus.nearby(
+            latitude,
+            longitude,
+            radius,
+            types=[type] if type else None,
+            excluded_types=excluded_types,
+            max_results=max_results,
+            require_photo=require_photo
+        )
+        if len(local) >= min(max_results, self.corpus_min_results):
+            current_span().set_attributes({"type": type, "source": "corpus", "results": len(local)})
+            return local
+        current_span().set_attributes({"type": type, "source": "api", "corpus_results": len(local)})
+        try:
+            return self.nearby_search(
+                latitude=latitude,
+                longitude=longitude,
+                radius=radius,
+                type=type,
+                excluded_types=excluded_types,
+                max_results=max_results,
+                profile=profile
+            )
+        except (requests.exceptions.RequestException, CircuitOpenError):
+            # Places API failing: a few local places beat none
+            if not local:
+                raise
+            mark_stale(self.breaker.provider)
+            return local
+
+    def get_place_details(self, place_id: str, profile: str = "full") -> Optional[Dict]:
+        """
+        Get detailed information for a specific place using Place Details API,
+        limited to the fields of the given field mask profile.
         Returns place details or None if the request fails.
         """
         # Skip if not a Google Place ID (should start with "ChI")
@@ -180,27 +255,19 @@ class GooglePlacesService:
             headers = {
                 "Content-Type": "application/json",
                 "X-Goog-Api-Key": f"{self.api_key}",
-                "X-Goog-FieldMask": (
-                    "id,"
-                    "displayName,"
-                    "formattedAddress,"
-                    "location,"
-                    "rating,"
-                    "userRatingCount,"
-                    "types,"
-                    "photos,"
-                    "primaryType,"
-                    "websiteUri,"
-                    "internationalPhoneNumber,"
-                    "editorialSummary,"
-                    "regularOpeningHours,"
-                    "priceLevel"
-                )
+                "X-Goog-FieldMask": field_mask(profile)
             }
             
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
+            def get() -> Dict:
+                self.rate_limiter.acquire("details")
+                with observe_upstream("google_places", "details"):
+                    response = requests.get(url, headers=headers)
+                    response.raise_for_status()
+                return orjson.loads(response.content)
+
+            data, stale = self.breaker.call(f"details:{profile}:{place_id}", get)
+            if stale:
+                mark_stale(self.breaker.provider)
             
             # Format opening hours if available
             formatted_hours = None
@@ -232,17 +299,18 @@ class GooglePlacesService:
                 "phone": data.get("internationalPhoneNumber"),
                 "description": data.get("editorialSummary", {}).get("text") if "editorialSummary" in data else None,
                 "opening_hours": formatted_hours,
+                "opening_periods": data.get("regularOpeningHours", {}).get("periods"),
                 "price_level": data.get("priceLevel"),
                 "cuisine": cuisines
             }
             
             return place_details
         
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, CircuitOpenError) as e:
             print(f"Error fetching place details: {str(e)}")
             return None
 
-    def batch_get_place_details(self, place_ids: List[str], max_concurrent: int = 5) -> Dict[str, Dict]:
+    def batch_get_place_details(self, place_ids: List[str], max_concurrent: int = 5, profile: str = "full") -> Dict[str, Dict]:
         """
         Get details for multiple places in parallel batches to minimize API calls
         Returns a dictionary of place_id -> place_details
@@ -254,7 +322,8 @@ class GooglePlacesService:
         # Process in batches to avoid too many concurrent requests
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrent) as executor:
             future_to_place_id = {
-                executor.submit(self.get_place_details, place_id): place_id 
+                # Worker threads inherit the caller's context, and with it its rate limit priority
+                executor.submit(contextvars.copy_context().run, self.get_place_details, place_id, profile): place_id 
                 for place_id in place_ids
             }
             
@@ -292,6 +361,11 @@ class GooglePlacesService:
         Get a place photo using the photo reference.
         Returns the photo URL or None if the request fails.
         """
+        # Photos resolved ahead of time for popular cities
+        packed_url = city_pack_store.photo_url(photo_name)
+        if packed_url:
+            return packed_url
+
         try:
             url = f"https://places.googleapis.com/v1/{photo_name}/media"
             
@@ -301,18 +375,25 @@ class GooglePlacesService:
                 "maxHeightPx": max_height,
             }
 
-            response = requests.get(url, params=params, allow_redirects=False)
-            
-            # Google Places Photo API returns a 302 redirect to the actual image URL
-            if response.status_code == 302:
-                return response.headers.get('Location')
-            
-            return None
+            def get() -> Optional[str]:
+                self.rate_limiter.acquire("media")
+                with observe_upstream("google_places", "media"):
+                    response = requests.get(url, params=params, allow_redirects=False)
+                # Google Places Photo API returns a 302 redirect to the actual image URL
+                if response.status_code == 302:
+                    return response.headers.get('Location')
+                return None
 
-        except requests.exceptions.RequestException as e:
+            photo_url, stale = self.breaker.call(f"media:{photo_name}:{max_width}x{max_height}", get)
+            if stale:
+                mark_stale(self.breaker.provider)
+            return photo_url
+
+        except (requests.exceptions.RequestException, CircuitOpenError) as e:
             print(f"Error fetching place photo: {str(e)}")
             return None
 
+    @traced("places.text_search")
     def text_search(
         self,
         query: str,
@@ -321,10 +402,12 @@ class GooglePlacesService:
         radius: int = 2000,
         type: Optional[str] = None,
         max_results: int = 20,
-        open_now: bool = False
-    ) -> List[Place]:
+        open_now: bool = False,
+        profile: str = "full"
+    ) -> List[PlaceRecord]:
         """
-        Perform a Text Search using the Places API.
+        Perform a Text Search using the Places API, requesting the fields of the
+        given field mask profile.
         Returns a list of places matching the search query with location bias.
         """
         url = f"{self.base_url}:searchText"
@@ -355,73 +438,16 @@ class GooglePlacesService:
         headers = {
             "Content-Type": "application/json",
             "X-Goog-Api-Key": f"{self.api_key}",
-            "X-Goog-FieldMask": (
-                "places.id,"
-                "places.displayName,"
-                "places.formattedAddress,"
-                "places.location,"
-                "places.rating,"
-                "places.userRatingCount,"
-                "places.types,"
-                "places.photos,"
-                "places.primaryType,"
-                "places.nationalPhoneNumber,"
-                "places.currentOpeningHours,"
-                "places.websiteUri,"
-                "places.editorialSummary"
-            )
+            "X-Goog-FieldMask": field_mask(profile, prefix="places.")
         }
         
         try:
-            response = requests.post(url, json=request_body, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            places = []
-            
-            for result in data.get("places", []):
-                try:
-                    # Format opening hours if available
-                    formatted_hours = None
-                    if "currentOpeningHours" in result:
-                        weekday_texts = result.get("currentOpeningHours", {}).get("weekdayDescriptions", [])
-                        formatted_hours = "\n".join(weekday_texts) if weekday_texts else None
-                    
-                    # Extract first photo if available
-                    photo_name = None
-                    if result.get("photos") and len(result.get("photos")) > 0:
-                        photo_name = result.get("photos")[0].get("name")
-                    
-                    # Get location coordinates
-                    location = {
-                        "latitude": result.get("location", {}).get("latitude"),
-                        "longitude": result.get("location", {}).get("longitude")
-                    }
-                    
-                    # Create Place object
-                    place = Place(
-                        place_id=result.get("id"),
-                        name=result.get("displayName", {}).get("text", ""),
-                        formatted_address=result.get("formattedAddress"),
-                        types=result.get("types", []),
-                        primary_type=result.get("primaryType"),
-                        rating=result.get("rating"),
-                        user_ratings_total=result.get("userRatingCount"),
-                        photo_name=photo_name,
-                        location=location,
-                        website=result.get("websiteUri"),
-                        phone=result.get("nationalPhoneNumber"),
-                        opening_hours=formatted_hours,
-                        description=result.get("editorialSummary", {}).get("text") if "editorialSummary" in result else None,
-                        price_level=None,  # Not requested in the field mask
-                        business_status=None,  # Not requested in the field mask
-                        cuisine=None  # Not available in text search response
-                    )
-                    places.append(place)
-                except Exception as e:
-                    print(f"Error processing place result: {str(e)}")
-                    # Continue processing other results even if one fails
-                    continue
+            data = self._post_search(url, request_body, headers)
+            places = self._parse_places(data)
+            current_span().set_attributes({"query": query, "results": len(places)})
             
+            if profile != "minimal":
+                self.corpus.ingest(places)
             return places
         
         except requests.exceptions.RequestException as e:
@@ -2,63 +2,313 @@ import asyncio
 import os
 import json
 import logging
-from groq import Groq
+import threading
+import time
+from collections import deque
+from groq import APIConnectionError, AsyncGroq, Groq
 from fastapi import HTTPException
 from sse_starlette.sse import ServerSentEvent
-from typing import Generator, Union
+from typing import Callable, Dict, Generator, List, Optional, Tuple, Union
 from models.groq_model import ChatRequest, ChatResponse, MessageRole
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError, is_provider_failure
+from services.metrics import observe_upstream, record_tokens
+from services.tracing import current_span, traced
 
 logger = logging.getLogger(__name__)
 
+def parse_model_chain(value: Optional[str]) -> List[Tuple[str, float]]:
+    """
+    Parse a model chain such as "llama-3.3-70b-versatile:30,llama-3.1-8b-instant:15"
+    into (model, deadline_seconds) pairs, in preference order.
+    """
+    chain = []
+    for entry in (value or "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        model, _, deadline = entry.partition(":")
+        chain.append((model.strip(), float(deadline) if deadline else 60.0))
+    return chain
+
+DEFAULT_MODEL_CHAIN = "llama-3.3-70b-versatile:45,llama-3.1-8b-instant:20"
+
+class ModelLatencyTracker:
+    """Rolling per-model latency samples and hedging win/failure counters."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, deque] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _counter(self, model: str) -> Dict[str, int]:
+        return self._counters.setdefault(model, {"calls": 0, "wins": 0, "failures": 0, "rejected": 0, "cancelled": 0})
+
+    def record_latency(self, model: str, seconds: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(model, deque(maxlen=self.window)).append(seconds)
+            self._counter(model)["calls"] += 1
+
+    def record(self, model: str, outcome: str) -> None:
+        with self._lock:
+            self._counter(model)[outcome] += 1
+
+    @staticmethod
+    def _percentile(samples: List[float], percentile: float) -> Optional[float]:
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+        return round(ordered[index], 3)
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            result = {}
+            for model, counters in self._counters.items():
+                samples = list(self._latencies.get(model, []))
+                attempts = counters["wins"] + counters["failures"] + counters["rejected"] + counters["cancelled"]
+                result[model] = {
+                    **counters,
+                    "p50_seconds": self._percentile(samples, 50),
+                    "p95_seconds": self._percentile(samples, 95),
+                    "win_rate": round(counters["wins"] / attempts, 4) if attempts else 0.0
+                }
+            return result
+
+# Shared by every GroqService instance so stats cover all routes
+model_latency_tracker = ModelLatencyTracker()
+# Generations take several seconds, so only calls nearing the shortest model deadline
+# (20s in the default chain) count as degraded; calls past their deadline are failures
+# The Groq client raises its own connection/timeout errors rather than httpx's
+groq_breaker = CircuitBreaker(
+    "groq",
+    slow_call_seconds=float(os.environ.get("GROQ_SLOW_CALL_SECONDS", 15)),
+    is_failure=lambda error: isinstance(error, APIConnectionError) or is_provider_failure(error)
+)
+
 class GroqService:
     def __init__(self):
         self.client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+        # Hedged calls run on the event loop so losing requests can be aborted
+        self.async_client = AsyncGroq(api_key=os.environ.get("GROQ_API_KEY"))
+        self.model_chain = parse_model_chain(os.environ.get("GROQ_MODEL_CHAIN", DEFAULT_MODEL_CHAIN))
+        self.hedge_after_seconds = float(os.environ.get("GROQ_HEDGE_AFTER_SECONDS", 12))
+        self.latency_tracker = model_latency_tracker
+        self.breaker = groq_breaker
 
+    @traced("groq.create_chat_completion")
     async def create_chat_completion(
-        self, 
+        self,
         request: ChatRequest
     ) -> Union[ChatResponse, Generator[ServerSentEvent, None, None]]:
         try:
+            current_span().set_attributes({
+                "model": request.model,
+                "stream": request.stream,
+                "prompt_chars": sum(len(msg.content) for msg in request.messages)
+            })
+            if not request.stream:
+                return self._complete(request)
+
             chat_completion = self.client.chat.completions.create(
                 messages=[{"role": msg.role, "content": msg.content} for msg in request.messages],
                 model=request.model,
                 stream=request.stream
             )
-            
-            if request.stream:
-                async def generate_events():
-                    try:
-                        for chunk in chat_completion:
-                            if chunk.choices[0].delta.content:
-                                yield ServerSentEvent(
-                                    data=json.dumps({
-                                        "content": chunk.choices[0].delta.content,
-                                        "role": MessageRole.ASSISTANT
-                                    }),
-                                    event="message"
-                                )
-                            await asyncio.sleep(0)
-                    except Exception as e:
-                        logger.error(f"Streaming error: {str(e)}", exc_info=True)
-                        yield ServerSentEvent(
-                            data=json.dumps({"error": str(e)}),
-                            event="error"
-                        )
-                    finally:
-                        yield ServerSentEvent(data="", event="close")
-                
-                return generate_events()
-            else:
-                response_content = chat_completion.choices[0].message.content
-                logger.info(f"Groq API response: {response_content}")
-                return ChatResponse(
-                    content=response_content,
-                    role=MessageRole.ASSISTANT,
-                    model=request.model
-                )
+
+            async def generate_events():
+                try:
+                    for chunk in chat_completion:
+                        if chunk.choices[0].delta.content:
+                            yield ServerSentEvent(
+                                data=json.dumps({
+                                    "content": chunk.choices[0].delta.content,
+                                    "role": MessageRole.ASSISTANT
+                                }),
+                                event="message"
+                            )
+                        await asyncio.sleep(0)
+                except Exception as e:
+                    logger.error(f"Streaming error: {str(e)}", exc_info=True)
+                    yield ServerSentEvent(
+                        data=json.dumps({"error": str(e)}),
+                        event="error"
+                    )
+                finally:
+                    yield ServerSentEvent(data="", event="close")
+
+            return generate_events()
         except Exception as e:
             logger.error(f"Error processing chat completion: {str(e)}", exc_info=True)
             raise HTTPException(
                 status_code=500,
                 detail=f"Error processing chat completion: {str(e)}"
-            )
\ No newline at end of file
+            )
+
+    def _complete(self, request: ChatRequest, timeout: Optional[float] = None) -> ChatResponse:
+        """
+        Blocking, non-streaming completion. Records latency for the model used, and
+        fails straight away while the Groq circuit is open.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(self.breaker.provider, self.breaker.retry_after())
+        started = time.perf_counter()
+        try:
+            with observe_upstream("groq", request.model):
+                chat_completion = self.client.chat.completions.create(
+                    messages=[{"role": msg.role, "content": msg.content} for msg in request.messages],
+                    model=request.model,
+                    stream=False,
+                    timeout=timeout
+                )
+        except Exception as e:
+            self.breaker.record_error(e, time.perf_counter() - started)
+            raise
+        elapsed = time.perf_counter() - started
+        self.breaker.record(False, elapsed)
+        self.latency_tracker.record_latency(request.model, elapsed)
+        return self._to_response(request, chat_completion)
+
+    async def _complete_async(self, request: ChatRequest, timeout: Optional[float] = None) -> ChatResponse:
+        """
+        Coroutine version of _complete() on the async client, given up after `timeout`
+        seconds with a TimeoutError that counts against the breaker. Cancelling it
+        closes the HTTP request; a cancelled call records neither latency nor a breaker
+        outcome.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(self.breaker.provider, self.breaker.retry_after())
+        started = time.perf_counter()
+        try:
+            with observe_upstream("groq", request.model):
+                # The deadline is enforced here rather than by the caller, so that an expiry
+                # is recorded as a failure instead of looking like a hedge cancellation
+                chat_completion = await asyncio.wait_for(
+                    self.async_client.chat.completions.create(
+                        messages=[{"role": msg.role, "content": msg.content} for msg in request.messages],
+                        model=request.model,
+                        stream=False,
+                        timeout=timeout
+                    ),
+                    timeout=timeout
+                )
+        except Exception as e:
+            self.breaker.record_error(e, time.perf_counter() - started)
+            raise
+        except BaseException:
+            # Cancelled: no verdict on the provider, free the half-open probe slot
+            self.breaker.release_probe()
+            raise
+        elapsed = time.perf_counter() - started
+        self.breaker.record(False, elapsed)
+        self.latency_tracker.record_latency(request.model, elapsed)
+        return self._to_response(request, chat_completion)
+
+    def _to_response(self, request: ChatRequest, chat_completion) -> ChatResponse:
+        response_content = chat_completion.choices[0].message.content
+        logger.debug(f"Groq API response from {request.model}: {len(response_content or '')} characters")
+        usage = getattr(chat_completion, "usage", None)
+        record_tokens(request.model, getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None))
+        span = current_span()
+        span.add("prompt_tokens", getattr(usage, "prompt_tokens", None) or 0)
+        span.add("completion_tokens", getattr(usage, "completion_tokens", None) or 0)
+        return ChatResponse(
+            content=response_content,
+            role=MessageRole.ASSISTANT,
+            model=request.model,
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None)
+        )
+
+    @traced("groq.hedged_completion")
+    async def create_hedged_completion(
+        self,
+        request: ChatRequest,
+        accept: Callable[[ChatResponse], bool],
+        model_chain: Optional[List[Tuple[str, float]]] = None,
+        hedge_after_seconds: Optional[float] = None
+    ) -> ChatResponse:
+        """
+        Non-streaming completion over a chain of models with per-model deadlines.
+
+        The first model is called straight away. If it has not answered after
+        hedge_after_seconds, or it fails or returns a response rejected by `accept`,
+        the next model in the chain is started. The first accepted response wins and
+        the remaining calls are cancelled. If no response is accepted, the first
+        successful (but rejected) response is returned so callers keep the old
+        single-model behaviour. Calls run on the async client, so cancelling a
+        losing call aborts its HTTP request.
+        """
+        chain = model_chain or self.model_chain or [(request.model, 60.0)]
+        hedge_after = self.hedge_after_seconds if hedge_after_seconds is None else hedge_after_seconds
+        span = current_span()
+        span.set_attribute("prompt_chars", sum(len(msg.content) for msg in request.messages))
+
+        pending: Dict[asyncio.Task, str] = {}
+        next_index = 0
+        fallback: Optional[ChatResponse] = None
+        errors = []
+
+        def launch_next():
+            nonlocal next_index
+            model, deadline = chain[next_index]
+            next_index += 1
+            model_request = request.model_copy(update={"model": model, "stream": False})
+            task = asyncio.create_task(self._complete_async(model_request, deadline))
+            pending[task] = model
+            span.set_attribute("models_started", next_index)
+            logger.info(f"Started Groq request on {model} (deadline {deadline}s)")
+
+        launch_next()
+        try:
+            while pending:
+                can_hedge = next_index < len(chain)
+                done, _ = await asyncio.wait(
+                    pending.keys(),
+                    timeout=hedge_after if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Latency threshold passed without an answer: hedge on the next model
+                    launch_next()
+                    continue
+
+                for task in done:
+                    model = pending.pop(task)
+                    try:
+                        response = task.result()
+                    except Exception as e:
+                        self.latency_tracker.record(model, "failures")
+                        errors.append(f"{model}: {type(e).__name__} {str(e)}")
+                        logger.warning(f"Groq request on {model} failed: {type(e).__name__} {str(e)}")
+                        continue
+
+                    if accept(response):
+                        self.latency_tracker.record(model, "wins")
+                        span.set_attribute("model", model)
+                        return response
+
+                    self.latency_tracker.record(model, "rejected")
+                    logger.warning(f"Groq response from {model} failed validation")
+                    if fallback is None:
+                        fallback = response
+
+                # Something finished without an accepted answer: try the next model now
+                if next_index < len(chain) and len(pending) == 0:
+                    launch_next()
+        finally:
+            for task, model in pending.items():
+                task.cancel()
+                self.latency_tracker.record(model, "cancelled")
+            # Let the cancelled calls close their connections before returning
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        if fallback is not None:
+            return fallback
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing chat completion: all models failed ({'; '.join(errors)})"
+        )
+
+    def latency_stats(self) -> Dict[str, Dict]:
+        return self.latency_tracker.stats()
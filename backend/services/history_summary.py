@@ -0,0 +1,61 @@
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+# How many of the latest saved POIs and trips the summary keeps
+RECENT_ITEMS = int(os.environ.get("HISTORY_SUMMARY_RECENT_ITEMS", 10))
+
+
+def empty_summary() -> Dict[str, Any]:
+    return {'poiCounts': {}, 'tripCounts': {}, 'recentPOIs': [], 'recentTrips': []}
+
+
+def _count(counts: Dict[str, int], city: Optional[str], delta: int) -> None:
+    city = city or 'unknown'
+    total = counts.get(city, 0) + delta
+    if total > 0:
+        counts[city] = total
+    else:
+        counts.pop(city, None)
+
+
+def record_poi_saved(summary: Dict[str, Any], point_id: str, city: str, saved_at: datetime) -> None:
+    _count(summary['poiCounts'], city, 1)
+    recent = [poi for poi in summary['recentPOIs'] if poi['pointID'] != point_id]
+    summary['recentPOIs'] = [{'pointID': point_id, 'city': city, 'savedDT': saved_at}] + recent[:RECENT_ITEMS - 1]
+
+
+def record_poi_unsaved(summary: Dict[str, Any], point_id: str, city: str) -> None:
+    # The recent list is not refilled from older items: it may hold fewer than RECENT_ITEMS
+    _count(summary['poiCounts'], city, -1)
+    summary['recentPOIs'] = [poi for poi in summary['recentPOIs'] if poi['pointID'] != point_id]
+
+
+def record_trip_saved(summary: Dict[str, Any], trip_doc_id: str, trip: Dict[str, Any]) -> None:
+    _count(summary['tripCounts'], trip.get('city'), 1)
+    entry = {'trip_doc_id': trip_doc_id, **{key: trip.get(key) for key in ('city', 'country', 'fromDT', 'toDT')}}
+    recent = [item for item in summary['recentTrips'] if item['trip_doc_id'] != trip_doc_id]
+    summary['recentTrips'] = [entry] + recent[:RECENT_ITEMS - 1]
+
+
+def record_trip_removed(summary: Dict[str, Any], trip_doc_id: str, city: Optional[str]) -> None:
+    _count(summary['tripCounts'], city, -1)
+    summary['recentTrips'] = [item for item in summary['recentTrips'] if item['trip_doc_id'] != trip_doc_id]
+
+
+def build_summary(saved_pois: Iterable[Dict[str, Any]], saved_trips: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Summary of a whole history: the savedPOIs entries ({'pointID', 'city', 'createdDT'})
+    and savedItineraries entries (with 'trip_doc_id') that have status True.
+    """
+    def oldest_first(field: str):
+        # Entries without the field go first, so they are the first to drop out of the recent lists
+        return lambda item: (item.get(field) is not None, item.get(field) or '')
+
+    summary = empty_summary()
+    for poi in sorted(saved_pois, key=oldest_first('createdDT')):
+        record_poi_saved(summary, poi['pointID'], poi.get('city'), poi.get('createdDT'))
+    # Saved trips have no creation time: the latest start dates count as the most recent
+    for trip in sorted(saved_trips, key=oldest_first('fromDT')):
+        record_trip_saved(summary, trip['trip_doc_id'], trip)
+    return summary
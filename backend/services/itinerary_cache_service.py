@@ -0,0 +1,101 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional
+from cachetools import TTLCache
+from models.tripgeneration import TripGenerationRequest
+
+logger = logging.getLogger(__name__)
+
+class ItineraryCacheService:
+    """
+    Content-addressed cache of generated itineraries.
+
+    Requests are canonicalized (case-folded city/country, rounded coordinates,
+    sorted preference lists and POI place_ids) so that effectively identical
+    generation requests share one entry and skip the Places fan-out and Groq call.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        coordinate_precision: int = 3,
+        timer=time.monotonic
+    ):
+        self.max_entries = max_entries or int(os.environ.get("ITINERARY_CACHE_MAX_ENTRIES", 512))
+        self.ttl_seconds = ttl_seconds or float(os.environ.get("ITINERARY_CACHE_TTL_SECONDS", 6 * 60 * 60))
+        self.coordinate_precision = coordinate_precision
+        self._cache = TTLCache(maxsize=self.max_entries, ttl=self.ttl_seconds, timer=timer)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    @staticmethod
+    def _normalize_list(values: Iterable[str]) -> list:
+        return sorted({value.strip().lower() for value in values if value and value.strip()})
+
+    def canonicalize(self, request: TripGenerationRequest) -> Dict:
+        """Reduce a generation request to the fields that determine its itinerary."""
+        trip_data = request.trip_data
+        return {
+            "city": trip_data.city.strip().lower(),
+            "country": trip_data.country.strip().lower(),
+            "coordinates": [
+                round(trip_data.coordinates.lat, self.coordinate_precision),
+                round(trip_data.coordinates.lng, self.coordinate_precision)
+            ],
+            "days": trip_data.monthly_days,
+            # Opening hours make the plan depend on which weekdays the trip covers
+            "start_weekday": trip_data.fromDT.weekday(),
+            "interests": self._normalize_list(trip_data.interests),
+            "food_preferences": self._normalize_list(trip_data.food_preferences),
+            "custom_interests": self._normalize_list(trip_data.custom_interests),
+            "custom_food_preferences": self._normalize_list(trip_data.custom_food_preferences),
+            "attractionpois": sorted({poi.place_id for poi in request.attractionpois}),
+            "foodpois": sorted({poi.place_id for poi in request.foodpois}),
+            "cafepois": sorted({poi.place_id for poi in request.cafepois})
+        }
+
+    def build_key(self, request: TripGenerationRequest) -> str:
+        canonical = json.dumps(self.canonicalize(request), sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            itinerary = self._cache.get(key)
+            if itinerary is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return itinerary
+
+    def set(self, key: str, itinerary_json: str) -> None:
+        """Store an itinerary. Callers are expected to only store validated itineraries."""
+        with self._lock:
+            self._cache[key] = itinerary_json
+            self.stores += 1
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        with self._lock:
+            if key is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(key, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._cache),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds
+            }
@@ -0,0 +1,140 @@
+import re
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from services.geometry import coordinate_of, distance_matrix_cache, travel_minutes
+from services.opening_hours import CompiledOpeningHours, is_open_pairs, parse_clock
+
+DAY_KEY_PATTERN = re.compile(r"^Day (\d+)$")
+TIME_SLOTS = ("Morning", "Afternoon", "Evening")
+# Slack allowed on top of the estimated travel time between consecutive visits
+TRAVEL_TOLERANCE_MINUTES = 15
+
+
+class ItineraryValidator:
+    """Structural checks for itineraries returned by the LLM."""
+
+    def validate(
+        self,
+        itinerary: Dict,
+        num_days: Optional[int] = None,
+        allowed_place_ids: Optional[Iterable[str]] = None,
+        trip_start: Optional[date] = None,
+        opening_hours: Optional[Dict[str, CompiledOpeningHours]] = None,
+        travel_profile: Optional[str] = None
+    ) -> List[str]:
+        """
+        Validate an itinerary dict and return a list of problems.
+        An empty list means the itinerary can be trusted (and cached).
+        When trip_start and opening_hours are given, every scheduled visit is
+        also checked against the place's opening hours on that date.
+        When travel_profile is given, the gap between consecutive visits of a
+        day must cover the estimated travel time between them.
+        """
+        if not isinstance(itinerary, dict):
+            return ["Itinerary is not a JSON object"]
+
+        problems = []
+        allowed = set(allowed_place_ids) if allowed_place_ids is not None else None
+        seen_place_ids = set()
+        visits = []
+        day_visits = {}
+
+        day_numbers = []
+        for key, day in itinerary.items():
+            match = DAY_KEY_PATTERN.match(key)
+            if not match:
+                continue
+            day_numbers.append(int(match.group(1)))
+
+            if not isinstance(day, dict):
+                problems.append(f"{key} is not an object")
+                continue
+
+            for slot_name, slot in day.items():
+                if slot_name not in TIME_SLOTS:
+                    problems.append(f"{key} has unknown time slot '{slot_name}'")
+                    continue
+                pois = slot.get("POI") if isinstance(slot, dict) else None
+                if not isinstance(pois, dict):
+                    problems.append(f"{key} {slot_name} has no POI object")
+                    continue
+
+                for place_id, poi in pois.items():
+                    if place_id in seen_place_ids:
+                        problems.append(f"Duplicate place_id {place_id}")
+                    seen_place_ids.add(place_id)
+
+                    if allowed is not None and place_id not in allowed:
+                        problems.append(f"Unknown place_id {place_id}")
+                    if not isinstance(poi, dict) or not poi.get("name") or not poi.get("type"):
+                        problems.append(f"POI {place_id} is missing name or type")
+                        continue
+                    if opening_hours and place_id in opening_hours:
+                        visits.append((key, int(match.group(1)), place_id, poi))
+                    if travel_profile:
+                        day_visits.setdefault(key, []).append(poi)
+
+        if not day_numbers:
+            problems.append("Itinerary has no days")
+        elif num_days is not None and sorted(day_numbers) != list(range(1, num_days + 1)):
+            problems.append(f"Expected days 1..{num_days}, got {sorted(day_numbers)}")
+
+        if trip_start is not None and visits:
+            problems.extend(self._check_opening_hours(visits, trip_start, opening_hours))
+
+        for day_key, pois in day_visits.items():
+            problems.extend(self._check_travel_time(day_key, pois, travel_profile))
+
+        return problems
+
+    def _check_travel_time(self, day_key: str, pois: List[Dict], profile: str) -> List[str]:
+        """Check that consecutive visits leave enough time to travel between them."""
+        timed = []
+        for poi in pois:
+            start = parse_clock(poi.get("StartTime"))
+            end = parse_clock(poi.get("EndTime"))
+            point = coordinate_of(poi)
+            if start is not None and end is not None and point is not None:
+                timed.append((start, end, point, poi))
+        if len(timed) < 2:
+            return []
+
+        timed.sort(key=lambda visit: visit[0])
+        distances = distance_matrix_cache.matrix([visit[2] for visit in timed])
+        legs = np.arange(len(timed) - 1)
+        needed = travel_minutes(distances[legs, legs + 1], profile)
+        gaps = np.array([timed[i + 1][0] - timed[i][1] for i in legs], dtype=np.float32)
+        return [
+            f"{day_key}: not enough time to travel from {timed[i][3].get('name')} to "
+            f"{timed[i + 1][3].get('name')} ({int(gaps[i])} min, needs ~{int(round(float(needed[i])))} min)"
+            for i in np.nonzero(gaps + TRAVEL_TOLERANCE_MINUTES < needed)[0]
+        ]
+
+    def _check_opening_hours(self, visits: list, trip_start: date, opening_hours: Dict) -> List[str]:
+        """Vectorized check that each visit falls inside the place's opening hours."""
+        rows = []
+        for day_key, day_number, place_id, poi in visits:
+            start = parse_clock(poi.get("StartTime"))
+            end = parse_clock(poi.get("EndTime"))
+            if start is None or end is None:
+                continue
+            weekday = (trip_start + timedelta(days=day_number - 1)).weekday()
+            rows.append((day_key, place_id, poi, weekday, start, end))
+        if not rows:
+            return []
+
+        open_mask = is_open_pairs(
+            [opening_hours[row[1]] for row in rows],
+            [row[3] for row in rows],
+            [row[4] for row in rows],
+            [row[5] for row in rows]
+        )
+        return [
+            f"{poi.get('name')} ({place_id}) is closed on {day_key} at {poi.get('StartTime')}-{poi.get('EndTime')}"
+            for (day_key, place_id, poi, _, _, _), is_open in zip(rows, open_mask)
+            if not is_open
+        ]
+
+    def is_valid(self, itinerary: Dict, **kwargs) -> bool:
+        return not self.validate(itinerary, **kwargs)
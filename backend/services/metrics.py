@@ -0,0 +1,252 @@
+"""
+In-process metrics in the Prometheus text exposition format, without a client library.
+
+Metrics are module-level and safe to update from the event loop and worker threads;
+an update is a dict lookup and a few additions under a lock. Cache statistics are not
+counted twice: caches register a function returning their hit/miss counters, read
+only when /metrics is scraped.
+"""
+import asyncio
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from services import tracing
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds: from cache-speed local work up to slow LLM calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Seconds the event loop was late: a few ms is scheduling, more is blocking work on the loop
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+REGISTRY: List["_Metric"] = []
+CACHE_STATS: Dict[str, Callable[[], Dict]] = {}
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+        REGISTRY.append(self)
+
+    def labels(self, *values: str):
+        """The child for these label values, created on first use (prometheus_client style)."""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.kind}\n"
+        return header + "".join(f"{line}\n" for line in self.samples())
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name if name.endswith("_total") else f"{name}_total", documentation, labelnames)
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def samples(self) -> Iterator[str]:
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def samples(self) -> Iterator[str]:
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def samples(self) -> Iterator[str]:
+        for values, child in list(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, values)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, values)} {cumulative}"
+
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Time to handle a request, by route template.",
+    ("method", "route", "status")
+)
+http_requests_in_flight = Gauge("http_requests_in_flight", "Requests being handled.")
+upstream_request_duration = Histogram(
+    "upstream_request_duration_seconds", "Time of calls to upstream providers and Firestore.",
+    ("provider", "endpoint", "outcome")
+)
+upstream_requests_in_flight = Gauge("upstream_requests_in_flight", "Upstream calls in progress.", ("provider",))
+llm_tokens = Counter("llm_tokens", "Tokens used by LLM completions.", ("model", "kind"))
+event_loop_lag = Histogram(
+    "event_loop_lag_seconds", "How late a periodic timer on the event loop fired.", buckets=LAG_BUCKETS
+)
+
+
+@contextmanager
+def observe_upstream(provider: str, endpoint: str) -> Iterator[None]:
+    """
+    Time one upstream call (also around an await) with its outcome: ok, error or
+    cancelled. In a trace the call is a span, counted in upstream_calls of its ancestors.
+    """
+    tracing.add_to_trace("upstream_calls")
+    in_flight = upstream_requests_in_flight.labels(provider)
+    in_flight.inc()
+    started = time.perf_counter()
+    outcome = "cancelled"
+    try:
+        with tracing.span(f"{provider}.{endpoint}"):
+            yield
+        outcome = "ok"
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        in_flight.dec()
+        upstream_request_duration.labels(provider, endpoint, outcome).observe(time.perf_counter() - started)
+
+
+def record_tokens(model: str, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> None:
+    if prompt_tokens:
+        llm_tokens.labels(model, "prompt").inc(prompt_tokens)
+    if completion_tokens:
+        llm_tokens.labels(model, "completion").inc(completion_tokens)
+
+
+async def monitor_event_loop(interval: float = 0.1, record: Optional[Callable[[float], None]] = None) -> None:
+    """
+    Sleep `interval` seconds at a time for as long as the task runs, observing how
+    late each wake-up is in event_loop_lag_seconds (and passing it to `record`, if
+    given). While a blocking call holds the loop, every request on it waits as long.
+    """
+    loop = asyncio.get_running_loop()
+    lag = event_loop_lag.labels()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        late = max(0.0, loop.time() - started - interval)
+        lag.observe(late)
+        if record is not None:
+            record(late)
+
+
+def register_cache(name: str, stats: Callable[[], Dict]) -> None:
+    """Report a cache whose stats() has "hits" and "misses"; a later registration replaces it."""
+    CACHE_STATS[name] = stats
+
+
+def _cache_samples() -> str:
+    counters = {name: stats() for name, stats in list(CACHE_STATS.items())}
+    families = (
+        ("cache_hits_total", "counter", "Cache lookups answered from the cache.", lambda hits, misses: hits),
+        ("cache_misses_total", "counter", "Cache lookups that missed.", lambda hits, misses: misses),
+        ("cache_hit_ratio", "gauge", "Hits over lookups since start.",
+         lambda hits, misses: hits / (hits + misses) if hits + misses else 0.0)
+    )
+    lines = []
+    # Each family's samples must be grouped under its own HELP/TYPE lines
+    for family, kind, documentation, value in families:
+        lines += [f"# HELP {family} {documentation}", f"# TYPE {family} {kind}"]
+        for name, stats in counters.items():
+            sample = value(stats.get("hits", 0), stats.get("misses", 0))
+            lines.append(f"{family}{_format_labels(('cache',), (name,))} {_format_value(sample)}")
+    return "\n".join(lines) + "\n"
+
+
+def render() -> str:
+    """All metrics in the Prometheus text format."""
+    return "".join(metric.render() for metric in REGISTRY) + _cache_samples()
@@ -0,0 +1,283 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+from typing import Dict, List, Optional, Sequence, Union
+import numpy as np
+from cachetools import LRUCache
+
+logger = logging.getLogger(__name__)
+
+MINUTES_PER_DAY = 24 * 60
+# Index 0 is Monday, matching datetime.weekday()
+WEEKDAYS = ("Mo", "Tu", "We", "Th", "Fr", "Sa", "Su")
+WEEKDAY_NAMES = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+OSM_TIME_RANGE = re.compile(r"(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})")
+GOOGLE_TIME_RANGE = re.compile(
+    r"(\d{1,2}):(\d{2})\s*(AM|PM)?\s*[–-]\s*(\d{1,2}):(\d{2})\s*(AM|PM)?",
+    re.IGNORECASE
+)
+
+
+class CompiledOpeningHours:
+    """
+    Opening hours compiled to a per-weekday bitmap of minutes.
+
+    The bitmap is stored packed (7 x 180 bytes); a cumulative open-minute table
+    is kept alongside it so any [start, end) slot can be checked in O(1).
+    """
+
+    __slots__ = ("packed", "cumulative")
+
+    def __init__(self, minutes: np.ndarray):
+        minutes = np.asarray(minutes, dtype=bool).reshape(7, MINUTES_PER_DAY)
+        self.packed = np.packbits(minutes, axis=1)
+        self.cumulative = np.zeros((7, MINUTES_PER_DAY + 1), dtype=np.int16)
+        np.cumsum(minutes, axis=1, out=self.cumulative[:, 1:])
+
+    @property
+    def minutes(self) -> np.ndarray:
+        return np.unpackbits(self.packed, axis=1, count=MINUTES_PER_DAY).astype(bool)
+
+    def is_open(self, weekday: int, start_minute: int, end_minute: int) -> bool:
+        """True if the place is open for the whole [start_minute, end_minute) slot on weekday."""
+        return bool(is_open_batch([self], [weekday], [start_minute], [end_minute])[0, 0])
+
+    def open_weekdays(self) -> List[int]:
+        return [day for day in range(7) if self.cumulative[day, -1] > 0]
+
+
+def _mark(minutes: np.ndarray, weekday: int, start: int, end: int) -> None:
+    """Mark [start, end) open on weekday; ranges past midnight spill into the next day."""
+    if end <= start:
+        end += MINUTES_PER_DAY
+    while start < end:
+        day_end = min(end, MINUTES_PER_DAY)
+        minutes[weekday % 7, start:day_end] = True
+        start, end = 0, end - MINUTES_PER_DAY
+        weekday += 1
+
+
+def from_google_periods(periods: Sequence[Dict]) -> Optional[CompiledOpeningHours]:
+    """Compile Places API (New) regularOpeningHours.periods (day 0 = Sunday)."""
+    if not periods:
+        return None
+    minutes = np.zeros((7, MINUTES_PER_DAY), dtype=bool)
+    for period in periods:
+        open_point = period.get("open") or {}
+        close_point = period.get("close")
+        open_day = (open_point.get("day", 0) - 1) % 7
+        open_minute = open_point.get("hour", 0) * 60 + open_point.get("minute", 0)
+        if close_point is None:
+            # A single period without a close time means open 24/7
+            minutes[:] = True
+            break
+        close_day = (close_point.get("day", 0) - 1) % 7
+        close_minute = close_point.get("hour", 0) * 60 + close_point.get("minute", 0)
+        span = ((close_day - open_day) % 7) * MINUTES_PER_DAY + close_minute - open_minute
+        if span <= 0:
+            span += 7 * MINUTES_PER_DAY
+        start = open_day * MINUTES_PER_DAY + open_minute
+        flat = minutes.reshape(-1)
+        indices = (start + np.arange(span)) % flat.size
+        flat[indices] = True
+    return CompiledOpeningHours(minutes)
+
+
+def _parse_osm_days(selector: str) -> Optional[List[int]]:
+    days = []
+    for part in selector.split(","):
+        part = part.strip()
+        if "-" in part:
+            first, _, last = part.partition("-")
+            if first not in WEEKDAYS or last not in WEEKDAYS:
+                return None
+            start, end = WEEKDAYS.index(first), WEEKDAYS.index(last)
+            days.extend((start + offset) % 7 for offset in range((end - start) % 7 + 1))
+        elif part in WEEKDAYS:
+            days.append(WEEKDAYS.index(part))
+        else:
+            return None
+    return days
+
+
+def from_osm(value: str) -> Optional[CompiledOpeningHours]:
+    """
+    Compile the common subset of OSM opening_hours syntax, e.g.
+    "Mo-Fr 09:00-17:00; Sa 10:00-14:00,15:00-18:00; Su off" or "24/7".
+    Later rules override earlier ones for the same days; unsupported rules
+    (public holidays, month ranges, ...) are skipped.
+    """
+    if not value or not value.strip():
+        return None
+    if value.strip() == "24/7":
+        return CompiledOpeningHours(np.ones((7, MINUTES_PER_DAY), dtype=bool))
+
+    minutes = np.zeros((7, MINUTES_PER_DAY), dtype=bool)
+    parsed_any = False
+    for rule in value.split(";"):
+        rule = rule.strip()
+        if not rule:
+            continue
+        selector, _, times = rule.partition(" ")
+        days = _parse_osm_days(selector)
+        if days is None:
+            # No weekday selector: "09:00-17:00" applies to every day
+            if OSM_TIME_RANGE.match(rule):
+                days, times = list(range(7)), rule
+            else:
+                continue
+        times = times.strip()
+        for day in days:
+            minutes[day, :] = False
+        if times.lower() in ("off", "closed"):
+            parsed_any = True
+            continue
+        for match in OSM_TIME_RANGE.finditer(times):
+            start = int(match.group(1)) * 60 + int(match.group(2))
+            end = int(match.group(3)) * 60 + int(match.group(4))
+            for day in days:
+                _mark(minutes, day, start, end)
+            parsed_any = True
+    return CompiledOpeningHours(minutes) if parsed_any else None
+
+
+def _to_minutes(hour: str, minute: str, meridiem: Optional[str]) -> int:
+    hour = int(hour) % 12 if meridiem else int(hour)
+    if meridiem and meridiem.upper() == "PM":
+        hour += 12
+    return hour * 60 + int(minute)
+
+
+def from_weekday_descriptions(value: Union[str, Sequence[str]]) -> Optional[CompiledOpeningHours]:
+    """Compile Google weekdayDescriptions text ("Monday: 9:00 AM – 5:00 PM")."""
+    lines = value.splitlines() if isinstance(value, str) else list(value)
+    minutes = np.zeros((7, MINUTES_PER_DAY), dtype=bool)
+    parsed_any = False
+    for line in lines:
+        day_name, _, hours = line.partition(":")
+        day_name = day_name.strip().lower()
+        if day_name not in WEEKDAY_NAMES:
+            continue
+        day = WEEKDAY_NAMES.index(day_name)
+        parsed_any = True
+        # Google uses narrow no-break and thin spaces around times
+        hours = hours.replace("\u202f", " ").replace("\u2009", " ").strip()
+        if hours.lower().startswith("open 24 hours"):
+            minutes[day, :] = True
+            continue
+        for match in GOOGLE_TIME_RANGE.finditer(hours):
+            # "6:00 – 10:00 PM" shares the closing meridiem
+            end_meridiem = match.group(6)
+            start_meridiem = match.group(3) or end_meridiem
+            start = _to_minutes(match.group(1), match.group(2), start_meridiem)
+            end = _to_minutes(match.group(4), match.group(5), end_meridiem)
+            _mark(minutes, day, start, end)
+    return CompiledOpeningHours(minutes) if parsed_any else None
+
+
+def compile_opening_hours(raw) -> Optional[CompiledOpeningHours]:
+    """Compile Google periods, Google weekday text or an OSM string. None if unknown."""
+    if not raw:
+        return None
+    try:
+        if isinstance(raw, (list, tuple)) and raw and isinstance(raw[0], dict):
+            return from_google_periods(raw)
+        if isinstance(raw, (list, tuple)):
+            return from_weekday_descriptions(raw)
+        if isinstance(raw, str):
+            first_line = raw.strip().split(":", 1)[0].strip().lower()
+            if first_line in WEEKDAY_NAMES:
+                return from_weekday_descriptions(raw)
+            return from_osm(raw)
+    except Exception as e:
+        logger.warning(f"Could not compile opening hours {raw!r}: {str(e)}")
+    return None
+
+
+class OpeningHoursCache:
+    """Per-POI cache of compiled opening hours, keyed on place_id and the raw value."""
+
+    def __init__(self, max_entries: int = 4096):
+        self._cache = LRUCache(maxsize=max_entries)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(raw) -> str:
+        encoded = raw if isinstance(raw, str) else json.dumps(raw, sort_keys=True)
+        return hashlib.blake2b(encoded.encode("utf-8"), digest_size=8).hexdigest()
+
+    def get(self, place_id: str, raw) -> Optional[CompiledOpeningHours]:
+        if not raw:
+            return None
+        key = (place_id, self._digest(raw))
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+        compiled = compile_opening_hours(raw)
+        with self._lock:
+            self._cache[key] = compiled
+        return compiled
+
+
+# Shared so hours compiled while gathering candidates are reused by the validator
+opening_hours_cache = OpeningHoursCache()
+
+
+def is_open_batch(
+    hours: Sequence[Optional[CompiledOpeningHours]],
+    weekdays: Sequence[int],
+    starts: Sequence[int],
+    ends: Sequence[int]
+) -> np.ndarray:
+    """
+    Vectorized feasibility check of N POIs against M slots.
+
+    Returns an (N, M) bool matrix; POIs with unknown hours (None) are treated as open.
+    Slots whose end is before their start are clipped to midnight.
+    """
+    weekdays = np.asarray(weekdays, dtype=np.int64) % 7
+    starts = np.clip(np.asarray(starts, dtype=np.int64), 0, MINUTES_PER_DAY)
+    ends = np.clip(np.maximum(np.asarray(ends, dtype=np.int64), starts), 0, MINUTES_PER_DAY)
+    result = np.ones((len(hours), len(weekdays)), dtype=bool)
+
+    known = [index for index, compiled in enumerate(hours) if compiled is not None]
+    if not known or len(weekdays) == 0:
+        return result
+    cumulative = np.stack([hours[index].cumulative for index in known])
+    open_minutes = cumulative[:, weekdays, ends] - cumulative[:, weekdays, starts]
+    result[known] = open_minutes == (ends - starts)
+    return result
+
+
+def is_open_pairs(
+    hours: Sequence[Optional[CompiledOpeningHours]],
+    weekdays: Sequence[int],
+    starts: Sequence[int],
+    ends: Sequence[int]
+) -> np.ndarray:
+    """Element-wise variant of is_open_batch: POI i checked against slot i only."""
+    weekdays = np.asarray(weekdays, dtype=np.int64) % 7
+    starts = np.clip(np.asarray(starts, dtype=np.int64), 0, MINUTES_PER_DAY)
+    ends = np.clip(np.maximum(np.asarray(ends, dtype=np.int64), starts), 0, MINUTES_PER_DAY)
+    result = np.ones(len(hours), dtype=bool)
+
+    known = np.array([index for index, compiled in enumerate(hours) if compiled is not None], dtype=np.int64)
+    if known.size == 0:
+        return result
+    cumulative = np.stack([hours[index].cumulative for index in known])
+    rows = np.arange(known.size)
+    open_minutes = cumulative[rows, weekdays[known], ends[known]] - cumulative[rows, weekdays[known], starts[known]]
+    result[known] = open_minutes == (ends[known] - starts[known])
+    return result
+
+
+def parse_clock(value: str) -> Optional[int]:
+    """'9:30' -> 570. Returns None for unparseable values."""
+    try:
+        hours, minutes = str(value).strip().split(":")[:2]
+        return int(hours) * 60 + int(minutes)
+    except (ValueError, AttributeError):
+        return None
@@ -0,0 +1,81 @@
+import base64
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Iterable, List, Optional, Tuple
+import orjson
+from fastapi import HTTPException
+from firebase_admin import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+from services.metrics import observe_upstream
+
+MAX_PAGE_SIZE = 200
+
+
+@dataclass
+class Page:
+    """One page of a listing; next_cursor is None on the last page."""
+    items: List[Any] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+
+def encode_cursor(value: Any, doc_id: str) -> str:
+    """Opaque token for the position after a document: its sort value and ID."""
+    payload = {"id": doc_id, "v": value}
+    if isinstance(value, datetime):
+        payload = {"id": doc_id, "v": value.isoformat(), "dt": True}
+    return base64.urlsafe_b64encode(orjson.dumps(payload)).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[Any, str]:
+    try:
+        payload = orjson.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        value = datetime.fromisoformat(payload["v"]) if payload.get("dt") else payload["v"]
+        return value, str(payload["id"])
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def select_fields(fields: Optional[str], allowed: Iterable[str]) -> Optional[List[str]]:
+    """Fields named in a comma-separated `fields` parameter, checked against those a listing has."""
+    if not fields:
+        return None
+    selected = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = sorted(set(selected) - set(allowed))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return selected
+
+
+def fetch_page(query, order_field: str, limit: Optional[int] = None, cursor: Optional[str] = None,
+               fields: Optional[List[str]] = None) -> Tuple[list, Optional[str]]:
+    """
+    Keyset pagination: newest first on order_field, ties broken by document ID so the
+    order is stable, resuming after the cursor's document with start_after.
+    One extra document is read to tell whether there is a next page.
+
+    Without a limit or cursor the query is run unordered, as listings always were
+    (ordering on top of the equality filters needs a composite index; see
+    firestore.indexes.json).
+    Returns the documents and the cursor of the next page, if any.
+    """
+    if fields:
+        # The sort field is needed for the cursor even when not asked for
+        query = query.select(sorted(set(fields) | {order_field}))
+    if limit is None and cursor is None:
+        with observe_upstream("firestore", "query"):
+            return list(query.get()), None
+
+    query = query.order_by(order_field, direction=firestore.Query.DESCENDING) \
+        .order_by(FieldPath.document_id(), direction=firestore.Query.DESCENDING)
+    if cursor is not None:
+        value, doc_id = decode_cursor(cursor)
+        query = query.start_after({order_field: value, "__name__": doc_id})
+    if limit is not None:
+        query = query.limit(limit + 1)
+
+    with observe_upstream("firestore", "query"):
+        docs = list(query.get())
+    if limit is None or len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    return docs, encode_cursor(docs[-1].get(order_field), docs[-1].id)
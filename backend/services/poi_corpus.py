@@ -0,0 +1,232 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set
+import numpy as np
+from scipy.spatial import cKDTree
+from models.googleplaces import PlaceLocation, PlaceRecord
+from services.dedup import chord_length, to_unit_vectors
+
+logger = logging.getLogger(__name__)
+
+# Itinerary/Firestore POI types mapped onto the Google type they are searched as
+CORPUS_TYPE_ALIASES = {
+    "attraction": "tourist_attraction",
+    "restaurant": "restaurant",
+    "cafe": "cafe"
+}
+
+
+class PoiCorpus:
+    """
+    Local corpus of places seen from the Places API and the PointofInterest collection.
+
+    Places are kept in columns (id, type codes, lat/lng, rating, ingest time) next to
+    the original Place records. A KD-tree over unit-sphere vectors answers radius +
+    type queries without going upstream.
+
+    Places ingested since the last rebuild are kept in a pending buffer and scanned
+    linearly next to the tree. The tree is only rebuilt once pending and evicted
+    entries reach `rebuild_fraction` of the indexed ones (and at least
+    `rebuild_min_pending`), so a steady trickle of ingests does not rebuild it on
+    every query.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_age_seconds: Optional[float] = None,
+        rebuild_min_pending: Optional[int] = None,
+        rebuild_fraction: float = 0.1,
+        timer: Callable[[], float] = time.time
+    ):
+        self.max_entries = max_entries or int(os.environ.get("POI_CORPUS_MAX_ENTRIES", 50000))
+        self.max_age_seconds = max_age_seconds or float(os.environ.get("POI_CORPUS_MAX_AGE_SECONDS", 7 * 24 * 3600))
+        self.rebuild_min_pending = (
+            rebuild_min_pending if rebuild_min_pending is not None
+            else int(os.environ.get("POI_CORPUS_REBUILD_MIN_PENDING", 256))
+        )
+        self.rebuild_fraction = rebuild_fraction
+        self._timer = timer
+        self._lock = threading.RLock()
+        self._records: Dict[str, PlaceRecord] = {}
+        self._ingested_at: Dict[str, float] = {}
+        self._type_codes: Dict[str, int] = {}
+        # Ingested since the last rebuild (ordered set), and tree entries evicted since then
+        self._pending: Dict[str, None] = {}
+        self._evicted = 0
+        self._rebuilds = 0
+        self._tree: Optional[cKDTree] = None
+        self._ids: List[str] = []
+        self._primary_type = np.empty(0, dtype=np.int16)
+        self._lat = np.empty(0, dtype=np.float32)
+        self._lng = np.empty(0, dtype=np.float32)
+        self._rating = np.empty(0, dtype=np.float32)
+        self._timestamps = np.empty(0, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _type_code(self, place_type: Optional[str]) -> int:
+        if not place_type:
+            return -1
+        return self._type_codes.setdefault(place_type, len(self._type_codes))
+
+    def ingest(self, places: Iterable[PlaceRecord]) -> int:
+        """Add or refresh places; returns how many were stored."""
+        now = self._timer()
+        stored = 0
+        with self._lock:
+            for place in places:
+                if not place.place_id or place.location is None:
+                    continue
+                # Re-inserting moves the place to the end, so eviction drops the stalest first
+                self._records.pop(place.place_id, None)
+                self._records[place.place_id] = place
+                self._ingested_at[place.place_id] = now
+                self._pending[place.place_id] = None
+                stored += 1
+            while len(self._records) > self.max_entries:
+                oldest = next(iter(self._records))
+                del self._records[oldest]
+                del self._ingested_at[oldest]
+                if oldest in self._pending:
+                    del self._pending[oldest]
+                else:
+                    # Still in the tree until the next rebuild
+                    self._evicted += 1
+        return stored
+
+    def _needs_rebuild(self) -> bool:
+        stale = len(self._pending) + self._evicted
+        return stale > 0 and stale >= max(self.rebuild_min_pending, self.rebuild_fraction * len(self._ids))
+
+    @staticmethod
+    def _matches(place: PlaceRecord, wanted: Set[str], excluded: Set[str]) -> bool:
+        if wanted and place.primary_type not in wanted and not wanted.intersection(place.types):
+            return False
+        return not excluded.intersection(place.types)
+
+    def _rebuild(self) -> None:
+        records = list(self._records.values())
+        self._ids = [place.place_id for place in records]
+        self._primary_type = np.fromiter(
+            (self._type_code(place.primary_type) for place in records), dtype=np.int16, count=len(records)
+        )
+        self._lat = np.fromiter((place.location.latitude for place in records), dtype=np.float32, count=len(records))
+        self._lng = np.fromiter((place.location.longitude for place in records), dtype=np.float32, count=len(records))
+        self._rating = np.fromiter(
+            (place.rating if place.rating is not None else np.nan for place in records), dtype=np.float32, count=len(records)
+        )
+        self._timestamps = np.fromiter(
+            (self._ingested_at[place_id] for place_id in self._ids), dtype=np.float64, count=len(records)
+        )
+        self._tree = cKDTree(to_unit_vectors(self._lat, self._lng)) if records else None
+        self._pending.clear()
+        self._evicted = 0
+        self._rebuilds += 1
+
+    def nearby(
+        self,
+        latitude: float,
+        longitude: float,
+        radius: float,
+        types: Optional[Iterable[str]] = None,
+        excluded_types: Optional[Iterable[str]] = None,
+        max_results: Optional[int] = None,
+        require_photo: bool = False
+    ) -> List[PlaceRecord]:
+        """
+        Places within radius metres matching any of `types` (primary type or type list)
+        and none of `excluded_types`, nearest first. Entries older than max_age_seconds are
+        skipped, as are places without a photo when `require_photo` is set.
+        """
+        with self._lock:
+            if self._needs_rebuild():
+                self._rebuild()
+            center = to_unit_vectors([latitude], [longitude])[0]
+            chord = chord_length(radius / 1000)
+            oldest = self._timer() - self.max_age_seconds
+            wanted = {CORPUS_TYPE_ALIASES.get(place_type, place_type) for place_type in types or [] if place_type}
+            excluded = set(excluded_types or [])
+            found = []
+
+            if self._tree is not None:
+                hits = np.asarray(self._tree.query_ball_point(center, r=chord), dtype=np.int64)
+                hits = hits[self._timestamps[hits] >= oldest]
+                if wanted:
+                    # Cheap vectorized pass on primary types first, full type lists only for the rest
+                    wanted_codes = [self._type_codes[place_type] for place_type in wanted if place_type in self._type_codes]
+                    primary_match = np.isin(self._primary_type[hits], wanted_codes)
+                else:
+                    primary_match = np.ones(hits.size, dtype=bool)
+                distances = np.linalg.norm(self._tree.data[hits] - center, axis=1)
+                for index, matched, distance in zip(hits.tolist(), primary_match.tolist(), distances.tolist()):
+                    place_id = self._ids[index]
+                    # Refreshed (pending) or evicted since the rebuild: the tree entry is out of date
+                    if place_id in self._pending or place_id not in self._records:
+                        continue
+                    place = self._records[place_id]
+                    if (matched or self._matches(place, wanted, set())) and self._matches(place, set(), excluded):
+                        found.append((distance, place))
+
+            if self._pending:
+                pending = [self._records[place_id] for place_id in self._pending]
+                vectors = to_unit_vectors(
+                    [place.location.latitude for place in pending], [place.location.longitude for place in pending]
+                )
+                distances = np.linalg.norm(vectors - center, axis=1)
+                for place, distance in zip(pending, distances.tolist()):
+                    if (
+                        distance <= chord and self._ingested_at[place.place_id] >= oldest
+                        and self._matches(place, wanted, excluded)
+                    ):
+                        found.append((distance, place))
+
+            if require_photo:
+                found = [(distance, place) for distance, place in found if place.photo_name]
+            found.sort(key=lambda hit: hit[0])
+            if max_results is not None:
+                found = found[:max_results]
+            return [place for _, place in found]
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "entries": len(self._records),
+                "types": len(self._type_codes),
+                "pending": len(self._pending),
+                "rebuilds": self._rebuilds
+            }
+
+
+def place_from_poi_document(data: dict) -> Optional[PlaceRecord]:
+    """Build a corpus record from a PointofInterest document (coordinates already as lat/lng)."""
+    coordinates = data.get("coordinates") or {}
+    if not data.get("place_id") or coordinates.get("lat") is None or coordinates.get("lng") is None:
+        return None
+    poi_type = CORPUS_TYPE_ALIASES.get(data.get("type"), data.get("type"))
+    types = [poi_type] if poi_type else []
+    types.extend(category for category in data.get("categories") or [] if category not in types)
+    return PlaceRecord(
+        place_id=data["place_id"],
+        name=data.get("name", ""),
+        formatted_address=data.get("address"),
+        types=types,
+        primary_type=poi_type,
+        rating=data.get("rating"),
+        user_ratings_total=data.get("user_ratings_total"),
+        photo_name=None,
+        location=PlaceLocation(float(coordinates["lat"]), float(coordinates["lng"])),
+        website=data.get("website"),
+        phone=data.get("phone"),
+        description=data.get("description"),
+        opening_hours=data.get("opening_hours"),
+        price_level=None,
+        cuisine=data.get("cuisine")
+    )
+
+
+# Shared by the Places service (which feeds it) and trip generation (which queries it)
+poi_corpus = PoiCorpus()
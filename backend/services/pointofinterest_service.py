@@ -1,14 +1,82 @@
-from typing import List, Optional
+import asyncio
+import os
+import threading
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+from cachetools import TTLCache
 from .firebase_service import FirebaseService
-from models.pointofinterest import PointOfInterestResponse
+from models.pointofinterest import Coordinates, PointOfInterestResponse
 from fastapi import HTTPException
 import logging
 from firebase_admin import firestore
 from firebase_admin.firestore import GeoPoint
+from services.poi_corpus import PoiCorpus, place_from_poi_document
+from services.metrics import observe_upstream, register_cache
+
+POI_FIELDS = frozenset(PointOfInterestResponse.model_fields)
+
+
+def point_from_document(doc_id: str, poi_data: dict) -> PointOfInterestResponse:
+    """
+    Response model for a stored PointofInterest document. Documents are written by
+    create_or_get_point from a validated model, so they are not validated again.
+    """
+    values = {key: value for key, value in poi_data.items() if key in POI_FIELDS}
+    coordinates = poi_data.get('coordinates')
+    if isinstance(coordinates, GeoPoint):
+        values['coordinates'] = Coordinates.model_construct(lat=coordinates.latitude, lng=coordinates.longitude)
+    elif isinstance(coordinates, dict):
+        values['coordinates'] = Coordinates.model_construct(**coordinates)
+    return PointOfInterestResponse.model_construct(id=doc_id, **values)
+
+
+class PointCache:
+    """
+    Points of interest by document ID. Stored points are never edited (create_or_get_point
+    only creates), so entries just expire after a TTL to bound how long a point deleted
+    from Firestore can still be served.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self._cache = TTLCache(
+            maxsize=max_entries or int(os.environ.get("POI_CACHE_MAX_ENTRIES", 10000)),
+            ttl=ttl_seconds or float(os.environ.get("POI_CACHE_TTL_SECONDS", 60 * 60))
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, point_ids: Iterable[str]) -> Dict[str, PointOfInterestResponse]:
+        with self._lock:
+            found = {point_id: self._cache[point_id] for point_id in point_ids if point_id in self._cache}
+            self.hits += len(found)
+            return found
+
+    def put_many(self, points: Iterable[PointOfInterestResponse]) -> None:
+        with self._lock:
+            for point in points:
+                self._cache[point.id] = point
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+    def count_misses(self, count: int) -> None:
+        with self._lock:
+            self.misses += count
+
+
+point_cache = PointCache()
+register_cache("points", point_cache.stats)
+
+
 class PointOfInterestService(FirebaseService):
     def __init__(self):
         super().__init__()
         self.collection_name = 'PointofInterest'
+        self.cache = point_cache
+        self.batch_size = 10
+        # Batch reads run in parallel on worker threads, at most this many at once
+        self.max_concurrent_batches = int(os.environ.get("POI_MAX_CONCURRENT_BATCHES", 4))
 
     async def get_point(self, point_id: str) -> PointOfInterestResponse:
         try:
@@ -18,44 +86,67 @@ class PointOfInterestService(FirebaseService):
             if not doc.exists:
                 raise HTTPException(status_code=404, detail="Point of interest not found")
 
-            poi_data = doc.to_dict()
-            
-            if 'coordinates' in poi_data and isinstance(poi_data['coordinates'], GeoPoint):
-                poi_data['coordinates'] = {
-                    'lat': poi_data['coordinates'].latitude,
-                    'lng': poi_data['coordinates'].longitude
-                }
-
-            return PointOfInterestResponse(id=doc.id, **poi_data)
+            return point_from_document(doc.id, doc.to_dict())
         except Exception as e:
             logging.error(f"Error fetching point of interest: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error fetching point of interest: {str(e)}")
 
+    def _read_batch(self, point_ids: List[str]) -> List[PointOfInterestResponse]:
+        """Read one batch of points from Firestore (blocking) and cache them."""
+        with observe_upstream("firestore", "get_all"):
+            docs = list(self.db.get_all(
+                [self.get_collection_ref(self.collection_name).document(point_id) for point_id in point_ids]
+            ))
+        points = [point_from_document(doc.id, doc.to_dict()) for doc in docs if doc.exists]
+        self.cache.put_many(points)
+        return points
+
+    def _uncached(self, point_ids: List[str], cached: Dict[str, PointOfInterestResponse]) -> List[List[str]]:
+        """Batches of the distinct requested IDs missing from the cache."""
+        missing = [point_id for point_id in dict.fromkeys(point_ids) if point_id not in cached]
+        self.cache.count_misses(len(missing))
+        return [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+
+    def _start_reads(self, batches: List[List[str]]) -> List[asyncio.Future]:
+        """Read the batches concurrently on worker threads, at most max_concurrent_batches at once."""
+        semaphore = asyncio.Semaphore(self.max_concurrent_batches)
+
+        async def read(batch: List[str]) -> List[PointOfInterestResponse]:
+            async with semaphore:
+                return await asyncio.to_thread(self._read_batch, batch)
+
+        return [asyncio.ensure_future(read(batch)) for batch in batches]
+
     async def get_points(self, point_ids: List[str]) -> List[PointOfInterestResponse]:
         try:
-            batch_size = 10
-            points = []
-            for i in range(0, len(point_ids), batch_size):
-                batch_ids = point_ids[i:i + batch_size]
-                docs = self.db.get_all(
-                    [self.get_collection_ref(self.collection_name).document(point_id) for point_id in batch_ids]
-                )
-                for doc in docs:
-                    if doc.exists:
-                        poi_data = doc.to_dict()
-
-                        if 'coordinates' in poi_data and isinstance(poi_data['coordinates'], GeoPoint):
-                            poi_data['coordinates'] = {
-                                'lat': poi_data['coordinates'].latitude,
-                                'lng': poi_data['coordinates'].longitude
-                            }
-                        poi = PointOfInterestResponse(id=doc.id, **poi_data)
-                        points.append(poi)
-            return points
+            points = self.cache.get_many(point_ids)
+            for batch_points in await asyncio.gather(*self._start_reads(self._uncached(point_ids, points))):
+                points.update((point.id, point) for point in batch_points)
+            return [points[point_id] for point_id in dict.fromkeys(point_ids) if point_id in points]
 
         except Exception as e:
             logging.error(f"Error fetching points: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error fetching points: {str(e)}")
+
+    async def iter_points(self, point_ids: List[str]) -> AsyncIterator[PointOfInterestResponse]:
+        """
+        Points for the IDs as soon as they are available: cached ones first, then each
+        batch read as it completes, batches running concurrently off the event loop.
+        Order is not preserved; IDs without a stored point are skipped.
+        """
+        cached = self.cache.get_many(point_ids)
+        for point in cached.values():
+            yield point
+
+        reads = self._start_reads(self._uncached(point_ids, cached))
+        try:
+            for completed in asyncio.as_completed(reads):
+                for point in await completed:
+                    yield point
+        finally:
+            # The client went away or a read failed: do not leave the other reads running
+            for pending in reads:
+                pending.cancel()
     
     async def find_by_coordinates(self, lat: float, lng: float, city: str, country: str) -> Optional[str]:
         try:
@@ -131,4 +222,25 @@ class PointOfInterestService(FirebaseService):
 
         except Exception as e:
             logging.error(f"Error in create_or_get_point: {str(e)}")
-            raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+            raise HTTPException(status_code=500, detail=str(e))
+
+    def load_corpus(self, corpus: PoiCorpus) -> int:
+        """Stream the PointofInterest collection into the local POI corpus."""
+        try:
+            places = []
+            for doc in self.get_collection_ref(self.collection_name).stream():
+                poi_data = doc.to_dict()
+                if isinstance(poi_data.get('coordinates'), GeoPoint):
+                    poi_data['coordinates'] = {
+                        'lat': poi_data['coordinates'].latitude,
+                        'lng': poi_data['coordinates'].longitude
+                    }
+                place = place_from_poi_document(poi_data)
+                if place is not None:
+                    places.append(place)
+            stored = corpus.ingest(places)
+            logging.info(f"Loaded {stored} points of interest into the local corpus")
+            return stored
+        except Exception as e:
+            logging.error(f"Error loading POI corpus: {str(e)}")
+            return 0
@@ -0,0 +1,261 @@
+import logging
+import math
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Alias prefix per POI type, e.g. A1 for the first attraction candidate
+ALIAS_PREFIXES = {"attraction": "A", "restaurant": "R", "cafe": "C"}
+UNUSED_SECTIONS = {"attraction": "Attractions", "restaurant": "Restaurants", "cafe": "Restaurants"}
+
+# Static instructions shared by every itinerary request. Keeping the schema and
+# rules out of the per-request message gives an identical prefix for prompt caching.
+ITINERARY_SYSTEM_PROMPT = """You are a travel itinerary planner. Only output a JSON string and no other text, wrapped in ```json fences.
+Candidates are given as rows "alias|name|type|lat|lng|closed_days". Refer to places ONLY by alias.
+Output schema (one entry per day, times as H:MM):
+{"Day 1":{"Morning":{"POI":{"C1":{"StartTime":"8:00","EndTime":"9:00","duration":"1 hour"},"A1":{"StartTime":"9:30","EndTime":"11:30","duration":"2 hours"}}},"Afternoon":{"POI":{"R1":{"StartTime":"12:00","EndTime":"13:30","duration":"1.5 hours"},"A2":{"StartTime":"14:00","EndTime":"16:00","duration":"2 hours"}}},"Evening":{"POI":{"R2":{"StartTime":"18:30","EndTime":"20:00","duration":"1.5 hours"}}}},"Unused":["A3","R4"]}
+Rules:
+- Use each alias at most once in the whole itinerary; never invent aliases
+- Every day: Morning starts with breakfast at a cafe (8:00-9:00), Afternoon starts with lunch at a restaurant (12:00-14:00), Evening starts with dinner at a restaurant (18:30-20:30)
+- Exactly 1 cafe and 2 restaurants per day; attractions take 2-3 hours, meals 1-2 hours
+- Morning 8:00-12:00, Afternoon 12:00-18:00, Evening 18:00-22:00
+- Group nearby places using the coordinates and allow 15 minutes per kilometer of travel
+- Never schedule a place on a day listed in its closed_days
+- "Unused" lists every candidate alias not used in the itinerary"""
+
+SLICE_SYSTEM_PROMPT = """You are a travel itinerary planner. Regenerate only the requested time slots. Only output a JSON string and no other text, wrapped in ```json fences.
+Candidates are given as rows "alias|name|type|lat|lng|closed_days". Refer to places ONLY by alias.
+Output schema (only the requested slots, times as H:MM):
+{"Evening":{"POI":{"R1":{"StartTime":"18:30","EndTime":"20:00","duration":"1.5 hours"}}}}
+Rules:
+- Use each alias at most once; never invent aliases
+- Morning 8:00-12:00 (breakfast 8:00-9:00), Afternoon 12:00-18:00 (lunch 12:00-14:00), Evening 18:00-22:00 (dinner 18:30-20:30)
+- Do not overlap the fixed plan and allow 15 minutes per kilometer of travel"""
+
+
+@dataclass
+class BuiltPrompt:
+    system: str
+    user: str
+    aliases: Dict[str, Dict] = field(default_factory=dict)
+    trimmed: int = 0
+
+    @property
+    def token_counts(self) -> Dict[str, int]:
+        system_tokens = PromptBuilder.estimate_tokens(self.system)
+        user_tokens = PromptBuilder.estimate_tokens(self.user)
+        return {
+            "system_tokens": system_tokens,
+            "user_tokens": user_tokens,
+            "total_tokens": system_tokens + user_tokens,
+            "candidates": len(self.aliases),
+            "candidates_trimmed": self.trimmed
+        }
+
+
+class PromptBuilder:
+    """
+    Builds compact, token-budgeted prompts for itinerary generation.
+
+    Candidates are emitted as one short table row each, with rounded coordinates
+    and short aliases instead of Google place_ids. The LLM answers in aliases and
+    expand_itinerary() maps them back to the full POI data afterwards.
+    """
+
+    def __init__(self, token_budget: Optional[int] = None, coordinate_precision: int = 4):
+        self.token_budget = token_budget or int(os.environ.get("TRIP_PROMPT_TOKEN_BUDGET", 6000))
+        self.coordinate_precision = coordinate_precision
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Rough token estimate (~4 characters per token for English/JSON text)."""
+        return math.ceil(len(text) / 4)
+
+    @staticmethod
+    def _poi_fields(poi) -> Dict:
+        """Normalize a POI model, Place or POI dict into a plain dict."""
+        if isinstance(poi, dict):
+            return {
+                "place_id": poi["place_id"],
+                "name": poi["name"],
+                "coordinates": poi.get("coordinates")
+            }
+        if hasattr(poi, "location"):
+            return {
+                "place_id": poi.place_id,
+                "name": poi.name,
+                "coordinates": {"lat": poi.location.latitude, "lng": poi.location.longitude}
+            }
+        return {
+            "place_id": poi.place_id,
+            "name": poi.name,
+            "coordinates": {"lat": poi.coordinates.lat, "lng": poi.coordinates.lng}
+        }
+
+    def _format_row(self, alias: str, candidate: Dict, closed_days: Dict[str, List[int]]) -> str:
+        name = candidate["name"].replace("|", "/")
+        closed = " ".join(str(day) for day in closed_days.get(candidate["place_id"], []))
+        coordinates = candidate.get("coordinates")
+        if coordinates:
+            lat = round(coordinates["lat"], self.coordinate_precision)
+            lng = round(coordinates["lng"], self.coordinate_precision)
+            return f"{alias}|{name}|{candidate['type']}|{lat}|{lng}|{closed}"
+        return f"{alias}|{name}|{candidate['type']}|||{closed}"
+
+    def _alias_candidates(self, candidates_by_type: Dict[str, List]) -> Dict[str, Dict]:
+        aliases = {}
+        seen = set()
+        for poi_type, pois in candidates_by_type.items():
+            prefix = ALIAS_PREFIXES[poi_type]
+            index = 0
+            for poi in pois:
+                candidate = {**self._poi_fields(poi), "type": poi_type}
+                if candidate["place_id"] in seen:
+                    continue
+                seen.add(candidate["place_id"])
+                index += 1
+                aliases[f"{prefix}{index}"] = candidate
+        return aliases
+
+    def _trim_to_budget(
+        self,
+        system: str,
+        header: str,
+        selected: Dict[str, List],
+        suggested: Dict[str, List],
+        minimums: Dict[str, int],
+        closed_days: Optional[Dict[str, List[int]]] = None
+    ) -> tuple:
+        """
+        Drop suggested (never user-selected) candidates until the prompt fits the budget,
+        always taking from the type with the largest surplus over its minimum.
+        """
+        suggested = {poi_type: list(pois) for poi_type, pois in suggested.items()}
+        trimmed = 0
+        while True:
+            candidates = {
+                poi_type: list(selected.get(poi_type, [])) + suggested.get(poi_type, [])
+                for poi_type in ALIAS_PREFIXES
+            }
+            aliases = self._alias_candidates(candidates)
+            table = "\n".join(self._format_row(alias, candidate, closed_days or {}) for alias, candidate in aliases.items())
+            user = f"{header}\nalias|name|type|lat|lng|closed_days\n{table}"
+            if self.estimate_tokens(system) + self.estimate_tokens(user) <= self.token_budget:
+                return user, aliases, trimmed
+
+            surplus = {
+                poi_type: len(candidates[poi_type]) - minimums.get(poi_type, 0)
+                for poi_type in ALIAS_PREFIXES
+                if suggested.get(poi_type)
+            }
+            trimmable = {poi_type: extra for poi_type, extra in surplus.items() if extra > 0}
+            if not trimmable:
+                logger.warning("Prompt exceeds token budget but no candidates can be trimmed")
+                return user, aliases, trimmed
+            suggested[max(trimmable, key=trimmable.get)].pop()
+            trimmed += 1
+
+    def build_itinerary_prompt(
+        self,
+        request,
+        selected: Dict[str, List],
+        suggested: Dict[str, List],
+        closed_days: Optional[Dict[str, List[int]]] = None
+    ) -> BuiltPrompt:
+        """Prompt for a full multi-day itinerary."""
+        trip_data = request.trip_data
+        num_days = trip_data.monthly_days
+        header = (
+            f"Create a {num_days}-day itinerary for {trip_data.city}, {trip_data.country} "
+            f"from {trip_data.fromDT.date()} to {trip_data.toDT.date()}."
+        )
+        minimums = {"cafe": num_days, "restaurant": num_days * 2, "attraction": num_days * 2}
+        user, aliases, trimmed = self._trim_to_budget(
+            ITINERARY_SYSTEM_PROMPT, header, selected, suggested, minimums, closed_days
+        )
+        return BuiltPrompt(system=ITINERARY_SYSTEM_PROMPT, user=user, aliases=aliases, trimmed=trimmed)
+
+    def build_slice_prompt(
+        self,
+        request,
+        day: Dict,
+        target_slots: List[str],
+        candidates: Dict[str, List],
+        slot_requirements: Dict[str, Dict[str, int]]
+    ) -> BuiltPrompt:
+        """Prompt for regenerating some time slots of one day."""
+        fixed_lines = []
+        for slot_name, slot in day.items():
+            if slot_name in target_slots:
+                continue
+            for poi in slot.get("POI", {}).values():
+                fixed_lines.append(f"{slot_name}: {poi.get('name')} ({poi.get('type')}) {poi.get('StartTime')}-{poi.get('EndTime')}")
+        requirement_lines = [
+            f"{slot}: " + ", ".join(f"{count} {poi_type}" for poi_type, count in slot_requirements[slot].items())
+            for slot in target_slots
+        ]
+        header = (
+            f"Regenerate {', '.join(target_slots)} of Day {request.day} in "
+            f"{request.trip_data.city}, {request.trip_data.country}.\n"
+            + ("Fixed plan:\n" + "\n".join(fixed_lines) + "\n" if fixed_lines else "")
+            + "Required:\n" + "\n".join(requirement_lines)
+        )
+        minimums = {
+            poi_type: sum(slot_requirements[slot].get(poi_type, 0) for slot in target_slots)
+            for poi_type in ALIAS_PREFIXES
+        }
+        user, aliases, trimmed = self._trim_to_budget(SLICE_SYSTEM_PROMPT, header, {}, candidates, minimums)
+        return BuiltPrompt(system=SLICE_SYSTEM_PROMPT, user=user, aliases=aliases, trimmed=trimmed)
+
+    @staticmethod
+    def _expand_slots(day: Dict, aliases: Dict[str, Dict]) -> Dict:
+        expanded_day = {}
+        for slot_name, slot in day.items():
+            pois = slot.get("POI", {}) if isinstance(slot, dict) else {}
+            expanded_pois = {}
+            for alias, timing in pois.items():
+                candidate = aliases.get(alias)
+                if candidate is None:
+                    # Leave unknown aliases in place so validation can report them
+                    expanded_pois[alias] = timing
+                    continue
+                expanded_pois[candidate["place_id"]] = {
+                    "name": candidate["name"],
+                    "type": candidate["type"],
+                    **(timing if isinstance(timing, dict) else {}),
+                    "coordinates": candidate.get("coordinates")
+                }
+            expanded_day[slot_name] = {"POI": expanded_pois}
+        return expanded_day
+
+    def expand_itinerary(self, itinerary: Dict, aliases: Dict[str, Dict]) -> Dict:
+        """Map aliases in an LLM itinerary back to place_ids and full POI data."""
+        expanded = {}
+        used = set()
+        for key, value in itinerary.items():
+            if key == "Unused" or not isinstance(value, dict):
+                continue
+            expanded[key] = self._expand_slots(value, aliases)
+            for slot in value.values():
+                if isinstance(slot, dict):
+                    used.update(slot.get("POI", {}).keys())
+
+        # Rebuild Unused from the alias table rather than trusting the model's list
+        unused = {"Attractions": [], "Restaurants": []}
+        for alias, candidate in aliases.items():
+            if alias in used:
+                continue
+            unused[UNUSED_SECTIONS[candidate["type"]]].append({
+                "place_id": candidate["place_id"],
+                "name": candidate["name"],
+                "type": candidate["type"],
+                "coordinates": candidate.get("coordinates")
+            })
+        expanded["Unused"] = unused
+        return expanded
+
+    def expand_slots(self, slots: Dict, aliases: Dict[str, Dict]) -> Dict:
+        """Map aliases in a regenerated slice back to place_ids and full POI data."""
+        return self._expand_slots(slots, aliases)
@@ -0,0 +1,229 @@
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, highest first
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+
+# Places API endpoints metered separately
+PLACES_ENDPOINTS = ("searchNearby", "searchText", "details", "media")
+
+# Priority of upstream calls made from the current request or task
+request_priority: contextvars.ContextVar[str] = contextvars.ContextVar("request_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority(level: str) -> Iterator[None]:
+    """Run the enclosed upstream calls at the given priority class."""
+    token = request_priority.set(level)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+def on_event_loop() -> bool:
+    """Whether the current thread is running an asyncio event loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`. Not thread-safe on its own."""
+
+    def __init__(self, rate: float, burst: float, timer: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self._timer = timer
+        self._updated = timer()
+
+    def refill(self) -> None:
+        now = self._timer()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def seconds_until(self, tokens: float) -> float:
+        return max(0.0, (tokens - self.tokens) / self.rate) if self.rate > 0 else float("inf")
+
+
+class _EndpointState:
+    __slots__ = ("bucket", "day", "used", "waiting", "metrics")
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.day = -1
+        self.used = 0
+        self.waiting = {level: 0 for level in PRIORITIES}
+        self.metrics = {
+            level: {"acquired": 0, "shed": 0, "queued_seconds": 0.0, "max_queued_seconds": 0.0}
+            for level in PRIORITIES
+        }
+
+
+class UpstreamRateLimiter:
+    """
+    Per-endpoint token buckets with priority classes and a daily quota budget.
+
+    Interactive calls may use every token and the whole daily budget. Background
+    calls leave `background_reserve` of the bucket untouched, yield to waiting
+    interactive calls, and are shed once `background_quota_share` of the day's
+    budget is used. Calls that cannot get a token within `max_wait_seconds`, or
+    that would exceed the budget, are rejected with a 429.
+    """
+
+    def __init__(
+        self,
+        endpoints: Tuple[str, ...] = PLACES_ENDPOINTS,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+        daily_quota: Optional[int] = None,
+        background_quota_share: Optional[float] = None,
+        background_reserve: float = 0.25,
+        max_wait_seconds: Optional[float] = None,
+        timer: Callable[[], float] = time.monotonic,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        rate = rate if rate is not None else float(os.environ.get("PLACES_QPS", 10))
+        burst = burst if burst is not None else float(os.environ.get("PLACES_BURST", 20))
+        # 0 disables the daily budget
+        self.daily_quota = daily_quota if daily_quota is not None else int(os.environ.get("PLACES_DAILY_QUOTA", 0))
+        self.background_quota_share = (
+            background_quota_share if background_quota_share is not None
+            else float(os.environ.get("PLACES_BACKGROUND_QUOTA_SHARE", 0.8))
+        )
+        self.background_reserve = background_reserve
+        self.max_wait_seconds = (
+            max_wait_seconds if max_wait_seconds is not None
+            else float(os.environ.get("PLACES_MAX_QUEUE_SECONDS", 10))
+        )
+        self._clock = clock
+        self._timer = timer
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._endpoints = {name: _EndpointState(TokenBucket(rate, burst, timer)) for name in endpoints}
+
+    def _shed(self, state: _EndpointState, endpoint: str, level: str, reason: str) -> HTTPException:
+        state.metrics[level]["shed"] += 1
+        logger.warning(f"Shedding {level} {endpoint} call: {reason}")
+        return HTTPException(status_code=429, detail=f"Upstream {endpoint} {reason}")
+
+    def _try_acquire(self, endpoint: str, level: str) -> float:
+        """Take a token and return 0, or return how long to wait before trying again."""
+        state = self._endpoints[endpoint]
+        with self._lock:
+            day = int(self._clock() // 86400)
+            if day != state.day:
+                state.day, state.used = day, 0
+            if self.daily_quota:
+                budget = self.daily_quota if level == INTERACTIVE else self.daily_quota * self.background_quota_share
+                if state.used >= budget:
+                    raise self._shed(state, endpoint, level, "daily quota exhausted")
+
+            bucket = state.bucket
+            bucket.refill()
+            needed = 1.0
+            if level != INTERACTIVE:
+                if state.waiting[INTERACTIVE]:
+                    return max(bucket.seconds_until(needed), 1.0 / bucket.rate if bucket.rate else 1.0)
+                needed += bucket.burst * self.background_reserve
+            if bucket.tokens >= needed:
+                bucket.tokens -= 1.0
+                state.used += 1
+                return 0.0
+            return bucket.seconds_until(needed)
+
+    def _record(self, endpoint: str, level: str, queued: float) -> None:
+        with self._lock:
+            metrics = self._endpoints[endpoint].metrics[level]
+            metrics["acquired"] += 1
+            metrics["queued_seconds"] += queued
+            metrics["max_queued_seconds"] = max(metrics["max_queued_seconds"], queued)
+
+    def _waiting(self, endpoint: str, level: str, delta: int) -> None:
+        with self._lock:
+            self._endpoints[endpoint].waiting[level] += delta
+
+    def _give_up(self, endpoint: str, level: str) -> HTTPException:
+        with self._lock:
+            return self._shed(self._endpoints[endpoint], endpoint, level, "rate limit queue timed out")
+
+    def acquire(self, endpoint: str, level: Optional[str] = None) -> float:
+        """
+        Block the calling thread until a token is available; returns the time queued.
+        Refuses to run on an event loop thread, where waiting would stall every request:
+        call the blocking service from asyncio.to_thread, or use acquire_async().
+        """
+        if on_event_loop():
+            raise RuntimeError("UpstreamRateLimiter.acquire() called on the event loop; use acquire_async()")
+        level = level or request_priority.get()
+        started = self._timer()
+        self._waiting(endpoint, level, 1)
+        try:
+            while True:
+                wait = self._try_acquire(endpoint, level)
+                queued = self._timer() - started
+                if wait == 0:
+                    self._record(endpoint, level, queued)
+                    return queued
+                if queued + wait > self.max_wait_seconds:
+                    raise self._give_up(endpoint, level)
+                self._sleep(wait)
+        finally:
+            self._waiting(endpoint, level, -1)
+
+    async def acquire_async(self, endpoint: str, level: Optional[str] = None) -> float:
+        """Like acquire(), but waits without blocking the event loop."""
+        level = level or request_priority.get()
+        started = self._timer()
+        self._waiting(endpoint, level, 1)
+        try:
+            while True:
+                wait = self._try_acquire(endpoint, level)
+                queued = self._timer() - started
+                if wait == 0:
+                    self._record(endpoint, level, queued)
+                    return queued
+                if queued + wait > self.max_wait_seconds:
+                    raise self._give_up(endpoint, level)
+                await asyncio.sleep(wait)
+        finally:
+            self._waiting(endpoint, level, -1)
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            report = {}
+            for name, state in self._endpoints.items():
+                state.bucket.refill()
+                report[name] = {
+                    "tokens": round(state.bucket.tokens, 2),
+                    "used_today": state.used,
+                    "daily_quota": self.daily_quota or None,
+                    "priorities": {
+                        level: {
+                            **metrics,
+                            "mean_queued_seconds": round(metrics["queued_seconds"] / metrics["acquired"], 4)
+                            if metrics["acquired"] else 0.0
+                        }
+                        for level, metrics in state.metrics.items()
+                    }
+                }
+            return report
+
+
+# Shared by every GooglePlacesService instance so the quota is metered process-wide
+places_rate_limiter = UpstreamRateLimiter()
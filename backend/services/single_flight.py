@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import json
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+from services.rate_limiter import on_event_loop
+from services.metrics import register_cache
+
+# Every group created, by name, so their metrics can be reported together
+SINGLE_FLIGHT_GROUPS: Dict[str, "SingleFlight"] = {}
+
+
+def canonical_key(**params) -> str:
+    """Stable key for request parameters: sorted keys, rounded floats, None dropped."""
+    def normalize(value):
+        if isinstance(value, float):
+            return round(value, 7)
+        if isinstance(value, dict):
+            return {key: normalize(item) for key, item in value.items() if item is not None}
+        if isinstance(value, (list, tuple)):
+            return [normalize(item) for item in value]
+        return value
+    encoded = json.dumps(normalize(params), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(encoded.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: the first caller for a key runs the call,
+    callers arriving while it is in flight wait for and share its result or error.
+
+    do() is for blocking callers on worker threads (it refuses to run on the event
+    loop); do_async() is for coroutines. The two paths keep separate in-flight
+    tables. A timeout only bounds how long a waiting caller blocks; the leader's
+    call is never interrupted.
+    """
+
+    def __init__(self, name: str, timeout: Optional[float] = None):
+        self.name = name
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._counters = {"calls": 0, "executions": 0, "collapsed": 0, "errors": 0, "timeouts": 0}
+        SINGLE_FLIGHT_GROUPS[name] = self
+        # A collapsed call is answered from another caller's request, like a cache hit
+        register_cache(f"single_flight_{name}", lambda: {
+            "hits": self._counters["collapsed"], "misses": self._counters["executions"]
+        })
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self._counters[counter] += 1
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        # On the loop thread a follower would block the loop the leader needs, and
+        # requests handled on one thread never overlap, so nothing would coalesce
+        if on_event_loop():
+            raise RuntimeError(f"{self.name}: SingleFlight.do() called on the event loop; use do_async()")
+        with self._lock:
+            self._counters["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._counters["executions"] += 1
+            else:
+                self._counters["collapsed"] += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+                self._count("errors")
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+        else:
+            wait = self.timeout if timeout is None else timeout
+            if not call.done.wait(wait):
+                self._count("timeouts")
+                raise TimeoutError(f"{self.name}: timed out after {wait}s waiting for an in-flight call")
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        with self._lock:
+            self._counters["calls"] += 1
+            future = self._futures.get(key)
+            leader = future is None
+            if leader:
+                future = asyncio.ensure_future(fn())
+                self._futures[key] = future
+                self._counters["executions"] += 1
+            else:
+                self._counters["collapsed"] += 1
+
+        if leader:
+            def finished(completed: asyncio.Future) -> None:
+                with self._lock:
+                    if self._futures.get(key) is completed:
+                        del self._futures[key]
+                if not completed.cancelled() and completed.exception() is not None:
+                    self._count("errors")
+            future.add_done_callback(finished)
+
+        wait = self.timeout if timeout is None else timeout
+        try:
+            # Shielded so a caller giving up does not cancel the call for the others
+            return await asyncio.wait_for(asyncio.shield(future), wait)
+        except asyncio.TimeoutError:
+            self._count("timeouts")
+            raise TimeoutError(f"{self.name}: timed out after {wait}s waiting for an in-flight call")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = self._counters["calls"]
+            return {
+                **self._counters,
+                "in_flight": len(self._calls) + len(self._futures),
+                "collapse_rate": round(self._counters["collapsed"] / calls, 4) if calls else 0.0
+            }
+
+
+def single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: group.stats() for name, group in SINGLE_FLIGHT_GROUPS.items()}
@@ -0,0 +1,282 @@
+"""
+Lightweight tracing spans, shaped like OpenTelemetry's (trace/span IDs, parent,
+start/end in epoch nanoseconds, attributes, status) so they can be handed to an
+OpenTelemetry SDK.
+
+Spans are only recorded inside a trace started by the request middleware: when an
+exporter is configured (TRACING_EXPORTER) or the client asked for the timing
+breakdown. Otherwise span() hands out a shared no-op span, so instrumented code
+costs one context variable lookup.
+"""
+import contextvars
+import functools
+import inspect
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    __slots__ = ("trace", "name", "span_id", "parent", "start_ns", "end_ns", "_started", "duration", "attributes", "status")
+
+    def __init__(self, trace: "Trace", name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent = parent
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self._started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.attributes = attributes
+        self.status = "OK"
+
+    @property
+    def parent_id(self) -> Optional[str]:
+        return self.parent.span_id if self.parent is not None else None
+
+    def is_recording(self) -> bool:
+        return True
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        self.attributes.update(attributes)
+
+    def add(self, key: str, amount: int = 1) -> None:
+        """Add to a counting attribute, e.g. candidates kept while the span is current."""
+        with self.trace._lock:
+            self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def end(self) -> None:
+        self.duration = time.perf_counter() - self._started
+        self.end_ns = self.start_ns + int(self.duration * 1e9)
+
+    def elapsed(self) -> float:
+        return self.duration if self.duration is not None else time.perf_counter() - self._started
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "attributes": dict(self.attributes),
+            "status": self.status
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span outside a trace; every operation does nothing."""
+    __slots__ = ()
+
+    def is_recording(self) -> bool:
+        return False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def add(self, key: str, amount: int = 1) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """The spans of one request, in start order. Spans may start on worker threads."""
+
+    def __init__(self):
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def start(self, name: str, parent: Optional[Span], attributes: Dict[str, Any]) -> Span:
+        span = Span(self, name, parent, attributes)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def finished(self) -> List[Span]:
+        with self._lock:
+            return [span for span in self.spans if span.duration is not None]
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+def current_span():
+    return _current_span.get() or NOOP_SPAN
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """
+    A child of the current span, current while the block runs (also across awaits and
+    into asyncio.to_thread, which copies the context). A no-op outside a trace.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+    child = parent.trace.start(name, parent, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.status = "ERROR"
+        child.set_attribute("error", type(e).__name__)
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+
+def traced(name: str) -> Callable:
+    """Decorator running a function (sync or async) in a span() of the given name."""
+    def decorator(function: Callable) -> Callable:
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add_to_trace(key: str, amount: int = 1) -> None:
+    """
+    Add to a counting attribute on the current span and all its ancestors, so e.g.
+    upstream_calls on a span covers everything that ran inside it.
+    """
+    current = _current_span.get()
+    while current is not None:
+        current.add(key, amount)
+        current = current.parent
+
+
+@contextmanager
+def start_trace(name: str, **attributes: Any) -> Iterator[Span]:
+    """Root span of a new trace; exported when it ends."""
+    trace = Trace()
+    root = trace.start(name, None, attributes)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.status = "ERROR"
+        root.set_attribute("error", type(e).__name__)
+        raise
+    finally:
+        _current_span.reset(token)
+        root.end()
+        try:
+            exporter.export(trace.finished())
+        except Exception as e:
+            logger.warning(f"Exporting trace {trace.trace_id} failed: {str(e)}")
+
+
+_NON_TOKEN = re.compile(r"[^A-Za-z0-9!#$%&'*+.^_`|~-]")
+
+
+def server_timing(trace_root: Span, max_entries: int = 64) -> str:
+    """
+    Server-Timing header value with the spans of a trace in start order: the root as
+    "total", durations in ms and the scalar attributes as the description. Spans
+    still running are timed up to now, i.e. what the client waited for.
+    """
+    entries = []
+    for entry in trace_root.trace.spans[:max_entries]:
+        name = "total" if entry is trace_root else _NON_TOKEN.sub("_", entry.name)
+        details = ",".join(
+            f"{key}={value}" for key, value in entry.attributes.items() if isinstance(value, (str, int, float))
+        ).replace("\\", "/").replace('"', "'")
+        description = f';desc="{details}"' if details else ""
+        entries.append(f"{name}{description};dur={entry.elapsed() * 1000:.1f}")
+    return ", ".join(entries)
+
+
+class NoopExporter:
+    """Default: spans are not sent anywhere (the debug header still shows them)."""
+
+    def export(self, spans: List[Span]) -> None:
+        pass
+
+
+class LogExporter:
+    """Logs each finished trace as one line of span dicts, for local debugging."""
+
+    def export(self, spans: List[Span]) -> None:
+        logger.info(f"trace {[span.to_dict() for span in spans]}")
+
+
+class OpenTelemetryExporter:
+    """
+    Replays finished spans into the OpenTelemetry SDK with their original timings and
+    parents, so the SDK's configured span processors/exporters ship them.
+    Requires the opentelemetry-api package.
+    """
+
+    def __init__(self):
+        from opentelemetry import trace as otel_trace
+        self._otel = otel_trace
+        self._tracer = otel_trace.get_tracer(__name__)
+
+    def export(self, spans: List[Span]) -> None:
+        started = {}
+        for entry in spans:
+            parent = started.get(entry.parent_id)
+            context = self._otel.set_span_in_context(parent) if parent is not None else None
+            otel_span = self._tracer.start_span(
+                entry.name, context=context, start_time=entry.start_ns,
+                attributes={key: value for key, value in entry.attributes.items() if value is not None}
+            )
+            if entry.status == "ERROR":
+                otel_span.set_status(self._otel.Status(self._otel.StatusCode.ERROR))
+            started[entry.span_id] = otel_span
+        for entry in reversed(spans):
+            started[entry.span_id].end(end_time=entry.end_ns)
+
+
+def exporter_from_env() -> Any:
+    name = os.environ.get("TRACING_EXPORTER", "none").lower()
+    if name == "log":
+        return LogExporter()
+    if name == "otel":
+        try:
+            return OpenTelemetryExporter()
+        except ImportError:
+            logger.warning("TRACING_EXPORTER=otel but opentelemetry is not installed; spans are not exported")
+    return NoopExporter()
+
+
+exporter = exporter_from_env()
+
+
+def set_exporter(new_exporter: Any) -> None:
+    global exporter
+    exporter = new_exporter
+
+
+def exporting() -> bool:
+    """Whether every request is traced, because spans go somewhere."""
+    return not isinstance(exporter, NoopExporter)
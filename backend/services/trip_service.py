@@ -1,5 +1,6 @@
 # services/trip_service.py
-from typing import List, Dict, Optional
+from collections import Counter
+from typing import List, Dict, Optional, Tuple
 from fastapi import HTTPException
 from .firebase_service import FirebaseService
 from .userhistory_service import UserHistoryService
@@ -83,11 +84,11 @@ class TripService(FirebaseService):
             unused_pois = unused_pois_ref.stream()
             unused_pois_list = [{**doc.to_dict(), 'doc_id': doc.id} for doc in unused_pois]
                         
-            # Convert the trip data into models
-            trip_data_model = TripData(
+            # Documents were written from validated requests: build the models without re-validating
+            trip_data_model = TripData.model_construct(
                 city=trip_data['city'],
                 country=trip_data['country'],
-                coordinates=Coordinates(
+                coordinates=Coordinates.model_construct(
                     lat=trip_data['coordinates'][0],
                     lng=trip_data['coordinates'][1]
                 ),
@@ -103,7 +104,7 @@ class TripService(FirebaseService):
             )
             
             itinerary_pois_models = [
-                ItineraryPOI(
+                ItineraryPOI.model_construct(
                     PointID = poi['doc_id'],
                     StartTime=poi['StartTime'],
                     EndTime=poi['EndTime'],
@@ -114,12 +115,12 @@ class TripService(FirebaseService):
             ]
             
             unused_pois_models = [
-                UnusedPOI(
+                UnusedPOI.model_construct(
                     PointID=poi['doc_id'],
                 ) for poi in unused_pois_list
             ]
             
-            return TripDetails(
+            return TripDetails.model_construct(
                 tripData=trip_data_model,
                 itineraryPOIs=itinerary_pois_models,
                 unusedPOIs=unused_pois_models
@@ -208,4 +209,25 @@ class TripService(FirebaseService):
 
         except Exception as e:
             logging.error(f"Error updating trip: {str(e)}")
-            raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+            raise HTTPException(status_code=500, detail=str(e))
+
+    def top_cities(self, limit: int = 10) -> List[Tuple[str, str, float, float]]:
+        """Most planned cities as (city, country, lat, lng), using the first trip's coordinates."""
+        try:
+            counts = Counter()
+            coordinates = {}
+            docs = self.get_collection_ref(self.collection_name).select(['city', 'country', 'coordinates']).stream()
+            for doc in docs:
+                trip_data = doc.to_dict()
+                city, country = trip_data.get('city'), trip_data.get('country')
+                if not city or not country or len(trip_data.get('coordinates') or []) != 2:
+                    continue
+                counts[(city, country)] += 1
+                coordinates.setdefault((city, country), trip_data['coordinates'])
+            return [
+                (city, country, *coordinates[(city, country)])
+                for (city, country), _ in counts.most_common(limit)
+            ]
+        except Exception as e:
+            logging.error(f"Error getting top cities: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
@@ -1,20 +1,66 @@
+import asyncio
 import logging
 import json
 import re
+import requests
+from datetime import timedelta
+from typing import Optional
 from fastapi import HTTPException
 from services.groq_service import GroqService
 from services.googleplaces_service import GooglePlacesService
-from models.tripgeneration import TripGenerationRequest
+from services.itinerary_cache_service import ItineraryCacheService
+from services.itinerary_validator import ItineraryValidator
+from services.prompt_builder import BuiltPrompt, PromptBuilder
+from services.opening_hours import opening_hours_cache, is_open_batch
+from services.geometry import coordinate_of, distance_matrix_cache
+from services.dedup import DedupIndex
+from services.candidate_ranker import CandidateRanker
+from services.metrics import register_cache
+from services.tracing import current_span, span, traced
+from config.place_categories import place_categories
+from models.tripgeneration import POI, TripGenerationRequest, TripRegenerationRequest
 from models.groq_model import ChatRequest, ChatMessage, MessageRole
-from models.googleplaces import Place
 
 logger = logging.getLogger(__name__)
 
+# POIs of each type that make up a time slot, mirroring the full itinerary prompt
+SLOT_REQUIREMENTS = {
+    "Morning": {"cafe": 1, "attraction": 1},
+    "Afternoon": {"restaurant": 1, "attraction": 1},
+    "Evening": {"restaurant": 1}
+}
+# Representative visit windows (minutes from midnight) per POI type; a candidate can be
+# scheduled on a day if it is open for at least one of its windows
+PLANNING_WINDOWS = {
+    "cafe": [(480, 540)],
+    "restaurant": [(720, 810), (1110, 1200)],
+    "attraction": [(570, 690), (840, 960)]
+}
+# Travel profile used to check gaps between consecutive visits
+TRAVEL_PROFILE = "walking"
+# Search place_type used by _ensure_sufficient_places for each itinerary POI type
+POI_TYPE_TO_PLACE_TYPE = {
+    "cafe": "cafe",
+    "restaurant": "restaurant",
+    "attraction": "tourist_attraction"
+}
+# Candidates gathered per needed place before ranking; served from responses already fetched
+CANDIDATE_OVERFETCH = 3
+# Candidate searches only fetch what planning reads; the client loads full details
+# (batch_details) for the places that end up in the itinerary
+CANDIDATE_FIELD_PROFILE = "minimal"
+
 class TripGenerationService:
     def __init__(self):
         self.groq_service = GroqService()
         self.places_service = GooglePlacesService()
+        self.itinerary_cache = ItineraryCacheService()
+        register_cache("itinerary", self.itinerary_cache.stats)
+        self.itinerary_validator = ItineraryValidator()
+        self.prompt_builder = PromptBuilder()
+        self.candidate_ranker = CandidateRanker()
 
+    @traced("ensure_sufficient_places")
     async def _ensure_sufficient_places(
         self,
         current_places: list,
@@ -22,77 +68,25 @@ class TripGenerationService:
         city_lng: float,
         preferences: list[str],
         place_type: str,
-        additional_places_needed: int
+        additional_places_needed: int,
+        custom_preferences: Optional[list] = None
     ) -> list:
+        current_span().set_attributes({"place_type": place_type, "needed": additional_places_needed})
         try:
-            attraction_type_mapping = {
-                'Museum': ['museum'],
-                'Shopping Malls': ['shopping_mall'],
-                'Art Gallery': ['art_gallery'],
-                'Theatre': ['performing_arts_theater'],
-                'Cultural': ['cultural_landmark'],
-                'Historical': ['historical_place'],
-                'National Park' : ['national_park'],
-                'Gardens' : ['garden'],
-                'Zoo' : ['zoo']
-            }
-            restaurant_type_mapping = {
-                'Italian': ['italian_restaurant'],
-                'Chinese': ['chinese_restaurant'],
-                'Japanese': ['japanese_restaurant'],
-                'Thai': ['thai_restaurant'],
-                'Indian': ['indian_restaurant'],
-                'Mediterranean': ['mediterranean_restaurant'],
-                'French': ['french_restaurant'],
-                'Greek': ['greek_restaurant'],
-                'Mexican': ['mexican_restaurant'],
-                'Korean': ['korean_restaurant'],
-                'Vietnamese': ['vietnamese_restaurant'],
-                'Burger': ['hamburger_restaurant'],
-                'Asian': ['asian_restaurant'],
-                'American': ['american_restaurant'],
-                'Seafood': ['seafood_restaurant'],
-                'Steakhouse': ['steak_house'],
-                'Vegetarian': ['vegetarian_restaurant'],
-                'Breakfast': ['breakfast_restaurant'],
-                'Brunch': ['brunch_restaurant'],
-                'Bakery': ['bakery'],
-                'Cafe': ['cafe'],
-                'Coffee': ['coffee_shop'],
-                'Dessert': ['dessert_shop'],
-                'Ice Cream': ['ice_cream_shop'],
-                'Bar': ['bar'],
-                'pub' : ['pub'],
-                'wine' :['wine_bar']
-            }
-
-            # Pre-compute sets for deduplication
-            existing_locations = {
-                (round(poi.coordinates.lat, 3), round(poi.coordinates.lng, 3))
-                for poi in current_places
-            }
-            existing_names = {
-                poi.name.strip().lower()
-                for poi in current_places
-            }
+            # Track the places already chosen so suggestions never duplicate them
+            seen = DedupIndex()
+            seen.add_many([(poi.name, poi.coordinates.lat, poi.coordinates.lng) for poi in current_places])
             
             additional_places = []
             
             # Step 1: Try to get places based on preferences if available
             matching_preferences = []
             if preferences and additional_places_needed > 0:
-                # Get relevant mapping based on place type
-                type_mapping = None
-                if place_type == "tourist_attraction":
-                    type_mapping = attraction_type_mapping
-                elif place_type == "restaurant" or place_type == "cafe":
-                    type_mapping = restaurant_type_mapping
-                    
-                # Find matching preferences
-                if type_mapping:
-                    for pref in preferences:
-                        if pref in type_mapping:
-                            matching_preferences.append(type_mapping[pref])
+                # Find matching preferences in the mapping for this place type
+                type_mapping = place_categories.preference_mapping(place_type)
+                for pref in preferences:
+                    if pref in type_mapping:
+                        matching_preferences.append(type_mapping[pref])
 
                 # Try to get places based on preferences
                 if matching_preferences:
@@ -101,9 +95,9 @@ class TripGenerationService:
                         city_lat,
                         city_lng,
                         place_type,
-                        existing_names,
-                        existing_locations,
-                        additional_places_needed
+                        seen,
+                        additional_places_needed,
+                        additional_places_needed * CANDIDATE_OVERFETCH
                     )
             
             # Step 2: Fall back to generic search if needed
@@ -113,16 +107,26 @@ class TripGenerationService:
                     city_lat,
                     city_lng,
                     place_type,
-                    existing_names,
-                    existing_locations,
-                    remaining_places_needed
+                    seen,
+                    remaining_places_needed,
+                    remaining_places_needed * CANDIDATE_OVERFETCH
                 )
                 additional_places.extend(generic_places)
-            
-            return additional_places
+
+            # Step 3: Rank the over-fetched candidates and keep the best
+            ranked = self.candidate_ranker.top_k(
+                additional_places,
+                additional_places_needed,
+                center=(city_lat, city_lng),
+                preferred_types=[place_type for types in matching_preferences for place_type in types],
+                custom_preferences=custom_preferences
+            )
+            current_span().set_attributes({"candidates": len(additional_places), "returned": len(ranked)})
+            return [self._create_poi_dict(place, place_type) for place in ranked]
 
         except Exception as e:
             logger.error(f"Error getting additional places: {str(e)}")
+            current_span().set_attribute("error", type(e).__name__)
             return []
 
     async def _search_places_by_types(
@@ -131,40 +135,39 @@ class TripGenerationService:
         city_lat,
         city_lng,
         place_type,
-        existing_names,
-        existing_locations,
-        max_places_needed
+        seen,
+        max_places_needed,
+        max_candidates=None
     ):
-        """Helper method to search places by specific types."""
+        """
+        Helper method to search places by specific types. Searching stops once
+        max_places_needed places are found, but up to max_candidates are kept from
+        the responses already fetched.
+        """
+        max_candidates = max(max_candidates or 0, max_places_needed)
         additional_places = []
         
         # Define types to exclude based on place_type
         excluded_types = self._get_excluded_types_for_place_type(place_type)
         
-        for types in type_lists:
+        for search_type in (search_type for types in type_lists for search_type in types):
             if len(additional_places) >= max_places_needed:
                 break
             
-            suggested_places = self.places_service.nearby_search(
+            suggested_places = await asyncio.to_thread(
+                self.places_service.tiered_nearby_search,
                 latitude=city_lat,
                 longitude=city_lng,
                 radius=3000,
-                type=types,
+                type=search_type,
                 excluded_types=excluded_types,
-                max_results=20
+                max_results=20,
+                profile=CANDIDATE_FIELD_PROFILE
             )
             
-            for place in suggested_places:
-                if len(additional_places) >= max_places_needed:
-                    break
-                
-                if self._is_valid_place(place, place_type, existing_names, existing_locations):
-                    new_poi = self._create_poi_dict(place, place_type)
-                    additional_places.append(new_poi)
-                    
-                    # Update tracking sets
-                    existing_locations.add((round(place.location.latitude, 3), round(place.location.longitude, 3)))
-                    existing_names.add(place.name.strip().lower())
+            additional_places.extend(self._accept_places(
+                suggested_places, place_type, seen, max_candidates - len(additional_places)
+            ))
         
         return additional_places
 
@@ -173,51 +176,35 @@ class TripGenerationService:
         city_lat,
         city_lng,
         place_type,
-        existing_names,
-        existing_locations,
-        max_places_needed
+        seen,
+        max_places_needed,
+        max_candidates=None
     ):
-        """Helper method for generic place search by place_type."""
+        """Helper method for generic place search by place_type (see _search_places_by_types)."""
+        max_candidates = max(max_candidates or 0, max_places_needed)
         additional_places = []
         
         # Define types to exclude based on place_type
         excluded_types = self._get_excluded_types_for_place_type(place_type)
         
-        # Define backup types based on place_type
-        backup_types = []
-        if place_type == "restaurant":
-            backup_types = [
-                "meal_takeaway", "meal_delivery", "food", 
-                "fast_food_restaurant", "fine_dining_restaurant",
-                "breakfast_restaurant", "brunch_restaurant"
-            ]
-        elif place_type == "cafe":
-            backup_types = [
-                "bakery", "coffee_shop", "tea_house", 
-                "breakfast_restaurant", "juice_shop"
-            ]
+        # Backup types searched when place_type alone is not enough
+        backup_types = place_categories.get(place_type).backup_types
         
         # Initial search with provided place_type
-        suggested_places = self.places_service.nearby_search(
+        suggested_places = await asyncio.to_thread(
+            self.places_service.tiered_nearby_search,
             latitude=city_lat,
             longitude=city_lng,
             radius=3000,
             type=place_type,
             excluded_types=excluded_types,
-            max_results=20  
+            max_results=20,
+            profile=CANDIDATE_FIELD_PROFILE
         )
         
-        for place in suggested_places:
-            if len(additional_places) >= max_places_needed:
-                break
-            
-            if self._is_valid_place(place, place_type, existing_names, existing_locations):
-                new_poi = self._create_poi_dict(place, place_type)
-                additional_places.append(new_poi)
-                
-                # Update tracking sets
-                existing_locations.add((round(place.location.latitude, 3), round(place.location.longitude, 3)))
-                existing_names.add(place.name.strip().lower())
+        additional_places.extend(self._accept_places(
+            suggested_places, place_type, seen, max_candidates - len(additional_places)
+        ))
         
         # If we didn't get enough places, try backup types
         if len(additional_places) < max_places_needed and backup_types:
@@ -227,26 +214,20 @@ class TripGenerationService:
                 if len(additional_places) >= max_places_needed:
                     break
                     
-                backup_places = self.places_service.nearby_search(
+                backup_places = await asyncio.to_thread(
+                    self.places_service.tiered_nearby_search,
                     latitude=city_lat,
                     longitude=city_lng,
                     radius=3000,
                     type=backup_type,
                     excluded_types=excluded_types,
-                    max_results=20
+                    max_results=20,
+                    profile=CANDIDATE_FIELD_PROFILE
                 )
                 
-                for place in backup_places:
-                    if len(additional_places) >= max_places_needed:
-                        break
-                    
-                    if self._is_valid_place(place, place_type, existing_names, existing_locations):
-                        new_poi = self._create_poi_dict(place, place_type)
-                        additional_places.append(new_poi)
-                        
-                        # Update tracking sets
-                        existing_locations.add((round(place.location.latitude, 3), round(place.location.longitude, 3)))
-                        existing_names.add(place.name.strip().lower())
+                additional_places.extend(self._accept_places(
+                    backup_places, place_type, seen, max_candidates - len(additional_places)
+                ))
         
         # Last resort: try a more generic text search if we still don't have enough places
         if len(additional_places) < max_places_needed:
@@ -255,86 +236,46 @@ class TripGenerationService:
             # Use a text search with general terms
             search_term = "restaurant" if place_type == "restaurant" else "cafe"
             try:
-                text_results = self.places_service.text_search(
+                text_results = await asyncio.to_thread(
+                    self.places_service.text_search,
                     query=search_term,
                     latitude=city_lat,
                     longitude=city_lng,
                     radius=3000,
-                    max_results=remaining_needed
+                    max_results=remaining_needed,
+                    profile=CANDIDATE_FIELD_PROFILE
                 )
                 
-                for place in text_results:
-                    if len(additional_places) >= max_places_needed:
-                        break
-                    
-                    if self._is_valid_place(place, place_type, existing_names, existing_locations):
-                        new_poi = self._create_poi_dict(place, place_type)
-                        additional_places.append(new_poi)
-                        
-                        # Update tracking sets
-                        existing_locations.add((round(place.location.latitude, 3), round(place.location.longitude, 3)))
-                        existing_names.add(place.name.strip().lower())
-            except:
-                # If text search fails, just continue
-                pass
+                additional_places.extend(self._accept_places(
+                    text_results, place_type, seen, max_candidates - len(additional_places)
+                ))
+            except (requests.exceptions.RequestException, HTTPException, TimeoutError) as e:
+                # Rate limited, circuit open, upstream error or timeout: go with what we have
+                logger.warning(f"Fallback text search for {place_type} failed: {str(e)}")
         
         return additional_places
 
-    def _is_valid_place(self, place, place_type, existing_names, existing_locations):
-        """Check if a place is valid based on duplication and type criteria."""
-        # Check for duplicate name
-        normalized_name = place.name.strip().lower()
-        if normalized_name in existing_names:
-            return False
-        
-        # Check for places at same location
-        rounded_location = (round(place.location.latitude, 3), round(place.location.longitude, 3))
-        if rounded_location in existing_locations:
-            return False
-        
-        # STRICT FILTERING FOR CAFES - only accept places with specific primary_types
-        if place_type == "cafe":
-            # For cafes, ONLY accept if primary_type is one of these specific types
-            cafe_specific_types = ["cafe", "coffee_shop", "bakery"]
-            
-            # If primary_type is None or not in our specific list, reject
-            if not place.primary_type or place.primary_type not in cafe_specific_types:
-                return False
-            
-            return True
-        
-        # For restaurants, more flexible type checking
-        elif place_type == "restaurant":
-            restaurant_types = [
-                "restaurant", "american_restaurant", "asian_restaurant", "barbecue_restaurant",
-                "brazilian_restaurant", "chinese_restaurant", "dessert_restaurant", 
-                "fast_food_restaurant", "fine_dining_restaurant", "french_restaurant", 
-                "greek_restaurant", "hamburger_restaurant", "indian_restaurant", 
-                "indonesian_restaurant", "italian_restaurant", "japanese_restaurant", 
-                "korean_restaurant", "lebanese_restaurant", "mediterranean_restaurant", 
-                "mexican_restaurant", "middle_eastern_restaurant", "pizza_restaurant", 
-                "ramen_restaurant", "seafood_restaurant", "spanish_restaurant", 
-                "steak_house", "sushi_restaurant", "thai_restaurant", "turkish_restaurant", 
-                "vegan_restaurant", "vegetarian_restaurant", "vietnamese_restaurant"
-            ]
-            
-            # First check primary_type if available
-            if place.primary_type:
-                if place.primary_type in restaurant_types or place.primary_type.endswith("restaurant"):
-                    # Explicitly exclude places that could be cafes
-                    cafe_specific_types = ["cafe", "coffee_shop", "bakery"]
-                    if place.primary_type in cafe_specific_types:
-                        return False
-                    return True
-            
-            # If we get here, the primary type wasn't clearly a restaurant, reject
-            return False
-        
-        # For attraction or other types, always return true (no filtering)
-        elif place_type == "tourist_attraction":
-            return True
-        
-        return False
+    def _accept_places(self, places, place_type, seen, max_places):
+        """
+        Up to max_places of the given places that pass the type criteria and do not
+        duplicate anything in `seen`, deduplicated as one batch.
+        """
+        if max_places <= 0:
+            return []
+        typed = [place for place in places if self._is_valid_place(place, place_type)]
+        kept = seen.filter_batch(
+            [(place.name, place.location.latitude, place.location.longitude) for place in typed],
+            limit=max_places
+        )
+        places_span = current_span()
+        places_span.add("candidates_kept", len(kept))
+        places_span.add("candidates_rejected", len(places) - len(kept))
+        return [typed[index] for index in kept]
+
+    def _is_valid_place(self, place, place_type):
+        """Check if a place is valid based on the type criteria of its category."""
+        category = place_categories.categories.get(place_type)
+        return category is not None and category.accepts(place.primary_type)
 
     def _create_poi_dict(self, place, place_type):
         """Create a standardized POI dictionary from a place object."""
@@ -345,11 +286,63 @@ class TripGenerationService:
             'coordinates': {
                 'lat': place.location.latitude,
                 'lng': place.location.longitude
-            }
+            },
+            'opening_hours': place.opening_periods or place.opening_hours
         }
 
+    def _compile_hours(self, candidates_by_type: dict) -> dict:
+        """Compiled opening hours per place_id for candidates whose hours are known."""
+        hours = {}
+        for pois in candidates_by_type.values():
+            for poi in pois:
+                place_id = poi['place_id'] if isinstance(poi, dict) else poi.place_id
+                raw = poi.get('opening_hours') if isinstance(poi, dict) else getattr(poi, 'opening_hours', None)
+                compiled = opening_hours_cache.get(place_id, raw)
+                if compiled is not None:
+                    hours[place_id] = compiled
+        return hours
+
+    def _closed_days(self, candidates_by_type: dict, hours: dict, trip_start, day_numbers: list) -> dict:
+        """
+        Map place_id -> trip day numbers on which the candidate cannot be visited,
+        checking every candidate of a type against every (day, window) slot in one pass.
+        """
+        closed = {}
+        for poi_type, pois in candidates_by_type.items():
+            windows = PLANNING_WINDOWS.get(poi_type, [])
+            place_ids = [poi['place_id'] if isinstance(poi, dict) else poi.place_id for poi in pois]
+            known = [place_id for place_id in place_ids if place_id in hours]
+            if not known or not windows:
+                continue
+            weekdays, starts, ends = [], [], []
+            for day in day_numbers:
+                weekday = (trip_start + timedelta(days=day - 1)).weekday()
+                for start, end in windows:
+                    weekdays.append(weekday)
+                    starts.append(start)
+                    ends.append(end)
+            open_matrix = is_open_batch([hours[place_id] for place_id in known], weekdays, starts, ends)
+            open_by_day = open_matrix.reshape(len(known), len(day_numbers), len(windows)).any(axis=2)
+            for place_id, open_days in zip(known, open_by_day):
+                closed_days = [day for day, is_open in zip(day_numbers, open_days) if not is_open]
+                if closed_days:
+                    closed[place_id] = closed_days
+        return closed
+
+    @traced("generate_trip")
     async def generate_trip(self, request: TripGenerationRequest) -> str:
         try:
+            trip_span = current_span()
+            trip_span.set_attributes({"city": request.trip_data.city, "days": request.trip_data.monthly_days})
+            cache_key = None
+            if request.use_cache:
+                cache_key = self.itinerary_cache.build_key(request)
+                cached_itinerary = self.itinerary_cache.get(cache_key)
+                trip_span.set_attribute("cache_hit", cached_itinerary is not None)
+                if cached_itinerary is not None:
+                    logger.info(f"Itinerary cache hit for {request.trip_data.city} ({cache_key[:12]})")
+                    return cached_itinerary
+
             num_days = request.trip_data.monthly_days
             required_breakfast_places = num_days
             required_restaurant_places = num_days * 2 
@@ -384,7 +377,8 @@ class TripGenerationService:
                     city_lng=request.trip_data.coordinates.lng,
                     preferences=request.trip_data.food_preferences,
                     place_type="cafe",
-                    additional_places_needed=additional_breakfast_needed
+                    additional_places_needed=additional_breakfast_needed,
+                    custom_preferences=request.trip_data.custom_food_preferences
                 )
             
             # Get additional restaurant places if needed
@@ -395,7 +389,8 @@ class TripGenerationService:
                     city_lng=request.trip_data.coordinates.lng,
                     preferences=request.trip_data.food_preferences,
                     place_type="restaurant",
-                    additional_places_needed=additional_restaurant_needed
+                    additional_places_needed=additional_restaurant_needed,
+                    custom_preferences=request.trip_data.custom_food_preferences
                 )
             
             if additional_attractions_needed > 0:
@@ -405,48 +400,106 @@ class TripGenerationService:
                     city_lng=request.trip_data.coordinates.lng,
                     preferences=request.trip_data.interests,
                     place_type="tourist_attraction",
-                    additional_places_needed=additional_attractions_needed  
+                    additional_places_needed=additional_attractions_needed,
+                    custom_preferences=request.trip_data.custom_interests
                 )
             
+            # Drop suggestions that are closed on every day of the trip and tell the LLM about the rest
+            trip_start = request.trip_data.fromDT.date()
+            day_numbers = list(range(1, num_days + 1))
+            candidates_by_type = {
+                "cafe": list(existing_breakfast_places) + suggested_breakfast_places,
+                "restaurant": list(existing_restaurant_places) + suggested_restaurant_places,
+                "attraction": list(existing_attraction_places) + suggested_attraction_places
+            }
+            opening_hours = self._compile_hours(candidates_by_type)
+            closed_days = self._closed_days(candidates_by_type, opening_hours, trip_start, day_numbers)
+            always_closed = {place_id for place_id, days in closed_days.items() if len(days) == num_days}
+            if always_closed:
+                logger.info(f"Dropping {len(always_closed)} suggested places closed for the whole trip")
+                suggested_breakfast_places = [poi for poi in suggested_breakfast_places if poi['place_id'] not in always_closed]
+                suggested_restaurant_places = [poi for poi in suggested_restaurant_places if poi['place_id'] not in always_closed]
+                suggested_attraction_places = [poi for poi in suggested_attraction_places if poi['place_id'] not in always_closed]
+
             # Create prompt with updated request data
-            prompt = self._create_prompt(request, existing_breakfast_places, existing_restaurant_places, existing_attraction_places, suggested_breakfast_places, suggested_restaurant_places, suggested_attraction_places)
+            prompt = self._create_prompt(request, existing_breakfast_places, existing_restaurant_places, existing_attraction_places, suggested_breakfast_places, suggested_restaurant_places, suggested_attraction_places, closed_days)
             
             # Create ChatRequest
             chat_request = ChatRequest(
                 messages=[
                     ChatMessage(
                         role=MessageRole.SYSTEM,
-                        content="You are a travel itinerary planner. Generate a detailed day-by-day itinerary in JSON. Only output the JSON string and no other text "
+                        content=prompt.system
                     ),
                     ChatMessage(
                         role=MessageRole.USER,
-                        content=prompt
+                        content=prompt.user
                     )
                 ],
                 stream=False
             )
             
-            # Get completion from Groq
-            completion = await self.groq_service.create_chat_completion(chat_request)
-    
-            # Extract content between backticks
-            pattern = r'```\s*(.*?)\s*```'
-            match = re.search(pattern, completion.content, re.DOTALL)
-            if match:
-                json_str = match.group(1)
-                
-                if json_str.startswith('json'):
-                    json_str = json_str[4:].strip()
-                itinerary_dict = json.loads(json_str)
-                itinerary_json = json.dumps(itinerary_dict)
-                return itinerary_json
+            allowed_place_ids = [candidate['place_id'] for candidate in prompt.aliases.values()]
+
+            checked = {}
+
+            def check_completion(completion):
+                """
+                The expanded itinerary of a response and its structural problems (JSON,
+                allowed place IDs, day count), worked out once per response.
+                """
+                if completion.content not in checked:
+                    with span("check_completion", model=completion.model) as check_span:
+                        try:
+                            itinerary = self.prompt_builder.expand_itinerary(
+                                self._extract_itinerary(completion.content),
+                                prompt.aliases
+                            )
+                        except Exception as e:
+                            check_span.set_attribute("valid_json", False)
+                            checked[completion.content] = (None, [f"Response did not contain a JSON itinerary: {str(e)}"])
+                        else:
+                            problems = self.itinerary_validator.validate(
+                                itinerary, num_days=num_days, allowed_place_ids=allowed_place_ids
+                            )
+                            check_span.set_attribute("problems", len(problems))
+                            checked[completion.content] = (itinerary, problems)
+                return checked[completion.content]
+
+            # Get completion from Groq, hedging onto faster models if the primary is slow or unusable.
+            # Only structural problems start another call: scheduling problems just skip the cache
+            completion = await self.groq_service.create_hedged_completion(
+                chat_request,
+                accept=lambda response: not check_completion(response)[1]
+            )
+            self._log_token_usage("generate", prompt, completion)
 
-            else:
+            itinerary_dict, problems = check_completion(completion)
+            if itinerary_dict is None:
                 logger.error("No json content found in groq response")
                 raise HTTPException(
                     status_code=500,
                     detail="Failed to extract valid json from GROQ response"
                 )
+            if not problems:
+                with span("check_schedule") as schedule_span:
+                    problems = self.itinerary_validator.validate(
+                        itinerary_dict,
+                        num_days=num_days,
+                        allowed_place_ids=allowed_place_ids,
+                        trip_start=trip_start,
+                        opening_hours=opening_hours,
+                        travel_profile=TRAVEL_PROFILE
+                    )
+                    schedule_span.set_attribute("problems", len(problems))
+            itinerary_json = json.dumps(itinerary_dict)
+
+            if problems:
+                logger.warning(f"Itinerary has {len(problems)} validation problems, not caching: {problems[:3]}")
+            elif cache_key is not None:
+                self.itinerary_cache.set(cache_key, itinerary_json)
+
+            return itinerary_json
 
         except Exception as e:
             logger.error(f"Error generating trip: {str(e)}", exc_info=True)
@@ -455,199 +508,239 @@ class TripGenerationService:
                 detail=f"Error generating trip: {str(e)}"
             )
 
-    def _create_prompt(self, request: TripGenerationRequest, cafes: list, restaurants: list, attractions: list, suggested_cafes: list, suggested_restaurants: list, suggested_attractions: list) -> str:
+    async def regenerate_slice(self, request: TripRegenerationRequest) -> str:
+        """
+        Regenerate a single day (or one time slot of a day) of an existing itinerary.
+        Every other slot is kept fixed; candidates come from the Unused pool and any
+        client-supplied candidates first, and only the shortfall is searched upstream.
+        """
         try:
-            date_info = f"from {request.trip_data.fromDT} to {request.trip_data.toDT}"
-            num_days = request.trip_data.monthly_days
-            
-            # Initialize lists for all places
-            all_attractions = []
-            all_restaurants = []
-            all_cafes = []
-
-            # Helper function to format place string
-            def format_place(poi, place_type):
-                if isinstance(poi, Place):
-                    return f"- ID: {poi.place_id}, {poi.name} ({place_type}) - Located at lat: {poi.location.latitude}, lng: {poi.location.longitude}"
-                elif isinstance(poi, dict):
-                    return f"- ID: {poi['place_id']}, {poi['name']} ({place_type}) - Located at lat: {poi['coordinates']['lat']}, lng: {poi['coordinates']['lng']}"
-                else:
-                    return f"- ID: {poi.place_id}, {poi.name} ({place_type}) - Located at lat: {poi.coordinates.lat}, lng: {poi.coordinates.lng}"
-
-            # Add selected and suggested attractions
-            for poi in attractions:
-                all_attractions.append(format_place(poi, "attraction"))
-            for poi in suggested_attractions:
-                all_attractions.append(format_place(poi, "attraction"))
-
-            # Add selected and suggested restaurants
-            for poi in restaurants:
-                all_restaurants.append(format_place(poi, "restaurant"))
-            for poi in suggested_restaurants:
-                all_restaurants.append(format_place(poi, "restaurant"))
-
-            # Add selected and suggested cafes
-            for poi in cafes:
-                all_cafes.append(format_place(poi, "cafe"))
-            for poi in suggested_cafes:
-                all_cafes.append(format_place(poi, "cafe"))
-
-            # Create combined sections
-            attractions_section = "Available attraction list:\n" + "\n".join(all_attractions) if all_attractions else "No attractions available"
-            restaurants_section = "Available restaurant list:\n" + "\n".join(all_restaurants) if all_restaurants else "No restaurants available"
-            cafes_section = "Available cafe list:\n" + "\n".join(all_cafes) if all_cafes else "No cafes available"
-            return f"""Create a detailed {num_days}-day itinerary for {request.trip_data.city}, {request.trip_data.country} {date_info}.
-
-    {attractions_section}
-
-    {restaurants_section}
-
-    {cafes_section}
-
-    1. Return the response in valid JSON format with the exact structure shown below:
-    {{  
-    "Day 1": {{  
-        "Morning": {{  
-            "POI": {{  
-                "place_id_1": {{  
-                    "name": "Cafe Name",  
-                    "type": "cafe",  
-                    "duration": "1.5 hours",  
-                    "StartTime": "8:00",  
-                    "EndTime": "9:00",  
-                    "coordinates": {{  
-                        "lat": 53.4808,  
-                        "lng": -2.2426  
-                    }}  
-                }},  
-                "place_id_2": {{  
-                    "name": "Attraction Name",  
-                    "type": "attraction",  
-                    "duration": "2 hours",  
-                    "StartTime": "9:30",  
-                    "EndTime": "11:30",  
-                    "coordinates": {{  
-                        "lat": 53.4808,  
-                        "lng": -2.2426  
-                    }}  
-                }}  
-            }}  
-        }},  
-        "Afternoon": {{  
-            "POI": {{  
-                "place_id_3": {{  
-                    "name": "Restaurant Name",  
-                    "type": "restaurant",  
-                    "duration": "1.5 hours",  
-                    "StartTime": "12:00",  
-                    "EndTime": "13:30",  
-                    "coordinates": {{  
-                        "lat": 53.4808,  
-                        "lng": -2.2426  
-                    }}  
-                }},  
-                "place_id_4": {{  
-                    "name": "Attraction Name",  
-                    "type": "attraction",  
-                    "duration": "2 hours",  
-                    "StartTime": "14:00",  
-                    "EndTime": "16:00",  
-                    "coordinates": {{  
-                        "lat": 53.4808,  
-                        "lng": -2.2426  
-                    }}  
-                }}  
-            }}  
-        }},  
-        "Evening": {{  
-            "POI": {{  
-                "place_id_5": {{  
-                    "name": "Restaurant Name",  
-                    "type": "restaurant",  
-                    "duration": "1.5 hours",  
-                    "StartTime": "18:30",  
-                    "EndTime": "20:00",  
-                    "coordinates": {{  
-                        "lat": 53.4808,  
-                        "lng": -2.2426  
-                    }}  
-                }}  
-            }}  
-        }}  
-    }},  
-    "Unused": {{  
-        "Attractions": [  
-            {{  
-                "place_id": "id_1",  
-                "name": "attraction name",
-                "type": "attraction"
-            }}  
-        ],  
-        "Restaurants": [  
-            {{  
-                "place_id": "id_2",  
-                "name": "restaurant name",
-                "type": "restaurant"
-            }}  
-        ]  
-    }}  
-}}
-
-    2. IMPORTANT Rules:
-    - Each place_id from the available attractions, restaurants and cafes MUST be used EXACTLY ONCE in the entire itinerary
-    - DO NOT reuse any place_id or create new ones - only use place_ids from the available attractions, restaurants and cafes lists
-    - Each place must appear in its designated type (cafe for breakfast, restaurant for lunch/dinner)
-    - Each Morning starts with breakfast from Available cafe list (8:00-9:00)
-    - Each Afternoon starts with lunch from Available restaurant list (12:00-14:00)
-    - Each Evening starts with dinner from Available restaurant list (18:30-20:30)
-    - The "Unused" section must contain only place_ids from the available attractions, restaurants and cafes lists that were NOT used in the json itinerary
-
-    3. Location-based planning:
-    - Use the provided coordinates to optimize the route
-    - Group nearby attractions together to minimize travel time
-    - Allow 15 minutes per kilometer for travel time between locations
-
-    4. Timing Guidelines:
-    - Morning activities: 8:00-12:00
-    - Afternoon activities: 12:00-18:00
-    - Evening activities: 18:00-22:00
-    - Attractions: 2-3 hours per visit
-    - Meals: 1-2 hours per meal
-
-    5. Unused Section Rules:
-    - List all unused place IDs in their respective categories
-    - If all places are used, return empty arrays
-
-    Before returning the response:
-    - Verify NO DUPLICATE place_ids appear in the itinerary
-    - Verify that all place_ids and name in the itinerary match the available attraction, restaurant and cafe lists exactly. If any mismatches are found, correct them before returning the response
-    - Confirm each place is used in its correct type (cafe/restaurant/attraction) and only 2 restaurants and 1 cafe per day are used
-    - Any itinerary that contains mismatched or repeated place_ids will be considered invalid and must be corrected before submission."
-    - Check the Unused section only contains truly unused places"""
+            itinerary = json.loads(json.dumps(request.itinerary))
+            day_key = f"Day {request.day}"
+            if day_key not in itinerary:
+                raise HTTPException(status_code=404, detail=f"{day_key} not found in itinerary")
+
+            target_slots = [request.time_slot] if request.time_slot else list(SLOT_REQUIREMENTS.keys())
+            required = {}
+            for slot in target_slots:
+                for poi_type, count in SLOT_REQUIREMENTS[slot].items():
+                    required[poi_type] = required.get(poi_type, 0) + count
+
+            # POIs being replaced go back into the pool; everything else stays fixed
+            released = []
+            for slot in target_slots:
+                for place_id, poi in itinerary[day_key].get(slot, {}).get("POI", {}).items():
+                    released.append({**poi, "place_id": place_id})
+            fixed_place_ids = {
+                place_id
+                for key, day in itinerary.items() if key.startswith("Day ")
+                for slot_name, slot in day.items()
+                if not (key == day_key and slot_name in target_slots)
+                for place_id in slot.get("POI", {})
+            }
+
+            pool = self._build_candidate_pool(itinerary.get("Unused", {}), request.candidate_pois, fixed_place_ids)
+            released_ids = {poi["place_id"] for poi in released}
+
+            # Only search upstream for the types the pool cannot cover, asking for one spare alternative
+            fixed_pois = [
+                POI(place_id=place_id, name=poi["name"], type=poi["type"], coordinates=poi["coordinates"])
+                for key, day in itinerary.items() if key.startswith("Day ")
+                for slot in day.values()
+                for place_id, poi in slot.get("POI", {}).items()
+                if poi.get("name") and poi.get("coordinates")
+            ]
+            # Prefer candidates close to what stays planned on the target day
+            anchors = [
+                point
+                for slot_name, slot in itinerary[day_key].items() if slot_name not in target_slots
+                for point in map(coordinate_of, slot.get("POI", {}).values()) if point is not None
+            ]
+            # Candidates with known hours that are closed on the target day are not offered
+            trip_start = request.trip_data.fromDT.date()
+            pool_hours = self._compile_hours(pool)
+            closed_on_day = self._closed_days(pool, pool_hours, trip_start, [request.day])
+
+            candidates = {}
+            for poi_type, count in required.items():
+                wanted = count + 1
+                fresh = [
+                    poi for poi in pool.get(poi_type, [])
+                    if poi["place_id"] not in released_ids and poi["place_id"] not in closed_on_day
+                ]
+                candidates[poi_type] = self._nearest_first(fresh, anchors)[:wanted]
+                if len(candidates[poi_type]) < count:
+                    shortfall = wanted - len(candidates[poi_type])
+                    place_type = POI_TYPE_TO_PLACE_TYPE[poi_type]
+                    candidates[poi_type].extend(await self._ensure_sufficient_places(
+                        current_places=fixed_pois,
+                        city_lat=request.trip_data.coordinates.lat,
+                        city_lng=request.trip_data.coordinates.lng,
+                        preferences=request.trip_data.interests if poi_type == "attraction" else request.trip_data.food_preferences,
+                        place_type=place_type,
+                        additional_places_needed=shortfall,
+                        custom_preferences=request.trip_data.custom_interests if poi_type == "attraction" else request.trip_data.custom_food_preferences
+                    ))
+                # Fall back to the released POIs if nothing new could be found
+                if len(candidates[poi_type]) < count:
+                    candidates[poi_type].extend(
+                        poi for poi in released if poi.get("type") == poi_type
+                    )
+
+            prompt = self.prompt_builder.build_slice_prompt(
+                request, itinerary[day_key], target_slots, candidates, SLOT_REQUIREMENTS
+            )
+            chat_request = ChatRequest(
+                messages=[
+                    ChatMessage(
+                        role=MessageRole.SYSTEM,
+                        content=prompt.system
+                    ),
+                    ChatMessage(
+                        role=MessageRole.USER,
+                        content=prompt.user
+                    )
+                ],
+                stream=False
+            )
+            def uses_only_candidates(response):
+                try:
+                    slots = self._extract_itinerary(response.content)
+                except Exception:
+                    return False
+                return all(
+                    alias in prompt.aliases
+                    for slot in target_slots
+                    for alias in slots.get(slot, {}).get("POI", {})
+                )
+
+            completion = await self.groq_service.create_hedged_completion(chat_request, accept=uses_only_candidates)
+            self._log_token_usage("regenerate", prompt, completion)
+            regenerated = self.prompt_builder.expand_slots(
+                self._extract_itinerary(completion.content),
+                prompt.aliases
+            )
+
+            candidate_by_id = {
+                poi["place_id"]: poi for pois in candidates.values() for poi in pois
+            }
+            used_ids = set()
+            for slot in target_slots:
+                slot_pois = regenerated.get(slot, {}).get("POI", {})
+                unknown = [place_id for place_id in slot_pois if place_id not in candidate_by_id]
+                if unknown:
+                    raise HTTPException(
+                        status_code=500,
+                        detail=f"Regenerated {slot} uses place_ids outside the candidate list: {unknown}"
+                    )
+                used_ids.update(slot_pois)
+                itinerary[day_key][slot] = {"POI": slot_pois}
+
+            # Rebuild the Unused section: old pool + released POIs + new candidates, minus what is now used
+            unused_pool = {
+                poi["place_id"]: poi
+                for pois in pool.values() for poi in pois
+            }
+            unused_pool.update({poi["place_id"]: poi for poi in released})
+            unused_pool.update(candidate_by_id)
+            itinerary["Unused"] = {"Attractions": [], "Restaurants": []}
+            for place_id, poi in unused_pool.items():
+                if place_id in used_ids or place_id in fixed_place_ids:
+                    continue
+                section = "Attractions" if poi.get("type") == "attraction" else "Restaurants"
+                itinerary["Unused"][section].append({
+                    "place_id": place_id,
+                    "name": poi.get("name"),
+                    "type": poi.get("type"),
+                    "coordinates": poi.get("coordinates")
+                })
+
+            problems = self.itinerary_validator.validate(itinerary)
+            if problems:
+                logger.warning(f"Regenerated itinerary has validation problems: {problems[:3]}")
+
+            return json.dumps(itinerary)
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error regenerating itinerary slice: {str(e)}", exc_info=True)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error regenerating itinerary: {str(e)}"
+            )
+
+    def _nearest_first(self, candidates: list, anchors: list) -> list:
+        """Order candidates by distance to the closest anchor; unlocated candidates go last."""
+        located = [(index, coordinate_of(poi)) for index, poi in enumerate(candidates)]
+        located = [(index, point) for index, point in located if point is not None]
+        if not anchors or not located:
+            return list(candidates)
+        distances = distance_matrix_cache.matrix([point for _, point in located], anchors).min(axis=1)
+        order = [located[i][0] for i in distances.argsort(kind="stable")]
+        located_ids = {index for index, _ in located}
+        return [candidates[i] for i in order] + [poi for i, poi in enumerate(candidates) if i not in located_ids]
+
+    def _build_candidate_pool(self, unused: dict, candidate_pois: list, excluded_place_ids: set) -> dict:
+        """Group Unused entries and client-supplied candidates by POI type."""
+        pool = {}
+        seen = set(excluded_place_ids)
+        entries = [poi for section in unused.values() if isinstance(section, list) for poi in section]
+        entries.extend(poi.model_dump() for poi in candidate_pois)
+        for entry in entries:
+            place_id = entry.get("place_id")
+            poi_type = entry.get("type")
+            if not place_id or place_id in seen or poi_type not in POI_TYPE_TO_PLACE_TYPE:
+                continue
+            seen.add(place_id)
+            pool.setdefault(poi_type, []).append(entry)
+        return pool
+
+    def _log_token_usage(self, operation: str, prompt, completion) -> None:
+        """Log estimated prompt size next to the token usage reported by Groq."""
+        counts = prompt.token_counts
+        logger.info(
+            f"{operation} prompt: ~{counts['total_tokens']} tokens "
+            f"(system {counts['system_tokens']}, user {counts['user_tokens']}), "
+            f"{counts['candidates']} candidates, {counts['candidates_trimmed']} trimmed; "
+            f"groq usage: prompt={completion.prompt_tokens}, completion={completion.completion_tokens}"
+        )
+
+    def _extract_itinerary(self, content: str) -> dict:
+        """Extract the itinerary JSON object from a fenced block in the LLM response."""
+        # Extract content between backticks
+        pattern = r'```\s*(.*?)\s*```'
+        match = re.search(pattern, content, re.DOTALL)
+        if not match:
+            logger.error("No json content found in groq response")
+            raise HTTPException(
+                status_code=500,
+                detail="Failed to extract valid json from GROQ response"
+            )
+
+        json_str = match.group(1)
+        if json_str.startswith('json'):
+            json_str = json_str[4:].strip()
+        return json.loads(json_str)
+
+    @traced("create_prompt")
+    def _create_prompt(self, request: TripGenerationRequest, cafes: list, restaurants: list, attractions: list, suggested_cafes: list, suggested_restaurants: list, suggested_attractions: list, closed_days: dict = None) -> BuiltPrompt:
+        try:
+            prompt = self.prompt_builder.build_itinerary_prompt(
+                request,
+                selected={"attraction": attractions, "restaurant": restaurants, "cafe": cafes},
+                suggested={"attraction": suggested_attractions, "restaurant": suggested_restaurants, "cafe": suggested_cafes},
+                closed_days=closed_days
+            )
+            prompt_span = current_span()
+            if prompt_span.is_recording():
+                prompt_span.set_attribute("prompt_chars", len(prompt.system) + len(prompt.user))
+                prompt_span.set_attributes(prompt.token_counts)
+            return prompt
         except Exception as e:
             logger.error(f"Error creating prompt: {str(e)}")
             raise HTTPException(status_code=500, detail="Failed to create prompt")
 
     def _get_excluded_types_for_place_type(self, place_type):
-        """Get a list of excluded types based on the place type being searched."""
-        # Common excluded types for all food establishments
-        common_excluded_types = [
-            "hotel", "lodging", "motel", "resort_hotel", "bed_and_breakfast", 
-            "inn", "guest_house", "department_store", "shopping_mall"
-        ]
-        
-        if place_type == "cafe":
-            # Additional exclusions specific to cafes
-            return common_excluded_types + [
-                "art_gallery", "art_studio", "auditorium", "cultural_landmark",
-                "historical_place", "monument", "museum", "performing_arts_theater",
-                "sculpture", "restaurant"  # Exclude restaurants from cafe results
-            ]
-        elif place_type == "restaurant":
-            # Additional exclusions for restaurants
-            return common_excluded_types + [
-                "cafe", "coffee_shop", "bakery"  # Exclude cafes from restaurant results
-            ]
-        else:
-            # For attractions or other types, use a different set of exclusions if needed
-            return [] if place_type == "tourist_attraction" else common_excluded_types
\ No newline at end of file
+        """Get the excluded types for the place type being searched."""
+        return place_categories.get(place_type).excluded_types
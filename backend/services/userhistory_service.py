@@ -1,12 +1,15 @@
-from datetime import datetime
+import asyncio
 import logging
-from models.trip import UserTrip
+from datetime import datetime, timezone
 from .firebase_service import FirebaseService
-from models.userhistory import SavedPOI
 from firebase_admin import firestore
-from typing import List, Dict
+from models.pointofinterest import PointOfInterestResponse
+from typing import AsyncIterator, List, Dict, Optional, Union
 from fastapi import HTTPException
 from .pointofinterest_service import PointOfInterestService
+from .pagination import Page, fetch_page
+from .metrics import observe_upstream
+from .history_summary import build_summary, record_poi_saved, record_poi_unsaved, record_trip_removed, record_trip_saved
 
 
 class UserHistoryService(FirebaseService):
@@ -15,7 +18,13 @@ class UserHistoryService(FirebaseService):
         self.collection_name = 'UserHistory'
         self.poi_service = PointOfInterestService()
 
-    async def get_saved_pois(self, user_id: str, city: str) -> List[SavedPOI]:
+    async def get_saved_pois(self, user_id: str, city: str) -> List[Dict]:
+        return (await self.get_saved_pois_page(user_id, city)).items
+
+    async def get_saved_pois_page(self, user_id: str, city: Optional[str], limit: Optional[int] = None,
+                                  cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> Page:
+        """Saved POIs, newest first a page at a time when a limit or cursor is given.
+        `fields` projects the documents to those fields (plus the ID)."""
         try:
             doc_ref = self.get_collection_ref(self.collection_name).document(user_id)
             saved_pois_ref = doc_ref.collection('savedPOIs')
@@ -28,16 +37,23 @@ class UserHistoryService(FirebaseService):
                 query = query.where('city', '==', city.lower())
                 
             # Execute query
-            saved_pois = query.get()
+            saved_pois, next_cursor = fetch_page(query, 'createdDT', limit, cursor, fields)
             
-            return [SavedPOI(
-                id=poi.id,
-                pointID=poi.get('pointID'),
-                status=poi.get('status'),
-                createdDT=poi.get('createdDT'),
-                city=poi.get('city')
-            ).model_dump() for poi in saved_pois]
+            # Same shape as SavedPOI, read straight from our own documents without validation
+            if fields:
+                items = [{'id': poi.id, **{name: poi.get(name) for name in fields}} for poi in saved_pois]
+            else:
+                items = [{
+                    'id': poi.id,
+                    'pointID': poi.get('pointID'),
+                    'status': poi.get('status'),
+                    'createdDT': poi.get('createdDT'),
+                    'city': poi.get('city')
+                } for poi in saved_pois]
+            return Page(items, next_cursor)
 
+        except HTTPException:
+            raise
         except Exception as e:
             print(f"Error in get_saved_pois: {str(e)}")
             raise HTTPException(
@@ -45,17 +61,68 @@ class UserHistoryService(FirebaseService):
                 detail=f"Error fetching saved POIs: {str(e)}"
             )
 
+    async def get_saved_point_ids(self, user_id: str, city: Optional[str]) -> List[str]:
+        """IDs of the points a user has saved (in a city), reading only the pointID field."""
+        try:
+            query = self.get_collection_ref(self.collection_name).document(user_id) \
+                .collection('savedPOIs').where('status', '==', True)
+            if city:
+                query = query.where('city', '==', city.lower())
+            with observe_upstream("firestore", "query"):
+                saved_pois = await asyncio.to_thread(query.select(['pointID']).get)
+            return [poi.get('pointID') for poi in saved_pois]
+        except Exception as e:
+            logging.error(f"Error fetching saved point IDs: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error fetching saved POIs: {str(e)}")
+
     async def get_detailed_saved_pois(self, user_id: str, city: str) -> List[Dict]:
-        saved_pois = await self.get_saved_pois(user_id, city)
-        poi_ids = [poi['pointID'] for poi in saved_pois]
-        return await self.poi_service.get_points(poi_ids)
+        return await self.poi_service.get_points(await self.get_saved_point_ids(user_id, city))
+
+    async def stream_detailed_saved_pois(
+        self, user_id: str, city: Optional[str]
+    ) -> AsyncIterator[Union[PointOfInterestResponse, Dict]]:
+        """
+        Saved POIs with their details, each yielded as soon as it is read: the saved IDs
+        go straight into the POI cache and concurrent batch reads. The ID query runs
+        before the first item, so its errors still surface as an error response; a
+        later failure ends the stream with an {"error": ...} item, so a client can tell
+        a truncated list from a complete one.
+        """
+        point_ids = await self.get_saved_point_ids(user_id, city)
+
+        async def points() -> AsyncIterator[Union[PointOfInterestResponse, Dict]]:
+            try:
+                async for point in self.poi_service.iter_points(point_ids):
+                    yield point
+            except Exception as e:
+                # Headers are sent by now: end the stream with an error line rather than fail mid-line
+                logging.error(f"Error streaming saved POI details: {str(e)}")
+                yield {"error": str(e)}
+
+        return points()
     
+    def read_summary(self, transaction, user_ref) -> Optional[Dict]:
+        """The user's history summary as read in the transaction; None until it has been built."""
+        snapshot = user_ref.get(transaction=transaction)
+        if not snapshot.exists:
+            return None
+        return (snapshot.to_dict() or {}).get('summary')
+
+    def write_summary(self, transaction, user_ref, summary: Dict) -> None:
+        # Listed fields are replaced as a whole, so cities whose count dropped to zero go away
+        transaction.set(
+            user_ref,
+            {'summary': summary, 'summaryUpdatedDT': firestore.SERVER_TIMESTAMP},
+            merge=['summary', 'summaryUpdatedDT']
+        )
+
     async def save_poi(self, user_id: str, point_id: str, city: str) -> str:
         """Save POI to user's saved collection. Handles duplicate entries by:
             - Checking if POI already exists for the user
             - If it exists and status is False, updates it to True
             - If it exists and status is True, returns existing ID
             - If it doesn't exist, creates new entry
+            The user's history summary is updated in the same transaction.
             
             Returns:
                 str: Document ID of the saved/updated POI"""
@@ -66,39 +133,52 @@ class UserHistoryService(FirebaseService):
 
             # Query for existing POI with matching pointID
             existing_poi_query = saved_pois_ref.where('pointID', '==', point_id).limit(1)
-            existing_docs = existing_poi_query.get()
+            transaction = self.db.transaction()
 
-            if existing_docs:
-                existing_doc = existing_docs[0]
-                existing_status = existing_doc.get('status')
+            @firestore.transactional
+            def save_in_transaction(transaction):
+                # Reads must all come before the writes
+                existing_docs = list(existing_poi_query.get(transaction=transaction))
+                summary = self.read_summary(transaction, user_ref)
 
-                # If existing POI has status False, update it to True
-                if not existing_status:
-                    existing_doc.reference.update({
+                if existing_docs:
+                    existing_doc = existing_docs[0]
+
+                    # Already saved: nothing to change
+                    if existing_doc.get('status'):
+                        return existing_doc.id
+
+                    # If existing POI has status False, update it to True
+                    transaction.update(existing_doc.reference, {
                         'status': True,
                         'createdDT': firestore.SERVER_TIMESTAMP
                     })
-            
-                return existing_doc.id
-            
-            else:
-                # Create new document with auto ID if it does not exist in the user's savedPOIs
-                doc_ref = saved_pois_ref.document()
-                doc_ref.set({
-                    'pointID': point_id,
-                    'status': True,
-                    'createdDT': firestore.SERVER_TIMESTAMP,
-                    'city': city.lower()
-                })
+                    saved_id = existing_doc.id
+                else:
+                    # Create new document with auto ID if it does not exist in the user's savedPOIs
+                    doc_ref = saved_pois_ref.document()
+                    transaction.set(doc_ref, {
+                        'pointID': point_id,
+                        'status': True,
+                        'createdDT': firestore.SERVER_TIMESTAMP,
+                        'city': city.lower()
+                    })
+                    saved_id = doc_ref.id
 
-                return doc_ref.id
+                if summary is not None:
+                    record_poi_saved(summary, point_id, city.lower(), datetime.now(timezone.utc))
+                    self.write_summary(transaction, user_ref, summary)
+                return saved_id
+
+            return save_in_transaction(transaction)
 
         except Exception as e:
             logging.error(f"Error saving POI: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
 
     async def unsave_poi(self, user_id: str, point_ids: List[str]) -> None:
-        """Update status to False for the given POIs in user's saved collection
+        """Update status to False for the given POIs in user's saved collection,
+        and the user's history summary, in one transaction
         
         Args:
             user_id (str): The user's ID
@@ -110,26 +190,32 @@ class UserHistoryService(FirebaseService):
             # Get reference to user's savedPOIs collection
             user_ref = self.get_collection_ref(self.collection_name).document(user_id)
             saved_pois_ref = user_ref.collection('savedPOIs')
-            
-            # Get batch reference for multiple updates
-            batch = self.db.batch()
-            
-            # For each point_id, query and update its status
-            for point_id in point_ids:
-                # Query for existing POI with matching pointID
-                existing_poi_query = saved_pois_ref.where('pointID', '==', point_id).limit(1)
-                existing_docs = existing_poi_query.get()
-                
-                if existing_docs:
-                    existing_doc = existing_docs[0]
-                    # Add update operation to batch
-                    batch.update(existing_doc.reference, {
+            transaction = self.db.transaction()
+
+            @firestore.transactional
+            def unsave_in_transaction(transaction):
+                summary = self.read_summary(transaction, user_ref)
+
+                # For each point_id, query for the existing POI with matching pointID
+                existing = []
+                for point_id in point_ids:
+                    existing_poi_query = saved_pois_ref.where('pointID', '==', point_id).limit(1)
+                    existing_docs = list(existing_poi_query.get(transaction=transaction))
+                    if existing_docs:
+                        existing.append((point_id, existing_docs[0]))
+
+                for point_id, existing_doc in existing:
+                    transaction.update(existing_doc.reference, {
                         'status': False,
                         'updatedDT': firestore.SERVER_TIMESTAMP
                     })
-            
-            # Commit all updates in batch
-            batch.commit()
+                    if summary is not None and existing_doc.get('status'):
+                        record_poi_unsaved(summary, point_id, existing_doc.get('city'))
+
+                if summary is not None:
+                    self.write_summary(transaction, user_ref, summary)
+
+            unsave_in_transaction(transaction)
             
         except Exception as e:
             logging.error(f"Error unsaving POIs: {str(e)}")
@@ -144,39 +230,104 @@ class UserHistoryService(FirebaseService):
             user_history_ref = self.get_collection_ref(self.collection_name).document(user_id)
             
             saved_itineraries_ref = user_history_ref.collection('savedItineraries').document(trip_doc_id)
-            # Save reference in user's history
-            saved_itineraries_ref.set({
+            trip = {
                 'city': city,
                 'country': country,
                 'fromDT': fromDT,
                 'toDT': toDT,
                 'monthlyDays': monthlyDays,
                 'status': True
-            })
+            }
+            transaction = self.db.transaction()
+
+            @firestore.transactional
+            def save_in_transaction(transaction):
+                existing = saved_itineraries_ref.get(transaction=transaction)
+                summary = self.read_summary(transaction, user_history_ref)
+
+                # Save reference in user's history
+                transaction.set(saved_itineraries_ref, trip)
+
+                if summary is not None:
+                    # Saving again (e.g. new dates) refreshes the entry without counting it twice
+                    if existing.exists and existing.get('status'):
+                        record_trip_removed(summary, trip_doc_id, existing.get('city'))
+                    record_trip_saved(summary, trip_doc_id, trip)
+                    self.write_summary(transaction, user_history_ref, summary)
+
+            save_in_transaction(transaction)
 
         except Exception as e:
             logging.error(f"Error saving trip to user history: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
 
-    # Update the get_user_saved_trips method to use the correct field name
-    async def get_user_saved_trips(self, user_id: str) -> List[UserTrip]:
+    async def get_summary(self, user_id: str) -> Dict:
+        """
+        Per-city counts and latest saved POIs and trips, kept up to date by the save and
+        unsave methods: one document read however long the history. Built from the
+        saved entries the first time it is asked for.
+        """
+        try:
+            user_ref = self.get_collection_ref(self.collection_name).document(user_id)
+            with observe_upstream("firestore", "get"):
+                snapshot = user_ref.get()
+            summary = (snapshot.to_dict() or {}).get('summary') if snapshot.exists else None
+            if summary is None:
+                summary = self.rebuild_summary(user_id)
+            return summary
+        except Exception as e:
+            logging.error(f"Error getting user history summary: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    def rebuild_summary(self, user_id: str) -> Dict:
+        """Recompute the summary from the saved entries and store it, in one transaction."""
+        user_ref = self.get_collection_ref(self.collection_name).document(user_id)
+        saved_pois_query = user_ref.collection('savedPOIs').where('status', '==', True) \
+            .select(['pointID', 'city', 'createdDT'])
+        saved_trips_query = user_ref.collection('savedItineraries').where('status', '==', True) \
+            .select(['city', 'country', 'fromDT', 'toDT'])
+        transaction = self.db.transaction()
+
+        @firestore.transactional
+        def rebuild_in_transaction(transaction):
+            saved_pois = [doc.to_dict() for doc in saved_pois_query.get(transaction=transaction)]
+            saved_trips = [
+                {'trip_doc_id': doc.id, **doc.to_dict()} for doc in saved_trips_query.get(transaction=transaction)
+            ]
+            summary = build_summary(saved_pois, saved_trips)
+            self.write_summary(transaction, user_ref, summary)
+            return summary
+
+        return rebuild_in_transaction(transaction)
+
+    async def get_user_saved_trips(self, user_id: str) -> List[Dict]:
         """Get all saved trips for a user"""
+        return (await self.get_user_saved_trips_page(user_id)).items
+
+    async def get_user_saved_trips_page(self, user_id: str, limit: Optional[int] = None,
+                                        cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> Page:
+        """Saved trips, latest start date first a page at a time when a limit or cursor is given.
+        `fields` projects the documents to those fields (plus trip_doc_id)."""
         try:
             user_history_ref = self.get_collection_ref(self.collection_name).document(user_id)
             saved_itineraries_ref = user_history_ref.collection('savedItineraries') 
 
             query = saved_itineraries_ref.where("status", "==", True)
-            saved_itineraries = query.get()
+            # Ordered on fromDT: entries have no creation time, and the stored
+            # "%Y-%m-%dT%H:%M:%S.%fZ" strings sort chronologically
+            saved_itineraries, next_cursor = fetch_page(query, 'fromDT', limit, cursor, fields)
+
+            # The stored ISO strings (UTC) are returned as they are, not parsed per trip
             user_trips = []
-            
             for doc in saved_itineraries:
                 trip_data = doc.to_dict()
-                trip_data['fromDT'] = datetime.strptime(trip_data['fromDT'], "%Y-%m-%dT%H:%M:%S.%fZ")
-                trip_data['toDT'] = datetime.strptime(trip_data['toDT'], "%Y-%m-%dT%H:%M:%S.%fZ") 
-                user_trip = UserTrip(**trip_data, trip_doc_id=doc.id) 
-                user_trips.append(user_trip)
+                if fields:
+                    trip_data = {name: trip_data.get(name) for name in fields}
+                user_trips.append({'trip_doc_id': doc.id, **trip_data})
 
-            return user_trips
+            return Page(user_trips, next_cursor)
+        except HTTPException:
+            raise
         except Exception as e:
             logging.error(f"Error getting user saved trips: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
@@ -1,16 +1,36 @@
+import asyncio
+import os
 import requests
 from fastapi import HTTPException
 from typing import Optional
 from models.wikidata import WikidataImageResponse
+from services.citypack_service import city_pack_store
+from services.circuit_breaker import CircuitBreaker, mark_stale
+from services.single_flight import SingleFlight, canonical_key
+from services.metrics import observe_upstream
+
+# Lookups of the same entity in flight at the same time share one upstream request
+wikidata_flight = SingleFlight("wikidata", timeout=float(os.environ.get("SINGLE_FLIGHT_TIMEOUT_SECONDS", 30)))
+wikidata_breaker = CircuitBreaker("wikidata")
 
 class WikidataService:
     def __init__(self):
         self.base_url = "https://www.wikidata.org/w/api.php"
 
+    def _get_entities(self, params: dict) -> dict:
+        with observe_upstream("wikidata", params.get("action", "api")):
+            response = requests.get(self.base_url, params=params)
+            response.raise_for_status()
+        return response.json()
+
     async def fetch_wikidata_image(self, wikidata_id: str) -> Optional[str]:
         """
         Fetches the image URL associated with a Wikidata ID.
         """
+        packed_url = city_pack_store.wikidata_image(wikidata_id)
+        if packed_url:
+            return packed_url
+
         params = {
             "action": "wbgetentities",
             "ids": wikidata_id,
@@ -19,9 +39,13 @@ class WikidataService:
         }
 
         try:
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()
-            data = response.json()
+            key = canonical_key(url=self.base_url, **params)
+            data, stale = await wikidata_flight.do_async(
+                key,
+                lambda: wikidata_breaker.call_async(key, lambda: asyncio.to_thread(self._get_entities, params))
+            )
+            if stale:
+                mark_stale(wikidata_breaker.provider)
 
             # Extract the image filename from the response
             image_filename = data["entities"][wikidata_id]["claims"].get("P18", [{}])[0].get("mainsnak", {}).get("datavalue", {}).get("value")
@@ -32,5 +56,7 @@ class WikidataService:
             else:
                 return None
 
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error fetching image from Wikidata: {str(e)}")
\ No newline at end of file
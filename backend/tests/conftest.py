@@ -0,0 +1,23 @@
+from models.googleplaces import PlaceLocation, PlaceRecord
+
+
+def make_place(place_id, lat=53.4808, lng=-2.2426, primary_type="restaurant", types=None, rating=4.5,
+               reviews=100, photo_name=None, description=None, price_level=None, name=None):
+    """Place record for tests; every field not given is empty or a neutral default."""
+    return PlaceRecord(
+        place_id=place_id,
+        name=name or f"Place {place_id}",
+        formatted_address=None,
+        types=types or [primary_type],
+        primary_type=primary_type,
+        rating=rating,
+        user_ratings_total=reviews,
+        photo_name=photo_name,
+        location=PlaceLocation(lat, lng),
+        website=None,
+        phone=None,
+        description=description,
+        opening_hours=None,
+        price_level=price_level,
+        cuisine=None
+    )
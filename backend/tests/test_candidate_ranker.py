@@ -0,0 +1,67 @@
+import pytest
+from unittest.mock import patch
+
+from models.tripgeneration import POI
+from services.candidate_ranker import CandidateRanker
+from tests.conftest import make_place
+
+CENTER = (53.4808, -2.2426)
+
+
+class TestCandidateRanker:
+    def test_feature_matrix(self):
+        """All features are scaled to [0, 1] and unrated places get the prior"""
+        places = [make_place("a"), make_place("b", rating=None, reviews=0, lat=53.52)]
+        features = CandidateRanker().features(places, CENTER, preferred_types=["museum"])
+
+        assert features.shape == (2, 6)
+        assert features.min() >= 0 and features.max() <= 1
+        assert features[1, 0] == pytest.approx(3.5 / 5)
+        assert features[0, 2] > features[1, 2]
+
+    def test_well_reviewed_close_places_win(self):
+        """A 4.8 with thousands of reviews beats a 5.0 with two reviews"""
+        places = [
+            make_place("few_reviews", rating=5.0, reviews=2),
+            make_place("far", rating=4.8, reviews=3000, lat=53.60),
+            make_place("best", rating=4.8, reviews=3000)
+        ]
+        ranked = CandidateRanker().top_k(places, 2, CENTER)
+        assert [place.place_id for place in ranked] == ["best", "far"]
+
+    def test_custom_interests_match_descriptions(self):
+        """TF-IDF similarity of custom interests lifts matching places"""
+        places = [
+            make_place("art", description="Gallery of contemporary art and sculpture"),
+            make_place("rail", description="Historic steam railway and locomotive collection")
+        ]
+        ranker = CandidateRanker()
+        assert ranker.top_k(places, 1, CENTER, custom_preferences=["steam trains", "railway"])[0].place_id == "rail"
+        assert ranker.text_match(places, []).tolist() == [0.0, 0.0]
+
+
+class TestRankedSuggestions:
+    @pytest.mark.asyncio
+    async def test_overfetched_candidates_are_ranked(self):
+        """Extra candidates come from the same response and only the best are returned"""
+        with patch('services.tripgeneration_service.GroqService'), \
+             patch('services.tripgeneration_service.GooglePlacesService'):
+            from services.tripgeneration_service import TripGenerationService
+            service = TripGenerationService()
+        names = ["Science Museum", "Art Gallery", "Library", "Cathedral", "Town Hall", "Football Museum"]
+        service.places_service.tiered_nearby_search.return_value = [
+            make_place(f"p{index}", rating=3.0 + index * 0.3, lat=53.4808 + index * 0.001, name=name)
+            for index, name in enumerate(names)
+        ]
+
+        suggestions = await service._ensure_sufficient_places(
+            current_places=[POI(place_id="x", name="Existing", type="attraction", coordinates={"lat": 53.0, "lng": -2.0})],
+            city_lat=CENTER[0],
+            city_lng=CENTER[1],
+            preferences=["Museum"],
+            place_type="tourist_attraction",
+            additional_places_needed=2
+        )
+
+        assert [poi["place_id"] for poi in suggestions] == ["p5", "p4"]
+        assert service.places_service.tiered_nearby_search.call_count == 1
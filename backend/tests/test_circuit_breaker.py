@@ -0,0 +1,164 @@
+import orjson
+import pytest
+import requests
+from fastapi import HTTPException
+from unittest.mock import MagicMock, patch
+
+from services.circuit_breaker import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, stale_providers
+)
+from services.googleplaces_service import GooglePlacesService
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(timer, **kwargs):
+    options = dict(window=10, min_calls=4, failure_rate=0.5, slow_call_seconds=2, open_seconds=30)
+    options.update(kwargs)
+    return CircuitBreaker("test-provider", timer=timer, **options)
+
+
+def failing():
+    raise requests.exceptions.ConnectionError("provider down")
+
+
+class TestCircuitBreaker:
+    def test_opens_after_failure_rate_and_fails_fast(self):
+        """Once half the recent calls failed the circuit opens and calls are refused without running"""
+        timer = FakeTimer()
+        breaker = make_breaker(timer)
+        breaker.call("key", lambda: "ok")
+        breaker.call("key", lambda: "ok")
+        for _ in range(2):
+            with pytest.raises(requests.exceptions.ConnectionError):
+                breaker.call("other", failing)
+
+        assert breaker.state == OPEN
+        upstream = MagicMock()
+        with pytest.raises(CircuitOpenError) as error:
+            breaker.call("other", upstream)
+        assert error.value.status_code == 503
+        upstream.assert_not_called()
+
+    def test_open_circuit_serves_stale_response(self):
+        """While open, the last good response for the key is returned and flagged as stale"""
+        timer = FakeTimer()
+        breaker = make_breaker(timer, min_calls=2)
+        assert breaker.call("key", lambda: {"places": [1]}) == ({"places": [1]}, False)
+        assert breaker.call("key", failing) == ({"places": [1]}, True)
+
+        assert breaker.state == OPEN
+        assert breaker.call("key", failing) == ({"places": [1]}, True)
+        assert breaker.stats()["stale_served"] == 2
+
+    def test_slow_calls_open_the_circuit(self):
+        """Calls slower than slow_call_seconds count against the provider even when they succeed"""
+        timer = FakeTimer()
+        breaker = make_breaker(timer)
+
+        def slow():
+            timer.now += 5
+            return "late"
+
+        for _ in range(4):
+            breaker.call("key", slow)
+
+        assert breaker.state == OPEN
+
+    def test_half_open_probe_closes_or_reopens(self):
+        """After open_seconds one probe goes upstream; success closes, failure reopens"""
+        timer = FakeTimer()
+        breaker = make_breaker(timer, min_calls=1)
+        with pytest.raises(requests.exceptions.ConnectionError):
+            breaker.call("key", failing)
+        assert breaker.state == OPEN
+
+        timer.now += 31
+        with pytest.raises(requests.exceptions.ConnectionError):
+            breaker.call("key", failing)
+        assert breaker.state == OPEN
+
+        timer.now += 31
+        assert breaker.allow()
+        assert breaker.state == HALF_OPEN
+        # Only one probe at a time
+        assert not breaker.allow()
+        breaker.record(False, 0.1)
+        assert breaker.state == CLOSED
+
+    def test_ignored_errors_do_not_count(self):
+        """Our own HTTPExceptions (e.g. rate limiting) pass through without tripping the circuit"""
+        timer = FakeTimer()
+        breaker = make_breaker(timer, min_calls=1)
+
+        def shed():
+            raise HTTPException(status_code=429, detail="shed")
+
+        with pytest.raises(HTTPException):
+            breaker.call("key", shed)
+        assert breaker.state == CLOSED
+        assert breaker.stats()["calls"] == 0
+
+
+    def test_only_provider_failures_count(self):
+        """4xx responses pass through like ignored errors; 5xx responses and timeouts count"""
+        timer = FakeTimer()
+        breaker = make_breaker(timer, min_calls=1)
+
+        def respond(status):
+            def fn():
+                response = requests.Response()
+                response.status_code = status
+                raise requests.exceptions.HTTPError(f"{status}", response=response)
+            return fn
+
+        for status in (400, 403, 404, 429):
+            with pytest.raises(requests.exceptions.HTTPError):
+                breaker.call("key", respond(status))
+        with pytest.raises(ValueError):
+            breaker.call("key", MagicMock(side_effect=ValueError("bad payload")))
+        assert breaker.state == CLOSED
+        assert breaker.stats()["calls"] == 0
+
+        with pytest.raises(requests.exceptions.HTTPError):
+            breaker.call("key", respond(503))
+        assert breaker.state == OPEN
+
+        timer.now += 31
+        with pytest.raises(requests.exceptions.Timeout):
+            breaker.call("key", MagicMock(side_effect=requests.exceptions.Timeout("slow")))
+        assert breaker.stats()["failures"] == 2
+
+
+class TestPlacesStaleServing:
+    @patch('requests.post')
+    def test_nearby_search_served_stale_while_open(self, mock_post):
+        """With the Places circuit open, nearby_search returns the last response and flags the request"""
+        service = GooglePlacesService()
+        service.breaker = make_breaker(FakeTimer(), min_calls=2)
+        service.corpus = MagicMock()
+        response = MagicMock()
+        response.content = orjson.dumps({"places": [{
+            "id": "p1",
+            "displayName": {"text": "Museum"},
+            "location": {"latitude": 53.48, "longitude": -2.24},
+            "types": ["museum"]
+        }]})
+        mock_post.side_effect = [response, requests.exceptions.Timeout("slow")]
+
+        service.nearby_search(53.48, -2.24, type="museum")
+        served = set()
+        token = stale_providers.set(served)
+        try:
+            places = service.nearby_search(53.48, -2.24, type="museum")
+        finally:
+            stale_providers.reset(token)
+
+        assert [place.place_id for place in places] == ["p1"]
+        assert served == {"test-provider"}
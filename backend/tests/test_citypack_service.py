@@ -0,0 +1,70 @@
+import pytest
+from unittest.mock import MagicMock
+
+from services.citypack_service import CityPackService, CityPackStore, city_slug, pack_search_types, parse_city_list
+from services.poi_corpus import PoiCorpus
+from tests.conftest import make_place
+
+
+@pytest.fixture
+def places_service():
+    service = MagicMock()
+    service.nearby_search.side_effect = lambda **kwargs: [
+        make_place(f"{kwargs['type']}_1", primary_type=kwargs["type"], photo_name=f"places/{kwargs['type']}_1/photos/1")
+    ]
+    service.get_place_photo.side_effect = lambda name: f"https://photos.example/{name}"
+    return service
+
+
+class TestCityPackHelpers:
+    def test_slug_and_city_list(self):
+        assert city_slug("São Paulo", "Brazil") == "sao-paulo--brazil"
+        assert parse_city_list("Manchester,United Kingdom,53.48,-2.24; bad entry") == [
+            ("Manchester", "United Kingdom", 53.48, -2.24)
+        ]
+
+    def test_pools_cover_every_mapping_key(self):
+        pools = pack_search_types()
+        assert pools["attraction:Museum"] == ["museum"]
+        assert pools["food:Italian"] == ["italian_restaurant"]
+        assert "type:tourist_attraction" in pools
+
+
+class TestCityPackService:
+    @pytest.mark.asyncio
+    async def test_build_write_and_load(self, tmp_path, places_service):
+        """A built pack round-trips through msgpack and warms the corpus and photo map"""
+        store = CityPackStore(corpus=PoiCorpus())
+        service = CityPackService(places_service, pack_dir=str(tmp_path), store=store)
+
+        paths = await service.refresh([("Manchester", "United Kingdom", 53.48, -2.24)])
+
+        assert paths == [str(tmp_path / "manchester--united-kingdom.msgpack")]
+        pack = store.get("Manchester", "United Kingdom")
+        assert pack["pools"]["attraction:Museum"]["place_ids"] == ["museum_1"]
+        assert "places" not in pack
+        assert store.photo_url("places/museum_1/photos/1") == "https://photos.example/places/museum_1/photos/1"
+        assert len(store.corpus.nearby(53.48, -2.24, 500, types=["museum"])) == 1
+        # "Cafe" preference and the base cafe pool share one search
+        searched = [call.kwargs["type"] for call in places_service.nearby_search.call_args_list]
+        assert len(searched) == len(set(searched))
+
+    @pytest.mark.asyncio
+    async def test_refresh_is_incremental(self, tmp_path, places_service):
+        """Fresh pools are not searched again; stale ones are"""
+        now = [1000.0]
+        service = CityPackService(
+            places_service, pack_dir=str(tmp_path), max_age_seconds=100,
+            store=CityPackStore(corpus=PoiCorpus()), timer=lambda: now[0]
+        )
+        await service.refresh([("Manchester", "United Kingdom", 53.48, -2.24)])
+        first_calls = places_service.nearby_search.call_count
+
+        await service.refresh([("Manchester", "United Kingdom", 53.48, -2.24)])
+        assert places_service.nearby_search.call_count == first_calls
+
+        now[0] = 2000.0
+        await service.refresh([("Manchester", "United Kingdom", 53.48, -2.24)])
+        assert places_service.nearby_search.call_count == 2 * first_calls
+        # Photos already resolved are reused
+        assert places_service.get_place_photo.call_count == first_calls
@@ -0,0 +1,42 @@
+from services.dedup import DedupIndex, normalize_name, names_similar
+
+
+class TestNameKeys:
+    def test_normalize_name(self):
+        """Accents, branch suffixes, punctuation and articles are folded away"""
+        assert normalize_name("Café X - Old Town") == "cafe x"
+        assert normalize_name("  The  Ivy (Spinningfields) ") == "ivy"
+        assert normalize_name("Joe's Pizza") == "joe s pizza"
+        assert normalize_name(None) == ""
+
+    def test_names_similar(self):
+        """Prefix and near-identical names are similar, unrelated names are not"""
+        assert names_similar("federal cafe", "federal cafe bar")
+        assert names_similar("pizza express", "pizzaexpress")
+        assert not names_similar("pizza express", "pizza hut")
+
+
+class TestDedupIndex:
+    def test_batch_dedup(self):
+        """Exact keys, nearby points and nearby similar names are dropped in one pass"""
+        index = DedupIndex()
+        index.add("Manchester Museum", 53.4664, -2.2343)
+
+        kept = index.filter_batch([
+            ("Café X", 53.4800, -2.2400),
+            ("Cafe X - Old Town", 53.4900, -2.2500),       # same name key, far away
+            ("Cafe Xavier", 53.48005, -2.24005),            # similar name within 300m
+            ("Different Place", 53.48001, -2.24001),        # within 30m of Café X
+            ("The Manchester Museum", 53.5, -2.3),          # already recorded
+            ("Bakery", 53.4700, -2.2300),
+            ("Bookshop", 53.4710, -2.2310)
+        ], limit=3)
+
+        assert kept == [0, 5, 6]
+        assert len(index) == 4
+        assert index.is_duplicate("Bakery", 53.0, -2.0)
+        assert not index.is_duplicate("New Cafe", 53.0, -2.0)
+
+    def test_unlocated_candidates_use_names_only(self):
+        index = DedupIndex()
+        assert index.filter_batch([("Cafe", None, None), ("Café", None, None), ("Bar", None, None)]) == [0, 2]
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from services.geometry import (
+    DistanceMatrixCache,
+    haversine_matrix,
+    haversine_pairs,
+    k_nearest,
+    travel_minutes
+)
+from services.itinerary_validator import ItineraryValidator
+
+# Manchester Piccadilly, Manchester Cathedral, Etihad Stadium
+POINTS = [(53.4774, -2.2309), (53.4853, -2.2446), (53.4831, -2.2004)]
+
+
+class TestDistances:
+    def test_matrix_matches_known_distances(self):
+        """Distances are float32, symmetric and within metres of reference values"""
+        distances = haversine_matrix(POINTS)
+
+        assert distances.dtype == np.float32
+        assert distances.shape == (3, 3)
+        assert np.allclose(distances, distances.T)
+        assert np.allclose(np.diag(distances), 0)
+        assert distances[0, 1] == pytest.approx(1.26, abs=0.02)
+        assert np.allclose(haversine_pairs(POINTS[:2], POINTS[1:]), [distances[0, 1], distances[1, 2]])
+
+    def test_k_nearest_and_travel_time(self):
+        """Nearest neighbours exclude the point itself; walking is 15 min/km"""
+        indices, distances = k_nearest(haversine_matrix(POINTS), k=1, exclude_self=True)
+
+        assert indices[:, 0].tolist() == [1, 0, 0]
+        assert float(travel_minutes(2.0)) == pytest.approx(30.0)
+        assert float(travel_minutes(2.0, "driving")) < float(travel_minutes(2.0))
+        with pytest.raises(ValueError):
+            travel_minutes(1.0, "teleport")
+
+    def test_matrix_cache_reuses_candidate_sets(self):
+        """The same candidate set is only computed once"""
+        cache = DistanceMatrixCache()
+        first = cache.matrix(POINTS)
+        second = cache.matrix(list(POINTS))
+
+        assert first is second
+        assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+class TestTravelTimeValidation:
+    def test_tight_gap_between_distant_visits(self):
+        """A 5 minute gap is not enough to walk 2km between visits"""
+        itinerary = {
+            "Day 1": {
+                "Morning": {"POI": {
+                    "a": {"name": "Station", "type": "attraction", "StartTime": "9:00", "EndTime": "10:00",
+                          "coordinates": {"lat": POINTS[0][0], "lng": POINTS[0][1]}},
+                    "b": {"name": "Stadium", "type": "attraction", "StartTime": "10:05", "EndTime": "11:30",
+                          "coordinates": {"lat": POINTS[2][0], "lng": POINTS[2][1]}}
+                }}
+            }
+        }
+        validator = ItineraryValidator()
+
+        problems = validator.validate(itinerary, travel_profile="walking")
+        assert any("not enough time to travel from Station to Stadium" in p for p in problems)
+        assert validator.validate(itinerary) == []
+        assert validator.validate(itinerary, travel_profile="driving") == []
@@ -1,18 +1,29 @@
+import orjson
 import pytest
 import sys
 import os
 from unittest.mock import patch, MagicMock
-from services.googleplaces_service import GooglePlacesService
+from services.circuit_breaker import CircuitBreaker
+from services.googleplaces_service import GooglePlacesService, field_mask
+from services.rate_limiter import UpstreamRateLimiter
+from services.single_flight import SingleFlight
 
 # Add the parent directory to the path so we can import modules
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 @pytest.fixture
 def google_places_service():
-    """Create a GooglePlacesService with a mock API key"""
+    """
+    Create a GooglePlacesService with a mock API key. The process-wide single-flight
+    group, circuit breaker and rate limiter are swapped for fresh ones so no state
+    (open circuits, stale responses, spent tokens) leaks between tests.
+    """
     with patch.dict('os.environ', {'GOOGLE_PLACES_API_KEY': 'test_api_key'}):
         service = GooglePlacesService()
-        return service
+    service.flight = SingleFlight("test-google-places")
+    service.breaker = CircuitBreaker("test-google-places")
+    service.rate_limiter = UpstreamRateLimiter(daily_quota=0)
+    return service
 
 class TestNearbySearch:
     @patch('requests.post')
@@ -21,7 +32,7 @@ class TestNearbySearch:
         # Create a mock response
         mock_response = MagicMock()
         mock_response.status_code = 200
-        mock_response.json.return_value = {
+        mock_response.content = orjson.dumps({
             "places": [
                 {
                     "id": "ChIJN1t_tDeuEmsRUsoyG83frY4",
@@ -37,7 +48,7 @@ class TestNearbySearch:
                     "businessStatus": "OPERATIONAL"
                 }
             ]
-        }
+        })
         mock_post.return_value = mock_response
         
         # Call the method
@@ -78,6 +89,25 @@ class TestNearbySearch:
         # Verify the error was caught and re-raised
         assert "API Error" in str(excinfo.value)
 
+    @patch('requests.post')
+    def test_nearby_search_skips_malformed_places(self, mock_post, google_places_service):
+        """Places with a missing id or wrongly typed fields are dropped, the rest are returned"""
+        mock_response = MagicMock()
+        mock_response.content = orjson.dumps({
+            "places": [
+                {"displayName": {"text": "No id"}, "location": {"latitude": 1, "longitude": 2}},
+                {"id": "bad-types", "location": {"latitude": 1, "longitude": 2}, "types": "museum"},
+                {"id": "bad-cuisine", "location": {"latitude": 1, "longitude": 2}, "cuisine": [1]},
+                {"id": "ok", "displayName": {"text": "Fine"}, "location": {"latitude": 1, "longitude": 2}}
+            ]
+        })
+        mock_post.return_value = mock_response
+
+        results = google_places_service.nearby_search(latitude=1, longitude=2, type="museum")
+
+        assert [place.place_id for place in results] == ["ok"]
+        assert results[0].types == []
+
 class TestGetPlaceDetails:
     @patch('requests.get')
     def test_get_place_details_success(self, mock_get, google_places_service):
@@ -85,7 +115,7 @@ class TestGetPlaceDetails:
         # Create a mock response
         mock_response = MagicMock()
         mock_response.status_code = 200
-        mock_response.json.return_value = {
+        mock_response.content = orjson.dumps({
             "id": "ChIJN1t_tDeuEmsRUsoyG83frY4",
             "displayName": {"text": "Test Place"},
             "formattedAddress": "123 Test St, Testville",
@@ -102,7 +132,7 @@ class TestGetPlaceDetails:
                     "Tuesday: 9:00 AM – 5:00 PM"
                 ]
             }
-        }
+        })
         mock_get.return_value = mock_response
         
         # Call the method
@@ -159,7 +189,7 @@ class TestTextSearch:
         # Create a mock response
         mock_response = MagicMock()
         mock_response.status_code = 200
-        mock_response.json.return_value = {
+        mock_response.content = orjson.dumps({
             "places": [
                 {
                     "id": "ChIJN1t_tDeuEmsRUsoyG83frY4",
@@ -175,7 +205,7 @@ class TestTextSearch:
                     "editorialSummary": {"text": "Great pizza place"}
                 }
             ]
-        }
+        })
         mock_post.return_value = mock_response
         
         # Call the method
@@ -243,4 +273,61 @@ class TestBatchOperations:
         assert "image_url" not in results["id2"]
         
         # Verify get_place_photo was called only for the place with a photo name
-        mock_get_place_photo.assert_called_once_with("photo1") 
\ No newline at end of file
+        mock_get_place_photo.assert_called_once_with("photo1")
+
+
+class TestFieldMaskProfiles:
+    @pytest.mark.parametrize("profile, present, absent", [
+        ("minimal", ["places.id", "places.rating", "places.regularOpeningHours"],
+         ["places.photos", "places.formattedAddress", "places.editorialSummary"]),
+        ("card", ["places.photos", "places.formattedAddress"], ["places.websiteUri", "places.editorialSummary"]),
+        ("full", ["places.photos", "places.websiteUri", "places.editorialSummary"], [])
+    ])
+    @patch('requests.post')
+    def test_nearby_search_requests_profile_fields(self, mock_post, google_places_service, profile, present, absent):
+        """nearby_search sends the field mask of the requested profile"""
+        mock_post.return_value.content = orjson.dumps({"places": []})
+        google_places_service.corpus = MagicMock()
+
+        google_places_service.nearby_search(latitude=40.7128, longitude=-74.0060, type="museum", profile=profile)
+
+        fields = mock_post.call_args[1]['headers']['X-Goog-FieldMask'].split(",")
+        assert all(field in fields for field in present)
+        assert not any(field in fields for field in absent)
+
+    @patch('requests.post')
+    def test_minimal_results_are_not_added_to_corpus(self, mock_post, google_places_service):
+        """Minimal records are parsed but kept out of the corpus that serves full place cards"""
+        mock_post.return_value.content = orjson.dumps({"places": [{
+            "id": "p1",
+            "displayName": {"text": "Museum"},
+            "location": {"latitude": 40.7128, "longitude": -74.0060},
+            "types": ["museum"],
+            "primaryType": "museum",
+            "rating": 4.6
+        }]})
+        google_places_service.corpus = MagicMock()
+
+        places = google_places_service.text_search(
+            query="minimal museum", latitude=40.7128, longitude=-74.0060, profile="minimal"
+        )
+
+        assert places[0].rating == 4.6
+        assert places[0].photo_name is None
+        google_places_service.corpus.ingest.assert_not_called()
+
+    @patch('requests.get')
+    def test_get_place_details_uses_unprefixed_mask(self, mock_get, google_places_service):
+        """Place Details masks name top-level fields without the 'places.' prefix"""
+        mock_get.return_value.content = orjson.dumps({"id": "ChIJcard", "displayName": {"text": "Card"}})
+
+        details = google_places_service.get_place_details("ChIJcard", profile="card")
+
+        assert details["name"] == "Card"
+        mask = mock_get.call_args[1]['headers']['X-Goog-FieldMask']
+        assert mask.startswith("id,displayName") and "photos" in mask and "websiteUri" not in mask
+
+    def test_unknown_profile_rejected(self):
+        """An unknown profile name raises instead of silently requesting everything"""
+        with pytest.raises(ValueError):
+            field_mask("everything")
@@ -0,0 +1,142 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+from fastapi import HTTPException
+
+from services.circuit_breaker import CircuitBreaker
+from services.groq_service import GroqService, ModelLatencyTracker, parse_model_chain
+from models.groq_model import ChatRequest, ChatMessage, ChatResponse, MessageRole
+
+@pytest.fixture
+def groq_service():
+    """Create a GroqService with mocked clients and its own tracker and breaker"""
+    with patch('services.groq_service.Groq'), patch('services.groq_service.AsyncGroq'):
+        service = GroqService()
+        service.latency_tracker = ModelLatencyTracker()
+        service.breaker = CircuitBreaker("test-groq", min_calls=100)
+        yield service
+
+def make_request():
+    return ChatRequest(messages=[ChatMessage(role=MessageRole.USER, content="plan a trip")])
+
+def simulate(service, behaviour):
+    """behaviour maps model -> (delay_seconds, content or Exception)"""
+    async def fake_complete(request, timeout=None):
+        delay, result = behaviour[request.model]
+        await asyncio.sleep(delay)
+        service.latency_tracker.record_latency(request.model, delay)
+        if isinstance(result, Exception):
+            raise result
+        return ChatResponse(content=result, model=request.model)
+    service._complete_async = fake_complete
+
+class TestParseModelChain:
+    def test_parse_model_chain(self):
+        assert parse_model_chain("big:30, small:10,tiny") == [("big", 30.0), ("small", 10.0), ("tiny", 60.0)]
+
+class TestHedgedCompletion:
+    @pytest.mark.asyncio
+    async def test_fast_primary_wins_without_hedging(self, groq_service):
+        """No second call is made when the primary answers before the threshold"""
+        simulate(groq_service, {"big": (0.01, "ok"), "small": (0.01, "ok")})
+
+        response = await groq_service.create_hedged_completion(
+            make_request(), accept=lambda r: True,
+            model_chain=[("big", 5), ("small", 5)], hedge_after_seconds=0.5
+        )
+
+        assert response.model == "big"
+        stats = groq_service.latency_stats()
+        assert stats["big"]["wins"] == 1
+        assert "small" not in stats
+
+    @pytest.mark.asyncio
+    async def test_slow_primary_is_hedged(self, groq_service):
+        """A faster model answers first once the latency threshold passes"""
+        simulate(groq_service, {"big": (0.5, "slow"), "small": (0.01, "fast")})
+
+        response = await groq_service.create_hedged_completion(
+            make_request(), accept=lambda r: True,
+            model_chain=[("big", 5), ("small", 5)], hedge_after_seconds=0.05
+        )
+
+        assert response.content == "fast"
+        stats = groq_service.latency_stats()
+        assert stats["small"]["wins"] == 1
+        assert stats["big"]["cancelled"] == 1
+
+    @pytest.mark.asyncio
+    async def test_invalid_response_falls_through_to_next_model(self, groq_service):
+        """A response rejected by validation triggers the next model immediately"""
+        simulate(groq_service, {"big": (0.01, "invalid"), "small": (0.01, "valid")})
+
+        response = await groq_service.create_hedged_completion(
+            make_request(), accept=lambda r: r.content == "valid",
+            model_chain=[("big", 5), ("small", 5)], hedge_after_seconds=5
+        )
+
+        assert response.content == "valid"
+        assert groq_service.latency_stats()["big"]["rejected"] == 1
+
+    @pytest.mark.asyncio
+    async def test_all_models_fail(self, groq_service):
+        """Errors from every model surface as an HTTPException"""
+        simulate(groq_service, {"big": (0.01, RuntimeError("down")), "small": (0.01, RuntimeError("down"))})
+
+        with pytest.raises(HTTPException) as excinfo:
+            await groq_service.create_hedged_completion(
+                make_request(), accept=lambda r: True,
+                model_chain=[("big", 5), ("small", 5)], hedge_after_seconds=5
+            )
+        assert "all models failed" in excinfo.value.detail
+
+    @pytest.mark.asyncio
+    async def test_losing_call_is_aborted_without_a_verdict(self, groq_service):
+        """Cancelling the slow model aborts its request and records no latency or breaker outcome"""
+        aborted = []
+
+        async def create(model, **kwargs):
+            try:
+                await asyncio.sleep(0.5 if model == "big" else 0.01)
+            except asyncio.CancelledError:
+                aborted.append(model)
+                raise
+            message = SimpleNamespace(content=f"from {model}")
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+        groq_service.async_client.chat.completions.create = create
+
+        response = await groq_service.create_hedged_completion(
+            make_request(), accept=lambda r: True,
+            model_chain=[("big", 5), ("small", 5)], hedge_after_seconds=0.05
+        )
+
+        assert response.content == "from small"
+        assert aborted == ["big"]
+        stats = groq_service.latency_stats()
+        assert stats["big"]["cancelled"] == 1
+        assert stats["big"]["calls"] == 0
+        assert groq_service.breaker.stats()["calls"] == 1
+
+    @pytest.mark.asyncio
+    async def test_deadline_expiry_counts_against_the_breaker(self, groq_service):
+        """A model hanging past its deadline is a breaker failure, unlike a hedge loser"""
+        async def create(model, **kwargs):
+            if model == "big":
+                await asyncio.sleep(10)
+            message = SimpleNamespace(content=f"from {model}")
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+        groq_service.async_client.chat.completions.create = create
+
+        response = await groq_service.create_hedged_completion(
+            make_request(), accept=lambda r: False,
+            model_chain=[("big", 0.1), ("small", 5)], hedge_after_seconds=5
+        )
+
+        assert response.content == "from small"
+        assert groq_service.latency_stats()["big"]["failures"] == 1
+        breaker = groq_service.breaker.stats()
+        assert breaker["calls"] == 2
+        assert breaker["failures"] == 1
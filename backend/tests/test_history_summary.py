@@ -0,0 +1,49 @@
+from datetime import datetime
+from unittest.mock import patch
+
+from services import history_summary
+from services.history_summary import (
+    build_summary, empty_summary, record_poi_saved, record_poi_unsaved, record_trip_removed, record_trip_saved
+)
+
+
+class TestHistorySummary:
+    def test_poi_counts_and_recent_items(self):
+        """Counts follow saves and unsaves per city; the recent list is newest first and bounded"""
+        summary = empty_summary()
+        with patch.object(history_summary, "RECENT_ITEMS", 2):
+            for day, (point_id, city) in enumerate([("a", "paris"), ("b", "paris"), ("c", "rome")], start=1):
+                record_poi_saved(summary, point_id, city, datetime(2024, 1, day))
+
+        assert summary["poiCounts"] == {"paris": 2, "rome": 1}
+        assert [poi["pointID"] for poi in summary["recentPOIs"]] == ["c", "b"]
+
+        record_poi_unsaved(summary, "c", "rome")
+        assert summary["poiCounts"] == {"paris": 2}
+        assert [poi["pointID"] for poi in summary["recentPOIs"]] == ["b"]
+
+    def test_trips(self):
+        summary = empty_summary()
+        record_trip_saved(summary, "t1", {"city": "Paris", "country": "France", "fromDT": "2024-06-01T00:00:00.000Z"})
+        record_trip_saved(summary, "t2", {"city": "Paris", "country": "France", "fromDT": "2024-07-01T00:00:00.000Z"})
+        record_trip_removed(summary, "t1", "Paris")
+
+        assert summary["tripCounts"] == {"Paris": 1}
+        assert summary["recentTrips"] == [
+            {"trip_doc_id": "t2", "city": "Paris", "country": "France", "fromDT": "2024-07-01T00:00:00.000Z", "toDT": None}
+        ]
+
+    def test_build_summary(self):
+        """A summary built from the saved entries matches one kept up to date, latest first"""
+        summary = build_summary(
+            [{"pointID": "b", "city": "paris", "createdDT": datetime(2024, 1, 2)},
+             {"pointID": "a", "city": "paris", "createdDT": datetime(2024, 1, 1)},
+             {"pointID": "x", "city": "rome", "createdDT": None}],
+            [{"trip_doc_id": "t2", "city": "Rome", "fromDT": "2024-07-01T00:00:00.000Z"},
+             {"trip_doc_id": "t1", "city": "Rome", "fromDT": "2024-06-01T00:00:00.000Z"}]
+        )
+
+        assert summary["poiCounts"] == {"paris": 2, "rome": 1}
+        assert [poi["pointID"] for poi in summary["recentPOIs"]] == ["b", "a", "x"]
+        assert summary["tripCounts"] == {"Rome": 2}
+        assert [trip["trip_doc_id"] for trip in summary["recentTrips"]] == ["t2", "t1"]
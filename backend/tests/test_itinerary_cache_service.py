@@ -0,0 +1,152 @@
+import json
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from services.itinerary_cache_service import ItineraryCacheService
+from services.itinerary_validator import ItineraryValidator
+from models.tripgeneration import TripGenerationRequest
+from models.groq_model import ChatResponse
+
+
+def make_request(**overrides):
+    """Build a TripGenerationRequest with sensible defaults"""
+    trip_data = {
+        "city": "Manchester",
+        "country": "United Kingdom",
+        "coordinates": {"lat": 53.480759, "lng": -2.242631},
+        "fromDT": "2025-05-01T00:00:00",
+        "toDT": "2025-05-02T00:00:00",
+        "monthly_days": 1,
+        "interests": ["Museum", "Gardens"],
+        "food_preferences": ["Italian"]
+    }
+    trip_data.update(overrides.pop("trip_data", {}))
+    return TripGenerationRequest.model_validate({"trip_data": trip_data, **overrides})
+
+
+def make_itinerary():
+    return {
+        "Day 1": {
+            "Morning": {"POI": {"cafe_1": {"name": "Cafe", "type": "cafe"}}},
+            "Afternoon": {"POI": {"rest_1": {"name": "Lunch", "type": "restaurant"}}},
+            "Evening": {"POI": {"rest_2": {"name": "Dinner", "type": "restaurant"}}}
+        },
+        "Unused": {"Attractions": [], "Restaurants": []}
+    }
+
+
+class TestCacheKey:
+    def test_equivalent_requests_share_key(self):
+        """Case, ordering and coordinate noise should not change the key"""
+        cache = ItineraryCacheService()
+        first = make_request()
+        second = make_request(trip_data={
+            "city": " manchester ",
+            "coordinates": {"lat": 53.48081, "lng": -2.24259},
+            "interests": ["gardens", "museum", "Museum"]
+        })
+
+        assert cache.build_key(first) == cache.build_key(second)
+
+    def test_different_days_or_pois_change_key(self):
+        """Day count and selected POIs are part of the key"""
+        cache = ItineraryCacheService()
+        base = make_request()
+        longer = make_request(trip_data={"monthly_days": 2})
+        with_poi = make_request(attractionpois=[{
+            "place_id": "ChIJ_attraction",
+            "name": "Museum",
+            "type": "attraction",
+            "coordinates": {"lat": 53.48, "lng": -2.24}
+        }])
+
+        keys = {cache.build_key(base), cache.build_key(longer), cache.build_key(with_poi)}
+        assert len(keys) == 3
+
+
+class TestCacheStorage:
+    def test_hit_rate_and_ttl(self):
+        """Entries expire after the TTL and lookups are counted"""
+        now = [0.0]
+        cache = ItineraryCacheService(ttl_seconds=10, timer=lambda: now[0])
+
+        assert cache.get("key") is None
+        cache.set("key", "{}")
+        assert cache.get("key") == "{}"
+
+        now[0] = 11.0
+        assert cache.get("key") is None
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 2
+        assert stats["hit_rate"] == pytest.approx(1 / 3, abs=1e-3)
+
+
+class TestItineraryValidator:
+    def test_valid_itinerary(self):
+        validator = ItineraryValidator()
+        assert validator.validate(
+            make_itinerary(),
+            num_days=1,
+            allowed_place_ids=["cafe_1", "rest_1", "rest_2"]
+        ) == []
+
+    def test_duplicate_and_unknown_place_ids(self):
+        validator = ItineraryValidator()
+        itinerary = make_itinerary()
+        itinerary["Day 1"]["Evening"]["POI"] = {"rest_1": {"name": "Lunch", "type": "restaurant"}}
+
+        problems = validator.validate(itinerary, num_days=2, allowed_place_ids=["cafe_1"])
+        assert any("Duplicate place_id rest_1" in p for p in problems)
+        assert any("Unknown place_id rest_1" in p for p in problems)
+        assert any("Expected days 1..2" in p for p in problems)
+
+
+@pytest.fixture
+def trip_generation_service():
+    """Create a TripGenerationService with mocked upstream clients"""
+    with patch('services.tripgeneration_service.GroqService'), \
+         patch('services.tripgeneration_service.GooglePlacesService'):
+        from services.tripgeneration_service import TripGenerationService
+        service = TripGenerationService()
+        service._ensure_sufficient_places = AsyncMock(side_effect=[
+            [{"place_id": "cafe_1", "name": "Cafe", "type": "cafe", "coordinates": {"lat": 1, "lng": 1}}],
+            [
+                {"place_id": "rest_1", "name": "Lunch", "type": "restaurant", "coordinates": {"lat": 1, "lng": 1}},
+                {"place_id": "rest_2", "name": "Dinner", "type": "restaurant", "coordinates": {"lat": 1, "lng": 1}}
+            ],
+            []
+        ])
+        service.groq_service.create_hedged_completion = AsyncMock(return_value=ChatResponse(
+            content="```json\n" + json.dumps({
+                "Day 1": {
+                    "Morning": {"POI": {"C1": {"StartTime": "8:00", "EndTime": "9:00"}}},
+                    "Afternoon": {"POI": {"R1": {"StartTime": "12:00", "EndTime": "13:30"}}},
+                    "Evening": {"POI": {"R2": {"StartTime": "18:30", "EndTime": "20:00"}}}
+                },
+                "Unused": []
+            }) + "\n```"
+        ))
+        yield service
+
+
+class TestGenerateTripCaching:
+    @pytest.mark.asyncio
+    async def test_second_identical_request_is_served_from_cache(self, trip_generation_service):
+        """A validated itinerary is cached and reused without calling Groq again"""
+        first = await trip_generation_service.generate_trip(make_request())
+        second = await trip_generation_service.generate_trip(make_request())
+
+        assert first == second
+        assert trip_generation_service.groq_service.create_hedged_completion.await_count == 1
+        assert trip_generation_service.itinerary_cache.stats()["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_opt_out_skips_cache(self, trip_generation_service):
+        """use_cache=False neither reads nor writes the cache"""
+        await trip_generation_service.generate_trip(make_request(use_cache=False))
+
+        stats = trip_generation_service.itinerary_cache.stats()
+        assert stats["stores"] == 0
+        assert stats["misses"] == 0
@@ -0,0 +1,96 @@
+import asyncio
+import time
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routes.metrics_route import MetricsMiddleware, router as metrics_router
+from services import metrics
+from services.metrics import Counter, Histogram, observe_upstream, register_cache
+
+
+class TestMetrics:
+    def test_histogram_exposition(self):
+        histogram = Histogram("test_latency_seconds", "Test latency.", ("route",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.labels("/a").observe(value)
+
+        lines = histogram.render().splitlines()
+        assert lines[:2] == ["# HELP test_latency_seconds Test latency.", "# TYPE test_latency_seconds histogram"]
+        assert lines[2:] == [
+            'test_latency_seconds_bucket{route="/a",le="0.1"} 1',
+            'test_latency_seconds_bucket{route="/a",le="1.0"} 2',
+            'test_latency_seconds_bucket{route="/a",le="+Inf"} 3',
+            'test_latency_seconds_sum{route="/a"} 5.55',
+            'test_latency_seconds_count{route="/a"} 3'
+        ]
+
+    def test_counter_and_cache_samples(self):
+        counter = Counter("test_events", "Test events.", ("kind",))
+        counter.labels('say "hi"').inc(2)
+        register_cache("test_cache", lambda: {"hits": 3, "misses": 1})
+
+        assert 'test_events_total{kind="say \\"hi\\""} 2.0' in counter.render()
+        rendered = metrics.render()
+        assert 'cache_hits_total{cache="test_cache"} 3' in rendered
+        assert 'cache_hit_ratio{cache="test_cache"} 0.75' in rendered
+
+    def test_observe_upstream_outcomes(self):
+        """Calls are counted as ok, error or cancelled, and leave the in-flight gauge at zero"""
+        with observe_upstream("test_provider", "search"):
+            pass
+        with pytest.raises(ValueError):
+            with observe_upstream("test_provider", "search"):
+                raise ValueError("bad request")
+
+        async def cancelled():
+            with observe_upstream("test_provider", "search"):
+                await asyncio.sleep(10)
+        async def run():
+            task = asyncio.create_task(cancelled())
+            await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        asyncio.run(run())
+
+        rendered = metrics.upstream_request_duration.render()
+        for outcome in ("ok", "error", "cancelled"):
+            assert f'upstream_request_duration_seconds_count{{provider="test_provider",endpoint="search",outcome="{outcome}"}} 1' in rendered
+        assert metrics.upstream_requests_in_flight.labels("test_provider").value == 0
+
+    def test_event_loop_lag_is_observed(self):
+        """A blocking call on the loop shows up as a late wake-up of the monitor"""
+        lags = []
+
+        async def run():
+            monitor = asyncio.create_task(metrics.monitor_event_loop(0.01, lags.append))
+            await asyncio.sleep(0.03)
+            time.sleep(0.1)
+            await asyncio.sleep(0.03)
+            monitor.cancel()
+
+        count_before = metrics.event_loop_lag.labels().counts[:]
+        asyncio.run(run())
+
+        assert len(lags) >= 2
+        assert max(lags) >= 0.08
+        assert sum(metrics.event_loop_lag.labels().counts) - sum(count_before) == len(lags)
+
+    def test_requests_are_timed_per_route_template(self):
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware)
+        app.include_router(metrics_router)
+
+        @app.get("/test-items/{item_id}")
+        async def item(item_id: str):
+            return {"id": item_id}
+
+        client = TestClient(app)
+        client.get("/test-items/1")
+        client.get("/test-items/2")
+        client.get("/test-missing")
+
+        body = client.get("/metrics").text
+        assert 'http_request_duration_seconds_count{method="GET",route="/test-items/{item_id}",status="200"} 2' in body
+        assert 'http_request_duration_seconds_count{method="GET",route="unmatched",status="404"} 1' in body
@@ -0,0 +1,91 @@
+import numpy as np
+from datetime import date
+
+from services.opening_hours import (
+    compile_opening_hours,
+    from_google_periods,
+    from_osm,
+    is_open_batch
+)
+from services.itinerary_validator import ItineraryValidator
+from services.prompt_builder import PromptBuilder
+from models.tripgeneration import TripGenerationRequest
+
+
+class TestCompileOpeningHours:
+    def test_osm_rules_and_overrides(self):
+        """Weekday ranges, split hours and later 'off' rules are honoured"""
+        hours = from_osm("Mo-Sa 09:00-17:00; Sa 10:00-12:00,13:00-15:00; Su off")
+
+        assert hours.is_open(0, 9 * 60, 17 * 60)
+        assert not hours.is_open(0, 16 * 60, 18 * 60)
+        assert hours.is_open(5, 13 * 60, 14 * 60)
+        assert not hours.is_open(5, 11 * 60 + 30, 13 * 60 + 30)
+        assert hours.open_weekdays() == [0, 1, 2, 3, 4, 5]
+
+    def test_google_periods_and_overnight(self):
+        """Google day 0 is Sunday; periods past midnight spill into the next day"""
+        hours = from_google_periods([
+            {"open": {"day": 5, "hour": 18, "minute": 0}, "close": {"day": 6, "hour": 2, "minute": 0}}
+        ])
+
+        # Google Friday is datetime weekday 4
+        assert hours.is_open(4, 20 * 60, 24 * 60)
+        assert hours.is_open(5, 0, 60)
+        assert not hours.is_open(5, 3 * 60, 4 * 60)
+
+    def test_weekday_descriptions(self):
+        """Google weekday text with narrow no-break spaces and shared meridiem"""
+        hours = compile_opening_hours([
+            "Monday: Closed",
+            "Tuesday: 11:00 AM – 3:00 PM, 6:00 – 10:00 PM",
+            "Sunday: Open 24 hours"
+        ])
+
+        assert not hours.is_open(0, 12 * 60, 13 * 60)
+        assert hours.is_open(1, 12 * 60, 13 * 60)
+        assert hours.is_open(1, 19 * 60, 21 * 60)
+        assert hours.is_open(6, 3 * 60, 4 * 60)
+
+    def test_unknown_hours(self):
+        """Unparseable values compile to None and are treated as open"""
+        assert compile_opening_hours("by appointment") is None
+        matrix = is_open_batch([None, from_osm("Mo-Fr 09:00-17:00")], [0, 6], [600, 600], [660, 660])
+        assert np.array_equal(matrix, np.array([[True, True], [True, False]]))
+
+
+class TestOpeningHoursScheduling:
+    def test_validator_reports_closed_visit(self):
+        """A visit scheduled on a closed weekday is a validation problem"""
+        itinerary = {
+            "Day 1": {
+                "Morning": {"POI": {"museum": {"name": "Museum", "type": "attraction", "StartTime": "9:30", "EndTime": "11:30"}}}
+            }
+        }
+        hours = {"museum": from_osm("Tu-Su 10:00-18:00")}
+
+        # 2025-05-05 is a Monday
+        problems = ItineraryValidator().validate(itinerary, trip_start=date(2025, 5, 5), opening_hours=hours)
+        assert any("closed on Day 1" in p for p in problems)
+        assert ItineraryValidator().validate(itinerary, trip_start=date(2025, 5, 6), opening_hours=hours) != []
+
+        hours = {"museum": from_osm("09:00-18:00")}
+        assert ItineraryValidator().validate(itinerary, trip_start=date(2025, 5, 5), opening_hours=hours) == []
+
+    def test_prompt_lists_closed_days(self):
+        """Closed trip days are rendered in the candidate table"""
+        request = TripGenerationRequest.model_validate({"trip_data": {
+            "city": "Paris",
+            "country": "France",
+            "coordinates": {"lat": 48.8566, "lng": 2.3522},
+            "fromDT": "2025-05-05T00:00:00",
+            "toDT": "2025-05-06T00:00:00",
+            "monthly_days": 2,
+            "interests": ["Museum"],
+            "food_preferences": []
+        }})
+        museum = {"place_id": "museum", "name": "Museum", "coordinates": {"lat": 48.86, "lng": 2.33}}
+        prompt = PromptBuilder().build_itinerary_prompt(
+            request, selected={"attraction": [museum]}, suggested={}, closed_days={"museum": [1]}
+        )
+        assert "A1|Museum|attraction|48.86|2.33|1" in prompt.user
@@ -0,0 +1,49 @@
+import json
+import pytest
+
+from config.place_categories import PlaceCategoryRegistry, place_categories
+
+
+class TestPlaceCategories:
+    @pytest.mark.parametrize("place_type, primary_type, expected", [
+        ("cafe", "coffee_shop", True),
+        ("cafe", "restaurant", False),
+        ("cafe", None, False),
+        ("restaurant", "italian_restaurant", True),
+        ("restaurant", "korean_bbq_restaurant", True),
+        ("restaurant", "steak_house", True),
+        ("restaurant", "bakery", False),
+        ("restaurant", None, False),
+        ("tourist_attraction", None, True),
+        ("tourist_attraction", "museum", True),
+    ])
+    def test_accepts(self, place_type, primary_type, expected):
+        assert place_categories.get(place_type).accepts(primary_type) is expected
+
+    def test_explore_is_looser(self):
+        """Explore shows takeaways and places without a primary type"""
+        restaurant = place_categories.get("restaurant")
+        assert restaurant.explore_accepts("meal_takeaway")
+        assert restaurant.explore_accepts(None)
+        assert not restaurant.explore_accepts("cafe")
+
+    def test_excluded_types_and_immutability(self):
+        assert "restaurant" in place_categories.get("cafe").excluded_types
+        assert place_categories.get("tourist_attraction").excluded_types == ()
+        assert "hotel" in place_categories.get("bar").excluded_types
+        with pytest.raises(TypeError):
+            place_categories.categories["bar"] = None
+
+    def test_overrides_from_file(self, tmp_path):
+        """New categories and preferences come from configuration, not code"""
+        path = tmp_path / "categories.json"
+        path.write_text(json.dumps({
+            "categories": {"bar": {"accepted_primary_types": ["bar", "pub"], "require_primary_type": True}},
+            "food_preferences": {"Tapas": ["spanish_restaurant"]}
+        }))
+        registry = PlaceCategoryRegistry.load(str(path))
+
+        assert registry.get("bar").accepts("pub")
+        assert not registry.get("bar").accepts("cafe")
+        assert registry.preference_mapping("restaurant")["Tapas"] == ("spanish_restaurant",)
+        assert registry.preference_mapping("tourist_attraction")["Museum"] == ("museum",)
@@ -0,0 +1,96 @@
+import pytest
+from unittest.mock import patch
+
+from services.poi_corpus import PoiCorpus, place_from_poi_document
+from tests.conftest import make_place
+
+
+class TestPoiCorpus:
+    def test_radius_and_type_query(self):
+        """Only places within the radius and of a requested type are returned, nearest first"""
+        corpus = PoiCorpus()
+        corpus.ingest([
+            make_place("far", 53.52, -2.24),
+            make_place("near", 53.4808, -2.2426),
+            make_place("nearer", 53.48076, -2.24263),
+            make_place("cafe", 53.4809, -2.2427, primary_type="cafe"),
+            make_place("italian", 53.4810, -2.2428, primary_type="italian_restaurant", types=["italian_restaurant", "restaurant"])
+        ])
+
+        results = corpus.nearby(53.480759, -2.242631, 1000, types=["restaurant"])
+        assert [place.place_id for place in results] == ["nearer", "near", "italian"]
+        assert [p.place_id for p in corpus.nearby(53.480759, -2.242631, 1000, types=["cafe"])] == ["cafe"]
+        assert len(corpus.nearby(53.480759, -2.242631, 1000, excluded_types=["cafe"], max_results=2)) == 2
+
+    def test_stale_entries_and_eviction(self):
+        """Entries past max age are skipped and the oldest are evicted first"""
+        now = [0.0]
+        corpus = PoiCorpus(max_entries=2, max_age_seconds=100, timer=lambda: now[0])
+        corpus.ingest([make_place("a", 53.48, -2.24)])
+        now[0] = 50.0
+        corpus.ingest([make_place("b", 53.48, -2.24), make_place("c", 53.48, -2.24)])
+
+        assert len(corpus) == 2
+        now[0] = 120.0
+        assert {p.place_id for p in corpus.nearby(53.48, -2.24, 100)} == {"b", "c"}
+        now[0] = 200.0
+        assert corpus.nearby(53.48, -2.24, 100) == []
+
+    def test_ingests_are_buffered_until_rebuild_threshold(self):
+        """New places are found by a linear scan until enough accumulate to rebuild the tree"""
+        corpus = PoiCorpus(rebuild_min_pending=3)
+        corpus.ingest([make_place("a", 53.48, -2.24), make_place("b", 53.4801, -2.2401)])
+
+        assert [p.place_id for p in corpus.nearby(53.48, -2.24, 100)] == ["a", "b"]
+        assert corpus.stats()["rebuilds"] == 0
+
+        corpus.ingest([make_place("c", 53.4802, -2.2402)])
+        assert [p.place_id for p in corpus.nearby(53.48, -2.24, 100)] == ["a", "b", "c"]
+        assert corpus.stats()["rebuilds"] == 1
+
+        # A refreshed place is served from the buffer, not twice
+        corpus.ingest([make_place("a", 53.4803, -2.2403, primary_type="cafe")])
+        results = corpus.nearby(53.48, -2.24, 100)
+        assert [p.place_id for p in results] == ["b", "c", "a"]
+        assert results[-1].primary_type == "cafe"
+        assert [p.place_id for p in corpus.nearby(53.48, -2.24, 100, types=["restaurant"])] == ["b", "c"]
+        assert corpus.stats()["rebuilds"] == 1
+
+    def test_require_photo(self):
+        """Places without a photo can be left out, e.g. for responses that show photos"""
+        corpus = PoiCorpus()
+        corpus.ingest([make_place("bare", 53.48, -2.24), make_place("pictured", 53.4801, -2.2401, photo_name="photos/1")])
+
+        assert [p.place_id for p in corpus.nearby(53.48, -2.24, 100, require_photo=True)] == ["pictured"]
+
+    def test_place_from_poi_document(self):
+        place = place_from_poi_document({
+            "place_id": "ChIJx", "name": "Museum", "type": "attraction",
+            "categories": ["museum"], "coordinates": {"lat": 53.48, "lng": -2.24}
+        })
+        assert place.primary_type == "tourist_attraction"
+        assert place.types == ["tourist_attraction", "museum"]
+        assert place_from_poi_document({"place_id": "x", "coordinates": {}}) is None
+
+
+class TestTieredNearbySearch:
+    @pytest.fixture
+    def google_places_service(self):
+        from services.googleplaces_service import GooglePlacesService
+        service = GooglePlacesService()
+        service.corpus = PoiCorpus()
+        service.corpus_min_results = 2
+        return service
+
+    def test_local_hit_skips_upstream(self, google_places_service):
+        google_places_service.corpus.ingest([make_place("a", 53.48, -2.24), make_place("b", 53.4801, -2.2401)])
+        with patch.object(google_places_service, "nearby_search") as upstream:
+            results = google_places_service.tiered_nearby_search(53.48, -2.24, 500, type="restaurant", max_results=5)
+        upstream.assert_not_called()
+        assert len(results) == 2
+
+    def test_thin_coverage_goes_upstream(self, google_places_service):
+        google_places_service.corpus.ingest([make_place("a", 53.48, -2.24)])
+        with patch.object(google_places_service, "nearby_search", return_value=[]) as upstream:
+            google_places_service.tiered_nearby_search(53.48, -2.24, 500, type="restaurant", max_results=5)
+        upstream.assert_called_once()
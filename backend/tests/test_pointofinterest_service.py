@@ -3,7 +3,7 @@ from unittest.mock import patch, AsyncMock, MagicMock, call
 from firebase_admin import firestore
 from fastapi import HTTPException
 
-from services.pointofinterest_service import PointOfInterestService
+from services.pointofinterest_service import PointCache, PointOfInterestService
 from models.pointofinterest import PointOfInterestResponse, Coordinates
 
 @pytest.fixture
@@ -15,6 +15,7 @@ def poi_service():
         
         # Mock the db property
         service.db = MagicMock()
+        service.cache = PointCache()
         
         # Mock document and collection references
         mock_collection_ref = MagicMock()
@@ -362,4 +363,53 @@ class TestCreateOrGetPoint:
         assert set_call_args['city'] == poi_data.city
         assert set_call_args['country'] == poi_data.country
         assert set_call_args['images'] == poi_data.image_url
-        assert 'created_at' in set_call_args 
\ No newline at end of file
+        assert 'created_at' in set_call_args 
+class TestPointCache:
+    @staticmethod
+    def stored_points(poi_service, point_ids):
+        """db.get_all answers with a stored document for every requested reference"""
+        def document(point_id):
+            ref = MagicMock()
+            ref.id = point_id
+            return ref
+
+        def get_all(refs):
+            docs = []
+            for ref in refs:
+                doc = MagicMock()
+                doc.exists = ref.id in point_ids
+                doc.id = ref.id
+                doc.to_dict.return_value = {
+                    "place_id": f"google_{ref.id}", "name": ref.id, "coordinates": firestore.GeoPoint(1.0, 2.0),
+                    "address": "Street", "city": "Test City"
+                }
+                docs.append(doc)
+            return docs
+
+        poi_service.get_collection_ref().document.side_effect = document
+        poi_service.db.get_all = MagicMock(side_effect=get_all)
+
+    @pytest.mark.asyncio
+    async def test_get_points_reads_only_uncached(self, poi_service):
+        """Points are returned in request order, and only cache misses are read, in batches"""
+        poi_service.batch_size = 2
+        self.stored_points(poi_service, {"a", "b", "c"})
+
+        assert [p.id for p in await poi_service.get_points(["c", "a", "missing", "b"])] == ["c", "a", "b"]
+        assert poi_service.db.get_all.call_count == 2
+
+        assert [p.id for p in await poi_service.get_points(["a", "b"])] == ["a", "b"]
+        assert poi_service.db.get_all.call_count == 2
+        assert poi_service.cache.stats()["hits"] == 2
+
+    @pytest.mark.asyncio
+    async def test_iter_points_yields_cached_then_reads(self, poi_service):
+        poi_service.batch_size = 1
+        self.stored_points(poi_service, {"a", "b", "c"})
+        await poi_service.get_points(["b"])
+
+        streamed = [point.id async for point in poi_service.iter_points(["a", "b", "c"])]
+
+        assert streamed[0] == "b"
+        assert sorted(streamed) == ["a", "b", "c"]
+        assert poi_service.db.get_all.call_count == 3
@@ -0,0 +1,82 @@
+import pytest
+from models.tripgeneration import TripGenerationRequest
+from services.prompt_builder import PromptBuilder, ITINERARY_SYSTEM_PROMPT
+
+def make_request(days=1):
+    return TripGenerationRequest.model_validate({
+        "trip_data": {
+            "city": "Manchester",
+            "country": "United Kingdom",
+            "coordinates": {"lat": 53.4808, "lng": -2.2426},
+            "fromDT": "2025-05-01T00:00:00",
+            "toDT": "2025-05-02T00:00:00",
+            "monthly_days": days
+        }
+    })
+
+def make_candidates(prefix, poi_type, count):
+    return [
+        {
+            "place_id": f"ChIJ{prefix}{i}",
+            "name": f"{poi_type.title()} {i}",
+            "type": poi_type,
+            "coordinates": {"lat": 53.480812345, "lng": -2.242612345}
+        }
+        for i in range(count)
+    ]
+
+class TestBuildItineraryPrompt:
+    def test_compact_rows_and_aliases(self):
+        """Candidates are emitted as alias rows with rounded coordinates"""
+        builder = PromptBuilder()
+        prompt = builder.build_itinerary_prompt(
+            make_request(),
+            selected={"attraction": make_candidates("sel", "attraction", 1)},
+            suggested={"restaurant": make_candidates("sug", "restaurant", 2), "cafe": make_candidates("c", "cafe", 1)}
+        )
+
+        assert prompt.system == ITINERARY_SYSTEM_PROMPT
+        assert "A1|Attraction 0|attraction|53.4808|-2.2426" in prompt.user
+        assert "ChIJ" not in prompt.user
+        assert prompt.aliases["R2"]["place_id"] == "ChIJsug1"
+        assert prompt.token_counts["candidates"] == 4
+
+    def test_trims_suggested_candidates_over_budget(self):
+        """Only suggested candidates above the per-day minimum are trimmed"""
+        builder = PromptBuilder(token_budget=PromptBuilder.estimate_tokens(ITINERARY_SYSTEM_PROMPT) + 150)
+        prompt = builder.build_itinerary_prompt(
+            make_request(days=1),
+            selected={"attraction": make_candidates("sel", "attraction", 3)},
+            suggested={"restaurant": make_candidates("sug", "restaurant", 20), "cafe": make_candidates("c", "cafe", 1)}
+        )
+
+        place_ids = {candidate["place_id"] for candidate in prompt.aliases.values()}
+        assert prompt.trimmed > 0
+        assert {"ChIJsel0", "ChIJsel1", "ChIJsel2", "ChIJc0"} <= place_ids
+        assert sum(1 for c in prompt.aliases.values() if c["type"] == "restaurant") >= 2
+
+class TestExpandItinerary:
+    def test_aliases_map_back_to_place_data(self):
+        """Aliases are replaced by place_ids and Unused is rebuilt from the alias table"""
+        builder = PromptBuilder()
+        prompt = builder.build_itinerary_prompt(
+            make_request(),
+            selected={},
+            suggested={"restaurant": make_candidates("r", "restaurant", 2), "cafe": make_candidates("c", "cafe", 1)}
+        )
+        itinerary = builder.expand_itinerary({
+            "Day 1": {
+                "Morning": {"POI": {"C1": {"StartTime": "8:00", "EndTime": "9:00"}}},
+                "Evening": {"POI": {"R2": {"StartTime": "18:30", "EndTime": "20:00"}}}
+            },
+            "Unused": ["R1"]
+        }, prompt.aliases)
+
+        evening = itinerary["Day 1"]["Evening"]["POI"]["ChIJr1"]
+        assert evening["name"] == "Restaurant 1"
+        assert evening["coordinates"] == {"lat": 53.480812345, "lng": -2.242612345}
+        assert evening["StartTime"] == "18:30"
+        assert itinerary["Unused"]["Restaurants"] == [
+            {"place_id": "ChIJr0", "name": "Restaurant 0", "type": "restaurant",
+             "coordinates": {"lat": 53.480812345, "lng": -2.242612345}}
+        ]
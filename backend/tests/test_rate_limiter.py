@@ -0,0 +1,113 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+
+from services.rate_limiter import BACKGROUND, INTERACTIVE, UpstreamRateLimiter, priority, request_priority
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def make_limiter(clock, **kwargs):
+    options = dict(rate=2, burst=4, daily_quota=0, max_wait_seconds=5)
+    options.update(kwargs)
+    return UpstreamRateLimiter(timer=clock, clock=clock, sleep=clock.sleep, **options)
+
+
+class TestUpstreamRateLimiter:
+    def test_burst_then_paced_at_rate(self):
+        """The burst is served immediately; later calls wait for the bucket to refill"""
+        clock = FakeClock()
+        limiter = make_limiter(clock)
+
+        queued = [limiter.acquire("searchNearby", INTERACTIVE) for _ in range(6)]
+
+        assert queued[:4] == [0, 0, 0, 0]
+        assert queued[4] == pytest.approx(0.5)
+        assert queued[5] == pytest.approx(0.5)
+        stats = limiter.stats()["searchNearby"]["priorities"][INTERACTIVE]
+        assert stats["acquired"] == 6
+        assert stats["max_queued_seconds"] == pytest.approx(0.5)
+
+    def test_endpoints_have_separate_buckets(self):
+        """Spending the searchNearby bucket does not slow down details calls"""
+        clock = FakeClock()
+        limiter = make_limiter(clock)
+
+        for _ in range(4):
+            limiter.acquire("searchNearby", INTERACTIVE)
+
+        assert limiter.acquire("details", INTERACTIVE) == 0
+
+    def test_background_leaves_reserve_for_interactive(self):
+        """Background calls stop short of the reserved tokens, which interactive calls can still use"""
+        clock = FakeClock()
+        limiter = make_limiter(clock, background_reserve=0.5)
+
+        assert limiter.acquire("details", BACKGROUND) == 0
+        assert limiter.acquire("details", BACKGROUND) == 0
+        # 2 tokens left, all reserved: background has to wait, interactive does not
+        assert limiter.acquire("details", INTERACTIVE) == 0
+        assert limiter.acquire("details", BACKGROUND) > 0
+
+    def test_background_shed_before_daily_quota_runs_out(self):
+        """Background work is rejected with 429 once its share of the daily budget is used"""
+        clock = FakeClock()
+        limiter = make_limiter(clock, burst=100, daily_quota=10, background_quota_share=0.5)
+
+        for _ in range(5):
+            limiter.acquire("searchText", BACKGROUND)
+        with pytest.raises(HTTPException) as error:
+            limiter.acquire("searchText", BACKGROUND)
+        assert error.value.status_code == 429
+
+        for _ in range(5):
+            limiter.acquire("searchText", INTERACTIVE)
+        with pytest.raises(HTTPException):
+            limiter.acquire("searchText", INTERACTIVE)
+        assert limiter.stats()["searchText"]["priorities"][BACKGROUND]["shed"] == 1
+
+        # Budget resets the next day
+        clock.now += 86400
+        assert limiter.acquire("searchText", BACKGROUND) == 0
+
+    def test_queue_timeout_is_rejected(self):
+        """A call that would wait longer than max_wait_seconds is shed instead of queued"""
+        clock = FakeClock()
+        limiter = make_limiter(clock, rate=0.1, burst=1, max_wait_seconds=1)
+
+        limiter.acquire("media", INTERACTIVE)
+        with pytest.raises(HTTPException) as error:
+            limiter.acquire("media", INTERACTIVE)
+        assert error.value.status_code == 429
+
+    @pytest.mark.asyncio
+    async def test_blocking_acquire_refused_on_event_loop(self):
+        """acquire() would sleep on the loop thread, so it must be called from a worker thread"""
+        limiter = UpstreamRateLimiter(rate=100, burst=10, daily_quota=0)
+
+        with pytest.raises(RuntimeError):
+            limiter.acquire("searchNearby")
+        assert await asyncio.to_thread(limiter.acquire, "searchNearby") == pytest.approx(0, abs=0.1)
+
+    @pytest.mark.asyncio
+    async def test_priority_context(self):
+        """The priority context manager sets the class used when none is passed"""
+        limiter = UpstreamRateLimiter(rate=100, burst=10, daily_quota=0)
+
+        assert request_priority.get() == INTERACTIVE
+        with priority(BACKGROUND):
+            await limiter.acquire_async("searchNearby")
+        await limiter.acquire_async("searchNearby")
+
+        stats = limiter.stats()["searchNearby"]["priorities"]
+        assert stats[BACKGROUND]["acquired"] == 1
+        assert stats[INTERACTIVE]["acquired"] == 1
@@ -0,0 +1,134 @@
+import numpy as np
+import orjson
+import pytest
+from datetime import datetime, timezone
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from firebase_admin.firestore import GeoPoint
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+
+from models.pointofinterest import PointOfInterestResponse
+from routes.responses import (
+    NO_STORE_CACHE_CONTROL, PLACE_DETAILS_CACHE_CONTROL, PLACES_CACHE_CONTROL, CompressionMiddleware, FastJSONResponse, accepted_encodings, cached_response, etag_matches
+)
+from services.pointofinterest_service import point_from_document
+from tests.conftest import make_place
+
+
+class TestFastJSONResponse:
+    def test_encodes_firestore_documents_without_validation(self):
+        """Constructed models, Firestore timestamps and GeoPoints are encoded as the old encoder did"""
+        created = DatetimeWithNanoseconds(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+        point = point_from_document("doc1", {
+            "place_id": "ChIJx",
+            "name": "Museum",
+            "coordinates": GeoPoint(53.48, -2.24),
+            "address": "1 Street",
+            "city": "manchester",
+            "created_at": created,
+            "images": ["not a field"]
+        })
+
+        body = orjson.loads(FastJSONResponse([point]).body)
+
+        assert body == [PointOfInterestResponse(**body[0]).model_dump(mode="json")]
+        assert body[0]["coordinates"] == {"lat": 53.48, "lng": -2.24}
+        assert body[0]["created_at"] == "2024-05-01T12:30:00+00:00"
+        assert "images" not in body[0]
+
+    def test_encodes_records_numpy_and_raw_values(self):
+        """Dataclass records, numpy scalars, bare GeoPoints and timestamps in dicts are all handled"""
+        body = orjson.loads(FastJSONResponse({
+            "place": make_place("p1"),
+            "score": np.float32(0.5),
+            "at": GeoPoint(1.0, 2.0),
+            "when": DatetimeWithNanoseconds(2024, 1, 1, tzinfo=timezone.utc),
+            "naive": datetime(2024, 1, 1)
+        }).body)
+
+        assert body["place"]["place_id"] == "p1"
+        assert body["place"]["location"] == {"latitude": 53.4808, "longitude": -2.2426}
+        assert body["score"] == 0.5
+        assert body["at"] == {"lat": 1.0, "lng": 2.0}
+        assert body["when"] == "2024-01-01T00:00:00+00:00"
+        assert body["naive"] == "2024-01-01T00:00:00"
+
+
+class TestResponsePolicy:
+    @pytest.fixture
+    def client(self):
+        app = FastAPI(default_response_class=FastJSONResponse)
+        app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+        @app.get("/places")
+        async def places(request: Request, count: int = 50):
+            return cached_response(request, FastJSONResponse([{"name": f"Place {i}"} for i in range(count)]), PLACES_CACHE_CONTROL)
+
+        @app.get("/stream")
+        async def stream():
+            return StreamingResponse(iter([b"data: one\n\n" * 100, b"data: two\n\n"]), media_type="text/event-stream")
+
+        return TestClient(app)
+
+    def test_conditional_get(self, client):
+        """A repeated request carrying the ETag gets an empty 304, a changed body a new ETag"""
+        first = client.get("/places", headers={"Accept-Encoding": "identity"})
+        assert first.headers["Cache-Control"] == PLACES_CACHE_CONTROL
+        etag = first.headers["ETag"]
+
+        revalidated = client.get("/places", headers={"If-None-Match": etag})
+        assert revalidated.status_code == 304
+        assert revalidated.content == b""
+        assert revalidated.headers["ETag"] == etag
+
+        changed = client.get("/places", params={"count": 51}, headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["ETag"] != etag
+
+    def test_compression(self, client):
+        """Large JSON bodies are gzipped with a weak ETag, small ones and streams are left alone"""
+        compressed = client.get("/places", headers={"Accept-Encoding": "gzip"})
+        assert compressed.headers["Content-Encoding"] == "gzip"
+        assert compressed.headers["ETag"].startswith("W/")
+        assert len(compressed.json()) == 50
+        assert client.get("/places", headers={"If-None-Match": compressed.headers["ETag"]}).status_code == 304
+
+        assert "Content-Encoding" not in client.get("/places", params={"count": 2}, headers={"Accept-Encoding": "gzip"}).headers
+        assert "Content-Encoding" not in client.get("/places", headers={"Accept-Encoding": "gzip;q=0"}).headers
+        streamed = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in streamed.headers
+        assert streamed.text.endswith("data: two\n\n")
+
+    def test_accepted_encodings(self):
+        assert accepted_encodings("gzip, deflate;q=0.5, br;q=0") == {"gzip": 1.0, "deflate": 0.5, "br": 0.0}
+        assert etag_matches('W/"abc", "def"', '"abc"')
+        assert not etag_matches('"abc"', '"abd"')
+
+
+class TestPlaceDetailsCaching:
+    @pytest.fixture
+    def client(self):
+        from routes.googleplaces_route import router
+        app = FastAPI(default_response_class=FastJSONResponse)
+        app.include_router(router)
+        return TestClient(app)
+
+    def test_found_details_are_cacheable(self, client):
+        with patch("routes.googleplaces_route.google_places_service.get_place_details", return_value={"place_id": "ChIJ1"}):
+            response = client.get("/api/googleplaces/details/ChIJ1")
+        assert response.status_code == 200
+        assert response.headers["Cache-Control"] == PLACE_DETAILS_CACHE_CONTROL
+        assert "ETag" in response.headers
+
+    def test_failed_lookup_is_not_cached(self, client):
+        """A failed request or open circuit is a 502, an unknown ID a 404, neither stored"""
+        with patch("routes.googleplaces_route.google_places_service.get_place_details", return_value=None):
+            failed = client.get("/api/googleplaces/details/ChIJ1")
+            unknown = client.get("/api/googleplaces/details/osm-123")
+        assert failed.status_code == 502
+        assert unknown.status_code == 404
+        for response in (failed, unknown):
+            assert response.headers["Cache-Control"] == NO_STORE_CACHE_CONTROL
+            assert "ETag" not in response.headers
@@ -0,0 +1,199 @@
+import asyncio
+import threading
+import orjson
+import pytest
+from unittest.mock import MagicMock, patch
+
+from services.googleplaces_service import GooglePlacesService
+from services.single_flight import SingleFlight, canonical_key
+
+
+class TestCanonicalKey:
+    def test_key_ignores_argument_order_and_float_noise(self):
+        """Same parameters in any order, with float noise or None values, give the same key"""
+        first = canonical_key(lat=53.48080000000001, lng=-2.2426, types=["cafe"], page=None)
+        second = canonical_key(types=["cafe"], lng=-2.2426, lat=53.4808)
+
+        assert first == second
+        assert canonical_key(lat=53.4808, lng=-2.2426, types=["bar"]) != first
+
+
+class TestSingleFlight:
+    def test_concurrent_threads_share_one_call(self):
+        """Threads asking for the same key while a call is in flight all get its result"""
+        flight = SingleFlight("test-threads")
+        release = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            release.wait(5)
+            return ["result"]
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do("key", slow))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        # Let every follower join the in-flight call before the leader finishes
+        while flight.stats()["collapsed"] < 4:
+            pass
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert results == [["result"]] * 5
+        stats = flight.stats()
+        assert stats["calls"] == 5
+        assert stats["executions"] == 1
+        assert stats["in_flight"] == 0
+
+    def test_sequential_calls_are_not_cached(self):
+        """Once a call completes, the next caller for the key runs it again"""
+        flight = SingleFlight("test-sequential")
+        fn = MagicMock(side_effect=[1, 2])
+
+        assert flight.do("key", fn) == 1
+        assert flight.do("key", fn) == 2
+        assert flight.stats()["collapsed"] == 0
+
+    def test_error_reaches_every_waiter(self):
+        """An error raised by the shared call is raised to the leader and all followers"""
+        flight = SingleFlight("test-errors")
+        release = threading.Event()
+
+        def failing():
+            release.wait(5)
+            raise ValueError("upstream down")
+
+        errors = []
+
+        def call():
+            try:
+                flight.do("key", failing)
+            except ValueError as e:
+                errors.append(str(e))
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        while flight.stats()["collapsed"] < 2:
+            pass
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert errors == ["upstream down"] * 3
+        assert flight.stats()["errors"] == 1
+
+    @pytest.mark.asyncio
+    async def test_blocking_do_refused_on_event_loop(self):
+        """do() must run on a worker thread; on the loop it would block the loop instead of coalescing"""
+        flight = SingleFlight("test-loop")
+
+        with pytest.raises(RuntimeError):
+            flight.do("key", lambda: 1)
+        assert await asyncio.to_thread(flight.do, "key", lambda: 1) == 1
+
+    @pytest.mark.asyncio
+    async def test_async_callers_share_one_call(self):
+        """Coroutines awaiting the same key share one execution"""
+        flight = SingleFlight("test-async")
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"value": 42}
+
+        results = await asyncio.gather(*(flight.do_async("key", fetch) for _ in range(4)))
+
+        assert len(calls) == 1
+        assert results == [{"value": 42}] * 4
+        assert flight.stats()["collapsed"] == 3
+
+    @pytest.mark.asyncio
+    async def test_async_timeout_does_not_cancel_the_shared_call(self):
+        """A follower timing out gets TimeoutError while the call completes for the others"""
+        flight = SingleFlight("test-timeout")
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        leader = asyncio.ensure_future(flight.do_async("key", fetch))
+        await asyncio.sleep(0)
+        with pytest.raises(TimeoutError):
+            await flight.do_async("key", fetch, timeout=0.001)
+
+        assert await leader == "done"
+        assert flight.stats()["timeouts"] == 1
+
+
+class TestPlacesCoalescing:
+    def test_identical_nearby_searches_share_one_request(self):
+        """Concurrent identical nearby searches send one Places API request"""
+        service = GooglePlacesService()
+        service.flight = SingleFlight("test-places")
+        service.corpus = MagicMock()
+        release = threading.Event()
+
+        def post(*args, **kwargs):
+            release.wait(5)
+            response = MagicMock()
+            response.content = orjson.dumps({"places": [{
+                "id": "p1",
+                "displayName": {"text": "Museum"},
+                "location": {"latitude": 53.48, "longitude": -2.24},
+                "types": ["museum"]
+            }]})
+            return response
+
+        results = []
+        with patch("services.googleplaces_service.requests.post", side_effect=post) as mock_post:
+            threads = [
+                threading.Thread(target=lambda: results.append(service.nearby_search(53.48, -2.24, type="museum")))
+                for _ in range(3)
+            ]
+            for thread in threads:
+                thread.start()
+            while service.flight.stats()["collapsed"] < 2:
+                pass
+            release.set()
+            for thread in threads:
+                thread.join()
+
+        assert mock_post.call_count == 1
+        assert [[place.place_id for place in places] for places in results] == [["p1"]] * 3
+
+    @pytest.mark.asyncio
+    async def test_concurrent_async_handlers_share_one_request(self):
+        """Handlers running the search in worker threads coalesce while the loop keeps serving"""
+        service = GooglePlacesService()
+        service.flight = SingleFlight("test-places-async")
+        service.corpus = MagicMock()
+        release = threading.Event()
+
+        def post(*args, **kwargs):
+            release.wait(5)
+            response = MagicMock()
+            response.content = orjson.dumps({"places": [{
+                "id": "p1",
+                "location": {"latitude": 53.48, "longitude": -2.24},
+                "types": ["museum"]
+            }]})
+            return response
+
+        with patch("services.googleplaces_service.requests.post", side_effect=post) as mock_post:
+            searches = [
+                asyncio.ensure_future(asyncio.to_thread(service.nearby_search, 53.48, -2.24, type="museum"))
+                for _ in range(3)
+            ]
+            # The loop is free while the leader's request is in flight
+            while service.flight.stats()["collapsed"] < 2:
+                await asyncio.sleep(0.001)
+            release.set()
+            results = await asyncio.gather(*searches)
+
+        assert mock_post.call_count == 1
+        assert [[place.place_id for place in places] for places in results] == [["p1"]] * 3
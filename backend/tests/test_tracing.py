@@ -0,0 +1,161 @@
+import asyncio
+import pytest
+from unittest.mock import MagicMock, patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routes.metrics_route import TracingMiddleware
+from services import tracing
+from services.metrics import observe_upstream
+from services.tracing import NOOP_SPAN, current_span, span, start_trace, traced
+from tests.conftest import make_place
+
+
+class RecordingExporter:
+    def __init__(self):
+        self.traces = []
+
+    def export(self, spans):
+        self.traces.append(spans)
+
+
+@pytest.fixture
+def exporter():
+    recording = RecordingExporter()
+    previous = tracing.exporter
+    tracing.set_exporter(recording)
+    yield recording
+    tracing.set_exporter(previous)
+
+
+class TestSpans:
+    def test_spans_are_noops_outside_a_trace(self, exporter):
+        with span("lookup", key="a") as lookup:
+            lookup.set_attribute("hits", 1)
+        assert lookup is NOOP_SPAN
+        assert current_span() is NOOP_SPAN
+        assert exporter.traces == []
+
+    def test_nested_spans_and_upstream_counts(self, exporter):
+        """Spans nest across awaits and threads; upstream calls count on every ancestor"""
+        @traced("search")
+        def search():
+            with observe_upstream("test_provider", "search"):
+                return ["result"]
+
+        async def run():
+            with start_trace("request") as root:
+                with span("fan_out") as fan_out:
+                    await asyncio.gather(asyncio.to_thread(search), asyncio.to_thread(search))
+                    fan_out.add("candidates_kept", 3)
+            return root
+
+        root = asyncio.run(run())
+
+        spans = exporter.traces[0]
+        by_name = {}
+        for entry in spans:
+            by_name.setdefault(entry.name, []).append(entry)
+        fan_out = by_name["fan_out"][0]
+        assert fan_out.parent is root
+        assert all(entry.parent is fan_out for entry in by_name["search"])
+        assert {entry.parent.name for entry in by_name["test_provider.search"]} == {"search"}
+        assert root.attributes["upstream_calls"] == 2
+        assert fan_out.attributes == {"upstream_calls": 2, "candidates_kept": 3}
+        assert {entry.trace for entry in spans} == {root.trace}
+        assert fan_out.to_dict()["parent_span_id"] == root.span_id
+
+    def test_failed_span_is_marked(self, exporter):
+        with pytest.raises(ValueError):
+            with start_trace("request"):
+                with span("parse"):
+                    raise ValueError("bad json")
+
+        parse = next(entry for entry in exporter.traces[0] if entry.name == "parse")
+        assert parse.status == "ERROR"
+        assert parse.attributes["error"] == "ValueError"
+
+
+class TestDebugTimingHeader:
+    @pytest.fixture
+    def client(self, monkeypatch):
+        monkeypatch.setenv("TRACING_DEBUG_HEADER", "1")
+        monkeypatch.delenv("METRICS_TOKEN", raising=False)
+        app = FastAPI()
+        app.add_middleware(TracingMiddleware)
+
+        @app.get("/test-search/{city}")
+        async def search(city: str):
+            with span("nearby search", type="cafe") as search_span:
+                search_span.set_attribute("results", 4)
+            return {"city": city}
+
+        return TestClient(app)
+
+    def test_header_returns_span_breakdown(self, client):
+        response = client.get("/test-search/leeds", headers={"X-Debug-Timing": "1"})
+
+        assert response.status_code == 200
+        entries = response.headers["server-timing"].split(", ")
+        assert entries[0].startswith('total;desc="status=200";dur=')
+        assert entries[1].startswith('nearby_search;desc="type=cafe,results=4";dur=')
+        assert len(response.headers["x-trace-id"]) == 32
+
+    def test_no_breakdown_without_header(self, client):
+        response = client.get("/test-search/leeds")
+        assert "server-timing" not in response.headers
+        assert "x-trace-id" not in response.headers
+
+    def test_header_is_ignored_by_default(self, client, monkeypatch):
+        monkeypatch.delenv("TRACING_DEBUG_HEADER")
+        response = TestClient(client.app).get("/test-search/leeds", headers={"X-Debug-Timing": "1"})
+        assert "server-timing" not in response.headers
+
+    def test_header_requires_metrics_token_when_set(self, client, monkeypatch):
+        monkeypatch.setenv("METRICS_TOKEN", "secret")
+        guarded = TestClient(client.app)
+        assert "server-timing" not in guarded.get("/test-search/leeds", headers={"X-Debug-Timing": "1"}).headers
+        assert "server-timing" in guarded.get("/test-search/leeds", headers={"X-Debug-Timing": "secret"}).headers
+
+    def test_exported_root_is_named_by_route_template(self, client, exporter):
+        client.get("/test-search/leeds")
+
+        root = exporter.traces[0][0]
+        assert root.parent is None
+        assert root.name == "GET /test-search/{city}"
+        assert root.attributes["status"] == 200
+
+
+class TestTripGenerationSpans:
+    @pytest.mark.asyncio
+    async def test_candidate_search_attributes(self, exporter):
+        """The candidate search span records the need, kept/rejected candidates and upstream calls"""
+        with patch('services.tripgeneration_service.GroqService'), \
+             patch('services.tripgeneration_service.GooglePlacesService'):
+            from services.tripgeneration_service import TripGenerationService
+            service = TripGenerationService()
+
+        def nearby(**kwargs):
+            with observe_upstream("test_provider", "searchNearby"):
+                return [
+                    make_place("r1", name="Trattoria"),
+                    make_place("r2", lat=53.49, name="Bistro"),
+                    make_place("g1", primary_type="gas_station", name="Fuel")
+                ]
+        service.places_service.tiered_nearby_search = MagicMock(side_effect=nearby)
+        service.places_service.text_search = MagicMock(return_value=[])
+
+        with start_trace("request"):
+            places = await service._ensure_sufficient_places(
+                current_places=[], city_lat=53.4808, city_lng=-2.2426, preferences=[],
+                place_type="restaurant", additional_places_needed=2
+            )
+
+        assert len(places) == 2
+        search = next(entry for entry in exporter.traces[0] if entry.name == "ensure_sufficient_places")
+        assert search.attributes["place_type"] == "restaurant"
+        assert search.attributes["needed"] == 2
+        assert search.attributes["candidates_kept"] == 2
+        assert search.attributes["candidates_rejected"] >= 1
+        assert search.attributes["returned"] == 2
+        assert search.attributes["upstream_calls"] == service.places_service.tiered_nearby_search.call_count
@@ -377,4 +377,28 @@ class TestUpdateTrip:
             'duration': 120
         }
         # Verify batch was committed
-        batch_mock.commit.assert_called_once()
\ No newline at end of file
+        batch_mock.commit.assert_called_once()
+class TestDeleteTripWithHistory:
+    @pytest.mark.asyncio
+    async def test_saved_entry_is_read_in_the_transaction(self):
+        """The history entry deciding the summary update is read inside the transaction"""
+        from routes import trip_route
+
+        db = MagicMock()
+        db.collection().document().get.return_value = MagicMock(exists=True)
+        transaction = db.transaction()
+        history_service = MagicMock(collection_name='userHistory')
+        history_service.read_summary.return_value = {'poiCounts': {}, 'tripCounts': {'paris': 1},
+                                                     'recentPOIs': [], 'recentTrips': []}
+        saved_ref = db.collection().document().collection().document()
+        saved_ref.get.return_value = MagicMock(exists=True, get=lambda field: {'status': True, 'city': 'paris'}[field])
+
+        with patch('routes.trip_route.firestore.client', return_value=db), \
+             patch('routes.trip_route.firestore.transactional', lambda fn: fn), \
+             patch('routes.trip_route.UserHistoryService', return_value=history_service):
+            await trip_route.delete_trip_with_history("trip_1", user_id="user")
+
+        saved_ref.get.assert_called_once_with(transaction=transaction)
+        transaction.delete.assert_any_call(saved_ref)
+        written = history_service.write_summary.call_args[0][2]
+        assert written['tripCounts'] == {}
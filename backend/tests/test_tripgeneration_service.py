@@ -0,0 +1,183 @@
+import json
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+from fastapi import HTTPException
+
+from models.tripgeneration import TripGenerationRequest, TripRegenerationRequest
+from models.groq_model import ChatResponse
+
+TRIP_DATA = {
+    "city": "Manchester",
+    "country": "United Kingdom",
+    "coordinates": {"lat": 53.4808, "lng": -2.2426},
+    "fromDT": "2025-05-01T00:00:00",
+    "toDT": "2025-05-03T00:00:00",
+    "monthly_days": 2,
+    "interests": ["Museum"],
+    "food_preferences": ["Italian"]
+}
+
+def poi(name, poi_type, start="8:00", end="9:00"):
+    return {
+        "name": name,
+        "type": poi_type,
+        "duration": "1 hour",
+        "StartTime": start,
+        "EndTime": end,
+        "coordinates": {"lat": 53.48, "lng": -2.24}
+    }
+
+def make_itinerary():
+    return {
+        "Day 1": {
+            "Morning": {"POI": {"cafe_1": poi("Cafe One", "cafe"), "attr_1": poi("Museum One", "attraction", "9:30", "11:30")}},
+            "Afternoon": {"POI": {"rest_1": poi("Lunch One", "restaurant", "12:00", "13:30")}},
+            "Evening": {"POI": {"rest_2": poi("Dinner One", "restaurant", "18:30", "20:00")}}
+        },
+        "Day 2": {
+            "Morning": {"POI": {"cafe_2": poi("Cafe Two", "cafe")}},
+            "Afternoon": {"POI": {"rest_5": poi("Lunch Two", "restaurant", "12:00", "13:30")}},
+            "Evening": {"POI": {"rest_6": poi("Dinner Two", "restaurant", "18:30", "20:00")}}
+        },
+        "Unused": {
+            "Attractions": [{"place_id": "attr_9", "name": "Gallery", "type": "attraction"}],
+            "Restaurants": [
+                {"place_id": "rest_3", "name": "Trattoria", "type": "restaurant"},
+                {"place_id": "rest_4", "name": "Bistro", "type": "restaurant"}
+            ]
+        }
+    }
+
+@pytest.fixture
+def trip_generation_service():
+    """Create a TripGenerationService with mocked upstream clients"""
+    with patch('services.tripgeneration_service.GroqService'), \
+         patch('services.tripgeneration_service.GooglePlacesService'):
+        from services.tripgeneration_service import TripGenerationService
+        service = TripGenerationService()
+        service._ensure_sufficient_places = AsyncMock(return_value=[])
+        yield service
+
+class TestRegenerateSlice:
+    @pytest.mark.asyncio
+    async def test_regenerate_slot_from_unused_pool(self, trip_generation_service):
+        """A slot covered by the Unused pool is regenerated without any upstream search"""
+        trip_generation_service.groq_service.create_hedged_completion = AsyncMock(return_value=ChatResponse(
+            content="```json\n" + json.dumps({
+                "Evening": {"POI": {"R1": {"StartTime": "18:30", "EndTime": "20:00", "duration": "1.5 hours"}}}
+            }) + "\n```"
+        ))
+        request = TripRegenerationRequest(
+            trip_data=TRIP_DATA,
+            itinerary=make_itinerary(),
+            day=1,
+            time_slot="Evening"
+        )
+
+        result = json.loads(await trip_generation_service.regenerate_slice(request))
+
+        trip_generation_service._ensure_sufficient_places.assert_not_awaited()
+        assert list(result["Day 1"]["Evening"]["POI"]) == ["rest_3"]
+        assert result["Day 1"]["Morning"] == make_itinerary()["Day 1"]["Morning"]
+        assert result["Day 2"] == make_itinerary()["Day 2"]
+
+        unused_restaurants = {p["place_id"] for p in result["Unused"]["Restaurants"]}
+        assert unused_restaurants == {"rest_2", "rest_4"}
+
+        assert result["Day 1"]["Evening"]["POI"]["rest_3"]["name"] == "Trattoria"
+
+        # The prompt only carries the regenerated slot's candidates, by alias
+        prompt = trip_generation_service.groq_service.create_hedged_completion.call_args[0][0].messages[1].content
+        assert "R1|Trattoria|restaurant" in prompt
+        assert "rest_3" not in prompt
+        assert "Gallery" not in prompt
+        assert "Lunch Two" not in prompt
+
+    @pytest.mark.asyncio
+    async def test_regenerate_searches_only_the_shortfall(self, trip_generation_service):
+        """Types missing from the pool trigger a search sized to the slice"""
+        trip_generation_service._ensure_sufficient_places = AsyncMock(return_value=[
+            {"place_id": "cafe_9", "name": "New Cafe", "type": "cafe", "coordinates": {"lat": 53.48, "lng": -2.24}}
+        ])
+        trip_generation_service.groq_service.create_hedged_completion = AsyncMock(return_value=ChatResponse(
+            content="```json\n" + json.dumps({
+                "Morning": {"POI": {
+                    "C1": {"StartTime": "8:00", "EndTime": "9:00", "duration": "1 hour"},
+                    "A1": {"StartTime": "9:30", "EndTime": "11:30", "duration": "2 hours"}
+                }}
+            }) + "\n```"
+        ))
+        request = TripRegenerationRequest(
+            trip_data=TRIP_DATA,
+            itinerary=make_itinerary(),
+            day=1,
+            time_slot="Morning"
+        )
+
+        result = json.loads(await trip_generation_service.regenerate_slice(request))
+
+        trip_generation_service._ensure_sufficient_places.assert_awaited_once()
+        kwargs = trip_generation_service._ensure_sufficient_places.call_args.kwargs
+        assert kwargs["place_type"] == "cafe"
+        assert kwargs["additional_places_needed"] == 2
+        assert set(result["Day 1"]["Morning"]["POI"]) == {"cafe_9", "attr_9"}
+        assert {p["place_id"] for p in result["Unused"]["Attractions"]} == {"attr_1"}
+        # Released and newly searched POIs keep their coordinates in Unused
+        assert result["Unused"]["Attractions"][0]["coordinates"] == {"lat": 53.48, "lng": -2.24}
+
+    @pytest.mark.asyncio
+    async def test_rejects_place_ids_outside_candidates(self, trip_generation_service):
+        """The LLM may not pull in POIs that are fixed elsewhere in the trip"""
+        trip_generation_service.groq_service.create_hedged_completion = AsyncMock(return_value=ChatResponse(
+            content="```json\n" + json.dumps({
+                "Evening": {"POI": {"rest_5": poi("Lunch Two", "restaurant", "18:30", "20:00")}}
+            }) + "\n```"
+        ))
+        request = TripRegenerationRequest(
+            trip_data=TRIP_DATA,
+            itinerary=make_itinerary(),
+            day=1,
+            time_slot="Evening"
+        )
+
+        with pytest.raises(HTTPException) as excinfo:
+            await trip_generation_service.regenerate_slice(request)
+        assert "rest_5" in excinfo.value.detail
+
+
+class TestGenerateTrip:
+    @pytest.mark.asyncio
+    async def test_scheduling_problems_do_not_hedge(self, trip_generation_service, caplog):
+        """Only structural problems reject a response; it is expanded once and, with a
+        travel time problem, returned but not cached"""
+        itinerary = make_itinerary()
+        del itinerary["Unused"]
+        itinerary["Day 1"]["Morning"]["POI"]["attr_1"]["coordinates"] = {"lat": 54.2, "lng": -2.24}
+        picked = [
+            {"place_id": place_id, "name": entry["name"], "type": entry["type"], "coordinates": entry["coordinates"]}
+            for day in itinerary.values() for slot in day.values() for place_id, entry in slot["POI"].items()
+        ]
+        request = TripGenerationRequest(
+            trip_data=TRIP_DATA,
+            cafepois=[p for p in picked if p["type"] == "cafe"],
+            foodpois=[p for p in picked if p["type"] == "restaurant"],
+            attractionpois=[p for p in picked if p["type"] == "attraction"]
+        )
+        service = trip_generation_service
+        service.prompt_builder.expand_itinerary = MagicMock(return_value=itinerary)
+        service.itinerary_cache.set = MagicMock()
+        accepted = []
+
+        async def hedged(chat_request, accept):
+            response = ChatResponse(content="```json\n{}\n```", model="big")
+            accepted.append(accept(response))
+            return response
+        service.groq_service.create_hedged_completion = hedged
+
+        result = json.loads(await service.generate_trip(request))
+
+        assert accepted == [True]
+        assert result["Day 1"]["Morning"]["POI"]["attr_1"]["name"] == "Museum One"
+        service.prompt_builder.expand_itinerary.assert_called_once()
+        service.itinerary_cache.set.assert_not_called()
+        assert "not enough time to travel" in caplog.text
@@ -8,7 +8,9 @@ from services.userhistory_service import UserHistoryService
 @pytest.fixture
 def user_history_service():
     """Create a UserHistoryService with mocked dependencies"""
-    with patch('services.userhistory_service.FirebaseService', autospec=True) as mock_firebase_base:
+    # Transactions run the function once with the mock transaction, no begin/commit
+    with patch('services.userhistory_service.FirebaseService', autospec=True) as mock_firebase_base, \
+            patch('services.userhistory_service.firestore.transactional', lambda fn: fn):
         # Create service instance
         service = UserHistoryService()
         
@@ -30,6 +32,8 @@ def user_history_service():
         service.get_collection_ref = MagicMock(return_value=mock_collection_ref)
         mock_collection_ref.document = MagicMock(return_value=mock_doc_ref)
         mock_doc_ref.collection = MagicMock(return_value=mock_subcollection_ref)
+        # No history summary built yet for the user
+        mock_doc_ref.get = MagicMock(return_value=MagicMock(exists=False))
         
         # Mock document creation with auto ID
         mock_new_doc_ref = MagicMock()
@@ -60,11 +64,13 @@ class TestSavePOI:
         # Verify document was created and set was called
         assert result == "new_doc_id"
         
-        # Verify the document.set method was called with correct data
-        user_history_service.get_collection_ref().document().collection().document().set.assert_called_once()
+        # Verify the document was set in the transaction with correct data
+        transaction = user_history_service.db.transaction()
+        transaction.set.assert_called_once()
         
         # Get the data that was passed to set()
-        set_call_args = user_history_service.get_collection_ref().document().collection().document().set.call_args[0][0]
+        doc_ref, set_call_args = transaction.set.call_args[0]
+        assert doc_ref.id == "new_doc_id"
         assert set_call_args['pointID'] == point_id
         assert set_call_args['status'] is True
         assert set_call_args['city'] == city.lower()
@@ -96,10 +102,12 @@ class TestSavePOI:
         
         # Verify the result and that update was called
         assert result == "existing_poi_id"
-        mock_doc.reference.update.assert_called_once()
+        transaction = user_history_service.db.transaction()
+        transaction.update.assert_called_once()
         
         # Verify correct data was passed to update
-        update_call_args = mock_doc.reference.update.call_args[0][0]
+        doc_ref, update_call_args = transaction.update.call_args[0]
+        assert doc_ref is mock_doc.reference
         assert update_call_args['status'] is True
         assert 'createdDT' in update_call_args
 
@@ -260,15 +268,15 @@ class TestUnsavePOI:
         assert save_result == "saved_poi_id"
         
         # Verify the POI was saved with status=True
-        set_call_args = mock_new_doc_ref.set.call_args[0][0]
+        doc_ref, set_call_args = user_history_service.db.transaction().set.call_args[0]
+        assert doc_ref is mock_new_doc_ref
         assert set_call_args['status'] is True
         
         # Step 2: Now unsave the POI
         
-        # Reset the batch mock to ensure it's clean
-        user_history_service.db.batch = MagicMock()
+        # Reset the transaction mock to ensure it's clean
         batch_mock = MagicMock()
-        user_history_service.db.batch.return_value = batch_mock
+        user_history_service.db.transaction = MagicMock(return_value=batch_mock)
         
         # Create a mock document that will be found when querying for the POI to unsave
         mock_existing_doc = MagicMock()
@@ -295,9 +303,6 @@ class TestUnsavePOI:
         assert update_args[1]['status'] is False
         assert 'updatedDT' in update_args[1]
         
-        # Verify the batch was committed
-        batch_mock.commit.assert_called_once()
-    
     @pytest.mark.asyncio
     async def test_unsave_multiple_pois(self, user_history_service):
         """Test unsaving multiple POIs in a single operation"""
@@ -305,10 +310,9 @@ class TestUnsavePOI:
         user_id = "test_user_123"
         point_ids = ["poi_123", "poi_456", "poi_789"]
         
-        # Reset the batch mock to ensure it's clean
-        user_history_service.db.batch = MagicMock()
+        # Reset the transaction mock to ensure it's clean
         batch_mock = MagicMock()
-        user_history_service.db.batch.return_value = batch_mock
+        user_history_service.db.transaction = MagicMock(return_value=batch_mock)
         
         # Create a simpler mocking strategy - just return a document for each query
         # without trying to match pointIDs (which complicates things)
@@ -316,6 +320,7 @@ class TestUnsavePOI:
         mock_doc = MagicMock()
         mock_doc.reference = MagicMock()
         mock_query.get.return_value = [mock_doc]
+        mock_query.limit = MagicMock(return_value=mock_query)
         user_history_service.get_collection_ref().document().collection().where = MagicMock(return_value=mock_query)
         
         # Unsave multiple POIs
@@ -329,9 +334,6 @@ class TestUnsavePOI:
             args = call[0]
             assert args[1]['status'] is False
             assert 'updatedDT' in args[1]
-        
-        # Verify the batch was committed once
-        batch_mock.commit.assert_called_once()
 
 class TestIntegrationFlow:
     @pytest.mark.asyncio
@@ -396,8 +398,121 @@ class TestIntegrationFlow:
         user_history_service.poi_service.create_or_get_point.assert_called_once_with(poi_data)
         
         # Verify the correct data was saved to user history
-        set_call_args = user_history_service.get_collection_ref().document().collection().document().set.call_args[0][0]
+        set_call_args = user_history_service.db.transaction().set.call_args[0][1]
         assert set_call_args['pointID'] == poi_id
         assert set_call_args['status'] is True
         assert set_call_args['city'] == city.lower()
 
+
+class TestSavedListingPagination:
+    @staticmethod
+    def make_docs(rows):
+        docs = []
+        for doc_id, data in rows:
+            doc = MagicMock()
+            doc.id = doc_id
+            doc.get = MagicMock(side_effect=lambda field, data=data: data.get(field))
+            doc.to_dict = MagicMock(return_value=dict(data))
+            docs.append(doc)
+        return docs
+
+    @staticmethod
+    def chain(user_history_service, docs):
+        query = MagicMock()
+        query.get.return_value = docs
+        for method in ("where", "select", "order_by", "start_after", "limit"):
+            setattr(query, method, MagicMock(return_value=query))
+        user_history_service.get_collection_ref().document().collection().where = MagicMock(return_value=query)
+        return query
+
+    @pytest.mark.asyncio
+    async def test_saved_pois_pages(self, user_history_service):
+        """A limit reads one extra document to know there is a next page, and the cursor resumes after the last item"""
+        created = [datetime(2024, 1, day) for day in (3, 2, 1)]
+        query = self.chain(user_history_service, self.make_docs(
+            [(f"doc_{i}", {'pointID': f'poi_{i}', 'status': True, 'createdDT': dt, 'city': 'paris'}) for i, dt in enumerate(created)]
+        ))
+
+        page = await user_history_service.get_saved_pois_page("user", "Paris", limit=2, fields=["pointID"])
+
+        assert page.items == [{'id': 'doc_0', 'pointID': 'poi_0'}, {'id': 'doc_1', 'pointID': 'poi_1'}]
+        assert page.next_cursor
+        query.limit.assert_called_once_with(3)
+        query.select.assert_called_once_with(['createdDT', 'pointID'])
+        assert query.order_by.call_args_list[0].args == ('createdDT',)
+
+        query = self.chain(user_history_service, self.make_docs([]))
+        last = await user_history_service.get_saved_pois_page("user", None, limit=2, cursor=page.next_cursor)
+        query.start_after.assert_called_once_with({'createdDT': created[1], '__name__': 'doc_1'})
+        assert last.next_cursor is None
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor_is_rejected(self, user_history_service):
+        from fastapi import HTTPException
+        self.chain(user_history_service, [])
+        with pytest.raises(HTTPException) as error:
+            await user_history_service.get_saved_pois_page("user", None, cursor="not-a-cursor")
+        assert error.value.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_saved_trips_keep_stored_dates(self, user_history_service):
+        """Trips are listed unordered without a limit, their date strings returned unparsed"""
+        trip = {'city': 'paris', 'country': 'france', 'fromDT': '2024-06-01T00:00:00.000Z',
+                'toDT': '2024-06-04T00:00:00.000Z', 'monthlyDays': 3, 'status': True}
+        query = self.chain(user_history_service, self.make_docs([("trip_1", trip)]))
+
+        trips = await user_history_service.get_user_saved_trips("user")
+
+        assert trips == [{'trip_doc_id': 'trip_1', **trip}]
+        query.order_by.assert_not_called()
+
+class TestSavedPOIDetailsStream:
+    @pytest.mark.asyncio
+    async def test_streams_points_of_saved_ids(self, user_history_service):
+        """Only the pointIDs are read from history, then handed to the POI stream; a failed read ends it with an error item"""
+        saved = TestSavedListingPagination.make_docs([("s1", {'pointID': 'poi_1'}), ("s2", {'pointID': 'poi_2'})])
+        query = TestSavedListingPagination.chain(user_history_service, saved)
+
+        async def iter_points(point_ids):
+            for point_id in point_ids:
+                yield {'id': point_id}
+            raise RuntimeError("read failed")
+        user_history_service.poi_service.iter_points = iter_points
+
+        points = await user_history_service.stream_detailed_saved_pois("user", "Paris")
+
+        assert [point async for point in points] == [{'id': 'poi_1'}, {'id': 'poi_2'}, {'error': 'read failed'}]
+        query.select.assert_called_once_with(['pointID'])
+
+class TestHistorySummary:
+    @pytest.mark.asyncio
+    async def test_save_updates_summary_in_transaction(self, user_history_service):
+        """An existing summary is counted up in the same transaction as the save"""
+        summary = {'poiCounts': {'paris': 1}, 'tripCounts': {}, 'recentPOIs': [], 'recentTrips': []}
+        user_doc = MagicMock(exists=True)
+        user_doc.to_dict.return_value = {'summary': summary}
+        user_history_service.get_collection_ref().document().get = MagicMock(return_value=user_doc)
+        mock_query = MagicMock()
+        mock_query.get.return_value = []
+        mock_query.limit = MagicMock(return_value=mock_query)
+        user_history_service.get_collection_ref().document().collection().where = MagicMock(return_value=mock_query)
+
+        await user_history_service.save_poi("user", "poi_1", "Paris")
+
+        transaction = user_history_service.db.transaction()
+        user_ref, written = transaction.set.call_args_list[-1][0]
+        assert user_ref is user_history_service.get_collection_ref().document()
+        assert written['summary']['poiCounts'] == {'paris': 2}
+        assert written['summary']['recentPOIs'][0]['pointID'] == 'poi_1'
+        assert transaction.set.call_args_list[-1].kwargs['merge'] == ['summary', 'summaryUpdatedDT']
+
+    @pytest.mark.asyncio
+    async def test_summary_is_built_once(self, user_history_service):
+        """Without a stored summary it is rebuilt from the saved entries and stored"""
+        saved = TestSavedListingPagination.make_docs([("s1", {'pointID': 'poi_1', 'city': 'paris', 'createdDT': None})])
+        TestSavedListingPagination.chain(user_history_service, saved)
+
+        summary = await user_history_service.get_summary("user")
+
+        assert summary['poiCounts'] == {'paris': 1}
+        user_history_service.db.transaction().set.assert_called_once()
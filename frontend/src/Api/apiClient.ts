@@ -41,6 +41,35 @@ class ApiClient {
     return this.fetchWithAuth(`/user/history/saved-pois${queryParams}`);
   }
 
+  // Saved POIs with their details in one request, streamed by the server as NDJSON
+  async getSavedPOIsWithDetails(city?: string): Promise<POI[]> {
+    const queryParams = city ? `?city=${encodeURIComponent(city)}` : '';
+    const token = await this.getIdToken();
+    const response = await fetch(`${this.API_BASE_URL}/user/history/saved-pois/details${queryParams}`, {
+      headers: {
+        Authorization: `Bearer ${token}`,
+        Accept: 'application/x-ndjson',
+      },
+    });
+
+    if (!response.ok) {
+      const error = await response.json().catch(() => null);
+      throw new Error(error?.detail || `API error: ${response.status}`);
+    }
+
+    const body = await response.text();
+    const items = body
+      .split('\n')
+      .filter((line) => line.trim())
+      .map((line) => JSON.parse(line));
+    // A failure part way through ends the stream with an error line: the list is incomplete
+    const failure = items.find((item) => 'error' in item && !('place_id' in item));
+    if (failure) {
+      throw new Error(`Saved POIs were only partly loaded: ${failure.error}`);
+    }
+    return items.map((poi: POI) => ({ ...poi, type: `${poi.type}` }));
+  }
+
   async getSavedPOIDetails(ids?: string[]) {
     if (!ids || ids.length === 0) {
       return [];
@@ -1,6 +1,6 @@
 //Used by POIContainer to return saved and explore POIs
 import { useState, useEffect, useCallback, useRef, useMemo } from 'react';
-import type { POI, POIType, UserHistoryPoint } from '@/Types/InterfaceTypes';
+import type { POI, POIType } from '@/Types/InterfaceTypes';
 import { useLocation } from '@/contexts/LocationContext';
 import { useDebounce } from './debounce';
 import { poiCacheService } from './poiCacheService';
@@ -177,17 +177,9 @@ const fetchSavedPOIs = useCallback(async (): Promise<POI[]> => {
 
   setLoading(true);
   try {
-    const savedPoiRefs = await apiClient.getSavedPOIs(currentCity);
-    const poiIds = savedPoiRefs.map((poi: UserHistoryPoint) => poi.pointID);
-    if (poiIds.length === 0) {
-      setSavedPois([]);
-      setSavedPoiIds(new Set());
-      return [];
-    }
-    
-    const poisWithDetails = await apiClient.getSavedPOIDetails(poiIds);
+    const poisWithDetails = await apiClient.getSavedPOIsWithDetails(currentCity);
     setSavedPois(poisWithDetails);
-    setSavedPoiIds(new Set(poiIds));
+    setSavedPoiIds(new Set(poisWithDetails.map((poi: POI) => poi.id)));
     return poisWithDetails;
   } catch (error) {
     console.error('Error fetching saved POIs:', error);